@@ -0,0 +1,33 @@
+"""Partial index for the signal outbox sweeper.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Accepted-but-unexecuted signals, oldest first (sweep_signal_outbox)
+    op.create_index(
+        "ix_signals_outbox",
+        "signals",
+        ["updated_at"],
+        postgresql_where=sa.text("status = 'ENRICHED'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_signals_outbox", table_name="signals")
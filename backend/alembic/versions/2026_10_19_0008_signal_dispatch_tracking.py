@@ -0,0 +1,41 @@
+"""Dispatch bookkeeping for the signal outbox sweeper.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+
+from __future__ import annotations
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # When sweep_signal_outbox last re-dispatched the signal, and how often
+    op.add_column(
+        "signals",
+        sa.Column("dispatched_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.add_column(
+        "signals",
+        sa.Column(
+            "dispatch_attempts",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("signals", "dispatch_attempts")
+    op.drop_column("signals", "dispatched_at")
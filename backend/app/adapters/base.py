@@ -4,6 +4,7 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import AsyncIterator
 
+from app.adapters.exceptions import OrderNotFoundError
 from app.adapters.types import (
     AccountInfo,
     BracketOrderResult,
@@ -24,6 +25,12 @@ class BrokerAdapter(ABC):
     Methods are async to support WebSocket and REST-based brokers uniformly.
     """
 
+    # Key for per-broker limits (e.g. reconciliation request rates).
+    broker_type: str = "unknown"
+    # Most ids ``get_order_statuses`` should be asked for in one call.
+    # 1 means the adapter has no bulk endpoint.
+    max_status_batch: int = 1
+
     @abstractmethod
     async def connect(self) -> ConnectionStatus:
         """Establish connection to broker."""
@@ -32,6 +39,14 @@ class BrokerAdapter(ABC):
     async def disconnect(self) -> None:
         """Gracefully close broker connection."""
 
+    async def health_check(self) -> bool:
+        """Return False if the session is no longer usable.
+
+        Called by the adapter pool before reusing an idle adapter. Adapters
+        with a cheap ping endpoint should override this.
+        """
+        return True
+
     @abstractmethod
     async def place_order(self, order: OrderRequest) -> OrderResult:
         """Submit a single order to the broker."""
@@ -66,13 +81,35 @@ class BrokerAdapter(ABC):
     async def get_order_status(self, broker_order_id: str) -> OrderStatusInfo:
         """Get current status of a specific order."""
 
+    async def get_order_statuses(
+        self, broker_order_ids: list[str]
+    ) -> dict[str, OrderStatusInfo]:
+        """Get the status of many orders; unknown ids are omitted.
+
+        The default makes one ``get_order_status`` call per id. Adapters with
+        a bulk endpoint should override this and raise ``max_status_batch``.
+        """
+        statuses = {}
+        for broker_order_id in broker_order_ids:
+            try:
+                statuses[broker_order_id] = await self.get_order_status(broker_order_id)
+            except OrderNotFoundError:
+                continue
+        return statuses
+
     @abstractmethod
     async def get_account_info(self) -> AccountInfo:
         """Get account balance and margin information."""
 
     @abstractmethod
-    async def subscribe_order_updates(self) -> AsyncIterator[OrderResult]:
-        """Stream real-time order fill updates."""
+    async def subscribe_order_updates(
+        self, since: str | None = None
+    ) -> AsyncIterator[OrderResult]:
+        """Stream real-time order fill updates.
+
+        Each update carries a ``sequence``. Passing the last one seen as
+        ``since`` resumes the stream after it; ``None`` starts from now.
+        """
 
     @abstractmethod
     async def subscribe_position_updates(self) -> AsyncIterator[PositionInfo]:
@@ -1,4 +1,8 @@
-"""Paper trading simulator — fully functional broker adapter for simulated trading."""
+"""Paper trading simulator — fully functional broker adapter for simulated trading.
+
+Resting orders live in a shared ``PaperMatchingEngine`` (see paper_engine), so
+any adapter instance, in any process, sees the same pending orders.
+"""
 from __future__ import annotations
 
 import uuid
@@ -11,9 +15,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.adapters.base import BrokerAdapter
 from app.adapters.exceptions import OrderNotFoundError, OrderRejectedError
+from app.adapters.paper_engine import PaperMatchingEngine, PaperOrder, RedisPaperEngine
 from app.adapters.types import (
     AccountInfo,
     BracketOrderResult,
+    BracketRole,
     CancelResult,
     ConnectionStatus,
     ModifyResult,
@@ -31,6 +37,8 @@ logger = get_logger("trendedge.adapters.paper")
 # Default paper account
 _DEFAULT_BALANCE = Decimal("100000.00")
 _DEFAULT_COMMISSION = Decimal("0.62")  # per micro contract per side
+# Seconds each fill-log read blocks; below the shared client's socket timeout.
+_STREAM_POLL_TIMEOUT = 2.0
 
 
 class PaperBrokerAdapter(BrokerAdapter):
@@ -43,22 +51,28 @@ class PaperBrokerAdapter(BrokerAdapter):
     - OCO behavior: when SL fills -> cancel TP; when TP fills -> cancel SL
     - MAE/MFE tracking during position lifetime
     - Commission simulation
+
+    Instances are per-user handles; pending orders are kept by the engine
+    (Redis-backed unless one is passed in).
     """
 
+    broker_type = "paper"
+    max_status_batch = 500
+
     def __init__(
         self,
         user_id: uuid.UUID,
         db: AsyncSession,
         redis: Redis,
         slippage_ticks: int = 1,
+        engine: PaperMatchingEngine | None = None,
     ) -> None:
         self._user_id = user_id
         self._db = db
         self._redis = redis
         self._slippage_ticks = slippage_ticks
         self._connected = False
-        # In-memory order book for paper orders
-        self._pending_orders: dict[str, dict] = {}
+        self._engine = engine if engine is not None else RedisPaperEngine(redis)
         self._account_balance = _DEFAULT_BALANCE
 
     async def connect(self) -> ConnectionStatus:
@@ -88,19 +102,9 @@ class PaperBrokerAdapter(BrokerAdapter):
             )
 
         if order.order_type in (OrderType.LIMIT, OrderType.STOP, OrderType.STOP_LIMIT):
-            # Limit/Stop orders are stored as pending
-            self._pending_orders[broker_order_id] = {
-                "order": order,
-                "broker_order_id": broker_order_id,
-                "created_at": now,
-                "status": "SUBMITTED",
-            }
-            return OrderResult(
-                broker_order_id=broker_order_id,
-                status="SUBMITTED",
-                message=f"Paper {order.order_type.value} order submitted",
-                timestamp=now,
-            )
+            # Limit/Stop orders rest in the shared book
+            await self._engine.place_orders([self._pending(broker_order_id, order, now)])
+            return _submitted(broker_order_id, order, now)
 
         raise OrderRejectedError(f"Unsupported order type: {order.order_type}")
 
@@ -115,30 +119,24 @@ class PaperBrokerAdapter(BrokerAdapter):
         # Place entry order (fills immediately if market)
         entry_result = await self.place_order(entry)
 
-        # Place SL and TP as pending
-        sl_result = await self.place_order(stop_loss)
-        tp_result = await self.place_order(take_profit)
-
-        # Link SL and TP as OCO pair in pending orders
-        if sl_result.broker_order_id in self._pending_orders:
-            self._pending_orders[sl_result.broker_order_id]["oco_partner"] = (
-                tp_result.broker_order_id
-            )
-        if tp_result.broker_order_id in self._pending_orders:
-            self._pending_orders[tp_result.broker_order_id]["oco_partner"] = (
-                sl_result.broker_order_id
-            )
+        # Rest SL and TP together, linked as an OCO pair
+        now = datetime.now(UTC)
+        sl = self._pending(f"PAPER-{uuid.uuid4().hex[:12].upper()}", stop_loss, now)
+        tp = self._pending(f"PAPER-{uuid.uuid4().hex[:12].upper()}", take_profit, now)
+        sl.oco_partner = tp.broker_order_id
+        tp.oco_partner = sl.broker_order_id
+        await self._engine.place_orders([sl, tp])
 
         return BracketOrderResult(
             entry=entry_result,
-            stop_loss=sl_result,
-            take_profit=tp_result,
+            stop_loss=_submitted(sl.broker_order_id, stop_loss, now),
+            take_profit=_submitted(tp.broker_order_id, take_profit, now),
             bracket_group_id=bracket_group_id,
         )
 
     async def cancel_order(self, broker_order_id: str) -> CancelResult:
-        if broker_order_id in self._pending_orders:
-            del self._pending_orders[broker_order_id]
+        cancelled = await self._engine.cancel_orders([broker_order_id])
+        if cancelled[broker_order_id]:
             return CancelResult(
                 broker_order_id=broker_order_id,
                 success=True,
@@ -156,16 +154,10 @@ class PaperBrokerAdapter(BrokerAdapter):
         new_price: float | None = None,
         new_quantity: int | None = None,
     ) -> ModifyResult:
-        if broker_order_id not in self._pending_orders:
+        price = Decimal(str(new_price)) if new_price is not None else None
+        if not await self._engine.modify_order(broker_order_id, price, new_quantity):
             raise OrderNotFoundError(broker_order_id)
 
-        pending = self._pending_orders[broker_order_id]
-        order = pending["order"]
-        if new_price is not None:
-            order.price = Decimal(str(new_price))
-        if new_quantity is not None:
-            order.quantity = new_quantity
-
         return ModifyResult(
             broker_order_id=broker_order_id,
             success=True,
@@ -178,14 +170,16 @@ class PaperBrokerAdapter(BrokerAdapter):
         return []
 
     async def get_order_status(self, broker_order_id: str) -> OrderStatusInfo:
-        if broker_order_id in self._pending_orders:
-            pending = self._pending_orders[broker_order_id]
-            return OrderStatusInfo(
-                broker_order_id=broker_order_id,
-                status=pending["status"],
-                timestamp=pending["created_at"],
-            )
-        raise OrderNotFoundError(broker_order_id)
+        order = (await self._engine.get_orders([broker_order_id]))[broker_order_id]
+        if order is None:
+            raise OrderNotFoundError(broker_order_id)
+        return _status_info(order)
+
+    async def get_order_statuses(
+        self, broker_order_ids: list[str]
+    ) -> dict[str, OrderStatusInfo]:
+        orders = await self._engine.get_orders(broker_order_ids)
+        return {oid: _status_info(order) for oid, order in orders.items() if order is not None}
 
     async def get_account_info(self) -> AccountInfo:
         return AccountInfo(
@@ -197,131 +191,52 @@ class PaperBrokerAdapter(BrokerAdapter):
             margin_used=Decimal("0"),
         )
 
-    async def subscribe_order_updates(self) -> AsyncIterator[OrderResult]:
-        # Paper trading uses polling instead of streaming
-        return
-        yield  # Make it a generator
+    async def subscribe_order_updates(
+        self, since: str | None = None
+    ) -> AsyncIterator[OrderResult]:
+        """Stream this user's trigger fills from the engine's fill log."""
+        cursor = since
+        while self._connected:
+            fills = await self._engine.read_fills(
+                str(self._user_id), cursor, timeout=_STREAM_POLL_TIMEOUT
+            )
+            for cursor, order in fills:
+                result = _trigger_fill(order)
+                result.sequence = cursor
+                yield result
 
     async def subscribe_position_updates(self) -> AsyncIterator[PositionInfo]:
         return
         yield  # Make it a generator
 
-    def check_stop_loss_trigger(
-        self, current_price: Decimal, order_data: dict
-    ) -> OrderResult | None:
-        """Check if a stop loss should trigger at the current price.
-
-        Returns an OrderResult if triggered, None otherwise.
-        """
-        order: OrderRequest = order_data["order"]
-        if order.price is None:
-            return None
-
-        # STOP for SELL side (long position SL) triggers when price <= stop price
-        if order.side == OrderSide.SELL and current_price <= order.price:
-            fill_price = order.price - Decimal(str(self._slippage_ticks)) * Decimal(
-                "0.25"
-            )
-            return OrderResult(
-                broker_order_id=order_data["broker_order_id"],
-                status="FILLED",
-                fill_price=fill_price,
-                fill_quantity=order.quantity,
-                commission=_DEFAULT_COMMISSION * order.quantity,
-                message="Paper stop loss triggered",
-                timestamp=datetime.now(UTC),
-            )
-
-        # STOP for BUY side (short position SL) triggers when price >= stop price
-        if order.side == OrderSide.BUY and current_price >= order.price:
-            fill_price = order.price + Decimal(str(self._slippage_ticks)) * Decimal(
-                "0.25"
-            )
-            return OrderResult(
-                broker_order_id=order_data["broker_order_id"],
-                status="FILLED",
-                fill_price=fill_price,
-                fill_quantity=order.quantity,
-                commission=_DEFAULT_COMMISSION * order.quantity,
-                message="Paper stop loss triggered",
-                timestamp=datetime.now(UTC),
-            )
-
-        return None
-
-    def check_take_profit_trigger(
-        self, current_price: Decimal, order_data: dict
-    ) -> OrderResult | None:
-        """Check if a take profit should trigger at the current price.
-
-        Returns an OrderResult if triggered, None otherwise.
-        """
-        order: OrderRequest = order_data["order"]
-        if order.price is None:
-            return None
-
-        # LIMIT for SELL side (long position TP) triggers when price >= limit price
-        if order.side == OrderSide.SELL and current_price >= order.price:
-            return OrderResult(
-                broker_order_id=order_data["broker_order_id"],
-                status="FILLED",
-                fill_price=order.price,  # Limit fills at limit price
-                fill_quantity=order.quantity,
-                commission=_DEFAULT_COMMISSION * order.quantity,
-                message="Paper take profit triggered",
-                timestamp=datetime.now(UTC),
-            )
-
-        # LIMIT for BUY side (short position TP) triggers when price <= limit price
-        if order.side == OrderSide.BUY and current_price <= order.price:
-            return OrderResult(
-                broker_order_id=order_data["broker_order_id"],
-                status="FILLED",
-                fill_price=order.price,
-                fill_quantity=order.quantity,
-                commission=_DEFAULT_COMMISSION * order.quantity,
-                message="Paper take profit triggered",
-                timestamp=datetime.now(UTC),
-            )
-
-        return None
-
     async def check_pending_triggers(
         self, instrument_symbol: str, current_price: Decimal
     ) -> list[OrderResult]:
-        """Check all pending orders for trigger conditions. Returns list of fills.
+        """Fill this user's pending SL/TP orders crossed by ``current_price``.
 
-        Called by the position monitoring Celery task.
+        OCO partners of filled orders are cancelled by the engine. The paper
+        position monitor runs the engine's ``trigger`` for every user on each
+        price update; this is the per-user equivalent.
         """
-        fills: list[OrderResult] = []
-        orders_to_remove: list[str] = []
-        oco_to_cancel: list[str] = []
-
-        for broker_id, order_data in self._pending_orders.items():
-            order: OrderRequest = order_data["order"]
-            if order.instrument_symbol != instrument_symbol:
-                continue
-
-            result: OrderResult | None = None
-
-            if order.bracket_role.value == "STOP_LOSS":
-                result = self.check_stop_loss_trigger(current_price, order_data)
-            elif order.bracket_role.value == "TAKE_PROFIT":
-                result = self.check_take_profit_trigger(current_price, order_data)
-
-            if result:
-                fills.append(result)
-                orders_to_remove.append(broker_id)
-                # OCO: cancel the partner
-                partner_id = order_data.get("oco_partner")
-                if partner_id and partner_id in self._pending_orders:
-                    oco_to_cancel.append(partner_id)
-
-        # Remove filled and OCO-cancelled orders
-        for oid in orders_to_remove + oco_to_cancel:
-            self._pending_orders.pop(oid, None)
-
-        return fills
+        filled = await self._engine.trigger(
+            {instrument_symbol: current_price}, user_id=str(self._user_id)
+        )
+        return [_trigger_fill(order) for order in filled]
+
+    def _pending(self, broker_order_id: str, order: OrderRequest, now: datetime) -> PaperOrder:
+        """Build the engine record for a resting order."""
+        offset = Decimal("0")
+        if order.bracket_role == BracketRole.STOP_LOSS:
+            # Stops fill one slippage step beyond the trigger, against the trader.
+            slippage = Decimal(str(self._slippage_ticks)) * Decimal("0.25")
+            offset = -slippage if order.side == OrderSide.SELL else slippage
+        return PaperOrder(
+            broker_order_id=broker_order_id,
+            user_id=str(self._user_id),
+            request=order,
+            created_at=now,
+            fill_offset=offset,
+        )
 
     def _apply_slippage(self, order: OrderRequest) -> Decimal:
         """Apply adverse slippage to a market order fill price."""
@@ -332,3 +247,40 @@ class PaperBrokerAdapter(BrokerAdapter):
         if order.side == OrderSide.BUY:
             return base_price + slippage  # Buy fills higher
         return base_price - slippage  # Sell fills lower
+
+
+def _submitted(broker_order_id: str, order: OrderRequest, now: datetime) -> OrderResult:
+    return OrderResult(
+        broker_order_id=broker_order_id,
+        status="SUBMITTED",
+        message=f"Paper {order.order_type.value} order submitted",
+        timestamp=now,
+    )
+
+
+def _trigger_fill(order: PaperOrder) -> OrderResult:
+    return OrderResult(
+        broker_order_id=order.broker_order_id,
+        status="FILLED",
+        fill_price=order.fill_price,
+        fill_quantity=order.request.quantity,
+        commission=_DEFAULT_COMMISSION * order.request.quantity,
+        message=(
+            "Paper stop loss triggered"
+            if order.request.bracket_role == BracketRole.STOP_LOSS
+            else "Paper take profit triggered"
+        ),
+        timestamp=order.filled_at,
+    )
+
+
+def _status_info(order: PaperOrder) -> OrderStatusInfo:
+    filled = order.status == "FILLED"
+    return OrderStatusInfo(
+        broker_order_id=order.broker_order_id,
+        status=order.status,
+        fill_price=order.fill_price,
+        filled_quantity=order.request.quantity if filled else None,
+        remaining_quantity=0 if filled else order.request.quantity,
+        timestamp=order.filled_at or order.created_at,
+    )
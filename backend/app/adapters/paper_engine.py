@@ -0,0 +1,479 @@
+"""Shared paper matching engine: resting paper orders outside any one adapter.
+
+``PaperBrokerAdapter`` instances are short-lived (one per request or task), so
+resting orders cannot live on them. Engines keep every user's resting orders
+in one book keyed by symbol, and adapters are thin per-user handles onto it.
+
+Two implementations share one batched API:
+
+- ``RedisPaperEngine`` (used by ``get_adapter``) stores orders in Redis so the
+  API, Celery workers and the paper monitor all see the same book.
+  ``paper:order:{id}`` hashes hold the orders; bracket exits also rest in
+  per-symbol sorted sets scored by trigger price
+  (``paper:book:{symbol}:below`` / ``:above``). Triggering and cancelling run
+  as Lua scripts, so an OCO pair can never fill twice.
+- ``LocalPaperEngine`` keeps the same book in process memory on a
+  ``TriggerBook``; for tests and single-process tools.
+
+The paper position monitor (``app.services.paper_monitor``) runs ``trigger``
+on every price update and cancels a position's bracket orders when it closes
+the position itself. Filled and cancelled orders stay readable for ``_TERMINAL_TTL`` so fill
+reconciliation can pick up their final status. Every fill is also appended to
+a per-user fill log (a ``paper:fills:{user_id}`` stream in Redis), which backs
+``PaperBrokerAdapter.subscribe_order_updates``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from redis.asyncio import Redis
+
+from app.adapters.trigger_book import (
+    FIRES_AT_OR_ABOVE,
+    FIRES_AT_OR_BELOW,
+    TriggerBook,
+    trigger_direction,
+)
+from app.adapters.types import BracketRole, OrderRequest, OrderSide, OrderType
+from app.core.logging import get_logger
+from app.core.redis import LuaScript
+
+logger = get_logger("trendedge.adapters.paper_engine")
+
+_ORDER_KEY_PREFIX = "paper:order:"
+_BOOK_KEY_PREFIX = "paper:book:"
+_FILLS_KEY_PREFIX = "paper:fills:"
+_FILL_LOG_LENGTH = 1000  # approximate per-user fills kept for stream resume
+_TERMINAL_TTL = 7 * 24 * 3600  # seconds filled/cancelled orders stay readable
+
+_BRACKET_EXITS = (BracketRole.STOP_LOSS, BracketRole.TAKE_PROFIT)
+
+
+@dataclass(slots=True)
+class PaperOrder:
+    """A paper order resting in (or settled by) the matching engine."""
+
+    broker_order_id: str
+    user_id: str
+    request: OrderRequest
+    status: str = "SUBMITTED"
+    created_at: datetime | None = None
+    # Added to the trigger price to get the fill price (stop slippage).
+    fill_offset: Decimal = Decimal("0")
+    oco_partner: str | None = None
+    filled_at: datetime | None = None
+
+    @property
+    def symbol(self) -> str:
+        return self.request.instrument_symbol
+
+    @property
+    def triggers(self) -> bool:
+        """Whether price crossing ``request.price`` fills this order."""
+        return self.request.price is not None and self.request.bracket_role in _BRACKET_EXITS
+
+    @property
+    def direction(self) -> str:
+        return trigger_direction(self.request.side, self.request.bracket_role)
+
+    @property
+    def fill_price(self) -> Decimal | None:
+        if self.status != "FILLED" or self.request.price is None:
+            return None
+        return self.request.price + self.fill_offset
+
+    def to_fields(self) -> dict[str, str]:
+        req = self.request
+        fields = {
+            "user_id": self.user_id,
+            "symbol": req.instrument_symbol,
+            "side": req.side.value,
+            "order_type": req.order_type.value,
+            "quantity": str(req.quantity),
+            "time_in_force": req.time_in_force,
+            "bracket_role": req.bracket_role.value,
+            "status": self.status,
+            "fill_offset": str(self.fill_offset),
+        }
+        optional = {
+            "price": req.price,
+            "stop_price": req.stop_price,
+            "bracket_group_id": req.bracket_group_id,
+            "client_order_id": req.client_order_id,
+            "oco_partner": self.oco_partner,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+        }
+        fields.update({k: str(v) for k, v in optional.items() if v is not None})
+        return fields
+
+    @classmethod
+    def from_fields(cls, broker_order_id: str, fields: Mapping[str, str]) -> PaperOrder:
+        request = OrderRequest(
+            instrument_symbol=fields["symbol"],
+            side=OrderSide(fields["side"]),
+            order_type=OrderType(fields["order_type"]),
+            quantity=int(fields["quantity"]),
+            price=_decimal_or_none(fields.get("price")),
+            stop_price=_decimal_or_none(fields.get("stop_price")),
+            time_in_force=fields.get("time_in_force", "GTC"),
+            bracket_role=BracketRole(fields["bracket_role"]),
+            bracket_group_id=fields.get("bracket_group_id"),
+            client_order_id=fields.get("client_order_id"),
+        )
+        return cls(
+            broker_order_id=broker_order_id,
+            user_id=fields["user_id"],
+            request=request,
+            status=fields["status"],
+            created_at=_datetime_or_none(fields.get("created_at")),
+            fill_offset=Decimal(fields.get("fill_offset", "0")),
+            oco_partner=fields.get("oco_partner"),
+            filled_at=_datetime_or_none(fields.get("filled_at")),
+        )
+
+
+def _decimal_or_none(value: str | None) -> Decimal | None:
+    return Decimal(value) if value is not None else None
+
+
+def _datetime_or_none(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value else None
+
+
+class PaperMatchingEngine(ABC):
+    """Batched operations on the shared paper order book."""
+
+    @abstractmethod
+    async def place_orders(self, orders: Iterable[PaperOrder]) -> None:
+        """Rest orders in the book (atomically, for OCO pairs)."""
+
+    @abstractmethod
+    async def cancel_orders(self, broker_order_ids: Iterable[str]) -> dict[str, bool]:
+        """Cancel resting orders. Maps each id to whether it was cancelled."""
+
+    @abstractmethod
+    async def modify_order(
+        self,
+        broker_order_id: str,
+        price: Decimal | None = None,
+        quantity: int | None = None,
+    ) -> bool:
+        """Change a resting order. False if it is not resting."""
+
+    @abstractmethod
+    async def get_orders(self, broker_order_ids: Iterable[str]) -> dict[str, PaperOrder | None]:
+        """Look up orders by id; None for unknown (or expired) ids."""
+
+    @abstractmethod
+    async def trigger(
+        self, prices: Mapping[str, Decimal], user_id: str | None = None
+    ) -> list[PaperOrder]:
+        """Fill every resting order crossed by ``prices`` (symbol -> price).
+
+        OCO partners of filled orders are cancelled. With ``user_id``, only
+        that user's orders are considered. Returns the filled orders.
+        """
+
+    @abstractmethod
+    async def read_fills(
+        self, user_id: str, after: str | None = None, timeout: float = 0
+    ) -> list[tuple[str, PaperOrder]]:
+        """Read ``user_id``'s fill log after cursor ``after``, oldest first.
+
+        Returns (cursor, order) pairs. ``after=None`` means fills from now on.
+        Waits up to ``timeout`` seconds when nothing new has been logged.
+        """
+
+
+# ---------------------------------------------------------------------------
+# Process-local engine
+# ---------------------------------------------------------------------------
+
+
+class LocalPaperEngine(PaperMatchingEngine):
+    """In-memory engine; shared only by adapters in the same process."""
+
+    def __init__(self) -> None:
+        self._orders: dict[str, PaperOrder] = {}
+        # One trigger book per user, so a per-user trigger pass never pops
+        # (and has to restore) another user's orders.
+        self._books: dict[str, TriggerBook] = {}
+        self._fills: dict[str, list[PaperOrder]] = {}
+        self._filled = asyncio.Condition()
+
+    def _book(self, user_id: str) -> TriggerBook:
+        book = self._books.get(user_id)
+        if book is None:
+            book = self._books[user_id] = TriggerBook()
+        return book
+
+    async def place_orders(self, orders: Iterable[PaperOrder]) -> None:
+        for order in orders:
+            self._orders[order.broker_order_id] = order
+            if order.triggers:
+                self._book(order.user_id).add(
+                    order.broker_order_id,
+                    order.symbol,
+                    order.request.price,
+                    order.direction,
+                    payload=order,
+                    oco_partner=order.oco_partner,
+                )
+
+    async def cancel_orders(self, broker_order_ids: Iterable[str]) -> dict[str, bool]:
+        cancelled = {}
+        for broker_order_id in broker_order_ids:
+            order = self._orders.get(broker_order_id)
+            ok = order is not None and order.status == "SUBMITTED"
+            if ok:
+                order.status = "CANCELLED"
+                self._book(order.user_id).remove(broker_order_id)
+            cancelled[broker_order_id] = ok
+        return cancelled
+
+    async def modify_order(
+        self,
+        broker_order_id: str,
+        price: Decimal | None = None,
+        quantity: int | None = None,
+    ) -> bool:
+        order = self._orders.get(broker_order_id)
+        if order is None or order.status != "SUBMITTED":
+            return False
+        if price is not None:
+            order.request.price = price
+            book = self._book(order.user_id)
+            if broker_order_id in book:
+                book.modify(broker_order_id, price)
+        if quantity is not None:
+            order.request.quantity = quantity
+        return True
+
+    async def get_orders(self, broker_order_ids: Iterable[str]) -> dict[str, PaperOrder | None]:
+        return {oid: self._orders.get(oid) for oid in broker_order_ids}
+
+    async def trigger(
+        self, prices: Mapping[str, Decimal], user_id: str | None = None
+    ) -> list[PaperOrder]:
+        books = [self._book(user_id)] if user_id is not None else list(self._books.values())
+        now = datetime.now(UTC)
+        filled: list[PaperOrder] = []
+        for book in books:
+            for symbol, price in prices.items():
+                result = book.on_price(symbol, price)
+                for entry in result.fired:
+                    entry.payload.status = "FILLED"
+                    entry.payload.filled_at = now
+                    filled.append(entry.payload)
+                for entry in result.cancelled:
+                    entry.payload.status = "CANCELLED"
+        if filled:
+            for order in filled:
+                self._fills.setdefault(order.user_id, []).append(order)
+            async with self._filled:
+                self._filled.notify_all()
+        return filled
+
+    async def read_fills(
+        self, user_id: str, after: str | None = None, timeout: float = 0
+    ) -> list[tuple[str, PaperOrder]]:
+        log = self._fills.setdefault(user_id, [])
+        # Cursors are 1-based positions in the user's log.
+        start = len(log) if after is None else int(after)
+        if len(log) <= start and timeout > 0:
+            async with self._filled:
+                try:
+                    await asyncio.wait_for(
+                        self._filled.wait_for(lambda: len(log) > start), timeout
+                    )
+                except TimeoutError:
+                    pass
+        return [(str(i + 1), log[i]) for i in range(start, len(log))]
+
+
+# ---------------------------------------------------------------------------
+# Redis engine
+# ---------------------------------------------------------------------------
+
+
+# Order hashes are addressed from inside the scripts (ids come out of the
+# sorted sets), so these assume a single, non-clustered Redis.
+
+# KEYS: below zset, above zset.
+# ARGV: price, order key prefix, now (ISO), user_id or '', terminal ttl,
+#       fill log key prefix, fill log length
+_TRIGGER_SCRIPT = LuaScript("""
+local candidates = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], '+inf')
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])) do
+    table.insert(candidates, id)
+end
+local fired = {}
+for _, id in ipairs(candidates) do
+    local key = ARGV[2] .. id
+    local order = redis.call('HMGET', key, 'status', 'user_id', 'oco_partner')
+    if order[1] ~= 'SUBMITTED' then
+        redis.call('ZREM', KEYS[1], id)
+        redis.call('ZREM', KEYS[2], id)
+    elseif ARGV[4] == '' or order[2] == ARGV[4] then
+        redis.call('ZREM', KEYS[1], id)
+        redis.call('ZREM', KEYS[2], id)
+        redis.call('HSET', key, 'status', 'FILLED', 'filled_at', ARGV[3])
+        redis.call('EXPIRE', key, ARGV[5])
+        redis.call('XADD', ARGV[6] .. order[2], 'MAXLEN', '~', ARGV[7], '*', 'order_id', id)
+        table.insert(fired, id)
+        local partner = order[3]
+        if partner then
+            local partner_key = ARGV[2] .. partner
+            if redis.call('HGET', partner_key, 'status') == 'SUBMITTED' then
+                redis.call('HSET', partner_key, 'status', 'CANCELLED')
+                redis.call('EXPIRE', partner_key, ARGV[5])
+                redis.call('ZREM', KEYS[1], partner)
+                redis.call('ZREM', KEYS[2], partner)
+            end
+        end
+    end
+end
+return fired
+""")
+
+# KEYS: order hash. ARGV: order id, book key prefix, terminal ttl
+_CANCEL_SCRIPT = LuaScript("""
+if redis.call('HGET', KEYS[1], 'status') ~= 'SUBMITTED' then
+    return 0
+end
+local symbol = redis.call('HGET', KEYS[1], 'symbol')
+redis.call('HSET', KEYS[1], 'status', 'CANCELLED')
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('ZREM', ARGV[2] .. symbol .. ':below', ARGV[1])
+redis.call('ZREM', ARGV[2] .. symbol .. ':above', ARGV[1])
+return 1
+""")
+
+# KEYS: order hash. ARGV: order id, book key prefix, price or '', quantity or ''
+_MODIFY_SCRIPT = LuaScript("""
+if redis.call('HGET', KEYS[1], 'status') ~= 'SUBMITTED' then
+    return 0
+end
+if ARGV[3] ~= '' then
+    local symbol = redis.call('HGET', KEYS[1], 'symbol')
+    redis.call('HSET', KEYS[1], 'price', ARGV[3])
+    redis.call('ZADD', ARGV[2] .. symbol .. ':below', 'XX', ARGV[3], ARGV[1])
+    redis.call('ZADD', ARGV[2] .. symbol .. ':above', 'XX', ARGV[3], ARGV[1])
+end
+if ARGV[4] ~= '' then
+    redis.call('HSET', KEYS[1], 'quantity', ARGV[4])
+end
+return 1
+""")
+
+
+def _order_key(broker_order_id: str) -> str:
+    return f"{_ORDER_KEY_PREFIX}{broker_order_id}"
+
+
+def _book_key(symbol: str, direction: str) -> str:
+    return f"{_BOOK_KEY_PREFIX}{symbol}:{direction}"
+
+
+class RedisPaperEngine(PaperMatchingEngine):
+    """Engine whose book lives in Redis, shared by every process."""
+
+    def __init__(self, redis: Redis) -> None:
+        self._redis = redis
+
+    async def place_orders(self, orders: Iterable[PaperOrder]) -> None:
+        pipe = self._redis.pipeline(transaction=True)
+        for order in orders:
+            pipe.hset(_order_key(order.broker_order_id), mapping=order.to_fields())
+            if order.triggers:
+                pipe.zadd(
+                    _book_key(order.symbol, order.direction),
+                    {order.broker_order_id: float(order.request.price)},
+                )
+        await pipe.execute()
+
+    async def cancel_orders(self, broker_order_ids: Iterable[str]) -> dict[str, bool]:
+        ids = list(broker_order_ids)
+        results = await _CANCEL_SCRIPT.run_many(
+            self._redis,
+            [([_order_key(oid)], [oid, _BOOK_KEY_PREFIX, _TERMINAL_TTL]) for oid in ids],
+        )
+        return {oid: bool(ok) for oid, ok in zip(ids, results, strict=True)}
+
+    async def modify_order(
+        self,
+        broker_order_id: str,
+        price: Decimal | None = None,
+        quantity: int | None = None,
+    ) -> bool:
+        args = [
+            broker_order_id,
+            _BOOK_KEY_PREFIX,
+            str(price) if price is not None else "",
+            str(quantity) if quantity is not None else "",
+        ]
+        (ok,) = await _MODIFY_SCRIPT.run_many(
+            self._redis, [([_order_key(broker_order_id)], args)]
+        )
+        return bool(ok)
+
+    async def get_orders(self, broker_order_ids: Iterable[str]) -> dict[str, PaperOrder | None]:
+        ids = list(broker_order_ids)
+        if not ids:
+            return {}
+        pipe = self._redis.pipeline(transaction=False)
+        for oid in ids:
+            pipe.hgetall(_order_key(oid))
+        rows = await pipe.execute()
+        return {
+            oid: PaperOrder.from_fields(oid, fields) if fields else None
+            for oid, fields in zip(ids, rows, strict=True)
+        }
+
+    async def trigger(
+        self, prices: Mapping[str, Decimal], user_id: str | None = None
+    ) -> list[PaperOrder]:
+        now = datetime.now(UTC).isoformat()
+        calls = [
+            (
+                [_book_key(symbol, FIRES_AT_OR_BELOW), _book_key(symbol, FIRES_AT_OR_ABOVE)],
+                [
+                    str(price), _ORDER_KEY_PREFIX, now, user_id or "", _TERMINAL_TTL,
+                    _FILLS_KEY_PREFIX, _FILL_LOG_LENGTH,
+                ],
+            )
+            for symbol, price in prices.items()
+        ]
+        results = await _TRIGGER_SCRIPT.run_many(self._redis, calls)
+        fired_ids = [oid for fired in results for oid in fired]
+        if not fired_ids:
+            return []
+        orders = await self.get_orders(fired_ids)
+        filled = [order for order in orders.values() if order is not None]
+        logger.info("Paper orders triggered", filled=len(filled), symbols=len(prices))
+        return filled
+
+    async def read_fills(
+        self, user_id: str, after: str | None = None, timeout: float = 0
+    ) -> list[tuple[str, PaperOrder]]:
+        key = _FILLS_KEY_PREFIX + user_id
+        response = await self._redis.xread(
+            {key: after or "$"},
+            count=_FILL_LOG_LENGTH,
+            block=int(timeout * 1000) if timeout > 0 else None,
+        )
+        entries = [entry for _, stream in response or [] for entry in stream]
+        if not entries:
+            return []
+        orders = await self.get_orders(fields["order_id"] for _, fields in entries)
+        return [
+            (entry_id, orders[fields["order_id"]])
+            for entry_id, fields in entries
+            if orders.get(fields["order_id"]) is not None
+        ]
@@ -0,0 +1,391 @@
+"""Process-wide pool of connected live broker adapters.
+
+Live brokers authenticate per session, so building and ``connect()``ing an
+adapter for every signal, reconcile pass and position close would mean one
+auth handshake per call. The pool keeps one connected adapter per
+(user, broker connection) and hands it back on every ``get_adapter``:
+
+- **Health checks** — an adapter idle for longer than the check interval is
+  probed with ``health_check()`` before reuse and reconnected if it fails.
+- **Idle eviction** — adapters unused for ``idle_timeout`` are disconnected
+  on the next pool access.
+- **Max sessions** — past ``max_sessions`` the least recently used adapter is
+  disconnected to make room.
+- **Credential caching** — decrypted credentials are cached per connection
+  and ciphertext, so reconnects skip the HKDF + AES-GCM work and rotated
+  credentials are picked up automatically.
+- **Shared HTTP sessions** — adapters of the same broker type share one
+  ``httpx.AsyncClient`` and therefore one keep-alive connection pool.
+- **Connection lookups** — the user's active live ``BrokerConnection`` row is
+  cached briefly. On update and delete ``BrokerService`` calls
+  ``invalidate_broker_user``, which broadcasts over the ``cache:invalidate``
+  channel so every process subscribed to it (the API) forgets the row too.
+  Celery workers are not subscribed; the worker runtime forgets all cached
+  rows after every task instead, so a task never sees a row older than its
+  own start.
+
+The pool is bound to the event loop it was first used on. If it is used from
+a different loop (e.g. a fresh ``asyncio.run`` per Celery task), sessions from
+the old loop are dropped rather than reused across loops.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+import httpx
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.adapters.base import BrokerAdapter
+from app.core.cache import add_invalidation_handler, publish_invalidation
+from app.core.logging import get_logger
+from app.db.models.broker_connection import BrokerConnection
+from app.services.encryption_service import decrypt_credentials
+
+logger = get_logger("trendedge.adapters.pool")
+
+_MAX_SESSIONS = 500
+_IDLE_TIMEOUT = 900.0  # seconds without use before an adapter is disconnected
+_HEALTH_CHECK_INTERVAL = 30.0  # idle seconds before a reused adapter is probed
+_CONNECTION_CACHE_TTL = 60.0  # seconds a BrokerConnection lookup is reused
+_CREDENTIALS_CACHE_SIZE = 1024
+_HTTP_TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+_INVALIDATION_KEY = "broker_user"  # cache:invalidate payload field
+
+PoolKey = tuple[uuid.UUID, uuid.UUID]  # (user_id, connection_id)
+AdapterFactory = Callable[..., BrokerAdapter]
+
+
+@dataclass(frozen=True, slots=True)
+class ConnectionInfo:
+    """Detached snapshot of the ``BrokerConnection`` fields the pool needs."""
+
+    id: uuid.UUID
+    user_id: uuid.UUID
+    broker_type: str
+    account_id: str | None
+    credentials_encrypted: bytes
+    credentials_iv: bytes
+    credentials_key_id: str
+
+    @classmethod
+    def from_model(cls, connection: BrokerConnection) -> ConnectionInfo:
+        return cls(
+            id=connection.id,
+            user_id=connection.user_id,
+            broker_type=connection.broker_type,
+            account_id=connection.account_id,
+            credentials_encrypted=bytes(connection.credentials_encrypted),
+            credentials_iv=bytes(connection.credentials_iv),
+            credentials_key_id=connection.credentials_key_id,
+        )
+
+    @property
+    def key(self) -> PoolKey:
+        return (self.user_id, self.id)
+
+    @property
+    def fingerprint(self) -> str:
+        """Changes whenever the stored credentials are re-encrypted."""
+        digest = hashlib.sha256(self.credentials_iv + self.credentials_encrypted)
+        return f"{self.credentials_key_id}:{digest.hexdigest()}"
+
+
+@dataclass(slots=True)
+class _Session:
+    adapter: BrokerAdapter
+    fingerprint: str
+    last_used: float
+    last_checked: float
+
+
+class AdapterPool:
+    """Connected adapters keyed by (user, broker connection)."""
+
+    def __init__(
+        self,
+        max_sessions: int = _MAX_SESSIONS,
+        idle_timeout: float = _IDLE_TIMEOUT,
+        health_check_interval: float = _HEALTH_CHECK_INTERVAL,
+        connection_ttl: float = _CONNECTION_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_sessions = max_sessions
+        self._idle_timeout = idle_timeout
+        self._health_check_interval = health_check_interval
+        self._connection_ttl = connection_ttl
+        self._clock = clock
+
+        # Ordered by last use: the first entry is the LRU eviction candidate.
+        self._sessions: OrderedDict[PoolKey, _Session] = OrderedDict()
+        self._locks: dict[PoolKey, asyncio.Lock] = {}
+        self._connections: dict[uuid.UUID, tuple[ConnectionInfo | None, float]] = {}
+        self._credentials: OrderedDict[tuple[uuid.UUID, str], dict] = OrderedDict()
+        self._http: dict[str, httpx.AsyncClient] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._last_sweep = 0.0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._sessions
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    async def get_connection(
+        self, db: AsyncSession, user_id: uuid.UUID
+    ) -> ConnectionInfo | None:
+        """Return the user's active live connection, cached for a short TTL."""
+        self._bind_loop()
+        now = self._clock()
+        cached = self._connections.get(user_id)
+        if cached is not None and now - cached[1] < self._connection_ttl:
+            return cached[0]
+
+        result = await db.execute(
+            select(BrokerConnection).where(
+                BrokerConnection.user_id == user_id,
+                BrokerConnection.status == "active",
+                BrokerConnection.is_paper == False,  # noqa: E712
+            ).limit(1)
+        )
+        connection = result.scalar_one_or_none()
+        info = ConnectionInfo.from_model(connection) if connection else None
+        self._connections[user_id] = (info, now)
+        return info
+
+    async def prime_connections(
+        self, db: AsyncSession, user_ids: Iterable[uuid.UUID]
+    ) -> None:
+        """Load many users' active live connections in one query.
+
+        Batch jobs call this first so the ``get_adapter`` calls that follow
+        are served from the cache.
+        """
+        self._bind_loop()
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        result = await db.execute(
+            select(BrokerConnection).where(
+                BrokerConnection.user_id.in_(user_ids),
+                BrokerConnection.status == "active",
+                BrokerConnection.is_paper == False,  # noqa: E712
+            )
+        )
+        now = self._clock()
+        found = {}
+        for connection in result.scalars().all():
+            found.setdefault(connection.user_id, ConnectionInfo.from_model(connection))
+        for user_id in user_ids:
+            self._connections[user_id] = (found.get(user_id), now)
+
+    async def get(
+        self, connection: ConnectionInfo, factory: AdapterFactory
+    ) -> BrokerAdapter:
+        """Return a connected adapter for ``connection``, reusing a pooled one.
+
+        ``factory`` is called as ``factory(credentials=..., http_client=...,
+        account_id=...)`` when a new session is needed.
+        """
+        self._bind_loop()
+        await self._sweep_idle()
+
+        key = connection.key
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:  # single-flight: concurrent callers share one handshake
+            session = self._sessions.get(key)
+            now = self._clock()
+            if session is not None and session.fingerprint != connection.fingerprint:
+                # Credentials were rotated since this session authenticated.
+                await self._discard(key)
+                session = None
+
+            if session is not None and await self._is_healthy(session, now):
+                session.last_used = now
+                self._sessions.move_to_end(key)
+                return session.adapter
+
+            if session is not None:
+                logger.info(
+                    "Pooled adapter failed health check; reconnecting",
+                    user_id=str(connection.user_id),
+                    connection_id=str(connection.id),
+                )
+                await self._discard(key)
+
+            adapter = factory(
+                credentials=self.credentials(connection),
+                http_client=self.http_client(connection.broker_type),
+                account_id=connection.account_id,
+            )
+            await adapter.connect()
+            await self._make_room()
+            self._sessions[key] = _Session(adapter, connection.fingerprint, now, now)
+            return adapter
+
+    def credentials(self, connection: ConnectionInfo) -> dict:
+        """Decrypt the connection's credentials, caching by ciphertext."""
+        cache_key = (connection.id, connection.fingerprint)
+        credentials = self._credentials.get(cache_key)
+        if credentials is None:
+            credentials = decrypt_credentials(
+                connection.id,
+                connection.credentials_encrypted,
+                connection.credentials_iv,
+                connection.credentials_key_id,
+            )
+            self._credentials[cache_key] = credentials
+            if len(self._credentials) > _CREDENTIALS_CACHE_SIZE:
+                self._credentials.popitem(last=False)
+        else:
+            self._credentials.move_to_end(cache_key)
+        return credentials
+
+    def http_client(self, broker_type: str) -> httpx.AsyncClient:
+        """The keep-alive HTTP client shared by every adapter of ``broker_type``."""
+        client = self._http.get(broker_type)
+        if client is None or client.is_closed:
+            client = self._http[broker_type] = httpx.AsyncClient(
+                timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS
+            )
+        return client
+
+    # ------------------------------------------------------------------
+    # Invalidation and shutdown
+    # ------------------------------------------------------------------
+
+    async def invalidate_user(self, user_id: uuid.UUID) -> None:
+        """Forget the user's cached connection and disconnect their sessions."""
+        keys = [key for key in self._sessions if key[0] == user_id]
+        self.forget_user(user_id, {connection_id for _, connection_id in keys})
+        for key in keys:
+            await self._discard(key)
+
+    def forget_user(
+        self, user_id: uuid.UUID, connection_ids: Iterable[uuid.UUID] = ()
+    ) -> None:
+        """Drop the user's cached connection row and decrypted credentials.
+
+        Pooled sessions are left alone: the next ``get`` replaces them if the
+        credentials changed, and idle eviction reaps them otherwise.
+        """
+        connection_ids = set(connection_ids)
+        connection_ids.update(k[1] for k in self._sessions if k[0] == user_id)
+        cached = self._connections.pop(user_id, None)
+        if cached is not None and cached[0] is not None:
+            connection_ids.add(cached[0].id)
+        for cache_key in [k for k in self._credentials if k[0] in connection_ids]:
+            del self._credentials[cache_key]
+
+    def forget_connections(self) -> None:
+        """Drop every cached connection row; the next lookups hit the database."""
+        self._connections.clear()
+
+    async def evict_idle(self) -> int:
+        """Disconnect every adapter idle for longer than the timeout."""
+        cutoff = self._clock() - self._idle_timeout
+        idle = [key for key, s in self._sessions.items() if s.last_used <= cutoff]
+        for key in idle:
+            await self._discard(key)
+        if idle:
+            logger.info("Evicted idle broker sessions", count=len(idle))
+        return len(idle)
+
+    async def close(self) -> None:
+        """Disconnect all adapters and close the shared HTTP clients."""
+        for key in list(self._sessions):
+            await self._discard(key)
+        for client in self._http.values():
+            await client.aclose()
+        self._reset()
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    async def _is_healthy(self, session: _Session, now: float) -> bool:
+        if now - session.last_checked < self._health_check_interval:
+            return True
+        try:
+            healthy = await session.adapter.health_check()
+        except Exception:
+            logger.warning("Broker health check raised", exc_info=True)
+            healthy = False
+        session.last_checked = now
+        return healthy
+
+    async def _sweep_idle(self) -> None:
+        now = self._clock()
+        if now - self._last_sweep < self._health_check_interval:
+            return
+        self._last_sweep = now
+        await self.evict_idle()
+
+    async def _make_room(self) -> None:
+        while len(self._sessions) >= self._max_sessions:
+            key = next(iter(self._sessions))
+            logger.info("Broker session pool full; evicting LRU session")
+            await self._discard(key)
+
+    async def _discard(self, key: PoolKey) -> None:
+        session = self._sessions.pop(key, None)
+        lock = self._locks.get(key)
+        if lock is not None and not lock.locked():
+            del self._locks[key]
+        if session is None:
+            return
+        try:
+            await session.adapter.disconnect()
+        except Exception:
+            logger.warning(
+                "Broker adapter disconnect failed",
+                user_id=str(key[0]),
+                connection_id=str(key[1]),
+                exc_info=True,
+            )
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        if self._loop is not None and self._sessions:
+            # Transports belong to the old loop and cannot be awaited here.
+            logger.info("Event loop changed; dropping pooled broker sessions")
+        self._reset()
+        self._loop = loop
+
+    def _reset(self) -> None:
+        self._sessions.clear()
+        self._locks.clear()
+        self._connections.clear()
+        self._http.clear()
+        self._last_sweep = 0.0
+
+
+adapter_pool = AdapterPool()
+
+
+async def invalidate_broker_user(user_id: uuid.UUID) -> None:
+    """Invalidate the user's pooled connection here and in peer processes."""
+    await adapter_pool.invalidate_user(user_id)
+    await publish_invalidation({_INVALIDATION_KEY: str(user_id)})
+
+
+def _on_invalidation(payload: dict) -> None:
+    if user_id := payload.get(_INVALIDATION_KEY):
+        adapter_pool.forget_user(uuid.UUID(user_id))
+
+
+add_invalidation_handler(_on_invalidation)
@@ -4,16 +4,15 @@ from __future__ import annotations
 import uuid
 
 from redis.asyncio import Redis
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.adapters.base import BrokerAdapter
 from app.adapters.exceptions import BrokerConnectionError
 from app.adapters.ibkr import IBKRAdapter
 from app.adapters.paper import PaperBrokerAdapter
+from app.adapters.pool import adapter_pool
 from app.adapters.tradovate import TradovateAdapter
 from app.core.logging import get_logger
-from app.db.models.broker_connection import BrokerConnection
 
 logger = get_logger("trendedge.adapters.registry")
 
@@ -32,8 +31,10 @@ async def get_adapter(
 ) -> BrokerAdapter:
     """Return the appropriate broker adapter for the user.
 
-    Paper mode (default) always returns PaperBrokerAdapter.
-    Live mode looks up the user's active broker connection.
+    Paper mode (default) always returns PaperBrokerAdapter; it is cheap to
+    build and its resting orders live in the shared matching engine.
+    Live mode returns the pooled, already-connected adapter for the user's
+    active broker connection (see ``app.adapters.pool``).
     """
     if is_paper:
         adapter = PaperBrokerAdapter(
@@ -45,15 +46,8 @@ async def get_adapter(
         await adapter.connect()
         return adapter
 
-    # Live mode — find active broker connection
-    result = await db.execute(
-        select(BrokerConnection).where(
-            BrokerConnection.user_id == user_id,
-            BrokerConnection.status == "active",
-            BrokerConnection.is_paper == False,  # noqa: E712
-        ).limit(1)
-    )
-    connection = result.scalar_one_or_none()
+    # Live mode — find active broker connection (cached by the pool)
+    connection = await adapter_pool.get_connection(db, user_id)
     if not connection:
         raise BrokerConnectionError("live", "No active live broker connection found.")
 
@@ -64,7 +58,10 @@ async def get_adapter(
             f"Unsupported broker type: {connection.broker_type}",
         )
 
-    # For now, live adapters are stubs
-    raise BrokerConnectionError(
-        connection.broker_type, "Live trading not yet available. Use paper mode."
-    )
+    try:
+        return await adapter_pool.get(connection, adapter_cls)
+    except NotImplementedError as exc:
+        # For now, live adapters are stubs
+        raise BrokerConnectionError(
+            connection.broker_type, "Live trading not yet available. Use paper mode."
+        ) from exc
@@ -3,6 +3,8 @@ from __future__ import annotations
 
 from collections.abc import AsyncIterator
 
+import httpx
+
 from app.adapters.base import BrokerAdapter
 from app.adapters.types import (
     AccountInfo,
@@ -24,6 +26,20 @@ class TradovateAdapter(BrokerAdapter):
     Full implementation planned for Phase 2.
     """
 
+    broker_type = "tradovate"
+
+    def __init__(
+        self,
+        credentials: dict,
+        http_client: httpx.AsyncClient | None = None,
+        account_id: str | None = None,
+    ) -> None:
+        # Built by the adapter pool: decrypted credentials plus the HTTP
+        # client shared by every Tradovate session in this process.
+        self._credentials = credentials
+        self._http = http_client
+        self._account_id = account_id
+
     async def connect(self) -> ConnectionStatus:
         raise NotImplementedError("Tradovate adapter: Phase 2 implementation")
 
@@ -61,7 +77,9 @@ class TradovateAdapter(BrokerAdapter):
     async def get_account_info(self) -> AccountInfo:
         raise NotImplementedError("Tradovate adapter: Phase 2 implementation")
 
-    async def subscribe_order_updates(self) -> AsyncIterator[OrderResult]:
+    async def subscribe_order_updates(
+        self, since: str | None = None
+    ) -> AsyncIterator[OrderResult]:
         raise NotImplementedError("Tradovate adapter: Phase 2 implementation")
 
     async def subscribe_position_updates(self) -> AsyncIterator[PositionInfo]:
@@ -0,0 +1,217 @@
+"""Per-symbol, price-sorted book of resting stop/limit triggers.
+
+Each symbol keeps two heaps:
+
+- ``below``: triggers that fire when price trades at or below their level
+  (sell stops, buy limits). Max-heap, so the highest level is checked first.
+- ``above``: triggers that fire at or above their level (buy stops, sell
+  limits). Min-heap.
+
+A price update pops exactly the triggered entries: O(log n) per fired entry,
+plus O(1) to see that nothing fired. Cancels and modifies are lazy: the entry
+is dropped from the index (or re-pushed with a new sequence number) and the
+stale heap item is discarded when it surfaces. Heaps are compacted once stale
+items outnumber live ones.
+
+OCO pairs are handled inside the book: when one side fires, its partner is
+removed and reported as cancelled, even if it would also have fired on the
+same update.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any
+
+from app.adapters.types import BracketRole, OrderSide
+
+FIRES_AT_OR_BELOW = "below"
+FIRES_AT_OR_ABOVE = "above"
+
+Price = Decimal | float
+
+
+def trigger_direction(side: OrderSide, role: BracketRole) -> str:
+    """Which way price must move to fire a bracket exit on ``side``.
+
+    Stop-losses fire against the position (a SELL stop protects a long and
+    fires on the way down); take-profits fire in its favor.
+    """
+    sells = side == OrderSide.SELL
+    if role == BracketRole.STOP_LOSS:
+        return FIRES_AT_OR_BELOW if sells else FIRES_AT_OR_ABOVE
+    if role == BracketRole.TAKE_PROFIT:
+        return FIRES_AT_OR_ABOVE if sells else FIRES_AT_OR_BELOW
+    raise ValueError(f"No trigger direction for bracket role {role}")
+
+
+@dataclass(slots=True)
+class TriggerEntry:
+    """One resting trigger. ``payload`` is whatever the owner needs on fire."""
+
+    order_id: str
+    symbol: str
+    price: Price
+    direction: str
+    payload: Any = None
+    oco_partner: str | None = None
+    seq: int = 0
+
+
+@dataclass(slots=True)
+class TriggerResult:
+    fired: list[TriggerEntry] = field(default_factory=list)
+    cancelled: list[TriggerEntry] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.fired)
+
+
+@dataclass(slots=True)
+class _SymbolBook:
+    # Items are (sort_key, seq, order_id); sort_key is -price for ``below``.
+    below: list[tuple[Price, int, str]] = field(default_factory=list)
+    above: list[tuple[Price, int, str]] = field(default_factory=list)
+    order_ids: set[str] = field(default_factory=set)
+
+
+class TriggerBook:
+    """Resting triggers indexed by symbol and sorted by trigger price."""
+
+    def __init__(self) -> None:
+        self._entries: dict[str, TriggerEntry] = {}
+        self._books: dict[str, _SymbolBook] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, order_id: object) -> bool:
+        return order_id in self._entries
+
+    def __iter__(self) -> Iterator[TriggerEntry]:
+        return iter(self._entries.values())
+
+    def get(self, order_id: str) -> TriggerEntry | None:
+        return self._entries.get(order_id)
+
+    # ------------------------------------------------------------------
+    # Mutation
+    # ------------------------------------------------------------------
+
+    def add(
+        self,
+        order_id: str,
+        symbol: str,
+        price: Price,
+        direction: str,
+        payload: Any = None,
+        oco_partner: str | None = None,
+    ) -> TriggerEntry:
+        if direction not in (FIRES_AT_OR_BELOW, FIRES_AT_OR_ABOVE):
+            raise ValueError(f"Unknown trigger direction: {direction}")
+        if order_id in self._entries:
+            self.remove(order_id)
+        entry = TriggerEntry(order_id, symbol, price, direction, payload, oco_partner)
+        self._entries[order_id] = entry
+        self._push(entry)
+        self._books[symbol].order_ids.add(order_id)
+        return entry
+
+    def link_oco(self, first_id: str, second_id: str) -> None:
+        """Make two resting triggers one-cancels-other."""
+        self._entries[first_id].oco_partner = second_id
+        self._entries[second_id].oco_partner = first_id
+
+    def remove(self, order_id: str) -> TriggerEntry | None:
+        """Drop a trigger (its heap item is discarded lazily)."""
+        entry = self._entries.pop(order_id, None)
+        if entry is not None:
+            book = self._books[entry.symbol]
+            book.order_ids.discard(order_id)
+            self._maybe_compact(entry.symbol, book)
+        return entry
+
+    def modify(self, order_id: str, price: Price) -> TriggerEntry:
+        """Move a trigger to a new level."""
+        entry = self._entries[order_id]
+        entry.price = price
+        self._push(entry)  # supersedes the old heap item via the new seq
+        self._maybe_compact(entry.symbol, self._books[entry.symbol])
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._books.clear()
+
+    # ------------------------------------------------------------------
+    # Evaluation
+    # ------------------------------------------------------------------
+
+    def on_price(self, symbol: str, price: Price) -> TriggerResult:
+        """Pop every trigger on ``symbol`` that ``price`` crosses.
+
+        Fired entries are removed from the book, as are their OCO partners
+        (reported in ``cancelled``).
+        """
+        result = TriggerResult()
+        book = self._books.get(symbol)
+        if book is None:
+            return result
+
+        while book.below and -book.below[0][0] >= price:
+            _, seq, order_id = heapq.heappop(book.below)
+            self._fire(order_id, seq, result)
+        while book.above and book.above[0][0] <= price:
+            _, seq, order_id = heapq.heappop(book.above)
+            self._fire(order_id, seq, result)
+        return result
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _book(self, symbol: str) -> _SymbolBook:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _SymbolBook()
+        return book
+
+    def _push(self, entry: TriggerEntry) -> None:
+        entry.seq = next(self._seq)
+        book = self._book(entry.symbol)
+        if entry.direction == FIRES_AT_OR_BELOW:
+            heapq.heappush(book.below, (-entry.price, entry.seq, entry.order_id))
+        else:
+            heapq.heappush(book.above, (entry.price, entry.seq, entry.order_id))
+
+    def _fire(self, order_id: str, seq: int, result: TriggerResult) -> None:
+        entry = self._entries.get(order_id)
+        if entry is None or entry.seq != seq:
+            return  # cancelled, modified, or already OCO-cancelled
+        self.remove(order_id)
+        result.fired.append(entry)
+        if entry.oco_partner is not None:
+            partner = self.remove(entry.oco_partner)
+            if partner is not None:
+                result.cancelled.append(partner)
+
+    def _maybe_compact(self, symbol: str, book: _SymbolBook) -> None:
+        if not book.order_ids:
+            del self._books[symbol]
+            return
+        if len(book.below) + len(book.above) <= 2 * len(book.order_ids) + 32:
+            return
+        live = [self._entries[order_id] for order_id in book.order_ids]
+        book.below = [
+            (-e.price, e.seq, e.order_id) for e in live if e.direction == FIRES_AT_OR_BELOW
+        ]
+        book.above = [
+            (e.price, e.seq, e.order_id) for e in live if e.direction == FIRES_AT_OR_ABOVE
+        ]
+        heapq.heapify(book.below)
+        heapq.heapify(book.above)
@@ -59,6 +59,9 @@ class OrderResult:
     commission: Decimal | None = None
     message: str = ""
     timestamp: datetime | None = None
+    # Opaque, increasing stream position; set on updates from
+    # subscribe_order_updates so a consumer can resume after a reconnect.
+    sequence: str | None = None
 
 
 @dataclass
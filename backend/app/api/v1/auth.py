@@ -58,7 +58,7 @@ async def signup(
     ip = _get_ip(request)
     rl = await check_rate_limit(redis, f"ratelimit:ip:{ip}:signup", max_requests=5, window_seconds=3600)
     if not rl.allowed:
-        raise RateLimitError(retry_after=rl.reset_at)
+        raise RateLimitError(retry_after=rl.retry_after)
 
     svc = AuthService(db, redis)
     result = await svc.signup(body.email, body.password, ip, _get_ua(request))
@@ -83,7 +83,7 @@ async def login(
     # Rate limit: 10 per IP per minute
     rl_ip = await check_rate_limit(redis, f"ratelimit:ip:{ip}:login", max_requests=10, window_seconds=60)
     if not rl_ip.allowed:
-        raise RateLimitError(retry_after=rl_ip.reset_at)
+        raise RateLimitError(retry_after=rl_ip.retry_after)
 
     svc = AuthService(db, redis)
     result = await svc.login(body.email, body.password, ip, _get_ua(request))
@@ -144,7 +144,7 @@ async def magic_link(
         redis, f"ratelimit:email:{email_hash}:magic_link", max_requests=3, window_seconds=900
     )
     if not rl.allowed:
-        raise RateLimitError(retry_after=rl.reset_at)
+        raise RateLimitError(retry_after=rl.retry_after)
 
     svc = AuthService(db, redis)
     await svc.magic_link(body.email, ip, _get_ua(request))
@@ -211,7 +211,7 @@ async def password_reset(
         redis, f"ratelimit:email:{email_hash}:password_reset", max_requests=3, window_seconds=3600
     )
     if not rl.allowed:
-        raise RateLimitError(retry_after=rl.reset_at)
+        raise RateLimitError(retry_after=rl.retry_after)
 
     svc = AuthService(db, redis)
     await svc.request_password_reset(body.email, ip, _get_ua(request))
@@ -292,7 +292,7 @@ async def resend_verification(
         redis, f"ratelimit:user:{user_id}:verify_resend", max_requests=3, window_seconds=3600
     )
     if not rl.allowed:
-        raise RateLimitError(retry_after=rl.reset_at)
+        raise RateLimitError(retry_after=rl.retry_after)
 
     access_token = request.headers["Authorization"].split(" ", 1)[1]
     svc = AuthService(db, redis)
@@ -61,7 +61,7 @@ async def update_config(
         redis, f"ratelimit:user:{user_id}:config", max_requests=10, window_seconds=60
     )
     if not rl.allowed:
-        raise RateLimitError(retry_after=rl.reset_at)
+        raise RateLimitError(retry_after=rl.retry_after)
 
     data = body.model_dump(exclude_none=True)
     svc = TrendlineService(db, redis)
@@ -89,7 +89,7 @@ async def reset_config(
         redis, f"ratelimit:user:{user_id}:config", max_requests=10, window_seconds=60
     )
     if not rl.allowed:
-        raise RateLimitError(retry_after=rl.reset_at)
+        raise RateLimitError(retry_after=rl.retry_after)
 
     svc = TrendlineService(db, redis)
     await svc.reset_config(uuid.UUID(user_id))
@@ -122,22 +122,36 @@ async def readiness(request: Request) -> JSONResponse:
     )
 
 
+def _operator_denied(request: Request) -> JSONResponse | None:
+    """401 unless the request carries the operator API key.
+
+    Accepts ``X-API-Key`` or ``Authorization: Bearer`` (what Prometheus sends).
+    """
+    api_key = request.headers.get("X-API-Key", "")
+    authorization = request.headers.get("Authorization", "")
+    if authorization.startswith("Bearer "):
+        api_key = api_key or authorization[7:].strip()
+    if settings.OPERATOR_API_KEY and api_key == settings.OPERATOR_API_KEY:
+        return None
+    return JSONResponse(
+        status_code=401,
+        content={
+            "error": {
+                "code": "AUTHENTICATION_REQUIRED",
+                "message": "Valid operator API key required.",
+                "request_id": getattr(request.state, "request_id", "unknown"),
+                "timestamp": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            }
+        },
+    )
+
+
 @router.get("/health/detailed")
 async def detailed(request: Request) -> JSONResponse:
     """Diagnostic endpoint -- requires operator API key."""
-    api_key = request.headers.get("X-API-Key", "")
-    if not settings.OPERATOR_API_KEY or api_key != settings.OPERATOR_API_KEY:
-        return JSONResponse(
-            status_code=401,
-            content={
-                "error": {
-                    "code": "AUTHENTICATION_REQUIRED",
-                    "message": "Valid operator API key required.",
-                    "request_id": getattr(request.state, "request_id", "unknown"),
-                    "timestamp": datetime.now(UTC).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                }
-            },
-        )
+    denied = _operator_denied(request)
+    if denied is not None:
+        return denied
 
     uptime_seconds = round(time.time() - _start_time, 2)
 
@@ -179,6 +193,8 @@ async def detailed(request: Request) -> JSONResponse:
     except Exception:
         celery_stats = {"error": "Unable to fetch queue stats"}
 
+    from app.core.cache import get_cache_stats
+
     return JSONResponse(
         status_code=200,
         content={
@@ -190,5 +206,18 @@ async def detailed(request: Request) -> JSONResponse:
             "database": db_stats,
             "redis": redis_stats,
             "celery_queues": celery_stats,
+            "cache": get_cache_stats(),
         },
     )
+
+
+@router.get("/metrics")
+async def metrics(request: Request) -> Response:
+    """Prometheus scrape endpoint -- requires operator API key."""
+    denied = _operator_denied(request)
+    if denied is not None:
+        return denied
+
+    from app.core.metrics import CONTENT_TYPE, render_latest
+
+    return Response(content=render_latest(), media_type=CONTENT_TYPE)
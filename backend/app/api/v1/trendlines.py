@@ -5,7 +5,7 @@ from __future__ import annotations
 import uuid
 from datetime import datetime
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from redis.asyncio import Redis
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -37,9 +37,7 @@ router = APIRouter(prefix="/trendlines", tags=["trendlines"])
 # ------------------------------------------------------------------
 
 
-async def _build_trendline_response(
-    db: AsyncSession, tl_dict: dict
-) -> TrendlineResponse:
+def _build_trendline_response(tl_dict: dict) -> TrendlineResponse:
     """Convert a service-layer trendline dict into a TrendlineResponse."""
     # Build anchor points from the pivot IDs if available, else use touch_points
     anchor_points: list[AnchorPoint] = []
@@ -82,40 +80,35 @@ async def _build_trendline_response(
     )
 
 
-# ------------------------------------------------------------------
-# GET /trendlines/{instrument_id}
-# ------------------------------------------------------------------
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return True if an If-None-Match header matches the current ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
 
 
-@router.get("/{instrument_id}", response_model=TrendlineListResponse)
-async def list_trendlines(
-    instrument_id: str,
-    user_id: str = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
-    redis: Redis = Depends(get_redis),
+async def _load_trendline_list(
+    db: AsyncSession,
+    svc: TrendlineService,
+    user_id: uuid.UUID,
+    instrument_id: uuid.UUID,
 ) -> TrendlineListResponse:
-    """List active trendlines for an instrument, split by direction."""
-    instrument_uuid = uuid.UUID(instrument_id)
-
+    """Build the trendline list response from the database."""
     # Fetch instrument for the summary
     inst_result = await db.execute(
-        select(Instrument).where(Instrument.id == instrument_uuid)
+        select(Instrument).where(Instrument.id == instrument_id)
     )
     instrument = inst_result.scalar_one_or_none()
     if instrument is None:
-        raise NotFoundError("Instrument", instrument_id)
+        raise NotFoundError("Instrument", str(instrument_id))
 
-    svc = TrendlineService(db, redis)
-    data = await svc.get_active_trendlines(uuid.UUID(user_id), instrument_uuid)
+    data = await svc.get_active_trendlines(user_id, instrument_id)
 
-    support_lines = [
-        await _build_trendline_response(db, tl) for tl in data["support"]
-    ]
-    resistance_lines = [
-        await _build_trendline_response(db, tl) for tl in data["resistance"]
-    ]
+    support_lines = [_build_trendline_response(tl) for tl in data["support"]]
+    resistance_lines = [_build_trendline_response(tl) for tl in data["resistance"]]
 
-    config = await svc.get_config(uuid.UUID(user_id))
+    config = await svc.get_config(user_id)
 
     return TrendlineListResponse(
         instrument=InstrumentSummary(
@@ -134,6 +127,41 @@ async def list_trendlines(
     )
 
 
+# ------------------------------------------------------------------
+# GET /trendlines/{instrument_id}
+# ------------------------------------------------------------------
+
+
+@router.get("/{instrument_id}", response_model=TrendlineListResponse)
+async def list_trendlines(
+    instrument_id: str,
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+) -> Response:
+    """List active trendlines for an instrument, split by direction.
+
+    Responses are cached per (user, instrument) and carry an ETag, so dashboard
+    polling with If-None-Match gets a 304 without touching the database.
+    """
+    instrument_uuid = uuid.UUID(instrument_id)
+    user_uuid = uuid.UUID(user_id)
+
+    svc = TrendlineService(db, redis)
+
+    async def load_body() -> str:
+        response = await _load_trendline_list(db, svc, user_uuid, instrument_uuid)
+        return response.model_dump_json()
+
+    etag, body = await svc.get_trendline_list(user_uuid, instrument_uuid, load_body)
+
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 # ------------------------------------------------------------------
 # GET /trendlines/{trendline_id}/detail
 # ------------------------------------------------------------------
@@ -152,7 +180,7 @@ async def get_trendline_detail(
     if data is None:
         raise NotFoundError("Trendline", trendline_id)
 
-    tl_response = await _build_trendline_response(db, data)
+    tl_response = _build_trendline_response(data)
 
     events = [
         TrendlineEventResponse(
@@ -2,16 +2,16 @@
 
 from __future__ import annotations
 
-import time
-
 from fastapi import Depends, Request
+from redis.exceptions import NoScriptError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import redis as redis_module
 from app.core.exceptions import AuthenticationError, ForbiddenError, RateLimitError
 from app.core.logging import get_logger
-from app.core.redis import redis_client
+from app.core.rate_limit import acquire, queue_acquire
 from app.db.session import get_db
-from app.services.api_key_service import validate_key
+from app.services.api_key_service import ValidatedKey, record_usage, validate_key
 
 logger = get_logger("trendedge.api_key_auth")
 
@@ -20,35 +20,37 @@ _RATE_LIMIT_MAX = 60
 _RATE_LIMIT_WINDOW = 60  # seconds
 
 
-async def _check_api_key_rate_limit(key_hash: str) -> None:
-    """Enforce per-key rate limiting using Redis sliding window.
+async def _check_api_key_rate_limit(api_key: ValidatedKey) -> None:
+    """Enforce per-key rate limiting (GCRA, see ``app.core.rate_limit``).
 
-    Key format: ratelimit:apikey:{key_hash}:{minute}
+    The limit check and the key's usage counters share one pipelined round
+    trip. Key format: ratelimit:apikey:{key_hash}
     """
-    if redis_client is None:
+    redis = redis_module.redis_client
+    if redis is None:
         # Redis unavailable: degrade gracefully (no rate limiting)
         logger.warning("Redis unavailable, skipping API key rate limit check")
         return
 
-    current_minute = int(time.time() // 60)
-    rate_key = f"ratelimit:apikey:{key_hash}:{current_minute}"
-
+    rate_key = f"ratelimit:apikey:{api_key.key_hash}"
     try:
-        count = await redis_client.incr(rate_key)
-        if count == 1:
-            await redis_client.expire(rate_key, _RATE_LIMIT_WINDOW)
-
-        if count > _RATE_LIMIT_MAX:
-            logger.warning(
-                "API key rate limit exceeded",
-                key_hash=key_hash[:16] + "...",
-                count=count,
-            )
-            raise RateLimitError(retry_after=_RATE_LIMIT_WINDOW)
-    except RateLimitError:
-        raise
+        pipe = redis.pipeline(transaction=False)
+        parse = queue_acquire(pipe, rate_key, _RATE_LIMIT_MAX, _RATE_LIMIT_WINDOW)
+        record_usage(pipe, api_key.id)
+        reply = (await pipe.execute(raise_on_error=False))[0]
+        if isinstance(reply, NoScriptError):
+            rl = await acquire(redis, rate_key, _RATE_LIMIT_MAX, _RATE_LIMIT_WINDOW)
+        elif isinstance(reply, Exception):
+            raise reply
+        else:
+            rl = parse(reply)
     except Exception:
         logger.warning("Rate limit check failed", exc_info=True)
+        return
+
+    if not rl.allowed:
+        logger.warning("API key rate limit exceeded", key_hash=api_key.key_hash[:16] + "...")
+        raise RateLimitError(retry_after=rl.retry_after)
 
 
 async def get_api_key_user(
@@ -68,11 +70,11 @@ async def get_api_key_user(
     if not raw_key:
         raise AuthenticationError("API key required. Provide via X-API-Key header or api_key query parameter.")
 
-    # Validate the key (checks active, not expired)
+    # Validate the key (checks active, not expired; usually served from cache)
     api_key = await validate_key(raw_key, db)
 
-    # Rate limit check
-    await _check_api_key_rate_limit(api_key.key_hash)
+    # Rate limit check and usage counting, one Redis round trip
+    await _check_api_key_rate_limit(api_key)
 
     # Set request state for downstream handlers
     user_id = str(api_key.user_id)
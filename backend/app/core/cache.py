@@ -1,65 +1,848 @@
-"""Cache helpers using Redis with JSON serialization."""
+"""Two-tier cache: in-process L1 in front of Redis (L2), JSON serialized.
+
+Keys can be grouped two ways so invalidation never has to walk the keyspace:
+
+- Namespaces: entries are stored under ``cache:{namespace}:v{generation}:{key}``.
+  Bumping the generation with a single INCR orphans every entry in the
+  namespace; orphans expire on their own TTL.
+- Tags: entries written with ``tags=`` are recorded in ``cache:tag:{tag}`` sets,
+  and ``invalidate_tags`` deletes the members in one pipeline.
+
+Deleted entries (``delete_cached``, ``invalidate_tags``) are replaced by a
+short-lived tombstone rather than removed, and ``get_or_load`` writes a loaded
+value back only if the entry still holds what its lookup saw, under the
+physical key it looked up. A loader that started before a delete or a
+namespace bump therefore cannot put its stale value back.
+
+The L1 layer is a bounded LRU of raw JSON strings with a short TTL. It is only
+consulted while this process is subscribed to the ``cache:invalidate`` pub/sub
+channel (see ``start_invalidation_listener``); every write or invalidation
+publishes there so peer processes drop their local copies. Processes without
+the listener (e.g. Celery workers) read straight from Redis. Other in-process
+caches can ride the same channel with ``publish_invalidation`` and
+``add_invalidation_handler``.
+
+``get_or_load`` adds single-flight loading (concurrent misses for one key share
+one loader call) and probabilistic early expiration (XFetch), so hot keys are
+refreshed by one caller shortly before they expire instead of stampeding the
+database when they do.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import fnmatch
 import json
+import math
+import random
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable, Mapping
+from dataclasses import dataclass
 from typing import Any
 
+from app.core import redis as redis_module
+from app.core.config import settings
 from app.core.logging import get_logger
-from app.core.redis import redis_client
+from app.core.redis import LuaScript
 
 logger = get_logger("trendedge.cache")
 
+_NAMESPACE_VERSION_PREFIX = "cache:ns:"
+_TAG_PREFIX = "cache:tag:"
+# Tag sets must outlive the entries they index; stale members are harmless.
+_TAG_SET_TTL = 86400  # 24 hours
+_INVALIDATION_CHANNEL = "cache:invalidate"
+_LISTENER_RETRY_DELAY = 1.0  # seconds between pub/sub reconnect attempts
+_DEFAULT_STATS_NAMESPACE = "_default"
+# Weight of the newest sample in the per-namespace loader latency average.
+_LOAD_LATENCY_ALPHA = 0.2
+# Deleted entries hold a unique tombstone this long, so loads that started
+# before the delete cannot write back. JSON never starts with "!".
+_TOMBSTONE_PREFIX = "!deleted:"
+_TOMBSTONE_TTL_MS = 60_000
+
+
+def _client():
+    """Return the live Redis client (resolved at call time, not import time)."""
+    return redis_module.redis_client
+
+
+# ---------------------------------------------------------------------------
+# Statistics
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class _NamespaceStats:
+    l1_hits: int = 0
+    l2_hits: int = 0
+    misses: int = 0
+    loads: int = 0
+    coalesced: int = 0
+    early_refreshes: int = 0
+    l2_calls: int = 0
+    l2_seconds: float = 0.0
+    load_seconds: float = 0.0
+    # EWMA of loader latency; used as the recompute cost in XFetch.
+    load_latency: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.l1_hits + self.l2_hits) / lookups, 4) if lookups else 0.0,
+            "l1_hit_ratio": round(self.l1_hits / lookups, 4) if lookups else 0.0,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "early_refreshes": self.early_refreshes,
+            "l2_avg_ms": round(self.l2_seconds / self.l2_calls * 1000, 3) if self.l2_calls else 0.0,
+            "load_avg_ms": round(self.load_seconds / self.loads * 1000, 3) if self.loads else 0.0,
+        }
+
+
+_stats: dict[str, _NamespaceStats] = {}
+
+
+def _stats_for(namespace: str | None) -> _NamespaceStats:
+    name = namespace or _DEFAULT_STATS_NAMESPACE
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = _NamespaceStats()
+    return stats
+
+
+def get_cache_stats() -> dict[str, dict[str, Any]]:
+    """Return hit ratios and latencies per namespace, plus L1 occupancy."""
+    result = {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+    result["_l1"] = {
+        "enabled": _l1_active(),
+        "entries": len(_local),
+        "max_entries": _local.max_entries,
+    }
+    return result
+
+
+def reset_cache_stats() -> None:
+    """Clear all per-namespace counters."""
+    _stats.clear()
+
+
+# ---------------------------------------------------------------------------
+# L1: in-process LRU
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class _LocalEntry:
+    raw: str
+    expires_at: float
+    delta: float
+    namespace: str | None
+
+
+class _LocalCache:
+    """Bounded LRU of raw JSON strings keyed by physical Redis key."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, _LocalEntry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str, now: float) -> _LocalEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, raw: str, ttl: float, delta: float, namespace: str | None) -> None:
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._entries[key] = _LocalEntry(raw, time.monotonic() + ttl, delta, namespace)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def discard_namespace(self, namespace: str) -> None:
+        for key in [k for k, e in self._entries.items() if e.namespace == namespace]:
+            del self._entries[key]
+
+    def discard_matching(self, pattern: str) -> None:
+        for key in [k for k in self._entries if fnmatch.fnmatchcase(k, pattern)]:
+            del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+_local = _LocalCache(settings.CACHE_L1_MAX_ENTRIES)
+# Namespace generations seen by this process; kept current by pub/sub.
+_local_versions: dict[str, int] = {}
+_listener_task: asyncio.Task | None = None
+_listener_ready = False
+_invalidation_handlers: list[Callable[[dict[str, Any]], None]] = []
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def _l1_active() -> bool:
+    """L1 is only safe while cross-process invalidations are being received."""
+    return _listener_ready and settings.CACHE_L1_MAX_ENTRIES > 0
+
+
+def _l1_ttl(ttl: int) -> float:
+    return min(float(ttl), float(settings.CACHE_L1_TTL))
+
 
-async def get_cached(key: str) -> Any | None:
+def _should_refresh_early(remaining: float, delta: float) -> bool:
+    """XFetch: refresh with probability rising as expiry approaches.
+
+    ``delta`` is the recompute cost in seconds; the 1 - random() keeps the
+    log argument in (0, 1].
+    """
+    if delta <= 0:
+        return False
+    beta = settings.CACHE_EARLY_EXPIRY_BETA
+    return -delta * beta * math.log(1.0 - random.random()) >= remaining
+
+
+# ---------------------------------------------------------------------------
+# Keys and namespaces
+# ---------------------------------------------------------------------------
+
+
+def namespaced_key(namespace: str, version: int, key: str) -> str:
+    """Build the physical Redis key for an entry in a versioned namespace."""
+    return f"cache:{namespace}:v{version}:{key}"
+
+
+async def get_namespace_version(namespace: str, client: Any = None) -> int:
+    """Return the current generation number of a namespace (0 if never bumped).
+
+    ``client`` overrides the shared Redis client (e.g. a Celery task's own).
+    """
+    if _l1_active() and namespace in _local_versions:
+        return _local_versions[namespace]
+    redis = client if client is not None else _client()
+    if redis is None:
+        return 0
+    raw = await redis.get(f"{_NAMESPACE_VERSION_PREFIX}{namespace}")
+    version = int(raw) if raw is not None else 0
+    if _l1_active():
+        _local_versions[namespace] = version
+    return version
+
+
+async def _resolve_keys(
+    keys: list[str], namespace: str | None, client: Any = None
+) -> list[str]:
+    if namespace is None:
+        return keys
+    version = await get_namespace_version(namespace, client=client)
+    return [namespaced_key(namespace, version, k) for k in keys]
+
+
+# KEYS: namespace version key. ARGV: "cache:{namespace}:v", logical keys.
+# Returns: the generation, then value and PTTL for each key. Entry keys are
+# built from the generation inside the script, so a namespaced read is one
+# round trip even when this process does not hold the generation.
+_NAMESPACED_GET_SCRIPT = LuaScript("""
+local version = tonumber(redis.call('GET', KEYS[1]) or '0')
+local prefix = ARGV[1] .. version .. ':'
+local reply = {version}
+for i = 2, #ARGV do
+    local key = prefix .. ARGV[i]
+    reply[#reply + 1] = redis.call('GET', key)
+    reply[#reply + 1] = redis.call('PTTL', key)
+end
+return reply
+""")
+
+
+def _knows_version(namespace: str | None) -> bool:
+    """Whether physical keys for ``namespace`` can be built without Redis."""
+    return namespace is None or (_l1_active() and namespace in _local_versions)
+
+
+async def _fetch(
+    redis: Any, keys: list[str], namespace: str | None
+) -> tuple[list[str], list[str | None], list[int]]:
+    """Read ``keys`` with their PTTLs in one round trip.
+
+    Returns the physical keys, raw values and PTTLs (milliseconds). The
+    namespace generation is resolved in the same call unless it is held
+    locally.
+    """
+    if _knows_version(namespace):
+        physical_keys = await _resolve_keys(keys, namespace)
+        pipe = redis.pipeline(transaction=False)
+        for physical_key in physical_keys:
+            pipe.get(physical_key)
+            pipe.pttl(physical_key)
+        reply = await pipe.execute()
+        return physical_keys, reply[0::2], reply[1::2]
+
+    version_key = f"{_NAMESPACE_VERSION_PREFIX}{namespace}"
+    args = (f"cache:{namespace}:v", *keys)
+    reply = await _NAMESPACED_GET_SCRIPT(redis, [version_key], args)
+    version = int(reply[0])
+    if _l1_active():
+        _local_versions[namespace] = version
+    physical_keys = [namespaced_key(namespace, version, k) for k in keys]
+    return physical_keys, reply[1::2], reply[2::2]
+
+
+def _remaining_seconds(pttl: int | None) -> float:
+    return pttl / 1000 if pttl and pttl > 0 else math.inf
+
+
+def _is_value(raw: str | None) -> bool:
+    """Whether a raw Redis reply is a cached value (not a miss or tombstone)."""
+    return raw is not None and not raw.startswith(_TOMBSTONE_PREFIX)
+
+
+# KEYS: entry key. ARGV: raw value the lookup saw ('' if none), new raw, ttl.
+# Writes only if the entry is unchanged since the lookup: a delete's
+# tombstone or a newer write in between wins.
+_WRITE_BACK_SCRIPT = LuaScript("""
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+""")
+
+# KEYS: entry keys. ARGV: tombstone, tombstone TTL (ms), tombstone prefix.
+# Returns the number of keys that held a value.
+_DELETE_SCRIPT = LuaScript("""
+local deleted = 0
+for _, key in ipairs(KEYS) do
+    local old = redis.call('GET', key)
+    if old and string.sub(old, 1, #ARGV[3]) ~= ARGV[3] then
+        deleted = deleted + 1
+    end
+    redis.call('SET', key, ARGV[1], 'PX', ARGV[2])
+end
+return deleted
+""")
+
+
+def _queue_delete(pipe: Any, physical_keys: list[str]) -> None:
+    """Queue tombstoning ``physical_keys`` and the peer L1 invalidation."""
+    tombstone = f"{_TOMBSTONE_PREFIX}{uuid.uuid4().hex}"
+    _DELETE_SCRIPT.queue(pipe, physical_keys, [tombstone, _TOMBSTONE_TTL_MS, _TOMBSTONE_PREFIX])
+    _queue_invalidation(pipe, {"keys": physical_keys})
+
+
+# ---------------------------------------------------------------------------
+# Reads and writes
+# ---------------------------------------------------------------------------
+
+
+async def get_cached(key: str, namespace: str | None = None) -> Any | None:
     """Get a value from cache. Returns None on miss or error.
 
-    Key pattern: cache:{endpoint}:{user_id}:{param_hash}
+    Key pattern: cache:{endpoint}:{user_id}:{param_hash}, or the logical key
+    within ``namespace`` when one is given.
+    """
+    result = await get_many([key], namespace=namespace)
+    return result.get(key)
+
+
+async def set_cached(
+    key: str,
+    value: Any,
+    ttl: int = 60,
+    namespace: str | None = None,
+    tags: Iterable[str] = (),
+) -> None:
+    """Set a value in cache with TTL (seconds).
+
+    Key pattern: cache:{endpoint}:{user_id}:{param_hash}, or the logical key
+    within ``namespace`` when one is given.
+    """
+    await set_many({key: value}, ttl=ttl, namespace=namespace, tags=tags)
+
+
+async def get_many(keys: Iterable[str], namespace: str | None = None) -> dict[str, Any]:
+    """Fetch several keys, L1 first, then one round trip. Returns only the keys that hit.
+
+    Without L1, a plain batch is one MGET and a namespaced one a single
+    script call that also resolves the generation.
     """
-    if redis_client is None:
-        logger.warning("Redis not available for cache get", key=key)
-        return None
+    keys = list(keys)
+    if not keys:
+        return {}
+    redis = _client()
+    if redis is None:
+        logger.warning("Redis not available for cache get", key_count=len(keys))
+        return {}
+    stats = _stats_for(namespace)
     try:
-        raw = await redis_client.get(key)
-        if raw is None:
-            return None
-        return json.loads(raw)
+        found: dict[str, Any] = {}
+        remote = keys
+        if _knows_version(namespace) and _l1_active():
+            physical_keys = await _resolve_keys(keys, namespace)
+            now = time.monotonic()
+            remote = []
+            for key, physical_key in zip(keys, physical_keys, strict=True):
+                entry = _local.get(physical_key, now)
+                if entry is not None:
+                    stats.l1_hits += 1
+                    found[key] = json.loads(entry.raw)
+                else:
+                    remote.append(key)
+            if not remote:
+                return found
+
+        started = time.perf_counter()
+        if namespace is None and not _l1_active():
+            physical_keys, raw_values, pttls = remote, await redis.mget(remote), []
+        else:
+            physical_keys, raw_values, pttls = await _fetch(redis, remote, namespace)
+        elapsed = time.perf_counter() - started
+        stats.l2_calls += 1
+        stats.l2_seconds += elapsed
+
+        for i, (key, raw) in enumerate(zip(remote, raw_values, strict=True)):
+            if not _is_value(raw):
+                stats.misses += 1
+                continue
+            stats.l2_hits += 1
+            found[key] = json.loads(raw)
+            if _l1_active() and pttls:
+                ttl = min(_remaining_seconds(pttls[i]), settings.CACHE_L1_TTL)
+                _local.set(physical_keys[i], raw, ttl, elapsed, namespace)
+        return found
     except Exception:
-        logger.warning("Cache get failed", key=key, exc_info=True)
-        return None
+        logger.warning("Cache get failed", namespace=namespace, exc_info=True)
+        return {}
 
 
-async def set_cached(key: str, value: Any, ttl: int = 60) -> None:
-    """Set a value in cache with TTL (seconds).
+async def set_many(
+    mapping: Mapping[str, Any],
+    ttl: int = 60,
+    namespace: str | None = None,
+    tags: Iterable[str] = (),
+) -> None:
+    """Store several values in one pipelined round trip, optionally tagging them.
 
-    Key pattern: cache:{endpoint}:{user_id}:{param_hash}
+    Peers are told to drop their L1 copies in the same pipeline.
     """
-    if redis_client is None:
-        logger.warning("Redis not available for cache set", key=key)
+    if not mapping:
+        return
+    redis = _client()
+    if redis is None:
+        logger.warning("Redis not available for cache set", key_count=len(mapping))
         return
+    tags = list(tags)
+    try:
+        physical_keys = await _resolve_keys(list(mapping), namespace)
+        raws = [json.dumps(value, default=str) for value in mapping.values()]
+        pipe = redis.pipeline(transaction=False)
+        for physical_key, raw in zip(physical_keys, raws, strict=True):
+            pipe.set(physical_key, raw, ex=ttl)
+        for tag in tags:
+            tag_key = f"{_TAG_PREFIX}{tag}"
+            pipe.sadd(tag_key, *physical_keys)
+            pipe.expire(tag_key, max(ttl, _TAG_SET_TTL))
+        _queue_invalidation(pipe, {"keys": physical_keys})
+        await pipe.execute()
+        if _l1_active():
+            delta = _stats_for(namespace).load_latency
+            for physical_key, raw in zip(physical_keys, raws, strict=True):
+                _local.set(physical_key, raw, _l1_ttl(ttl), delta, namespace)
+    except Exception:
+        logger.warning("Cache set failed", namespace=namespace, exc_info=True)
+
+
+async def get_or_load(
+    key: str,
+    loader: Callable[[], Awaitable[Any]],
+    ttl: int = 60,
+    namespace: str | None = None,
+    tags: Iterable[str] = (),
+    client: Any = None,
+) -> Any:
+    """Return the cached value for ``key``, calling ``loader`` on a miss.
+
+    Concurrent misses for the same key in this process share one loader call.
+    Entries close to expiry are refreshed early with probability proportional
+    to the loader's observed latency (XFetch). ``None`` results are not cached.
+    Exceptions raised by ``loader`` propagate to every waiting caller.
+    ``client`` overrides the shared Redis client (e.g. a Celery task's own).
+    """
+    stats = _stats_for(namespace)
+    redis = client if client is not None else _client()
+    physical_key = key
+    seen: str | None = None
+    looked_up = False
+    if redis is not None:
+        try:
+            physical_key, cached, seen = await _lookup_for_load(redis, key, namespace, stats)
+            if cached is not None:
+                return json.loads(cached)
+            looked_up = True
+        except Exception:
+            logger.warning("Cache get failed", key=key, namespace=namespace, exc_info=True)
+
+    inflight = _inflight.get(physical_key)
+    if inflight is not None:
+        stats.coalesced += 1
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            if not inflight.cancelled():
+                raise
+            # The leading caller was cancelled mid-load; load on our own.
+            return await get_or_load(
+                key, loader, ttl=ttl, namespace=namespace, tags=tags, client=client
+            )
+
+    future: asyncio.Future = asyncio.get_running_loop().create_future()
+    _inflight[physical_key] = future
+    try:
+        started = time.perf_counter()
+        value = await loader()
+        elapsed = time.perf_counter() - started
+        stats.loads += 1
+        stats.load_seconds += elapsed
+        stats.load_latency += _LOAD_LATENCY_ALPHA * (elapsed - stats.load_latency)
+        if value is not None and looked_up:
+            await _write_back(redis, physical_key, seen, value, ttl, namespace, list(tags))
+        future.set_result(value)
+        return value
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        # Mark retrieved so a loader failure with no waiters is not logged twice.
+        future.exception()
+        raise
+    finally:
+        _inflight.pop(physical_key, None)
+
+
+async def _lookup_for_load(
+    redis: Any,
+    key: str,
+    namespace: str | None,
+    stats: _NamespaceStats,
+) -> tuple[str, str | None, str | None]:
+    """Return the physical key, the raw cached value and what Redis held.
+
+    The value is None on a miss or an early-refresh draw; the last item is
+    the raw Redis reply (a value, a tombstone or None) for ``_write_back``.
+    """
+    if _knows_version(namespace) and _l1_active():
+        (physical_key,) = await _resolve_keys([key], namespace)
+        now = time.monotonic()
+        entry = _local.get(physical_key, now)
+        if entry is not None and not _should_refresh_early(entry.expires_at - now, entry.delta):
+            stats.l1_hits += 1
+            return physical_key, entry.raw, entry.raw
+
+    started = time.perf_counter()
+    (physical_key,), (raw,), (pttl,) = await _fetch(redis, [key], namespace)
+    stats.l2_calls += 1
+    stats.l2_seconds += time.perf_counter() - started
+
+    if not _is_value(raw):
+        stats.misses += 1
+        return physical_key, None, raw
+    remaining = _remaining_seconds(pttl)
+    if _should_refresh_early(remaining, stats.load_latency):
+        stats.early_refreshes += 1
+        stats.misses += 1
+        return physical_key, None, raw
+    stats.l2_hits += 1
+    if _l1_active():
+        _local.set(
+            physical_key, raw, min(remaining, settings.CACHE_L1_TTL), stats.load_latency, namespace
+        )
+    return physical_key, raw, raw
+
+
+async def _write_back(
+    redis: Any,
+    physical_key: str,
+    seen: str | None,
+    value: Any,
+    ttl: int,
+    namespace: str | None,
+    tags: list[str],
+) -> None:
+    """Store a loaded value unless the entry changed since its lookup.
+
+    Tags and the peer invalidation ride in the same pipeline.
+    """
+    raw = json.dumps(value, default=str)
+
+    def build(pipe: Any) -> None:
+        _WRITE_BACK_SCRIPT.queue(pipe, [physical_key], [seen or "", raw, ttl])
+        for tag in tags:
+            tag_key = f"{_TAG_PREFIX}{tag}"
+            pipe.sadd(tag_key, physical_key)
+            pipe.expire(tag_key, max(ttl, _TAG_SET_TTL))
+        _queue_invalidation(pipe, {"keys": [physical_key]})
+
+    try:
+        written = (await _WRITE_BACK_SCRIPT.run_pipeline(redis, build))[0]
+    except Exception:
+        logger.warning("Cache set failed", namespace=namespace, exc_info=True)
+        return
+    if written and _l1_active():
+        delta = _stats_for(namespace).load_latency
+        _local.set(physical_key, raw, _l1_ttl(ttl), delta, namespace)
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+
+def _queue_invalidation(pipe: Any, payload: dict[str, Any]) -> None:
+    """Append an L1 invalidation broadcast to a pipeline and apply it locally."""
+    _apply_invalidation(payload)
+    pipe.publish(_INVALIDATION_CHANNEL, json.dumps(payload))
+
+
+def _apply_invalidation(payload: dict[str, Any]) -> None:
+    """Drop L1 entries named by an invalidation message."""
+    if keys := payload.get("keys"):
+        _local.discard(keys)
+    if namespace := payload.get("namespace"):
+        _local.discard_namespace(namespace)
+        version = payload.get("version")
+        if version is not None:
+            _local_versions[namespace] = int(version)
+        else:
+            _local_versions.pop(namespace, None)
+    if pattern := payload.get("pattern"):
+        _local.discard_matching(pattern)
+    for handler in _invalidation_handlers:
+        try:
+            handler(payload)
+        except Exception:
+            logger.warning("Cache invalidation handler failed", exc_info=True)
+
+
+def add_invalidation_handler(handler: Callable[[dict[str, Any]], None]) -> None:
+    """Also pass every invalidation message, local or from a peer, to ``handler``.
+
+    Handlers run synchronously on the listener task and must ignore payload
+    keys they do not own.
+    """
+    if handler not in _invalidation_handlers:
+        _invalidation_handlers.append(handler)
+
+
+async def publish_invalidation(payload: dict[str, Any], client: Any = None) -> bool:
+    """Apply ``payload`` locally and broadcast it to peer processes.
+
+    Returns False if it could not be published; peers then only catch up
+    through their own TTLs.
+    """
+    _apply_invalidation(payload)
+    redis = client if client is not None else _client()
+    if redis is None:
+        return False
+    try:
+        await redis.publish(_INVALIDATION_CHANNEL, json.dumps(payload))
+        return True
+    except Exception:
+        logger.warning("Cache invalidation publish failed", payload=payload, exc_info=True)
+        return False
+
+
+async def delete_cached(*keys: str, namespace: str | None = None, client: Any = None) -> int:
+    """Delete exact keys in one round trip. Returns the number of keys removed.
+
+    Entries are tombstoned so in-flight ``get_or_load`` calls cannot restore them.
+    ``client`` overrides the shared Redis client.
+    """
+    redis = client if client is not None else _client()
+    if not keys or redis is None:
+        return 0
+    try:
+        physical_keys = await _resolve_keys(list(keys), namespace, client=redis)
+        results = await _DELETE_SCRIPT.run_pipeline(
+            redis, lambda pipe: _queue_delete(pipe, physical_keys)
+        )
+        return int(results[0])
+    except Exception:
+        logger.warning("Cache delete failed", keys=list(keys), exc_info=True)
+        return 0
+
+
+async def invalidate_namespace(namespace: str) -> int:
+    """Invalidate every entry in a namespace with a single INCR.
+
+    Returns the new generation number (0 if Redis is unavailable).
+    """
+    redis = _client()
+    if redis is None:
+        logger.warning("Redis not available for namespace invalidation", namespace=namespace)
+        return 0
     try:
-        serialized = json.dumps(value, default=str)
-        await redis_client.set(key, serialized, ex=ttl)
+        version = int(await redis.incr(f"{_NAMESPACE_VERSION_PREFIX}{namespace}"))
+        payload = {"namespace": namespace, "version": version}
+        _apply_invalidation(payload)
+        await redis.publish(_INVALIDATION_CHANNEL, json.dumps(payload))
+        logger.info("Cache namespace invalidated", namespace=namespace, version=version)
+        return version
     except Exception:
-        logger.warning("Cache set failed", key=key, exc_info=True)
+        logger.warning("Cache namespace invalidation failed", namespace=namespace, exc_info=True)
+        return 0
+
+
+async def invalidate_tags(*tags: str) -> int:
+    """Delete every entry recorded under the given tags. Returns keys removed.
+
+    Cost is independent of tag or member count: one pipelined SMEMBERS, then
+    one pipeline that tombstones the members, UNLINKs the tag sets and
+    notifies peers.
+    """
+    redis = _client()
+    if not tags or redis is None:
+        return 0
+    tag_keys = [f"{_TAG_PREFIX}{tag}" for tag in tags]
+    try:
+        pipe = redis.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        member_sets = await pipe.execute()
+        members = sorted(set().union(*member_sets))
+
+        def build(pipe: Any) -> None:
+            if members:
+                _queue_delete(pipe, members)
+            pipe.unlink(*tag_keys)
+
+        results = await _DELETE_SCRIPT.run_pipeline(redis, build)
+        deleted = int(results[0]) if members else 0
+        if deleted > 0:
+            logger.info("Cache tags invalidated", tags=list(tags), deleted_count=deleted)
+        return deleted
+    except Exception:
+        logger.warning("Cache tag invalidation failed", tags=list(tags), exc_info=True)
+        return 0
 
 
 async def invalidate_cache(pattern: str) -> int:
     """Delete keys matching a pattern. Returns the number of keys deleted.
 
-    Uses SCAN to avoid blocking Redis with KEYS on large datasets.
+    Uses SCAN to avoid blocking Redis with KEYS on large datasets. This is
+    O(keyspace); prefer ``invalidate_namespace`` or ``invalidate_tags``.
+    Matches are UNLINKed in batches rather than one call per key.
     """
-    if redis_client is None:
+    redis = _client()
+    if redis is None:
         logger.warning("Redis not available for cache invalidation", pattern=pattern)
         return 0
     try:
         deleted = 0
-        async for key in redis_client.scan_iter(match=pattern, count=100):
-            await redis_client.delete(key)
-            deleted += 1
+        batch: list[str] = []
+        async for key in redis.scan_iter(match=pattern, count=500):
+            batch.append(key)
+            if len(batch) >= 500:
+                deleted += int(await redis.unlink(*batch))
+                batch.clear()
+        if batch:
+            deleted += int(await redis.unlink(*batch))
+        payload = {"pattern": pattern}
+        _apply_invalidation(payload)
+        await redis.publish(_INVALIDATION_CHANNEL, json.dumps(payload))
         if deleted > 0:
             logger.info("Cache invalidated", pattern=pattern, deleted_count=deleted)
         return deleted
     except Exception:
         logger.warning("Cache invalidation failed", pattern=pattern, exc_info=True)
         return 0
+
+
+# ---------------------------------------------------------------------------
+# Cross-process invalidation listener
+# ---------------------------------------------------------------------------
+
+
+async def start_invalidation_listener() -> None:
+    """Subscribe to cache invalidations and enable L1 for this process.
+
+    Called from the API lifespan. Idempotent. Runs even with L1 disabled, so
+    invalidation handlers still hear from peers.
+    """
+    global _listener_task
+    if _listener_task is not None and not _listener_task.done():
+        return
+    if _client() is None:
+        return
+    _listener_task = asyncio.create_task(_listen(), name="cache-invalidation-listener")
+
+
+async def stop_invalidation_listener() -> None:
+    """Cancel the listener task and disable L1."""
+    global _listener_task, _listener_ready
+    _listener_ready = False
+    task, _listener_task = _listener_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _local.clear()
+    _local_versions.clear()
+
+
+async def _listen() -> None:
+    """Consume invalidation messages, reconnecting on failure.
+
+    L1 is disabled and flushed whenever the subscription is down, since
+    messages published in the gap are lost.
+    """
+    global _listener_ready
+    while True:
+        redis = _client()
+        pubsub = None
+        try:
+            if redis is None:
+                raise RuntimeError("Redis client not initialized")
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(_INVALIDATION_CHANNEL)
+            _listener_ready = True
+            logger.info("Cache invalidation listener subscribed")
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    _apply_invalidation(json.loads(message["data"]))
+                except (ValueError, TypeError):
+                    logger.warning("Malformed cache invalidation message", data=message.get("data"))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.warning("Cache invalidation listener disconnected", exc_info=True)
+        finally:
+            _listener_ready = False
+            _local.clear()
+            _local_versions.clear()
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+        await asyncio.sleep(_LISTENER_RETRY_DELAY)
@@ -62,9 +62,35 @@ class Settings(BaseSettings):
     CORS_ORIGINS: str = "http://localhost:3000"
 
     # Rate limiting
-    RATE_LIMIT_DEFAULT: int = 100
+    RATE_LIMIT_DEFAULT: int = 100  # per client per minute
+    # Local pre-filter for the default limit (see app.core.rate_limit.LocalRateLimiter)
+    RATE_LIMIT_LOCAL_FRACTION: float = 0.1  # share of remaining admitted locally; 0 disables
+    RATE_LIMIT_LOCAL_NEAR_LIMIT: float = 0.5  # below this share left, always ask Redis
+    RATE_LIMIT_SYNC_INTERVAL: float = 1.0  # seconds between charging local admissions
+    RATE_LIMIT_FAIL_CLOSED: bool = False  # refuse recently limited clients while Redis is down
 
-    # Operator API key for /health/detailed
+    # Cache: in-process L1 in front of Redis (see app.core.cache)
+    CACHE_L1_MAX_ENTRIES: int = 10000  # 0 disables L1
+    CACHE_L1_TTL: int = 30  # seconds; upper bound on L1 staleness if pub/sub lags
+    CACHE_EARLY_EXPIRY_BETA: float = 1.0  # XFetch aggressiveness; 0 disables
+
+    # Verified JWTs remembered until exp (see app.core.security)
+    JWT_CACHE_MAX_ENTRIES: int = 10000  # 0 disables
+
+    # Execution fast path: run new signals in the API process (see app.services.fast_path)
+    EXECUTION_FAST_PATH: bool = False
+    EXECUTION_FAST_PATH_WORKERS: int = 4
+
+    # Audit rows written behind the business transaction (see app.services.audit_buffer)
+    AUDIT_WRITE_BEHIND: bool = False
+
+    # Per-request/per-task query counting (see app.core.instrumentation)
+    INSTRUMENTATION_ENABLED: bool = True
+
+    # Shared directory for multiprocess metrics aggregation (see app.core.metrics)
+    METRICS_MULTIPROC_DIR: str = ""  # empty: /metrics reports this process only
+
+    # Operator API key for /health/detailed and /metrics
     OPERATOR_API_KEY: str = ""
 
     @property
@@ -0,0 +1,211 @@
+"""Per-request and per-task query instrumentation.
+
+``track()`` opens a scope (an HTTP request or a Celery task run) held in a
+context variable. SQLAlchemy cursor events and the wrapped Redis client add
+statement counts, rows and time to whichever scope is current; outside a
+scope they cost one ``ContextVar.get``. Because asyncio tasks copy the
+context, work spawned inside a scope (``gather``, ``create_task``)
+reports to the same scope.
+
+When a scope closes, ``report`` feeds the ``/metrics`` counters and logs
+any statement repeated ``_REPEATED_QUERY_THRESHOLD`` times — the signature
+of an N+1 loop. ``RequestContextMiddleware`` also returns the numbers as a
+``Server-Timing`` header.
+"""
+
+from __future__ import annotations
+
+import functools
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from dataclasses import dataclass, field
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import Counter
+
+logger = get_logger("trendedge.instrumentation")
+
+_REPEATED_QUERY_THRESHOLD = 5  # identical statements in one scope
+_START_KEY = "instrumentation_query_start"  # connection.info key
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+_LABELS = ("kind", "name")  # kind: http | task; name: route template or task name
+
+DB_STATEMENTS = Counter("trendedge_db_statements", "SQL statements executed", _LABELS)
+DB_ROWS = Counter("trendedge_db_rows", "Rows returned or affected by SQL statements", _LABELS)
+DB_SECONDS = Counter("trendedge_db_seconds", "Time spent in SQL statements", _LABELS)
+REDIS_CALLS = Counter(
+    "trendedge_redis_calls", "Redis round trips (a pipeline counts once)", _LABELS
+)
+REDIS_SECONDS = Counter("trendedge_redis_seconds", "Time spent in Redis round trips", _LABELS)
+REPEATED_QUERIES = Counter(
+    "trendedge_repeated_queries",
+    f"Scopes running one statement at least {_REPEATED_QUERY_THRESHOLD} times",
+    _LABELS,
+)
+
+
+# ---------------------------------------------------------------------------
+# Scopes
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class QueryStats:
+    """What one request or task run did against Postgres and Redis."""
+
+    db_statements: int = 0
+    db_rows: int = 0
+    db_seconds: float = 0.0
+    redis_calls: int = 0
+    redis_seconds: float = 0.0
+    statements: dict[str, int] = field(default_factory=dict)
+
+    def repeated(self) -> list[tuple[str, int]]:
+        """Statements run often enough to look like an N+1 loop."""
+        return sorted(
+            ((sql, n) for sql, n in self.statements.items() if n >= _REPEATED_QUERY_THRESHOLD),
+            key=lambda item: -item[1],
+        )
+
+    def log_fields(self) -> dict[str, Any]:
+        return {
+            "db_statements": self.db_statements,
+            "db_rows": self.db_rows,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "redis_calls": self.redis_calls,
+            "redis_ms": round(self.redis_seconds * 1000, 2),
+        }
+
+    def server_timing(self, total_seconds: float) -> str:
+        return (
+            f"app;dur={total_seconds * 1000:.1f}, "
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_statements} queries", '
+            f'redis;dur={self.redis_seconds * 1000:.1f};desc="{self.redis_calls} calls"'
+        )
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> QueryStats | None:
+    return _current.get()
+
+
+def open_scope() -> tuple[QueryStats, Token]:
+    """Start a scope; pair with ``close_scope`` (for callback-style hooks)."""
+    stats = QueryStats()
+    return stats, _current.set(stats)
+
+
+def close_scope(token: Token) -> None:
+    _current.reset(token)
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    stats, token = open_scope()
+    try:
+        yield stats
+    finally:
+        close_scope(token)
+
+
+def report(stats: QueryStats, kind: str, name: str) -> None:
+    """Add a finished scope to the metrics and flag repeated statements."""
+    labels = (kind, name)
+    DB_STATEMENTS.labels(*labels).inc(stats.db_statements)
+    DB_ROWS.labels(*labels).inc(stats.db_rows)
+    DB_SECONDS.labels(*labels).inc(stats.db_seconds)
+    REDIS_CALLS.labels(*labels).inc(stats.redis_calls)
+    REDIS_SECONDS.labels(*labels).inc(stats.redis_seconds)
+
+    repeated = stats.repeated()
+    if repeated:
+        REPEATED_QUERIES.labels(*labels).inc()
+        for statement, count in repeated:
+            logger.warning(
+                "Repeated query (possible N+1)",
+                kind=kind,
+                name=name,
+                count=count,
+                statement=" ".join(statement.split())[:300],
+            )
+
+
+# ---------------------------------------------------------------------------
+# Hooks
+# ---------------------------------------------------------------------------
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info[_START_KEY] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    started = conn.info.pop(_START_KEY, None)
+    if stats is None or started is None:
+        return
+    stats.db_seconds += time.perf_counter() - started
+    stats.db_statements += 1
+    if cursor.rowcount > 0:
+        stats.db_rows += cursor.rowcount
+    stats.statements[statement] = stats.statements.get(statement, 0) + 1
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Count ``engine``'s statements against the current scope. Idempotent."""
+    if not settings.INSTRUMENTATION_ENABLED:
+        return
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _timed(method):
+    @functools.wraps(method)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        stats = _current.get()
+        if stats is None:
+            return await method(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            stats.redis_calls += 1
+            stats.redis_seconds += time.perf_counter() - started
+
+    wrapper.__instrumented__ = True  # type: ignore[attr-defined]
+    return wrapper
+
+
+def instrument_redis() -> None:
+    """Count Redis round trips from every asyncio client. Idempotent.
+
+    Wraps the client classes rather than instances, so clients created by
+    the API and by the workers are all covered. ``Pipeline`` queues commands
+    in its own ``execute_command``, so a pipeline counts once, at ``execute``.
+    """
+    if not settings.INSTRUMENTATION_ENABLED:
+        return
+    from redis.asyncio.client import Pipeline, Redis
+
+    for cls, name in ((Redis, "execute_command"), (Pipeline, "execute")):
+        method = getattr(cls, name)
+        if not getattr(method, "__instrumented__", False):
+            setattr(cls, name, _timed(method))
+
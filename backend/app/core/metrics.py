@@ -0,0 +1,278 @@
+"""In-process metrics in the Prometheus text exposition format.
+
+A deliberately small subset of ``prometheus_client``: labelled counters and
+histograms registered on a module-level registry and rendered by
+``/metrics``. Updates are plain float additions on cached children (a
+histogram adds a bisect), cheap enough for per-request and per-query hot
+paths.
+
+Multiprocess mode: with ``METRICS_MULTIPROC_DIR`` set, every process
+(gunicorn/uvicorn workers, Celery prefork children) periodically writes its
+samples to ``<dir>/metrics-<host>-<pid>.json`` via ``write_snapshot``, and
+``/metrics`` sums its own live values with every other process's last
+snapshot. Snapshots of exited processes are kept, so counters do not go
+backwards when a child is recycled; a reused pid overwrites its old file,
+which Prometheus treats as a counter reset.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import socket
+import time
+from bisect import bisect_left
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger("trendedge.metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; request, task and query latencies.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_SNAPSHOT_INTERVAL = 5.0  # seconds between snapshot writes per process
+
+Sample = tuple[str, dict[str, str], float]  # (name, labels, value)
+State = dict[tuple[str, ...], list[float]]  # label values -> flat sample values
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dump(self) -> list[float]:
+        return [self.value]
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self._bounds = bounds
+        self.counts = [0.0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def dump(self) -> list[float]:
+        return [*self.counts, self.sum]
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: dict = {}
+        REGISTRY.register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def dump(self) -> State:
+        return {values: child.dump() for values, child in list(self._children.items())}
+
+    def samples(self, state: State) -> Iterator[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter with a fixed set of label names."""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def samples(self, state: State) -> Iterator[Sample]:
+        for values, (value,) in state.items():
+            yield f"{self.name}_total", dict(zip(self.labelnames, values, strict=True)), value
+
+
+class Histogram(_Metric):
+    """Bucketed distribution; ``le`` buckets are rendered cumulatively."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def samples(self, state: State) -> Iterator[Sample]:
+        for values, data in state.items():
+            labels = dict(zip(self.labelnames, values, strict=True))
+            cumulative = 0.0
+            for bound, count in zip((*self.buckets, math.inf), data[:-1], strict=True):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_bound(bound)}, cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, data[-1]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def collect(self, directory: Path | None = None) -> dict[str, State]:
+        """This process's samples, plus other processes' snapshots in ``directory``."""
+        state = {name: metric.dump() for name, metric in self._metrics.items()}
+        if directory is None:
+            return state
+        own = _snapshot_path(directory).name
+        for path in directory.glob("metrics-*.json"):
+            if path.name == own:
+                continue
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue  # being replaced, or left half-written by a crash
+            for name, entries in snapshot.items():
+                if name in state:
+                    _merge(state[name], entries, self._metrics[name])
+        return state
+
+    def render(self, directory: Path | None = None) -> str:
+        state = self.collect(directory)
+        lines: list[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample, labels, value in metric.samples(state[name]):
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, directory: Path) -> None:
+        snapshot = {
+            name: [[list(values), data] for values, data in metric.dump().items()]
+            for name, metric in self._metrics.items()
+        }
+        path = _snapshot_path(directory)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot))
+        os.replace(tmp, path)  # readers never see a partial file
+
+
+def _snapshot_path(directory: Path) -> Path:
+    # Hostname too: containers sharing the directory have separate pid spaces.
+    return directory / f"metrics-{socket.gethostname()}-{os.getpid()}.json"
+
+
+def _merge(state: State, entries: list, metric: _Metric) -> None:
+    # Skip entries from a deploy with other label names or bucket layout.
+    width = len(metric._new_child().dump())
+    for values, data in entries:
+        if len(values) != len(metric.labelnames) or len(data) != width:
+            continue
+        key = tuple(values)
+        current = state.get(key)
+        if current is None:
+            state[key] = list(data)
+        else:
+            state[key] = [a + b for a, b in zip(current, data, strict=True)]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else repr(float(bound))
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+REGISTRY = Registry()
+_last_snapshot = 0.0
+
+
+def _multiproc_dir() -> Path | None:
+    directory = settings.METRICS_MULTIPROC_DIR
+    return Path(directory) if directory else None
+
+
+def render_latest() -> str:
+    """All registered metrics, ready to serve on ``/metrics``."""
+    return REGISTRY.render(_multiproc_dir())
+
+
+def write_snapshot(force: bool = False) -> None:
+    """Publish this process's samples for multiprocess mode.
+
+    Cheap to call on every request or task: it writes at most once every
+    ``_SNAPSHOT_INTERVAL`` seconds unless ``force`` (used at shutdown).
+    """
+    global _last_snapshot
+    directory = _multiproc_dir()
+    if directory is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_snapshot < _SNAPSHOT_INTERVAL:
+        return
+    _last_snapshot = now
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        REGISTRY.write_snapshot(directory)
+    except OSError:
+        logger.warning("Could not write metrics snapshot", directory=str(directory), exc_info=True)
@@ -1,4 +1,14 @@
-"""Middleware stack for request processing pipeline."""
+"""Middleware stack for request processing pipeline.
+
+``RequestContextMiddleware`` is a single pure-ASGI layer that assigns the
+request ID, applies the default rate limit, opens the instrumentation scope,
+logs the request and stamps the response headers. Unlike
+``BaseHTTPMiddleware`` it adds no extra task or body stream per request;
+headers are added to the ``http.response.start`` message as it is sent.
+
+``APIVersionMiddleware`` sits outside ``CORSMiddleware`` so that CORS
+preflight responses carry ``X-API-Version`` too.
+"""
 
 from __future__ import annotations
 
@@ -8,152 +18,216 @@ from datetime import UTC, datetime
 
 import structlog
 from redis.asyncio import Redis
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.config import settings
+from app.core.instrumentation import QueryStats, report, track
 from app.core.logging import get_logger
+from app.core.metrics import Counter, Histogram, write_snapshot
+from app.core.rate_limit import DEFAULT_WINDOW_SECONDS, acquire, local_rate_limiter
 
 logger = get_logger("trendedge.middleware")
 
+_API_VERSION = "v1"
+_SLOW_REQUEST_MS = 5000
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Assign or propagate a unique request ID for every request."""
+_HTTP_REQUESTS = Counter(
+    "trendedge_http_requests", "HTTP requests by route template", ("method", "route", "status")
+)
+_HTTP_SECONDS = Histogram(
+    "trendedge_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route"),
+)
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        request_id = request.headers.get("X-Request-ID", "")
-        try:
-            uuid.UUID(request_id)
-        except (ValueError, AttributeError):
-            request_id = str(uuid.uuid4())
 
-        request.state.request_id = request_id
-        structlog.contextvars.bind_contextvars(request_id=request_id)
+def route_template(scope: Scope) -> str:
+    """The matched route's path template, so metrics don't explode per id."""
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
 
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = request_id
-        return response
 
+class RequestContextMiddleware:
+    """Request ID, rate limiting, timing, logging and response headers.
 
-class TimingMiddleware(BaseHTTPMiddleware):
-    """Track request duration and warn on slow requests."""
+    Runs the whole request inside one instrumentation scope, so the response
+    carries a ``Server-Timing`` header with database and Redis time. The
+    header reflects the work done before the response started; the metrics
+    and the completion log use the time until the body was sent.
+    """
+
+    EXEMPT_PATHS: set[str] = {"/health", "/health/ready", "/health/detailed", "/metrics"}
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
         start = time.perf_counter()
-        response = await call_next(request)
-        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        method: str = scope["method"]
+        path: str = scope["path"]
+        request_headers = Headers(scope=scope)
+        state: dict = scope.setdefault("state", {})
 
-        structlog.contextvars.bind_contextvars(duration_ms=duration_ms)
+        request_id = request_headers.get("X-Request-ID", "")
+        try:
+            uuid.UUID(request_id)
+        except ValueError:
+            request_id = str(uuid.uuid4())
+        state["request_id"] = request_id
+        structlog.contextvars.bind_contextvars(request_id=request_id)
+        logger.debug("Request started: %s %s", method, path)
 
-        if duration_ms > 5000:
+        status_code = 500
+        stats: QueryStats | None = None
+        try:
+            with track() as stats:
+                rejection, rate_headers = await self._rate_limit(scope, state)
+
+                async def send_with_headers(message: Message) -> None:
+                    nonlocal status_code
+                    if message["type"] == "http.response.start":
+                        status_code = message["status"]
+                        headers = MutableHeaders(scope=message)
+                        for name, value in rate_headers.items():
+                            headers[name] = value
+                        headers["Server-Timing"] = stats.server_timing(
+                            time.perf_counter() - start
+                        )
+                        headers["X-Request-ID"] = request_id
+                    await send(message)
+
+                if rejection is not None:
+                    await rejection(scope, receive, send_with_headers)
+                else:
+                    await self.app(scope, receive, send_with_headers)
+        except Exception:
+            # The 500 itself is sent by an outer layer; count it here.
+            status_code = 500
+            raise
+        finally:
+            try:
+                if stats is not None:
+                    self._record(scope, state, stats, start, status_code)
+            finally:
+                structlog.contextvars.unbind_contextvars("request_id")
+
+    def _record(
+        self, scope: Scope, state: dict, stats: QueryStats, start: float, status_code: int
+    ) -> None:
+        """Metrics, slow-request warning and completion log for one request."""
+        method: str = scope["method"]
+        path: str = scope["path"]
+        duration = time.perf_counter() - start
+        duration_ms = round(duration * 1000, 2)
+        route = route_template(scope)
+        _HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+        _HTTP_SECONDS.labels(method, route).observe(duration)
+        report(stats, "http", f"{method} {route}")
+        write_snapshot()
+
+        if duration_ms > _SLOW_REQUEST_MS:
             logger.warning(
                 "Slow request: %s %s took %sms",
-                request.method,
-                request.url.path,
+                method,
+                path,
                 duration_ms,
+                **stats.log_fields(),
             )
 
-        return response
-
-
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Sliding window rate limiter backed by Redis sorted sets."""
-
-    EXEMPT_PATHS: set[str] = {"/health", "/health/ready", "/health/detailed"}
-
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        if request.url.path in self.EXEMPT_PATHS:
-            return await call_next(request)
+        client = scope.get("client")
+        logger.info(
+            "Request completed",
+            method=method,
+            path=path,
+            status_code=status_code,
+            duration_ms=duration_ms,
+            user_id=state.get("user_id"),
+            request_id=state["request_id"],
+            ip=client[0] if client else "unknown",
+            user_agent=Headers(scope=scope).get("User-Agent", ""),
+            **stats.log_fields(),
+        )
 
-        redis: Redis | None = getattr(request.app.state, "redis", None)
-        redis_available: bool = getattr(request.app.state, "redis_available", False)
+    async def _rate_limit(
+        self, scope: Scope, state: dict
+    ) -> tuple[Response | None, dict[str, str]]:
+        """Apply ``RATE_LIMIT_DEFAULT`` per minute.
 
-        if not redis or not redis_available:
-            return await call_next(request)
+        Goes through the local pre-filter when it is running, otherwise one
+        GCRA round trip per request. Without Redis, requests fail open except
+        for identifiers the pre-filter still refuses.
 
-        limit = settings.RATE_LIMIT_DEFAULT
-        window = 60  # seconds
+        Returns the 429 response to send instead of the app (or ``None``) and
+        the ``X-RateLimit-*`` headers for the response.
+        """
+        if scope["path"] in self.EXEMPT_PATHS:
+            return None, {}
 
         # Identify client by user_id if authenticated, else by IP
-        user_id = getattr(request.state, "user_id", None)
-        identifier = user_id or (request.client.host if request.client else "unknown")
-        key = f"ratelimit:default:{identifier}"
-
-        now = time.time()
-        window_start = now - window
-
-        try:
-            pipe = redis.pipeline()
-            pipe.zremrangebyscore(key, 0, window_start)
-            pipe.zadd(key, {f"{now}:{uuid.uuid4().hex[:8]}": now})
-            pipe.zcard(key)
-            pipe.expire(key, window)
-            results = await pipe.execute()
-
-            current_count = results[2]
-            remaining = max(0, limit - current_count)
-            reset_at = int(now + window)
-
-            if current_count > limit:
-                retry_after = window
-                return Response(
-                    content=_rate_limit_body(
-                        retry_after=retry_after,
-                        request_id=getattr(request.state, "request_id", "unknown"),
-                    ),
-                    status_code=429,
-                    media_type="application/json",
-                    headers={
-                        "Retry-After": str(retry_after),
-                        "X-RateLimit-Limit": str(limit),
-                        "X-RateLimit-Remaining": "0",
-                        "X-RateLimit-Reset": str(reset_at),
-                    },
-                )
-
-            response = await call_next(request)
-            response.headers["X-RateLimit-Limit"] = str(limit)
-            response.headers["X-RateLimit-Remaining"] = str(remaining)
-            response.headers["X-RateLimit-Reset"] = str(reset_at)
-            return response
-
-        except Exception:
-            logger.warning("Redis unavailable for rate limiting, allowing request through")
-            return await call_next(request)
-
+        client = scope.get("client")
+        identifier = state.get("user_id") or (client[0] if client else "unknown")
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    """Log request lifecycle with structured fields."""
+        key = f"ratelimit:default:{identifier}"
+        limiter = local_rate_limiter()
+        app_state = scope["app"].state
+        redis: Redis | None = getattr(app_state, "redis", None)
+        redis_available: bool = getattr(app_state, "redis_available", False)
+        if not redis or not redis_available:
+            rl = limiter.check_offline(key) if limiter is not None else None
+            if rl is None:
+                return None, {}
+        else:
+            try:
+                if limiter is not None:
+                    rl = await limiter.check(redis, key)
+                else:
+                    rl = await acquire(
+                        redis, key, settings.RATE_LIMIT_DEFAULT, DEFAULT_WINDOW_SECONDS
+                    )
+            except Exception:
+                logger.warning("Redis unavailable for rate limiting, allowing request through")
+                return None, {}
+
+        headers = {
+            "X-RateLimit-Limit": str(rl.limit),
+            "X-RateLimit-Remaining": str(rl.remaining),
+            "X-RateLimit-Reset": str(rl.reset_at),
+        }
+        if rl.allowed:
+            return None, headers
+
+        rejection = Response(
+            content=_rate_limit_body(retry_after=rl.retry_after, request_id=state["request_id"]),
+            status_code=429,
+            media_type="application/json",
+            headers={"Retry-After": str(rl.retry_after)},
+        )
+        return rejection, headers
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        method = request.method
-        path = request.url.path
-        logger.debug("Request started: %s %s", method, path)
 
-        response = await call_next(request)
+class APIVersionMiddleware:
+    """Adds ``X-API-Version`` to every HTTP response, CORS preflights included."""
 
-        request_id = getattr(request.state, "request_id", "unknown")
-        duration_ms = structlog.contextvars.get_contextvars().get("duration_ms")
-        user_id = getattr(request.state, "user_id", None)
-        ip = request.client.host if request.client else "unknown"
-        user_agent = request.headers.get("User-Agent", "")
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        logger.info(
-            "Request completed",
-            method=method,
-            path=path,
-            status_code=response.status_code,
-            duration_ms=duration_ms,
-            user_id=user_id,
-            request_id=request_id,
-            ip=ip,
-            user_agent=user_agent,
-        )
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        structlog.contextvars.unbind_contextvars("request_id", "duration_ms")
+        async def send_with_version(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-API-Version"] = _API_VERSION
+            await send(message)
 
-        return response
+        await self.app(scope, receive, send_with_version)
 
 
 def _rate_limit_body(retry_after: int, request_id: str) -> str:
@@ -3,22 +3,23 @@
 from __future__ import annotations
 
 import uuid
+from dataclasses import dataclass
 from typing import Any
 
 from fastapi import Depends, Request
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.cache import get_cached, set_cached
+from app.core.cache import delete_cached, get_or_load, invalidate_namespace
 from app.core.exceptions import ForbiddenError
 from app.core.logging import get_logger
-from app.core.redis import redis_client
 from app.core.security import get_current_user
 from app.db.session import get_db
 
 logger = get_logger("trendedge.permissions")
 
-# Permission cache TTL (seconds)
+# Permission cache namespace and TTL (seconds)
+_PERMS_CACHE_NAMESPACE = "perms"
 _PERMS_CACHE_TTL = 300  # 5 minutes
 
 # Tier limits per resource
@@ -38,50 +39,73 @@ async def get_user_permissions(
     user_id: str,
     db: AsyncSession,
 ) -> dict[str, Any]:
-    """Fetch user role and tier from DB with Redis caching.
+    """Fetch user role and tier from DB with two-tier (in-process + Redis) caching.
 
     Returns dict with 'role' and 'subscription_tier' keys.
-    Cache key: perms:{user_id}, TTL 5 minutes.
+    Cached under the 'perms' namespace keyed by user_id, TTL 5 minutes.
+    Concurrent misses for the same user share one DB query.
     """
-    cache_key = f"perms:{user_id}"
 
-    # Try cache first
-    cached = await get_cached(cache_key)
-    if cached is not None:
-        return cached
+    async def _load() -> dict[str, Any]:
+        from app.db.models.user import User
 
-    # Cache miss: query DB
-    from app.db.models.user import User
-
-    result = await db.execute(
-        select(User.role, User.subscription_tier).where(
-            User.id == uuid.UUID(user_id),
-            User.deleted_at.is_(None),
+        result = await db.execute(
+            select(User.role, User.subscription_tier).where(
+                User.id == uuid.UUID(user_id),
+                User.deleted_at.is_(None),
+            )
         )
+        row = result.one_or_none()
+
+        if row is None:
+            raise ForbiddenError("Account not found or has been deactivated.")
+
+        return {"role": row.role, "subscription_tier": row.subscription_tier}
+
+    return await get_or_load(
+        user_id, _load, ttl=_PERMS_CACHE_TTL, namespace=_PERMS_CACHE_NAMESPACE
     )
-    row = result.one_or_none()
 
-    if row is None:
-        raise ForbiddenError("Account not found or has been deactivated.")
 
-    perms = {"role": row.role, "subscription_tier": row.subscription_tier}
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """The authenticated user: JWT subject and claims plus role and tier."""
 
-    # Populate cache
-    await set_cached(cache_key, perms, ttl=_PERMS_CACHE_TTL)
+    user_id: str
+    role: str
+    subscription_tier: str
+    claims: dict[str, Any]
 
-    return perms
+
+async def get_current_principal(
+    request: Request,
+    user_id: str = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
+    """FastAPI dependency: verified JWT (cached) and permissions in one lookup.
+
+    Sets request.state.user_role and request.state.subscription_tier.
+    """
+    perms = await get_user_permissions(user_id, db)
+    request.state.user_role = perms["role"]
+    request.state.subscription_tier = perms["subscription_tier"]
+    return Principal(
+        user_id=user_id,
+        role=perms["role"],
+        subscription_tier=perms["subscription_tier"],
+        claims=getattr(request.state, "jwt_claims", {}),
+    )
 
 
 async def invalidate_permission_cache(user_id: str) -> None:
     """Delete cached permissions for a user. Call after role or tier changes."""
-    if redis_client is None:
-        return
-    cache_key = f"perms:{user_id}"
-    try:
-        await redis_client.delete(cache_key)
+    if await delete_cached(user_id, namespace=_PERMS_CACHE_NAMESPACE):
         logger.info("Permission cache invalidated", user_id=user_id)
-    except Exception:
-        logger.warning("Failed to invalidate permission cache", user_id=user_id, exc_info=True)
+
+
+async def invalidate_all_permission_caches() -> None:
+    """Drop every cached permission entry with one INCR (e.g. after a tier migration)."""
+    await invalidate_namespace(_PERMS_CACHE_NAMESPACE)
 
 
 def require_role(role: str):
@@ -91,17 +115,10 @@ def require_role(role: str):
         @router.get("/admin/users", dependencies=[Depends(require_role("admin"))])
     """
 
-    async def _check_role(
-        request: Request,
-        user_id: str = Depends(get_current_user),
-        db: AsyncSession = Depends(get_db),
-    ) -> str:
-        perms = await get_user_permissions(user_id, db)
-        if perms["role"] != role:
+    async def _check_role(principal: Principal = Depends(get_current_principal)) -> str:
+        if principal.role != role:
             raise ForbiddenError("You do not have permission to perform this action.")
-        request.state.user_role = perms["role"]
-        request.state.subscription_tier = perms["subscription_tier"]
-        return user_id
+        return principal.user_id
 
     return _check_role
 
@@ -116,23 +133,8 @@ def require_verified_email():
         request: Request,
         user_id: str = Depends(get_current_user),
     ) -> str:
-        # The JWT claims are available after validate_jwt runs in get_current_user.
-        # Re-extract from the Authorization header to get the full claims.
-        from jose import jwt as jose_jwt
-
-        from app.core.config import settings
-
-        auth_header = request.headers.get("Authorization", "")
-        token = auth_header.split(" ", 1)[1] if " " in auth_header else ""
-
-        claims = jose_jwt.decode(
-            token,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
-            audience="authenticated",
-        )
-
-        email_verified = claims.get("email_verified", False)
+        # get_current_user leaves the verified claims on the request.
+        email_verified = getattr(request.state, "jwt_claims", {}).get("email_verified", False)
         if not email_verified:
             raise ForbiddenError("Email verification required. Please verify your email address.")
 
@@ -1,13 +1,26 @@
-"""Sliding window rate limiter using Redis sorted sets."""
+"""Redis rate limiting: GCRA limits and failed-login lockouts.
+
+``acquire`` implements the generic cell rate algorithm in one Lua script:
+each key holds a single "theoretical arrival time", so a limit of N requests
+per window costs one small string per client and one round trip per check,
+whatever the traffic. Requests are spaced ``window / N`` apart with a burst
+of N; rejected requests do not consume capacity.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import math
 import time
+from collections.abc import Callable
 from dataclasses import dataclass
+from typing import Any
 
 from redis.asyncio import Redis
 
+from app.core.config import settings
 from app.core.logging import get_logger
+from app.core.redis import LuaScript
 
 logger = get_logger("trendedge.rate_limit")
 
@@ -18,6 +31,8 @@ _LOCK_TIER_2_FAILURES = 50
 _LOCK_TIER_2_SECONDS = 3600  # 1 hour
 _FAILED_LOGIN_TTL = 7200  # 2 hours
 
+DEFAULT_WINDOW_SECONDS = 60  # RATE_LIMIT_DEFAULT is per minute
+
 
 @dataclass(frozen=True, slots=True)
 class RateLimitResult:
@@ -25,70 +40,363 @@ class RateLimitResult:
 
     allowed: bool
     remaining: int
-    reset_at: int
+    reset_at: int  # epoch seconds when the full limit is available again
     limit: int
+    retry_after: int = 0  # seconds until a rejected request would be allowed
 
 
-async def check_rate_limit(
+# ---------------------------------------------------------------------------
+# GCRA
+# ---------------------------------------------------------------------------
+
+
+# KEYS: limiter key. ARGV: now, emission interval, window (microseconds),
+#       debt (requests already admitted locally, charged unconditionally),
+#       cost (requests to admit now: 1, or 0 to only settle the debt).
+# Returns: allowed (0/1), remaining, retry after, reset after (microseconds).
+_GCRA_SCRIPT = LuaScript("""
+local now = tonumber(ARGV[1])
+local interval = tonumber(ARGV[2])
+local window = tonumber(ARGV[3])
+local debt = tonumber(ARGV[4])
+local cost = tonumber(ARGV[5])
+local stored = redis.call('GET', KEYS[1])
+local tat = stored and tonumber(stored) or now
+if tat < now then
+    tat = now
+end
+tat = math.min(tat + debt * interval, now + window)
+local new_tat = tat + cost * interval
+local allowed = new_tat - now <= window
+if not allowed then
+    new_tat = tat
+end
+if new_tat > now then
+    redis.call('SET', KEYS[1], string.format('%d', new_tat),
+               'PX', math.ceil((new_tat - now) / 1000))
+end
+if not allowed then
+    return {0, 0, tat + cost * interval - window - now, tat - now}
+end
+return {1, math.floor((window - (new_tat - now)) / interval), 0, new_tat - now}
+""")
+
+
+def _gcra_args(now: float, max_requests: int, window_seconds: int, debt: int, cost: int) -> tuple:
+    window = window_seconds * 1_000_000
+    interval = max(1, window // max_requests)
+    return int(now * 1_000_000), interval, window, debt, cost
+
+
+def _gcra_result(now: float, max_requests: int, reply: list) -> RateLimitResult:
+    allowed, remaining, retry_after, reset_after = reply
+    return RateLimitResult(
+        allowed=bool(allowed),
+        remaining=int(remaining),
+        reset_at=math.ceil(now + int(reset_after) / 1_000_000),
+        limit=max_requests,
+        retry_after=math.ceil(int(retry_after) / 1_000_000),
+    )
+
+
+async def acquire(
     redis: Redis,
     key: str,
     max_requests: int,
     window_seconds: int,
+    debt: int = 0,
 ) -> RateLimitResult:
-    """Check if a request is within rate limits using a sliding window.
-
-    Key patterns:
-        ratelimit:ip:{ip}:{endpoint}
-        ratelimit:email:{email_hash}:{endpoint}
+    """Take one request from ``key``'s limit in a single round trip.
 
-    Uses sorted sets: score = timestamp, member = unique timestamp string.
-    All operations run in a pipeline for atomicity.
+    ``debt`` charges requests a ``LocalRateLimiter`` already admitted. State
+    lives under ``{key}:gcra``. Redis errors propagate; use
+    ``check_rate_limit`` to fail open instead.
     """
     now = time.time()
-    window_start = now - window_seconds
-    reset_at = int(now + window_seconds)
+    args = _gcra_args(now, max_requests, window_seconds, debt, 1)
+    reply = await _GCRA_SCRIPT(redis, [f"{key}:gcra"], args)
+    return _gcra_result(now, max_requests, reply)
 
-    try:
-        pipe = redis.pipeline(transaction=True)
-        # Remove expired entries
-        pipe.zremrangebyscore(key, "-inf", window_start)
-        # Count entries in current window
-        pipe.zcard(key)
-        results = await pipe.execute()
 
-        current_count: int = results[1]
+def queue_acquire(
+    pipe: Any, key: str, max_requests: int, window_seconds: int
+) -> Callable[[Any], RateLimitResult]:
+    """Queue ``acquire`` on a caller's pipeline; returns the reply parser.
+
+    Lets one round trip also carry the caller's own commands. The reply is a
+    ``NoScriptError`` if the script is not loaded yet; fall back to
+    ``acquire`` then.
+    """
+    now = time.time()
+    args = _gcra_args(now, max_requests, window_seconds, 0, 1)
+    _GCRA_SCRIPT.queue(pipe, [f"{key}:gcra"], args)
+    return lambda reply: _gcra_result(now, max_requests, reply)
 
-        if current_count < max_requests:
-            # Add new entry and set TTL
-            pipe = redis.pipeline(transaction=True)
-            pipe.zadd(key, {f"{now}": now})
-            pipe.expire(key, window_seconds)
-            await pipe.execute()
 
-            return RateLimitResult(
-                allowed=True,
-                remaining=max_requests - current_count - 1,
-                reset_at=reset_at,
-                limit=max_requests,
-            )
+async def check_rate_limit(
+    redis: Redis,
+    key: str,
+    max_requests: int,
+    window_seconds: int,
+) -> RateLimitResult:
+    """Check if a request is within rate limits; allow it if Redis is down.
 
-        return RateLimitResult(
-            allowed=False,
-            remaining=0,
-            reset_at=reset_at,
-            limit=max_requests,
-        )
+    Key patterns:
+        ratelimit:ip:{ip}:{endpoint}
+        ratelimit:email:{email_hash}:{endpoint}
+        ratelimit:user:{user_id}:{endpoint}
+        ratelimit:apikey:{key_hash}
+    """
+    try:
+        return await acquire(redis, key, max_requests, window_seconds)
     except Exception:
         # Fail open: allow the request if Redis is unavailable
         logger.warning("Rate limit check failed, allowing request", key=key, exc_info=True)
         return RateLimitResult(
             allowed=True,
             remaining=max_requests,
-            reset_at=reset_at,
+            reset_at=int(time.time() + window_seconds),
             limit=max_requests,
         )
 
 
+# ---------------------------------------------------------------------------
+# Local pre-filter
+# ---------------------------------------------------------------------------
+
+
+@dataclass(slots=True)
+class _LocalEntry:
+    tokens: int = 0  # requests this process may still admit without Redis
+    pending: int = 0  # admitted locally, not yet charged in Redis
+    expires: float = 0.0  # monotonic; the grant is void after this
+    remaining: int = 0  # estimate for the X-RateLimit-Remaining header
+    reset_at: int = 0
+    blocked_until: float = 0.0  # monotonic; Redis said no until then
+    abusive_until: float = 0.0  # monotonic; refused while Redis is down (fail closed)
+
+
+class LocalRateLimiter:
+    """In-process pre-filter in front of ``acquire`` for one limit.
+
+    Every Redis answer for an identifier with at least ``near_limit`` of its
+    limit left comes with a local grant of ``fraction`` x remaining requests,
+    valid for ``sync_interval`` seconds. Requests within the grant are
+    admitted from memory and charged to Redis afterwards: as debt on the
+    identifier's next ``acquire``, or by ``sync`` every ``sync_interval``.
+    Identifiers near their limit consult Redis on every request, so each
+    process can overshoot a limit by at most one grant. ``fraction`` trades
+    that accuracy for Redis round trips; 0 disables local admission.
+
+    Identifiers Redis rejects are refused locally until their retry time.
+    With ``fail_closed`` they stay refused for a whole window while Redis is
+    unreachable, instead of failing open with everyone else.
+    """
+
+    def __init__(
+        self,
+        max_requests: int,
+        window_seconds: int,
+        fraction: float,
+        near_limit: float,
+        sync_interval: float,
+        fail_closed: bool = False,
+        max_entries: int = 100_000,
+    ) -> None:
+        self._limit = max_requests
+        self._window = window_seconds
+        self._fraction = fraction
+        self._near_limit = near_limit
+        self._sync_interval = sync_interval
+        self._fail_closed = fail_closed
+        self._max_entries = max_entries
+        self._entries: dict[str, _LocalEntry] = {}
+        self._task: asyncio.Task | None = None
+
+    def _rejection(self, entry: _LocalEntry, until: float, now: float) -> RateLimitResult:
+        return RateLimitResult(
+            allowed=False,
+            remaining=0,
+            reset_at=entry.reset_at,
+            limit=self._limit,
+            retry_after=math.ceil(until - now),
+        )
+
+    async def check(self, redis: Redis, key: str) -> RateLimitResult:
+        """Admit or reject one request for ``key``; Redis errors propagate."""
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now < entry.blocked_until:
+                return self._rejection(entry, entry.blocked_until, now)
+            if entry.tokens > 0 and now < entry.expires:
+                entry.tokens -= 1
+                entry.pending += 1
+                entry.remaining = max(0, entry.remaining - 1)
+                return RateLimitResult(
+                    allowed=True,
+                    remaining=entry.remaining,
+                    reset_at=entry.reset_at,
+                    limit=self._limit,
+                )
+
+        debt = 0
+        if entry is not None:
+            debt, entry.pending = entry.pending, 0  # in flight; sync must not charge it too
+        try:
+            result = await acquire(redis, key, self._limit, self._window, debt=debt)
+        except BaseException as exc:
+            if entry is None:
+                raise
+            # sync may have dropped the entry while acquire was in flight
+            entry = self._entries.setdefault(key, entry)
+            entry.pending += debt  # still owed
+            if isinstance(exc, Exception) and self._fail_closed and now < entry.abusive_until:
+                return self._rejection(entry, entry.abusive_until, now)
+            raise
+
+        entry = self._entries.get(key)
+        if entry is None:
+            if len(self._entries) >= self._max_entries:
+                return result  # no room to cache; this identifier always asks Redis
+            entry = self._entries[key] = _LocalEntry()
+        self._update(entry, result, now)
+        if not result.allowed:
+            entry.blocked_until = now + result.retry_after
+            entry.abusive_until = now + self._window
+            logger.info("Rate limit exceeded", key=key, retry_after=result.retry_after)
+        return result
+
+    def check_offline(self, key: str) -> RateLimitResult | None:
+        """The local refusal for ``key`` while Redis is unavailable, if any.
+
+        Identifiers still inside a Redis retry time are refused; with
+        ``fail_closed``, so are those flagged abusive in the last window.
+        ``None`` means the caller should fail open.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now < entry.blocked_until:
+            return self._rejection(entry, entry.blocked_until, now)
+        if self._fail_closed and now < entry.abusive_until:
+            return self._rejection(entry, entry.abusive_until, now)
+        return None
+
+    def _update(self, entry: _LocalEntry, result: RateLimitResult, now: float) -> None:
+        entry.remaining = result.remaining
+        entry.reset_at = result.reset_at
+        if result.allowed and result.remaining >= self._limit * self._near_limit:
+            entry.tokens = int(result.remaining * self._fraction)
+            entry.expires = now + self._sync_interval
+        else:
+            entry.tokens = 0
+
+    async def sync(self, redis: Redis) -> None:
+        """Charge locally admitted requests to Redis and forget idle entries."""
+        now = time.monotonic()
+        due: list[tuple[str, int]] = []
+        for key, entry in self._entries.items():
+            if entry.pending:
+                due.append((key, entry.pending))
+                entry.pending = 0
+        if due:
+            wall = time.time()
+            try:
+                replies = await self._settle(redis, due, wall)
+            except BaseException:
+                for key, debt in due:
+                    self._entries[key].pending += debt
+                raise
+            for (key, _), reply in zip(due, replies, strict=True):
+                self._update(self._entries[key], _gcra_result(wall, self._limit, reply), now)
+
+        idle = [
+            key
+            for key, entry in self._entries.items()
+            if not entry.pending and now >= max(entry.expires, entry.abusive_until)
+        ]
+        for key in idle:
+            del self._entries[key]
+
+    async def _settle(self, redis: Redis, due: list[tuple[str, int]], wall: float) -> list:
+        """Charge each key's debt in one pipeline, loading the script on NOSCRIPT."""
+        calls = [
+            ([f"{key}:gcra"], _gcra_args(wall, self._limit, self._window, debt, 0))
+            for key, debt in due
+        ]
+        return await _GCRA_SCRIPT.run_many(redis, calls)
+
+    def start(self, redis: Redis) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(redis), name="rate-limit-sync")
+
+    async def stop(self, redis: Redis) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.sync(redis)
+
+    async def _run(self, redis: Redis) -> None:
+        while True:
+            await asyncio.sleep(self._sync_interval)
+            try:
+                await self.sync(redis)
+            except Exception:
+                logger.warning("Rate limit sync failed; retrying", exc_info=True)
+
+
+_local: LocalRateLimiter | None = None
+
+
+def local_rate_limiter() -> LocalRateLimiter | None:
+    """The default limit's pre-filter, if ``start_local_rate_limiter`` enabled it."""
+    return _local
+
+
+def start_local_rate_limiter(redis: Redis) -> None:
+    """Put a ``LocalRateLimiter`` in front of ``RATE_LIMIT_DEFAULT`` for this process."""
+    global _local
+    if settings.RATE_LIMIT_LOCAL_FRACTION <= 0 or _local is not None:
+        return
+    _local = LocalRateLimiter(
+        settings.RATE_LIMIT_DEFAULT,
+        DEFAULT_WINDOW_SECONDS,
+        fraction=settings.RATE_LIMIT_LOCAL_FRACTION,
+        near_limit=settings.RATE_LIMIT_LOCAL_NEAR_LIMIT,
+        sync_interval=settings.RATE_LIMIT_SYNC_INTERVAL,
+        fail_closed=settings.RATE_LIMIT_FAIL_CLOSED,
+    )
+    _local.start(redis)
+    logger.info(
+        "Local rate limiting enabled",
+        fraction=settings.RATE_LIMIT_LOCAL_FRACTION,
+        fail_closed=settings.RATE_LIMIT_FAIL_CLOSED,
+    )
+
+
+async def stop_local_rate_limiter(redis: Redis) -> None:
+    global _local
+    limiter = _local
+    if limiter is None:
+        return
+    _local = None
+    try:
+        await limiter.stop(redis)
+    except Exception:
+        logger.warning("Locally admitted requests not charged on shutdown", exc_info=True)
+
+
+# ---------------------------------------------------------------------------
+# Failed logins
+# ---------------------------------------------------------------------------
+
+
 async def increment_failed_login(redis: Redis, email_hash: str, ip: str) -> int:
     """Increment failed login counters for email and IP. Returns the email failure count."""
     email_key = f"failed_login:{email_hash}"
@@ -1,10 +1,13 @@
-"""Redis client setup and FastAPI dependency."""
+"""Redis client setup, FastAPI dependency and Lua script helper."""
 
 from __future__ import annotations
 
-from typing import AsyncIterator
+import hashlib
+from collections.abc import Callable, Sequence
+from typing import Any, AsyncIterator
 
 from redis.asyncio import Redis
+from redis.exceptions import NoScriptError
 
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -43,3 +46,57 @@ async def get_redis() -> AsyncIterator[Redis]:
     if redis_client is None:
         raise RuntimeError("Redis client not initialized. Call init_redis() first.")
     yield redis_client
+
+
+class LuaScript:
+    """A Lua script run by SHA, falling back to its source on NOSCRIPT.
+
+    Unlike ``Redis.register_script`` it is not bound to a client, so one
+    module-level instance serves the API's, the workers' and test clients.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        self.sha = hashlib.sha1(source.encode()).hexdigest()
+
+    async def __call__(self, redis: Any, keys: Sequence = (), args: Sequence = ()) -> Any:
+        """Run the script once in its own round trip."""
+        try:
+            return await redis.evalsha(self.sha, len(keys), *keys, *args)
+        except NoScriptError:
+            return await redis.eval(self.source, len(keys), *keys, *args)
+
+    def queue(self, pipe: Any, keys: Sequence = (), args: Sequence = ()) -> None:
+        """Queue the script on a caller's pipeline.
+
+        Its reply is a ``NoScriptError`` if the script is not loaded yet.
+        """
+        pipe.evalsha(self.sha, len(keys), *keys, *args)
+
+    async def run_many(self, redis: Any, calls: Sequence[tuple[Sequence, Sequence]]) -> list:
+        """Run the script once per ``(keys, args)`` in one pipeline."""
+        if not calls:
+            return []
+
+        def build(pipe: Any) -> None:
+            for keys, args in calls:
+                self.queue(pipe, keys, args)
+
+        return await self.run_pipeline(redis, build)
+
+    async def run_pipeline(self, redis: Any, build: Callable[[Any], None]) -> list:
+        """Execute a pipeline filled by ``build``, which queues this script.
+
+        On NOSCRIPT the script is loaded and the pipeline rebuilt and retried
+        once, so ``build`` must be safe to call twice.
+        """
+        for attempt in range(2):
+            pipe = redis.pipeline(transaction=False)
+            build(pipe)
+            try:
+                return await pipe.execute()
+            except NoScriptError:
+                if attempt:
+                    raise
+                await redis.script_load(self.source)
+        return []
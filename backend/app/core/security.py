@@ -1,7 +1,18 @@
-"""JWT validation and authentication dependencies for Supabase tokens."""
+"""JWT validation and authentication dependencies for Supabase tokens.
+
+Verified tokens are remembered in a bounded in-process LRU keyed by the
+token's SHA-256 digest, until the token's ``exp``. A client repeating its
+bearer token (every request between refreshes) costs one hash and a dict
+lookup instead of a signature check and claims validation.
+"""
 
 from __future__ import annotations
 
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any
+
 from fastapi import Request
 from jose import ExpiredSignatureError, JWTError, jwt
 
@@ -15,12 +26,60 @@ _JWT_ALGORITHM = "HS256"
 _JWT_AUDIENCE = "authenticated"
 
 
+class _VerifiedTokens:
+    """Bounded LRU of token digest -> (verified claims, exp)."""
+
+    def __init__(self, max_entries: int) -> None:
+        self._max_entries = max_entries
+        self._entries: OrderedDict[bytes, tuple[dict[str, Any], float]] = OrderedDict()
+
+    def get(self, digest: bytes, now: float) -> dict[str, Any] | None:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if now >= expires_at:
+            del self._entries[digest]  # re-verify, so the caller gets the expiry error
+            return None
+        self._entries.move_to_end(digest)
+        return claims
+
+    def put(self, digest: bytes, claims: dict[str, Any]) -> None:
+        exp = claims.get("exp")
+        if self._max_entries <= 0 or not isinstance(exp, (int, float)):
+            return
+        self._entries[digest] = (claims, float(exp))
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_verified = _VerifiedTokens(settings.JWT_CACHE_MAX_ENTRIES)
+
+
+def clear_token_cache() -> None:
+    """Forget every verified token (e.g. after rotating the JWT secret)."""
+    _verified.clear()
+
+
 async def validate_jwt(token: str) -> dict:
     """Validate a Supabase JWT and return decoded claims.
 
     Checks signature (HS256), expiration, and audience.
-    Returns the full decoded claims dict on success.
+    Returns the full decoded claims dict on success; it is shared with
+    later callers presenting the same token, so treat it as read-only.
     """
+    digest = hashlib.sha256(token.encode()).digest()
+    claims = _verified.get(digest, time.time())
+    if claims is not None:
+        return claims
+
     try:
         claims = jwt.decode(
             token,
@@ -36,13 +95,15 @@ async def validate_jwt(token: str) -> dict:
     if "sub" not in claims:
         raise AuthenticationError("Invalid authentication token.")
 
+    _verified.put(digest, claims)
     return claims
 
 
 async def get_current_user(request: Request) -> str:
     """FastAPI dependency that extracts and validates JWT from Authorization header.
 
-    Sets request.state.user_id on success. Returns the user_id string (UUID).
+    Sets request.state.user_id and request.state.jwt_claims on success.
+    Returns the user_id string (UUID).
     """
     auth_header = request.headers.get("Authorization")
     if not auth_header:
@@ -57,4 +118,5 @@ async def get_current_user(request: Request) -> str:
     user_id: str = claims["sub"]
 
     request.state.user_id = user_id
+    request.state.jwt_claims = claims
     return user_id
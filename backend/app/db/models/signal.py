@@ -3,10 +3,12 @@
 from __future__ import annotations
 
 import uuid
+from datetime import datetime
 from decimal import Decimal
 
 from sqlalchemy import (
     CheckConstraint,
+    DateTime,
     ForeignKey,
     Index,
     Integer,
@@ -28,6 +30,11 @@ class Signal(Base):
     __table_args__ = (
         Index("ix_signals_user_id_status", "user_id", "status"),
         Index("ix_signals_instrument_status", "instrument_symbol", "status"),
+        Index(
+            "ix_signals_outbox",
+            "updated_at",
+            postgresql_where=text("status = 'ENRICHED'"),
+        ),
         CheckConstraint(
             "source IN ('INTERNAL', 'WEBHOOK', 'MANUAL')",
             name="valid_source",
@@ -87,5 +94,12 @@ class Signal(Base):
         JSONB, nullable=False, server_default=text("'{}'::jsonb")
     )
     rejection_reason: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # Outbox bookkeeping for sweep_signal_outbox
+    dispatched_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    dispatch_attempts: Mapped[int] = mapped_column(
+        Integer, nullable=False, server_default=text("0")
+    )
 
     # created_at and updated_at inherited from Base
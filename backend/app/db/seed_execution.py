@@ -335,6 +335,8 @@ async def seed() -> None:
 
         await session.commit()
 
+    await _notify_reference_data_changed()
+
     print("Seed complete.")
     print(f"  Contract specs:    {specs_inserted} attempted (ON CONFLICT DO NOTHING)")
     print(f"  Calendar entries:  {cal_inserted} attempted")
@@ -342,6 +344,20 @@ async def seed() -> None:
     print(f"  Risk settings:     {risk_inserted} attempted (for existing users)")
 
 
+async def _notify_reference_data_changed() -> None:
+    """Tell running API/worker processes to reload their contract registry."""
+    from app.core.redis import close_redis, init_redis
+    from app.services.contract_registry import notify_reference_data_changed
+
+    try:
+        init_redis()
+        await notify_reference_data_changed()
+    except Exception as exc:
+        print(f"  Warning: could not notify running processes: {exc}", file=sys.stderr)
+    finally:
+        await close_redis()
+
+
 def main() -> None:
     try:
         asyncio.run(seed())
@@ -7,6 +7,7 @@ from collections.abc import AsyncGenerator
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
 
 engine = create_async_engine(
     settings.DATABASE_URL,
@@ -20,6 +21,8 @@ engine = create_async_engine(
     },
 )
 
+instrument_engine(engine)
+
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -7,18 +7,13 @@ import sys
 from collections.abc import AsyncIterator
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.core.exceptions import register_exception_handlers
 from app.core.logging import get_logger, setup_logging
-from app.core.middleware import (
-    RateLimitMiddleware,
-    RequestIDMiddleware,
-    RequestLoggingMiddleware,
-    TimingMiddleware,
-)
+from app.core.middleware import APIVersionMiddleware, RequestContextMiddleware
 
 logger = get_logger("trendedge.main")
 
@@ -97,6 +92,18 @@ async def _init_redis(app: FastAPI) -> None:
             await asyncio.sleep(1)
 
 
+async def _init_reference_data() -> None:
+    """Preload the contract registry. Services query the DB directly until it loads."""
+    from app.db.session import AsyncSessionLocal
+    from app.services.contract_registry import contract_registry
+
+    try:
+        async with AsyncSessionLocal() as db:
+            await contract_registry.ensure_current(db)
+    except Exception:
+        logger.warning("Contract registry preload failed", exc_info=True)
+
+
 def _init_sentry() -> None:
     """Initialize Sentry error tracking if DSN is configured."""
     if not settings.SENTRY_DSN:
@@ -120,10 +127,29 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # --- Startup ---
     setup_logging()
     _validate_env()
+    from app.core.instrumentation import instrument_redis
+
+    instrument_redis()
     await _init_database(app)
     await _init_redis(app)
+    await _init_reference_data()
     _init_sentry()
 
+    if app.state.redis_available:
+        from app.core.cache import start_invalidation_listener
+
+        await start_invalidation_listener()
+
+        from app.services.audit_buffer import start_audit_buffer
+        from app.services.fast_path import start_fast_path
+
+        start_audit_buffer(app.state.redis)
+        start_fast_path(app.state.redis)
+
+        from app.core.rate_limit import start_local_rate_limiter
+
+        start_local_rate_limiter(app.state.redis)
+
     from app.api.v1.health import set_start_time
 
     set_start_time()
@@ -139,6 +165,23 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # --- Shutdown ---
     logger.info("TrendEdge API shutting down...")
 
+    from app.core.cache import stop_invalidation_listener
+    from app.services.audit_buffer import stop_audit_buffer
+    from app.services.fast_path import stop_fast_path
+
+    await stop_fast_path()
+    await stop_audit_buffer()  # after the fast path: its last signals stage rows
+    await stop_invalidation_listener()
+
+    if app.state.redis_available:
+        from app.core.rate_limit import stop_local_rate_limiter
+
+        await stop_local_rate_limiter(app.state.redis)
+
+    from app.core.metrics import write_snapshot
+
+    write_snapshot(force=True)
+
     engine = getattr(app.state, "db_engine", None)
     if engine is not None:
         await engine.dispose()
@@ -164,11 +207,9 @@ def create_app() -> FastAPI:
 
     # --- Middleware (outermost first → added last) ---
     # Starlette applies middleware in reverse registration order,
-    # so we register from innermost to outermost.
-    app.add_middleware(RequestLoggingMiddleware)
-    app.add_middleware(RateLimitMiddleware)
-    app.add_middleware(TimingMiddleware)
-    app.add_middleware(RequestIDMiddleware)
+    # so we register from innermost to outermost. Request ID, rate limiting,
+    # timing and logging share one ASGI layer.
+    app.add_middleware(RequestContextMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.cors_origins_list,
@@ -179,12 +220,8 @@ def create_app() -> FastAPI:
         max_age=600,
     )
 
-    # --- API version header on every response ---
-    @app.middleware("http")
-    async def add_api_version_header(request: Request, call_next: object) -> Response:
-        response = await call_next(request)  # type: ignore[misc]
-        response.headers["X-API-Version"] = "v1"
-        return response  # type: ignore[return-value]
+    # --- API version header on every response, CORS preflights included ---
+    app.add_middleware(APIVersionMiddleware)
 
     # --- Routers ---
     from app.api.v1.health import router as health_router
@@ -0,0 +1,44 @@
+"""Run the audit stream writer.
+
+Usage:
+    python -m app.scripts.audit_writer
+
+Runs until interrupted. Drains ``audit:events`` into order_events,
+trendline_events and risk_check_audit (see app.services.audit_buffer). Run
+one instance: rows are written at least once either way, but a single
+writer keeps them in commit order.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+
+from app.core.logging import setup_logging
+from app.core.redis import close_redis, init_redis
+from app.db.session import AsyncSessionLocal, engine
+from app.services.audit_buffer import AuditWriter
+
+
+async def run() -> None:
+    redis = init_redis()
+    try:
+        await AuditWriter(redis, engine, AsyncSessionLocal).run()
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+
+def main() -> None:
+    setup_logging()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except Exception as exc:
+        print(f"Audit writer failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
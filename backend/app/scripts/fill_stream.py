@@ -0,0 +1,48 @@
+"""Run the streaming fill consumer.
+
+Usage:
+    python -m app.scripts.fill_stream
+
+Runs until interrupted. Fills are applied idempotently, so a second instance
+is safe but only duplicates broker subscriptions. Subscribes to cache
+invalidations so broker connection changes reach the adapter pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+
+from app.adapters.pool import adapter_pool
+from app.core.cache import start_invalidation_listener, stop_invalidation_listener
+from app.core.logging import setup_logging
+from app.core.redis import close_redis, init_redis
+from app.db.session import AsyncSessionLocal, engine
+from app.services.fill_stream import FillStreamService
+
+
+async def run() -> None:
+    redis = init_redis()
+    await start_invalidation_listener()
+    try:
+        await FillStreamService(AsyncSessionLocal, redis).run()
+    finally:
+        await stop_invalidation_listener()
+        await adapter_pool.close()
+        await close_redis()
+        await engine.dispose()
+
+
+def main() -> None:
+    setup_logging()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except Exception as exc:
+        print(f"Fill stream failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Run the event-driven paper position monitor.
+
+Usage:
+    python -m app.scripts.paper_monitor
+
+Runs until interrupted. One instance is enough; extra instances are safe
+(closes take a row lock) but duplicate the work.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+
+from app.core.logging import setup_logging
+from app.core.redis import close_redis, init_redis
+from app.db.session import AsyncSessionLocal, engine
+from app.services.paper_monitor import PaperPositionMonitor
+
+
+async def run() -> None:
+    redis = init_redis()
+    try:
+        await PaperPositionMonitor(AsyncSessionLocal, redis).run()
+    finally:
+        await close_redis()
+        await engine.dispose()
+
+
+def main() -> None:
+    setup_logging()
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    except Exception as exc:
+        print(f"Paper monitor failed: {exc}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
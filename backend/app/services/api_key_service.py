@@ -1,18 +1,33 @@
-"""Service layer for API key lifecycle management."""
+"""Service layer for API key lifecycle management.
+
+Validation results are cached per key hash in the ``apikeys`` namespace of
+the two-tier cache (``app.core.cache``) for ``_KEY_CACHE_TTL`` seconds, and
+unknown keys for ``_NEGATIVE_CACHE_TTL``, so bots repeating a key, valid or
+not, do not reach Postgres. ``revoke_key`` and ``delete_key`` drop the entry
+in every process after committing; the cache tombstones it, so a validation
+that read the row before the commit cannot cache the key as active again.
+Usage (``request_count``, ``last_used_at``) is counted in Redis by
+``record_usage`` and written to Postgres in batches by ``flush_usage``.
+"""
 
 from __future__ import annotations
 
 import hashlib
 import secrets
 import uuid
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
+from typing import Any
 
-from sqlalchemy import func, select, update
+from redis.asyncio import Redis
+from sqlalchemy import bindparam, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import delete_cached, get_or_load, set_cached
 from app.core.exceptions import AuthenticationError, ConflictError, ForbiddenError, NotFoundError
 from app.core.logging import get_logger
 from app.core.permissions import VALID_API_KEY_PERMISSIONS, check_tier_limit
+from app.core.redis import LuaScript
 from app.db.models.api_key import ApiKey
 
 logger = get_logger("trendedge.api_key_service")
@@ -21,6 +36,42 @@ logger = get_logger("trendedge.api_key_service")
 _LIVE_PREFIX = "te_live_"
 _TEST_PREFIX = "te_test_"
 
+# Validation cache
+_KEY_CACHE_NAMESPACE = "apikeys"
+_KEY_CACHE_TTL = 60  # seconds; revoke/delete invalidate explicitly
+_NEGATIVE_CACHE_TTL = 30  # seconds; unknown key hashes
+_MISSING: dict[str, Any] = {"missing": True}
+
+# Usage counters, flushed to Postgres by flush_usage
+_USAGE_COUNT_KEY = "apikey:usage:count"  # hash: key id -> requests since last flush
+_USAGE_LAST_USED_KEY = "apikey:usage:last_used"  # hash: key id -> epoch seconds
+
+
+# KEYS: count hash, last-used hash. ARGV: key id, flushed count, ...
+# Subtracts each flushed count and drops both fields of keys left at zero, so
+# the hashes only hold keys with usage still to flush. A request counted
+# between the subtraction and the HDEL cannot be lost: the script is atomic.
+_SETTLE_USAGE_SCRIPT = LuaScript("""
+for i = 1, #ARGV, 2 do
+    local left = redis.call('HINCRBY', KEYS[1], ARGV[i], -tonumber(ARGV[i + 1]))
+    if left <= 0 then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+        redis.call('HDEL', KEYS[2], ARGV[i])
+    end
+end
+return 1
+""")
+
+
+@dataclass(frozen=True, slots=True)
+class ValidatedKey:
+    """What authentication needs from a valid, active, unexpired API key."""
+
+    id: uuid.UUID
+    user_id: uuid.UUID
+    key_hash: str
+    permissions: list[str]
+
 
 def _hash_key(raw_key: str) -> str:
     """Compute SHA-256 hex digest of a raw API key."""
@@ -119,6 +170,7 @@ async def revoke_key(user_id: str, key_id: str, db: AsyncSession) -> ApiKey:
     api_key.is_active = False
     await db.commit()
     await db.refresh(api_key)
+    await delete_cached(api_key.key_hash, namespace=_KEY_CACHE_NAMESPACE)
 
     logger.info("API key revoked", user_id=user_id, key_prefix=api_key.key_prefix)
     return api_key
@@ -133,44 +185,147 @@ async def delete_key(user_id: str, key_id: str, db: AsyncSession) -> None:
 
     await db.delete(api_key)
     await db.commit()
+    await delete_cached(api_key.key_hash, namespace=_KEY_CACHE_NAMESPACE)
+    await _forget_usage(api_key.id)
 
     logger.info("API key deleted", user_id=user_id, key_prefix=api_key.key_prefix)
 
 
-async def validate_key(raw_key: str, db: AsyncSession) -> ApiKey:
-    """Validate an API key string and return the associated ApiKey model.
+async def validate_key(raw_key: str, db: AsyncSession) -> ValidatedKey:
+    """Validate an API key string and return the key's identity and permissions.
 
-    Checks: exists, is_active, not expired.
-    Updates last_used_at and request_count on success.
+    Checks: exists, is_active, not expired. Served from the validation cache
+    when possible; unknown keys are cached too. Callers record usage with
+    ``record_usage``.
     """
     key_hash = _hash_key(raw_key)
 
-    result = await db.execute(
-        select(ApiKey).where(ApiKey.key_hash == key_hash)
+    async def _load() -> dict[str, Any] | None:
+        result = await db.execute(
+            select(
+                ApiKey.id,
+                ApiKey.user_id,
+                ApiKey.permissions,
+                ApiKey.is_active,
+                ApiKey.expires_at,
+            ).where(ApiKey.key_hash == key_hash)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        return {
+            "id": str(row.id),
+            "user_id": str(row.user_id),
+            "permissions": list(row.permissions),
+            "is_active": row.is_active,
+            "expires_at": row.expires_at.isoformat() if row.expires_at else None,
+        }
+
+    entry = await get_or_load(
+        key_hash, _load, ttl=_KEY_CACHE_TTL, namespace=_KEY_CACHE_NAMESPACE
     )
-    api_key = result.scalar_one_or_none()
-
-    if api_key is None:
+    if entry is None:
+        await set_cached(
+            key_hash, _MISSING, ttl=_NEGATIVE_CACHE_TTL, namespace=_KEY_CACHE_NAMESPACE
+        )
+        raise AuthenticationError("Invalid API key.")
+    if entry.get("missing"):
         raise AuthenticationError("Invalid API key.")
 
-    if not api_key.is_active:
+    if not entry["is_active"]:
         raise AuthenticationError("API key has been revoked.")
 
-    if api_key.expires_at is not None and api_key.expires_at < datetime.now(UTC):
+    expires_at = entry["expires_at"]
+    if expires_at is not None and datetime.fromisoformat(expires_at) < datetime.now(UTC):
         raise AuthenticationError("API key has expired.")
 
-    # Update usage stats
-    await db.execute(
-        update(ApiKey)
-        .where(ApiKey.id == api_key.id)
-        .values(
-            last_used_at=datetime.now(UTC),
-            request_count=ApiKey.request_count + 1,
-        )
+    return ValidatedKey(
+        id=uuid.UUID(entry["id"]),
+        user_id=uuid.UUID(entry["user_id"]),
+        key_hash=key_hash,
+        permissions=entry["permissions"],
     )
-    await db.commit()
 
-    return api_key
+
+# ---------------------------------------------------------------------------
+# Usage tracking
+# ---------------------------------------------------------------------------
+
+
+def record_usage(pipe: Any, key_id: uuid.UUID) -> None:
+    """Queue one request's usage on a Redis pipeline (see ``flush_usage``)."""
+    pipe.hincrby(_USAGE_COUNT_KEY, str(key_id), 1)
+    pipe.hset(_USAGE_LAST_USED_KEY, str(key_id), int(datetime.now(UTC).timestamp()))
+
+
+async def _forget_usage(key_id: uuid.UUID) -> None:
+    from app.core.redis import redis_client
+
+    if redis_client is None:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hdel(_USAGE_COUNT_KEY, str(key_id))
+        pipe.hdel(_USAGE_LAST_USED_KEY, str(key_id))
+        await pipe.execute()
+    except Exception:
+        logger.warning("Failed to drop usage counters", key_id=str(key_id), exc_info=True)
+
+
+async def flush_usage(db: AsyncSession, redis: Redis) -> int:
+    """Add the counted usage to ``api_keys`` in one UPDATE. Returns keys updated.
+
+    Counts are subtracted from Redis only after the commit, so requests
+    counted meanwhile carry over to the next flush. ``last_used_at`` only
+    moves forward, so re-applying a timestamp is harmless. Keys left with
+    nothing to flush (including deleted keys) are dropped from both hashes.
+    """
+    pipe = redis.pipeline(transaction=True)
+    pipe.hgetall(_USAGE_COUNT_KEY)
+    pipe.hgetall(_USAGE_LAST_USED_KEY)
+    counts, last_used = await pipe.execute()
+    usage = [
+        {
+            "b_id": uuid.UUID(key_id),
+            "b_count": int(count),
+            "b_last_used": datetime.fromtimestamp(int(last_used.get(key_id, 0)), UTC),
+        }
+        for key_id, count in counts.items()
+        if int(count) > 0
+    ]
+    idle = {key_id for key_id, count in counts.items() if int(count) <= 0}
+    idle.update(key_id for key_id in last_used if key_id not in counts)
+
+    if usage:
+        table = ApiKey.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                request_count=table.c.request_count + bindparam("b_count"),
+                last_used_at=func.greatest(
+                    func.coalesce(table.c.last_used_at, bindparam("b_last_used")),
+                    bindparam("b_last_used"),
+                ),
+            )
+        )
+        await db.execute(stmt, usage)
+        await db.commit()
+
+    settled = [(str(row["b_id"]), row["b_count"]) for row in usage]
+    settled.extend((key_id, 0) for key_id in sorted(idle))
+    if settled:
+        await _settle_usage(redis, settled)
+    if usage:
+        logger.info("API key usage flushed", keys=len(usage))
+    return len(usage)
+
+
+async def _settle_usage(redis: Redis, settled: list[tuple[str, int]]) -> None:
+    """Subtract flushed counts and drop keys left at zero, in one script call."""
+    keys = [_USAGE_COUNT_KEY, _USAGE_LAST_USED_KEY]
+    args = [value for key_id, count in settled for value in (key_id, count)]
+    await _SETTLE_USAGE_SCRIPT(redis, keys, args)
 
 
 async def _get_user_key(user_id: str, key_id: str, db: AsyncSession) -> ApiKey:
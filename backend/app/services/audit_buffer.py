@@ -0,0 +1,446 @@
+"""Write-behind pipeline for audit rows.
+
+With ``AUDIT_WRITE_BEHIND`` enabled, ``order_events``, ``trendline_events``
+and ``risk_check_audit`` rows no longer go into the transaction that changes
+the order, trendline or signal. That keeps the hot transaction (and its row
+locks on ``orders``/``positions``) short:
+
+1. **Stage** — ``stage_audit`` attaches rows to the session. They are
+   published when the session commits and discarded if it rolls back, so
+   the audit trail never records a change that did not happen.
+2. **Buffer** — committed rows go to this process's ``AuditBuffer``, which
+   appends one entry per transaction to the Redis stream ``audit:events``.
+   If Redis is unavailable the rows are inserted into Postgres directly
+   instead (the durable fallback).
+3. **Write** — ``AuditWriter`` (``python -m app.scripts.audit_writer``) reads
+   the stream through a consumer group and writes each batch with COPY into
+   a temp table followed by ``INSERT ... ON CONFLICT (id) DO NOTHING``, then
+   acknowledges and deletes the entries.
+
+Ordering: rows get their ``id`` and ``created_at`` when staged, entries are
+appended in commit order, and the writer preserves stream order within each
+table. Run a single writer to keep that order on disk as well.
+
+At-least-once: an entry stays pending in the consumer group until its batch
+commits; a restarted writer reclaims entries left pending by a dead one.
+Redelivered rows carry the same ids and are skipped by ``ON CONFLICT``. Rows
+committed but not yet appended live only in process memory; the API lifespan
+and the Celery worker runtime flush them on shutdown and after every task.
+
+Poison entries: an entry that cannot be decoded, or a row Postgres rejects
+even on its own, is moved to ``audit:dead-letter`` and acknowledged with its
+batch, so it cannot wedge the stream. Dead-letter entries keep the ``rows``
+field (when there is one), so they can be re-added to ``audit:events`` once
+fixed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import socket
+import uuid
+from collections import deque
+from datetime import UTC, datetime
+from decimal import Decimal
+from typing import Any
+
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, ResponseError
+from sqlalchemy import DateTime, Numeric, event
+from sqlalchemy.dialects.postgresql import JSONB, UUID, insert
+from sqlalchemy.exc import DataError as SQLDataError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.models.order_event import OrderEvent
+from app.db.models.risk_check_audit import RiskCheckAudit
+from app.db.models.trendline_event import TrendlineEvent
+
+logger = get_logger("trendedge.audit_buffer")
+
+STREAM_KEY = "audit:events"
+DEAD_LETTER_KEY = "audit:dead-letter"
+_GROUP = "audit-writers"
+_STAGED_KEY = "audit_rows"  # session.info key
+_PUBLISH_BATCH = 200  # transactions per XADD pipeline
+_WRITE_BATCH = 500  # stream entries per COPY
+_BLOCK_MS = 1000
+_CLAIM_IDLE_MS = 60_000  # reclaim entries a crashed writer left pending this long
+_RETRY_DELAY = 1.0  # seconds
+
+_MODELS = {
+    model.__tablename__: model for model in (OrderEvent, RiskCheckAudit, TrendlineEvent)
+}
+
+Row = tuple[str, dict[str, Any]]
+
+
+# ----------------------------------------------------------------------
+# Staging
+# ----------------------------------------------------------------------
+
+
+def stage_audit(db, model: type, rows: dict | list[dict]) -> bool:
+    """Stage audit rows on ``db`` for write-behind.
+
+    Returns False when write-behind is off; the caller then writes the rows
+    in its own transaction as before.
+    """
+    if _buffer is None:
+        return False
+    now = datetime.now(UTC)
+    staged = db.info.setdefault(_STAGED_KEY, [])
+    for row in [rows] if isinstance(rows, dict) else rows:
+        row = {"id": uuid.uuid4(), "created_at": now, "updated_at": now, **row}
+        staged.append((model.__tablename__, row))
+    return True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session) -> None:
+    rows = session.info.pop(_STAGED_KEY, None)
+    if rows:
+        if _buffer is not None:
+            _buffer.append(rows)
+        else:
+            logger.error("Audit rows committed after the buffer stopped", count=len(rows))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction) -> None:
+    if transaction.parent is None:  # rolled back or closed without commit
+        session.info.pop(_STAGED_KEY, None)
+
+
+# ----------------------------------------------------------------------
+# Encoding
+# ----------------------------------------------------------------------
+
+
+def _default(value: Any) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (uuid.UUID, Decimal)):
+        return str(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in an audit row")
+
+
+def encode_rows(rows: list[Row]) -> str:
+    return json.dumps(rows, default=_default, separators=(",", ":"))
+
+
+def decode_rows(payload: str) -> list[Row]:
+    """Inverse of ``encode_rows``: restores column types from the models."""
+    decoded = []
+    for table, row in json.loads(payload):
+        columns = _MODELS[table].__table__.c
+        for name, value in row.items():
+            if value is None:
+                continue
+            column_type = columns[name].type
+            if isinstance(column_type, UUID):
+                row[name] = uuid.UUID(value)
+            elif isinstance(column_type, DateTime):
+                row[name] = datetime.fromisoformat(value)
+            elif isinstance(column_type, Numeric):
+                row[name] = Decimal(value)
+        decoded.append((table, row))
+    return decoded
+
+
+def _by_table(rows: list[Row]) -> dict[str, list[dict]]:
+    """Rows grouped by table in stream order, each with the same keys."""
+    grouped: dict[str, list[dict]] = {}
+    for table, row in rows:
+        grouped.setdefault(table, []).append(row)
+    for table, table_rows in grouped.items():
+        columns = dict.fromkeys(name for row in table_rows for name in row)
+        grouped[table] = [{name: row.get(name) for name in columns} for row in table_rows]
+    return grouped
+
+
+async def insert_rows(session_factory, rows: list[Row]) -> None:
+    """Insert audit rows with the ORM, skipping ids already written."""
+    async with session_factory() as db:
+        for table, table_rows in _by_table(rows).items():
+            stmt = insert(_MODELS[table]).on_conflict_do_nothing(index_elements=["id"])
+            await db.execute(stmt, table_rows)
+        await db.commit()
+
+
+# ----------------------------------------------------------------------
+# Producer side
+# ----------------------------------------------------------------------
+
+
+class AuditBuffer:
+    """Moves committed audit rows from process memory to the audit stream."""
+
+    def __init__(self, redis: Redis, session_factory) -> None:
+        self._redis = redis
+        self._session_factory = session_factory
+        self._pending: deque[list[Row]] = deque()  # one entry per transaction
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def append(self, rows: list[Row]) -> None:
+        self._pending.append(rows)
+        self._wake.set()
+
+    def start(self) -> None:
+        """Publish in the background as transactions commit."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audit-buffer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.error("Audit rows could not be persisted; retrying", exc_info=True)
+                await asyncio.sleep(_RETRY_DELAY)
+                self._wake.set()
+
+    async def flush(self) -> None:
+        """Append every pending transaction to the stream, oldest first.
+
+        Rows leave memory only once the stream (or, failing that, Postgres)
+        has them; if both are down they stay queued for the next flush.
+        """
+        async with self._lock:  # a single publisher keeps commit order
+            while self._pending:
+                count = min(_PUBLISH_BATCH, len(self._pending))
+                batch = [self._pending[i] for i in range(count)]
+                try:
+                    async with self._redis.pipeline(transaction=False) as pipe:
+                        for rows in batch:
+                            pipe.xadd(STREAM_KEY, {"rows": encode_rows(rows)})
+                        await pipe.execute()
+                except RedisError:
+                    logger.warning(
+                        "Audit stream unavailable; writing audit rows directly",
+                        transactions=len(batch),
+                        exc_info=True,
+                    )
+                    await insert_rows(self._session_factory, [r for rows in batch for r in rows])
+                for _ in batch:
+                    self._pending.popleft()
+
+
+_buffer: AuditBuffer | None = None
+
+
+def start_audit_buffer(redis: Redis, session_factory=None, background: bool = True) -> None:
+    """Enable write-behind for this process when ``AUDIT_WRITE_BEHIND`` is set.
+
+    Processes without a long-running loop (Celery workers) pass
+    ``background=False`` and call ``flush_audit_buffer`` themselves.
+    """
+    global _buffer
+    if not settings.AUDIT_WRITE_BEHIND or _buffer is not None:
+        return
+    if session_factory is None:
+        from app.db.session import AsyncSessionLocal
+
+        session_factory = AsyncSessionLocal
+    _buffer = AuditBuffer(redis, session_factory)
+    if background:
+        _buffer.start()
+    logger.info("Audit write-behind enabled")
+
+
+async def flush_audit_buffer() -> None:
+    if _buffer is None:
+        return
+    try:
+        await _buffer.flush()
+    except Exception:
+        logger.error(
+            "Audit flush failed; rows stay queued", pending=_buffer.pending, exc_info=True
+        )
+
+
+async def stop_audit_buffer() -> None:
+    global _buffer
+    buffer = _buffer
+    if buffer is None:
+        return
+    try:
+        await buffer.stop()
+    except Exception:
+        logger.error("Audit rows lost on shutdown", pending=buffer.pending, exc_info=True)
+    _buffer = None
+
+
+# ----------------------------------------------------------------------
+# Consumer side
+# ----------------------------------------------------------------------
+
+
+class AuditWriter:
+    """Drains the audit stream into Postgres in COPY batches."""
+
+    def __init__(
+        self,
+        redis: Redis,
+        engine: AsyncEngine,
+        session_factory,
+        batch_size: int = _WRITE_BATCH,
+        consumer: str | None = None,
+    ) -> None:
+        self._redis = redis
+        self._engine = engine
+        self._session_factory = session_factory
+        self._batch_size = batch_size
+        self._consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+
+    async def run(self) -> None:
+        await self.ensure_group()
+        logger.info("Audit writer started", consumer=self._consumer)
+        while True:
+            try:
+                await self.write_batch()
+            except Exception:
+                logger.error("Audit batch failed; will retry", exc_info=True)
+                await asyncio.sleep(_RETRY_DELAY)
+
+    async def ensure_group(self) -> None:
+        try:
+            await self._redis.xgroup_create(STREAM_KEY, _GROUP, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def write_batch(self, block_ms: int = _BLOCK_MS) -> int:
+        """Write one batch of entries; returns the number of rows written.
+
+        Entries are acknowledged only after their rows commit.
+        """
+        entries = await self._reclaim()
+        if not entries:
+            response = await self._redis.xreadgroup(
+                _GROUP,
+                self._consumer,
+                {STREAM_KEY: ">"},
+                count=self._batch_size,
+                block=block_ms,
+            )
+            entries = response[0][1] if response else []
+        if not entries:
+            return 0
+
+        rows: list[Row] = []
+        dead: list[dict[str, str]] = []
+        for entry_id, fields in entries:
+            try:
+                rows.extend(decode_rows(fields["rows"]))
+            except (KeyError, TypeError, ValueError) as exc:
+                logger.error("Dead-lettering undecodable audit entry", entry_id=entry_id)
+                dead.append({**fields, "entry_id": entry_id, "error": repr(exc)})
+
+        unwritable: list[Row] = []
+        if rows:
+            try:
+                await self._copy(rows)
+            except (IntegrityConstraintViolationError, DataError):
+                # One bad row (e.g. its order was deleted meanwhile, or a value
+                # the column rejects) must not wedge the stream: retry the
+                # batch row by row.
+                logger.warning("Audit COPY failed; inserting rows individually", exc_info=True)
+                unwritable = await self._insert_individually(rows)
+        for row, exc in unwritable:
+            dead.append({"rows": encode_rows([row]), "error": repr(exc)})
+
+        entry_ids = [entry_id for entry_id, _ in entries]
+        async with self._redis.pipeline(transaction=True) as pipe:
+            for fields in dead:
+                pipe.xadd(DEAD_LETTER_KEY, fields)
+            pipe.xack(STREAM_KEY, _GROUP, *entry_ids)
+            pipe.xdel(STREAM_KEY, *entry_ids)
+            await pipe.execute()
+        return len(rows) - len(unwritable)
+
+    async def _reclaim(self) -> list:
+        """Entries a dead writer read but never acknowledged."""
+        result = await self._redis.xautoclaim(
+            STREAM_KEY,
+            _GROUP,
+            self._consumer,
+            min_idle_time=_CLAIM_IDLE_MS,
+            start_id="0-0",
+            count=self._batch_size,
+        )
+        return result[1]
+
+    async def _copy(self, rows: list[Row]) -> None:
+        async with self._engine.connect() as conn:
+            raw = await conn.get_raw_connection()
+            pg = raw.driver_connection
+            async with pg.transaction():
+                for table, table_rows in _by_table(rows).items():
+                    columns = list(table_rows[0])
+                    json_columns = {
+                        name
+                        for name in columns
+                        if isinstance(_MODELS[table].__table__.c[name].type, JSONB)
+                    }
+                    records = [
+                        tuple(
+                            json.dumps(row[name])
+                            if name in json_columns and row[name] is not None
+                            else row[name]
+                            for name in columns
+                        )
+                        for row in table_rows
+                    ]
+                    staging = f"audit_staging_{table}"
+                    column_list = ", ".join(columns)
+                    await pg.execute(
+                        f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                        f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+                    )
+                    await pg.copy_records_to_table(staging, records=records, columns=columns)
+                    await pg.execute(
+                        f"INSERT INTO {table} ({column_list}) "
+                        f"SELECT {column_list} FROM {staging} "
+                        "ON CONFLICT (id) DO NOTHING"
+                    )
+
+    async def _insert_individually(self, rows: list[Row]) -> list[tuple[Row, Exception]]:
+        """Insert ``rows`` one at a time; returns the rows Postgres rejected."""
+        rejected = []
+        for row in rows:
+            try:
+                await insert_rows(self._session_factory, [row])
+            except (IntegrityError, SQLDataError) as exc:
+                logger.error(
+                    "Dead-lettering audit row that cannot be written",
+                    table=row[0],
+                    row_id=str(row[1].get("id")),
+                    exc_info=True,
+                )
+                rejected.append((row, exc))
+        return rejected
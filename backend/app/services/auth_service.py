@@ -108,7 +108,7 @@ class AuthService:
             window_seconds=900,
         )
         if not rl.allowed:
-            raise RateLimitError(retry_after=rl.reset_at)
+            raise RateLimitError(retry_after=rl.retry_after)
 
         async with httpx.AsyncClient(timeout=10) as client:
             resp = await client.post(
@@ -9,6 +9,7 @@ from datetime import UTC, datetime
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.adapters.pool import invalidate_broker_user
 from app.core.exceptions import ConflictError, ForbiddenError, NotFoundError
 from app.core.logging import get_logger
 from app.db.models.broker_connection import BrokerConnection
@@ -143,6 +144,7 @@ class BrokerService:
 
         await self._db.commit()
         await self._db.refresh(connection)
+        await invalidate_broker_user(connection.user_id)
 
         logger.info(
             "Broker connection updated",
@@ -160,6 +162,7 @@ class BrokerService:
         connection = await self._get_owned_connection(user_id, connection_id)
         await self._db.delete(connection)
         await self._db.commit()
+        await invalidate_broker_user(connection.user_id)
 
         logger.info(
             "Broker connection deleted",
@@ -0,0 +1,217 @@
+"""In-memory registry of contract specifications and instrument correlations.
+
+Reference data seeded by ``db/seed_execution.py`` changes rarely but is read
+on every signal, fill and paper-monitor tick. The registry loads both tables
+with two queries into an immutable snapshot: specs by symbol, the micro to
+full-size symbol map, and a dense correlation matrix over full-size symbols.
+
+Snapshots are versioned by the generation of the ``refdata`` cache namespace.
+Writers call ``notify_reference_data_changed()`` after committing, which bumps
+the generation (and broadcasts it over the cache pub/sub channel). Readers
+re-check the generation at most every ``_VERSION_CHECK_INTERVAL`` seconds and
+reload when it has moved.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from decimal import Decimal
+
+import numpy as np
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import get_namespace_version, invalidate_namespace
+from app.core.logging import get_logger
+from app.db.models.contract_specification import ContractSpecification
+from app.db.models.instrument_correlation import InstrumentCorrelation
+
+logger = get_logger("trendedge.contract_registry")
+
+_REFDATA_NAMESPACE = "refdata"
+_VERSION_CHECK_INTERVAL = 5.0  # seconds between generation checks
+
+
+@dataclass(frozen=True, slots=True)
+class ContractSpec:
+    """Immutable copy of a ContractSpecification row.
+
+    Attribute names match the ORM model so either can be passed to code that
+    reads tick sizes, values and micro flags.
+    """
+
+    symbol: str
+    name: str
+    exchange: str
+    asset_class: str
+    tick_size: Decimal
+    tick_value: Decimal
+    point_value: Decimal
+    margin_day: Decimal | None
+    margin_overnight: Decimal | None
+    trading_hours: str | None
+    is_micro: bool
+    full_size_symbol: str | None
+
+    @classmethod
+    def from_model(cls, row: ContractSpecification) -> ContractSpec:
+        return cls(
+            symbol=row.symbol,
+            name=row.name,
+            exchange=row.exchange,
+            asset_class=row.asset_class,
+            tick_size=row.tick_size,
+            tick_value=row.tick_value,
+            point_value=row.point_value,
+            margin_day=row.margin_day,
+            margin_overnight=row.margin_overnight,
+            trading_hours=row.trading_hours,
+            is_micro=bool(row.is_micro),
+            full_size_symbol=row.full_size_symbol,
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class _Snapshot:
+    version: int
+    specs: dict[str, ContractSpec]
+    full_symbols: dict[str, str]
+    index: dict[str, int]
+    # Symmetric; NaN where no correlation is recorded (including the diagonal).
+    matrix: np.ndarray
+
+
+def _build_snapshot(
+    version: int,
+    specs: list[ContractSpec],
+    correlations: Iterable[tuple[str, str, float]],
+) -> _Snapshot:
+    correlations = list(correlations)
+    by_symbol = {spec.symbol: spec for spec in specs}
+    full_symbols = {
+        spec.symbol: spec.full_size_symbol for spec in specs if spec.full_size_symbol
+    }
+
+    names = {full_symbols.get(symbol, symbol) for symbol in by_symbol}
+    for a, b, _ in correlations:
+        names.update((a, b))
+    index = {name: i for i, name in enumerate(sorted(names))}
+
+    matrix = np.full((len(index), len(index)), np.nan)
+    for a, b, value in correlations:
+        matrix[index[a], index[b]] = value
+        matrix[index[b], index[a]] = value
+    matrix.flags.writeable = False
+
+    return _Snapshot(
+        version=version,
+        specs=by_symbol,
+        full_symbols=full_symbols,
+        index=index,
+        matrix=matrix,
+    )
+
+
+class ContractRegistry:
+    """Process-wide, versioned cache of contract reference data."""
+
+    def __init__(self) -> None:
+        self._snapshot: _Snapshot | None = None
+        self._checked_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    @property
+    def version(self) -> int | None:
+        return self._snapshot.version if self._snapshot is not None else None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    async def load(self, db: AsyncSession, version: int = 0) -> None:
+        """Replace the snapshot with the current contents of both tables."""
+        spec_rows = (await db.execute(select(ContractSpecification))).scalars().all()
+        corr_rows = (await db.execute(select(InstrumentCorrelation))).scalars().all()
+
+        self._snapshot = _build_snapshot(
+            version,
+            [ContractSpec.from_model(row) for row in spec_rows],
+            ((r.instrument_a, r.instrument_b, float(r.correlation)) for r in corr_rows),
+        )
+        self._checked_at = time.monotonic()
+        logger.info(
+            "Contract registry loaded",
+            version=version,
+            specs=len(self._snapshot.specs),
+            correlations=len(corr_rows),
+        )
+
+    async def ensure_current(self, db: AsyncSession, redis: Redis | None = None) -> None:
+        """Load the registry, or reload it if the reference data generation moved.
+
+        The generation is checked at most every few seconds, so the common
+        path costs no I/O at all.
+        """
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._checked_at < _VERSION_CHECK_INTERVAL:
+            return
+        self._checked_at = now
+
+        try:
+            version = await get_namespace_version(_REFDATA_NAMESPACE, client=redis)
+        except Exception:
+            logger.warning("Reference data version check failed", exc_info=True)
+            if self._snapshot is not None:
+                return
+            version = 0
+
+        if self._snapshot is None or self._snapshot.version != version:
+            await self.load(db, version)
+
+    def mark_stale(self) -> None:
+        """Force the next ``ensure_current`` call to re-check the generation."""
+        self._checked_at = 0.0
+
+    def reset(self) -> None:
+        """Drop the snapshot; callers fall back to querying the database."""
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Lookups (synchronous; require a loaded snapshot)
+    # ------------------------------------------------------------------
+
+    def get_spec(self, symbol: str) -> ContractSpec | None:
+        assert self._snapshot is not None, "Contract registry not loaded"
+        return self._snapshot.specs.get(symbol)
+
+    def normalize_symbol(self, symbol: str) -> str:
+        """Resolve a micro symbol to its full-size symbol."""
+        assert self._snapshot is not None, "Contract registry not loaded"
+        return self._snapshot.full_symbols.get(symbol, symbol)
+
+    def correlation(self, symbol_a: str, symbol_b: str) -> float | None:
+        """Correlation between two (normalized) symbols, or None if unknown."""
+        assert self._snapshot is not None, "Contract registry not loaded"
+        index = self._snapshot.index
+        i, j = index.get(symbol_a), index.get(symbol_b)
+        if i is None or j is None:
+            return None
+        value = float(self._snapshot.matrix[i, j])
+        return None if math.isnan(value) else value
+
+
+contract_registry = ContractRegistry()
+
+
+async def notify_reference_data_changed() -> None:
+    """Bump the reference data generation so every process reloads its registry."""
+    await invalidate_namespace(_REFDATA_NAMESPACE)
+    contract_registry.mark_stale()
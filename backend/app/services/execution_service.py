@@ -2,18 +2,22 @@
 
 from __future__ import annotations
 
+import asyncio
 import uuid
+from collections.abc import Awaitable, Iterable
 from datetime import UTC, datetime
 from decimal import Decimal
 
 from redis.asyncio import Redis
-from sqlalchemy import func, select
+from sqlalchemy import event, func, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from app.adapters.base import BrokerAdapter
 from app.adapters.types import (
     BracketRole,
     OrderRequest,
+    OrderResult,
     OrderSide,
     OrderType,
 )
@@ -24,9 +28,84 @@ from app.db.models.order import Order
 from app.db.models.order_event import OrderEvent
 from app.db.models.position import Position
 from app.db.models.signal import Signal
+from app.services.audit_buffer import stage_audit
+from app.services.contract_registry import ContractSpec, contract_registry
+from app.services.exposure_ledger import ExposureLedger
+from app.services.paper_monitor import publish_position_event
 
 logger = get_logger("trendedge.execution_service")
 
+_PENDING_STATUSES = ("CONSTRUCTED", "SUBMITTED")
+_FLATTEN_CONCURRENCY = 20  # broker calls in flight at once during flatten-all
+_BROKER_CALL_TIMEOUT = 10.0  # seconds per exit/cancel during flatten-all
+_LEDGER_STAGED_KEY = "exposure_updates"  # session.info key
+
+# Last scheduled batch of post-commit ledger updates; batches apply in order.
+_ledger_tail: asyncio.Task | None = None
+
+
+# ----------------------------------------------------------------------
+# Post-commit exposure ledger updates
+# ----------------------------------------------------------------------
+
+
+@event.listens_for(Session, "after_commit")
+def _ledger_after_commit(session: Session) -> None:
+    global _ledger_tail
+    updates = session.info.pop(_LEDGER_STAGED_KEY, None)
+    if not updates:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        logger.warning(
+            "Exposure ledger updates dropped outside an event loop", count=len(updates)
+        )
+        return
+    previous = _ledger_tail
+    if previous is not None and previous.get_loop() is not loop:
+        previous = None
+    _ledger_tail = loop.create_task(_apply_ledger_updates(updates, previous))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _ledger_after_transaction_end(session: Session, transaction) -> None:
+    if transaction.parent is None:  # rolled back or closed without commit
+        session.info.pop(_LEDGER_STAGED_KEY, None)
+
+
+async def _apply_ledger_updates(
+    updates: list[tuple[Redis, str, Position]], previous: asyncio.Task | None
+) -> None:
+    """Apply one transaction's position opens/closes to the exposure ledger and
+    announce them to the paper position monitor.
+
+    Best effort: Postgres is the source of truth; ledger reconciliation and
+    the monitor's periodic resync repair any update lost here.
+    """
+    if previous is not None:
+        await asyncio.wait([previous])
+    for redis, ledger_event, position in updates:
+        try:
+            await getattr(ExposureLedger(redis), ledger_event)(position)
+            await publish_position_event(
+                redis, ledger_event.removeprefix("position_"), position
+            )
+        except Exception:
+            logger.warning(
+                "Exposure ledger update failed",
+                ledger_event=ledger_event,
+                position_id=str(position.id),
+                exc_info=True,
+            )
+
+
+async def drain_ledger_updates() -> None:
+    """Wait for the exposure ledger updates of every commit so far."""
+    tail = _ledger_tail
+    if tail is not None and tail.get_loop() is asyncio.get_running_loop():
+        await asyncio.wait([tail])
+
 
 class ExecutionService:
     """Bracket order construction, submission, fill handling, and position lifecycle."""
@@ -34,6 +113,8 @@ class ExecutionService:
     def __init__(self, db: AsyncSession, redis: Redis | None = None) -> None:
         self._db = db
         self._redis = redis
+        # Contract specs looked up by this service instance, keyed by symbol
+        self._specs: dict[str, ContractSpecification | ContractSpec | None] = {}
 
     # ------------------------------------------------------------------
     # OrderEvent audit trail
@@ -49,16 +130,17 @@ class ExecutionService:
         reason: str | None = None,
         raw_response: dict | None = None,
     ) -> None:
-        event = OrderEvent(
-            order_id=order_id,
-            previous_state=prev_state,
-            new_state=new_state,
-            fill_price=fill_price,
-            fill_quantity=fill_qty,
-            raw_broker_response=raw_response,
-            reason=reason,
-        )
-        self._db.add(event)
+        row = {
+            "order_id": order_id,
+            "previous_state": prev_state,
+            "new_state": new_state,
+            "fill_price": fill_price,
+            "fill_quantity": fill_qty,
+            "raw_broker_response": raw_response,
+            "reason": reason,
+        }
+        if not stage_audit(self._db, OrderEvent, row):
+            self._db.add(OrderEvent(**row))
 
     # ------------------------------------------------------------------
     # Bracket order construction
@@ -254,7 +336,7 @@ class ExecutionService:
         if entry_order.status == "FILLED":
             await self._create_position_from_fill(entry_order)
 
-        await self._db.commit()
+        await self._commit()
 
         logger.info(
             "Bracket order submitted",
@@ -281,6 +363,15 @@ class ExecutionService:
         if order is None:
             raise NotFoundError("Order", str(order_id))
 
+        await self.apply_fill(order, fill_data)
+        await self._commit()
+
+    async def apply_fill(self, order: Order, fill_data: dict) -> None:
+        """Apply a fill to a loaded order without committing.
+
+        Lets batch callers (fill reconciliation) apply many fills in one
+        transaction.
+        """
         old_status = order.status
         order.status = "FILLED"
         order.fill_price = Decimal(str(fill_data["fill_price"]))
@@ -307,8 +398,6 @@ class ExecutionService:
             # OCO: cancel the other pending order
             await self.handle_oco_fill(order.id, order.bracket_group_id)
 
-        await self._db.commit()
-
     async def handle_oco_fill(
         self, filled_order_id: uuid.UUID, bracket_group_id: uuid.UUID
     ) -> None:
@@ -354,36 +443,8 @@ class ExecutionService:
             raise NotFoundError("Position", str(position_id))
 
         # Place market close order
-        close_side = OrderSide.SELL if position.direction == "LONG" else OrderSide.BUY
-        close_req = OrderRequest(
-            instrument_symbol=position.instrument_symbol,
-            side=close_side,
-            order_type=OrderType.MARKET,
-            quantity=position.quantity,
-            price=position.current_price,
-            client_order_id=f"close-{position_id}",
-        )
-        close_result = await adapter.place_order(close_req)
-
-        # Create close order record
-        close_order = Order(
-            signal_id=position.signal_id,
-            bracket_group_id=uuid.uuid4(),  # Standalone close
-            user_id=user_id,
-            instrument_symbol=position.instrument_symbol,
-            side=close_side.value,
-            order_type="MARKET",
-            bracket_role="ENTRY",  # Close is technically an entry in opposite direction
-            price=close_result.fill_price,
-            quantity=position.quantity,
-            status=close_result.status,
-            broker_order_id=close_result.broker_order_id,
-            fill_price=close_result.fill_price,
-            filled_quantity=close_result.fill_quantity,
-            commission=close_result.commission,
-            submitted_at=datetime.now(UTC),
-            filled_at=close_result.timestamp,
-        )
+        close_result = await adapter.place_order(self._close_request(position))
+        close_order = self._close_order(position, close_result)
         self._db.add(close_order)
         await self._db.flush()
         await self._record_order_event(
@@ -395,17 +456,13 @@ class ExecutionService:
 
         # Cancel pending SL/TP orders for this position's signal
         if position.entry_order_id:
-            entry_stmt = select(Order).where(Order.id == position.entry_order_id)
-            entry_result = await self._db.execute(entry_stmt)
-            entry_order = entry_result.scalar_one_or_none()
-            if entry_order:
-                await self._cancel_bracket_pending(entry_order.bracket_group_id, adapter)
+            await self._cancel_bracket_pending(position.entry_order_id, adapter)
 
         # Calculate final P&L
         exit_price = float(close_result.fill_price) if close_result.fill_price else 0.0
         await self._finalize_position(position, exit_price, "MANUAL")
 
-        await self._db.commit()
+        await self._commit()
 
         logger.info(
             "Position closed",
@@ -421,57 +478,176 @@ class ExecutionService:
     async def flatten_all(
         self, user_id: uuid.UUID, adapter: BrokerAdapter
     ) -> dict:
-        """Close all open positions and cancel all pending orders."""
-        # Get all open positions
-        pos_stmt = select(Position).where(
-            Position.user_id == user_id,
-            Position.status == "OPEN",
+        """Close all open positions and cancel all pending orders.
+
+        An emergency action, so it is set-based and time-bounded: one query
+        each for positions, pending orders, their entries' bracket groups and
+        contract specs; broker calls go out concurrently, each capped at
+        ``_BROKER_CALL_TIMEOUT``; closing orders and OrderEvents are written
+        in bulk.
+
+        Exits go out together with cancels of orders outside any open
+        position's bracket. As in ``close_position``, a position's SL/TP are
+        cancelled only after its exit succeeded, so a position whose exit
+        fails stays OPEN, protected, and is left out of the result. Only
+        orders the broker confirmed cancelled (or that never reached it) are
+        marked CANCELLED.
+        """
+        pos_result = await self._db.execute(
+            select(Position).where(
+                Position.user_id == user_id,
+                Position.status == "OPEN",
+            )
         )
-        pos_result = await self._db.execute(pos_stmt)
         positions = list(pos_result.scalars().all())
-
-        closed_positions = []
-        for pos in positions:
-            try:
-                result = await self.close_position(user_id, pos.id, adapter)
-                closed_positions.append(result["position"])
-            except Exception:
-                logger.error(
-                    "Failed to close position during flatten",
-                    position_id=str(pos.id),
-                    exc_info=True,
-                )
-
-        # Cancel any remaining pending orders
-        pending_stmt = select(Order).where(
-            Order.user_id == user_id,
-            Order.status.in_(["CONSTRUCTED", "SUBMITTED"]),
+        pending_result = await self._db.execute(
+            select(Order).where(
+                Order.user_id == user_id,
+                Order.status.in_(_PENDING_STATUSES),
+            )
         )
-        pending_result = await self._db.execute(pending_stmt)
         pending_orders = list(pending_result.scalars().all())
-        cancelled_count = 0
+        entry_ids = [p.entry_order_id for p in positions if p.entry_order_id]
+        group_of_entry: dict[uuid.UUID, uuid.UUID] = {}
+        if entry_ids:
+            group_result = await self._db.execute(
+                select(Order.id, Order.bracket_group_id).where(Order.id.in_(entry_ids))
+            )
+            group_of_entry = dict(group_result.all())
+        await self._load_specs(p.instrument_symbol for p in positions)
+
+        # Pending orders protecting each position, by the position's index
+        bracket_of: dict[uuid.UUID, int] = {}
+        for i, position in enumerate(positions):
+            group = group_of_entry.get(position.entry_order_id)
+            if group is not None:
+                bracket_of[group] = i
+        brackets: list[list[Order]] = [[] for _ in positions]
+        unattached: list[Order] = []
         for order in pending_orders:
-            old_status = order.status
+            i = bracket_of.get(order.bracket_group_id)
+            if i is None:
+                unattached.append(order)
+            else:
+                brackets[i].append(order)
+
+        semaphore = asyncio.Semaphore(_FLATTEN_CONCURRENCY)
+        exits, unattached_cancelled = await asyncio.gather(
+            asyncio.gather(*(
+                self._bounded_broker_call(
+                    semaphore, adapter.place_order(self._close_request(p)),
+                    "Failed to close position during flatten", position_id=str(p.id),
+                )
+                for p in positions
+            )),
+            self._cancel_at_broker(semaphore, adapter, unattached),
+        )
+        closed_brackets = [
+            order
+            for bracket, close_result in zip(brackets, exits, strict=True)
+            if close_result is not None
+            for order in bracket
+        ]
+        cancelled = unattached_cancelled + await self._cancel_at_broker(
+            semaphore, adapter, closed_brackets
+        )
+
+        # One executemany for cancels and exits: every event needs the same keys
+        events: list[dict] = []
+        for order in cancelled:
+            events.append({
+                "order_id": order.id,
+                "previous_state": order.status,
+                "new_state": "CANCELLED",
+                "fill_price": None,
+                "fill_quantity": None,
+                "reason": "Flatten all",
+            })
             order.status = "CANCELLED"
-            await self._record_order_event(
-                order.id, old_status, "CANCELLED", reason="Flatten all",
-            )
-            cancelled_count += 1
 
-        await self._db.commit()
+        closed_positions = []
+        for position, close_result in zip(positions, exits, strict=True):
+            if close_result is None:
+                continue
+            close_order = self._close_order(position, close_result)
+            self._db.add(close_order)
+            events.append({
+                "order_id": close_order.id,
+                "previous_state": "CONSTRUCTED",
+                "new_state": close_result.status,
+                "fill_price": close_result.fill_price,
+                "fill_quantity": close_result.fill_quantity,
+                "reason": "Flatten all",
+            })
+            exit_price = float(close_result.fill_price) if close_result.fill_price else 0.0
+            await self._finalize_position(position, exit_price, "MANUAL")
+            closed_positions.append(self._position_to_dict(position))
+
+        await self._db.flush()  # closing orders must exist before their events
+        if events and not stage_audit(self._db, OrderEvent, events):
+            await self._db.execute(insert(OrderEvent), events)
+        await self._commit()
 
         logger.info(
             "Flatten all complete",
             user_id=str(user_id),
             closed_count=len(closed_positions),
-            cancelled_orders=cancelled_count,
+            failed_count=len(positions) - len(closed_positions),
+            cancelled_orders=len(cancelled),
+            still_pending=len(pending_orders) - len(cancelled),
         )
         return {
             "closed_count": len(closed_positions),
-            "cancelled_orders": cancelled_count,
+            "cancelled_orders": len(cancelled),
             "positions": closed_positions,
         }
 
+    async def _cancel_at_broker(
+        self, semaphore: asyncio.Semaphore, adapter: BrokerAdapter, orders: list[Order]
+    ) -> list[Order]:
+        """Cancel ``orders`` concurrently; returns the ones now cancelled.
+
+        Orders that never reached the broker count as cancelled. A timeout,
+        an error or an unsuccessful ``CancelResult`` leaves the order out.
+        """
+        at_broker = [o for o in orders if o.broker_order_id]
+        results = await asyncio.gather(*(
+            self._bounded_broker_call(
+                semaphore, adapter.cancel_order(o.broker_order_id),
+                "Failed to cancel order at broker", order_id=str(o.id),
+            )
+            for o in at_broker
+        ))
+        for order, result in zip(at_broker, results, strict=True):
+            if result is not None and not result.success:
+                logger.warning(
+                    "Broker refused cancel during flatten",
+                    order_id=str(order.id),
+                    message=result.message,
+                )
+        confirmed = {
+            o.id
+            for o, result in zip(at_broker, results, strict=True)
+            if result is not None and result.success
+        }
+        return [o for o in orders if not o.broker_order_id or o.id in confirmed]
+
+    @staticmethod
+    async def _bounded_broker_call(
+        semaphore: asyncio.Semaphore, call: Awaitable, message: str, **log_fields
+    ):
+        """Await a broker call under ``semaphore`` and the flatten timeout.
+
+        Returns None (and logs) on failure so one broker error cannot abort
+        the rest of a flatten.
+        """
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(call, _BROKER_CALL_TIMEOUT)
+            except Exception:
+                logger.error(message, exc_info=True, **log_fields)
+                return None
+
     async def cancel_order(
         self, user_id: uuid.UUID, order_id: uuid.UUID, adapter: BrokerAdapter
     ) -> dict:
@@ -657,12 +833,12 @@ class ExecutionService:
 
     async def _create_position_from_fill(self, entry_order: Order) -> Position:
         """Create an OPEN position from a filled entry order."""
-        # Load signal for SL/TP prices
+        # Signal for SL/TP prices. session.get is served from the identity map
+        # when the signal is already loaded (signal execution), so this only
+        # queries for fills that arrive on their own.
         signal = None
         if entry_order.signal_id:
-            sig_stmt = select(Signal).where(Signal.id == entry_order.signal_id)
-            sig_result = await self._db.execute(sig_stmt)
-            signal = sig_result.scalar_one_or_none()
+            signal = await self._db.get(Signal, entry_order.signal_id)
 
         position = Position(
             signal_id=entry_order.signal_id,
@@ -681,6 +857,7 @@ class ExecutionService:
         )
         self._db.add(position)
         await self._db.flush()
+        self._stage_ledger_update("position_opened", position)
 
         logger.info(
             "Position opened",
@@ -727,11 +904,8 @@ class ExecutionService:
         # Look up contract spec for tick calculations
         tick_size = 0.25
         tick_value = 12.50
-        spec_stmt = select(ContractSpecification).where(
-            ContractSpecification.symbol == position.instrument_symbol
-        )
-        spec_result = await self._db.execute(spec_stmt)
-        spec = spec_result.scalar_one_or_none()
+        await self._load_specs([position.instrument_symbol])
+        spec = self._specs[position.instrument_symbol]
         if spec:
             tick_size = float(spec.tick_size)
             tick_value = float(spec.tick_value)
@@ -759,13 +933,59 @@ class ExecutionService:
                     str(round(float(position.net_pnl) / planned_risk, 4))
                 )
 
+        self._stage_ledger_update("position_closed", position)
+
+    def _stage_ledger_update(self, ledger_event: str, position: Position) -> None:
+        """Queue a position open/close for the exposure ledger.
+
+        Applied once the session commits (rolled-back opens and closes never
+        reach Redis); ``_commit`` waits for it.
+        """
+        if self._redis is None:
+            return
+        staged = self._db.info.setdefault(_LEDGER_STAGED_KEY, [])
+        staged.append((self._redis, ledger_event, position))
+
+    async def _commit(self) -> None:
+        """Commit, then wait for the ledger updates the commit released."""
+        await self._db.commit()
+        await drain_ledger_updates()
+
+    async def _load_specs(self, symbols: Iterable[str]) -> None:
+        """Load contract specs for ``symbols`` into ``self._specs``.
+
+        Served from the contract registry when it is loaded; otherwise one
+        query covers every symbol not already cached.
+        """
+        missing = set(symbols) - self._specs.keys()
+        if not missing:
+            return
+        if contract_registry.loaded:
+            await contract_registry.ensure_current(self._db, self._redis)
+            for symbol in missing:
+                self._specs[symbol] = contract_registry.get_spec(symbol)
+            return
+        result = await self._db.execute(
+            select(ContractSpecification).where(
+                ContractSpecification.symbol.in_(missing)
+            )
+        )
+        found = {spec.symbol: spec for spec in result.scalars().all()}
+        for symbol in missing:
+            self._specs[symbol] = found.get(symbol)
+
     async def _cancel_bracket_pending(
-        self, bracket_group_id: uuid.UUID, adapter: BrokerAdapter
+        self, entry_order_id: uuid.UUID, adapter: BrokerAdapter
     ) -> None:
-        """Cancel all pending orders in a bracket group."""
+        """Cancel all pending orders in the entry order's bracket group."""
+        bracket_group = (
+            select(Order.bracket_group_id)
+            .where(Order.id == entry_order_id)
+            .scalar_subquery()
+        )
         stmt = select(Order).where(
-            Order.bracket_group_id == bracket_group_id,
-            Order.status.in_(["CONSTRUCTED", "SUBMITTED"]),
+            Order.bracket_group_id == bracket_group,
+            Order.status.in_(_PENDING_STATUSES),
         )
         result = await self._db.execute(stmt)
         pending = list(result.scalars().all())
@@ -782,6 +1002,42 @@ class ExecutionService:
                     )
             order.status = "CANCELLED"
 
+    @staticmethod
+    def _close_request(position: Position) -> OrderRequest:
+        """Market order that flattens ``position``."""
+        close_side = OrderSide.SELL if position.direction == "LONG" else OrderSide.BUY
+        return OrderRequest(
+            instrument_symbol=position.instrument_symbol,
+            side=close_side,
+            order_type=OrderType.MARKET,
+            quantity=position.quantity,
+            price=position.current_price,
+            client_order_id=f"close-{position.id}",
+        )
+
+    @staticmethod
+    def _close_order(position: Position, close_result: OrderResult) -> Order:
+        """Order record for a position's closing market order."""
+        return Order(
+            id=uuid.uuid4(),
+            signal_id=position.signal_id,
+            bracket_group_id=uuid.uuid4(),  # Standalone close
+            user_id=position.user_id,
+            instrument_symbol=position.instrument_symbol,
+            side="SELL" if position.direction == "LONG" else "BUY",
+            order_type="MARKET",
+            bracket_role="ENTRY",  # Close is technically an entry in opposite direction
+            price=close_result.fill_price,
+            quantity=position.quantity,
+            status=close_result.status,
+            broker_order_id=close_result.broker_order_id,
+            fill_price=close_result.fill_price,
+            filled_quantity=close_result.fill_quantity,
+            commission=close_result.commission,
+            submitted_at=datetime.now(UTC),
+            filled_at=close_result.timestamp,
+        )
+
     @staticmethod
     def _to_order_request(order: Order, bracket_group_id: str) -> OrderRequest:
         """Convert an Order ORM model to an adapter OrderRequest."""
@@ -0,0 +1,333 @@
+"""Redis-maintained per-user exposure ledger for O(1) pre-trade risk checks.
+
+Each user has one hash, ``exposure:{user_id}``:
+
+- ``ready``              set by reconciliation; reads ignore hashes without it
+- ``day``                UTC date that ``realized_loss`` belongs to
+- ``realized_loss``      sum of losing realized P&L closed on ``day`` (positive)
+- ``unrealized_loss``    sum of ``upnl:*`` (positive)
+- ``open_total``         number of open positions
+- ``open:{symbol}``      open positions per instrument
+- ``pos:{position_id}``  instrument of each open position (makes updates idempotent)
+- ``upnl:{position_id}`` current unrealized loss of each open position
+- ``seq``                bumped by every open/close update
+
+Position open/close and mark-to-market updates run as Lua scripts so each is
+atomic. Postgres stays the source of truth: ``reconcile_exposure`` rebuilds
+hashes from the positions table, both periodically and whenever a risk check
+finds a user's ledger missing. Reconciliation reads ``seq`` before querying
+and only overwrites hashes whose ``seq`` is unchanged, so an open or close
+landing between its read and its write is never lost; that user is simply
+left for the next run.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from decimal import Decimal
+
+from redis.asyncio import Redis
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import get_logger
+from app.core.redis import LuaScript
+from app.db.models.position import Position
+
+logger = get_logger("trendedge.exposure_ledger")
+
+_LEDGER_KEY_PREFIX = "exposure:"
+# Users whose ledger shows open positions; lets reconciliation find hashes
+# that drifted to show exposure the database no longer has. Users leave the
+# set when their last position closes.
+_LEDGER_USERS_KEY = "exposure:users"
+
+
+@dataclass(slots=True)
+class RiskSnapshot:
+    """Per-user exposure figures gathered in one round trip before the checks run."""
+
+    open_for_symbol: int = 0
+    open_total: int = 0
+    realized_losses_today: float = 0.0
+    unrealized_losses: float = 0.0
+    open_symbols: list[str] = field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Lua scripts
+# ---------------------------------------------------------------------------
+
+
+# KEYS: hash, users set. ARGV: user_id, position_id, symbol
+_OPEN_SCRIPT = LuaScript("""
+if redis.call('HSETNX', KEYS[1], 'pos:' .. ARGV[2], ARGV[3]) == 1 then
+    redis.call('HINCRBY', KEYS[1], 'open:' .. ARGV[3], 1)
+    redis.call('HINCRBY', KEYS[1], 'open_total', 1)
+end
+redis.call('HINCRBY', KEYS[1], 'seq', 1)
+redis.call('SADD', KEYS[2], ARGV[1])
+return 1
+""")
+
+# KEYS: hash, users set. ARGV: user_id, position_id, realized_pnl, today
+_CLOSE_SCRIPT = LuaScript("""
+local symbol = redis.call('HGET', KEYS[1], 'pos:' .. ARGV[2])
+if not symbol then
+    return 0
+end
+redis.call('HDEL', KEYS[1], 'pos:' .. ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'seq', 1)
+if redis.call('HINCRBY', KEYS[1], 'open:' .. symbol, -1) <= 0 then
+    redis.call('HDEL', KEYS[1], 'open:' .. symbol)
+end
+if redis.call('HINCRBY', KEYS[1], 'open_total', -1) <= 0 then
+    redis.call('HSET', KEYS[1], 'open_total', 0)
+    redis.call('SREM', KEYS[2], ARGV[1])
+end
+local upnl = redis.call('HGET', KEYS[1], 'upnl:' .. ARGV[2])
+if upnl then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'unrealized_loss', -tonumber(upnl))
+    redis.call('HDEL', KEYS[1], 'upnl:' .. ARGV[2])
+end
+if redis.call('HGET', KEYS[1], 'day') ~= ARGV[4] then
+    redis.call('HSET', KEYS[1], 'day', ARGV[4], 'realized_loss', 0)
+end
+local pnl = tonumber(ARGV[3])
+if pnl < 0 then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'realized_loss', -pnl)
+end
+return 1
+""")
+
+# KEYS: hash, users set. ARGV: user_id, seq read before the snapshot,
+#       open_total, then field/value pairs.
+# Returns 0 without writing if an open/close bumped seq since the read.
+_REPLACE_SCRIPT = LuaScript("""
+if (redis.call('HGET', KEYS[1], 'seq') or '0') ~= ARGV[2] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], 'seq', ARGV[2], unpack(ARGV, 4))
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SADD', KEYS[2], ARGV[1])
+else
+    redis.call('SREM', KEYS[2], ARGV[1])
+end
+return 1
+""")
+
+# KEYS: hash. ARGV: position_id, unrealized_pnl
+_MARK_SCRIPT = LuaScript("""
+if redis.call('HEXISTS', KEYS[1], 'pos:' .. ARGV[1]) == 0 then
+    return 0
+end
+local loss = -tonumber(ARGV[2])
+if loss < 0 then
+    loss = 0
+end
+local old = tonumber(redis.call('HGET', KEYS[1], 'upnl:' .. ARGV[1]) or '0')
+if loss ~= old then
+    if loss > 0 then
+        redis.call('HSET', KEYS[1], 'upnl:' .. ARGV[1], loss)
+    else
+        redis.call('HDEL', KEYS[1], 'upnl:' .. ARGV[1])
+    end
+    redis.call('HINCRBYFLOAT', KEYS[1], 'unrealized_loss', loss - old)
+end
+return 1
+""")
+
+
+def _ledger_key(user_id: uuid.UUID | str) -> str:
+    return f"{_LEDGER_KEY_PREFIX}{user_id}"
+
+
+def _today() -> str:
+    return datetime.now(UTC).date().isoformat()
+
+
+def _parse_snapshot(fields: dict[str, str], symbol: str, today: str) -> RiskSnapshot:
+    open_symbols = [
+        name.removeprefix("open:")
+        for name, count in fields.items()
+        if name.startswith("open:") and int(count) > 0
+    ]
+    realized = float(fields.get("realized_loss", 0)) if fields.get("day") == today else 0.0
+    return RiskSnapshot(
+        open_for_symbol=max(0, int(fields.get(f"open:{symbol}", 0))),
+        open_total=max(0, int(fields.get("open_total", 0))),
+        realized_losses_today=max(0.0, realized),
+        unrealized_losses=max(0.0, float(fields.get("unrealized_loss", 0))),
+        open_symbols=open_symbols,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Ledger
+# ---------------------------------------------------------------------------
+
+
+class ExposureLedger:
+    """Atomic reads and updates of per-user exposure hashes."""
+
+    def __init__(self, redis: Redis) -> None:
+        self._redis = redis
+
+    async def snapshot(self, user_id: uuid.UUID, symbol: str) -> RiskSnapshot | None:
+        """Read the user's exposure in one HGETALL. None if not reconciled yet."""
+        fields = await self._redis.hgetall(_ledger_key(user_id))
+        if not fields or "ready" not in fields:
+            return None
+        return _parse_snapshot(fields, symbol, _today())
+
+    async def position_opened(self, position: Position) -> None:
+        await _OPEN_SCRIPT(
+            self._redis,
+            [_ledger_key(position.user_id), _LEDGER_USERS_KEY],
+            [str(position.user_id), str(position.id), position.instrument_symbol],
+        )
+
+    async def position_closed(self, position: Position) -> None:
+        realized = float(position.realized_pnl) if position.realized_pnl is not None else 0.0
+        await _CLOSE_SCRIPT(
+            self._redis,
+            [_ledger_key(position.user_id), _LEDGER_USERS_KEY],
+            [str(position.user_id), str(position.id), realized, _today()],
+        )
+
+    async def mark_positions(self, positions: Iterable[Position]) -> None:
+        """Record current unrealized P&L for many positions in one pipeline."""
+        marks = [
+            ([_ledger_key(p.user_id)], [str(p.id), float(p.unrealized_pnl or 0)])
+            for p in positions
+        ]
+        await _MARK_SCRIPT.run_many(self._redis, marks)
+
+    async def sequences(self, user_ids: Iterable[uuid.UUID]) -> dict[uuid.UUID, str]:
+        """Read each user's update sequence in one pipeline (``"0"`` if unset)."""
+        users = list(user_ids)
+        if not users:
+            return {}
+        pipe = self._redis.pipeline(transaction=False)
+        for user_id in users:
+            pipe.hget(_ledger_key(user_id), "seq")
+        values = await pipe.execute()
+        return {u: v or "0" for u, v in zip(users, values, strict=True)}
+
+    async def replace(
+        self, updates: dict[uuid.UUID, tuple[dict[str, str], str]]
+    ) -> set[uuid.UUID]:
+        """Overwrite hashes with reconciled values, one pipeline for all users.
+
+        ``updates`` maps each user to its fields and the ``seq`` read before
+        they were computed. Users whose ``seq`` moved since are left as they
+        are; they are returned.
+        """
+        users = list(updates)
+        calls = []
+        for user_id in users:
+            fields, seq = updates[user_id]
+            pairs = [value for item in fields.items() for value in item]
+            calls.append((
+                [_ledger_key(user_id), _LEDGER_USERS_KEY],
+                [str(user_id), seq, fields.get("open_total", "0"), *pairs],
+            ))
+        results = await _REPLACE_SCRIPT.run_many(self._redis, calls)
+        return {u for u, ok in zip(users, results, strict=True) if not ok}
+
+    async def tracked_users(self) -> set[uuid.UUID]:
+        return {uuid.UUID(u) for u in await self._redis.smembers(_LEDGER_USERS_KEY)}
+
+
+# ---------------------------------------------------------------------------
+# Reconciliation
+# ---------------------------------------------------------------------------
+
+
+async def reconcile_exposure(
+    db: AsyncSession,
+    redis: Redis,
+    user_ids: Iterable[uuid.UUID] | None = None,
+) -> dict[uuid.UUID, dict[str, str]]:
+    """Rebuild exposure hashes from Postgres in two queries.
+
+    With no ``user_ids``, reconciles every user with an open position, a
+    position closed today, or an existing ledger. Returns the reconciled
+    fields per user; hashes updated while the queries ran keep their live
+    values until the next run.
+    """
+    today_start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+    closed_today = and_(Position.status == "CLOSED", Position.closed_at >= today_start)
+    ledger = ExposureLedger(redis)
+
+    open_stmt = select(
+        Position.user_id, Position.id, Position.instrument_symbol, Position.unrealized_pnl
+    ).where(Position.status == "OPEN")
+    realized_stmt = (
+        select(Position.user_id, func.coalesce(func.sum(Position.realized_pnl), 0))
+        .where(closed_today, Position.realized_pnl < 0)
+        .group_by(Position.user_id)
+    )
+    if user_ids is not None:
+        users = set(user_ids)
+        open_stmt = open_stmt.where(Position.user_id.in_(users))
+        realized_stmt = realized_stmt.where(Position.user_id.in_(users))
+    else:
+        active_stmt = (
+            select(Position.user_id)
+            .where(or_(Position.status == "OPEN", closed_today))
+            .distinct()
+        )
+        users = {row[0] for row in (await db.execute(active_stmt)).all()}
+        users |= await ledger.tracked_users()
+
+    sequences = await ledger.sequences(users)
+    open_rows = (await db.execute(open_stmt)).all()
+    realized_rows = (await db.execute(realized_stmt)).all()
+
+    today = today_start.date().isoformat()
+    fields_by_user: dict[uuid.UUID, dict[str, str]] = {
+        user_id: {
+            "ready": "1",
+            "day": today,
+            "realized_loss": "0",
+            "unrealized_loss": "0",
+            "open_total": "0",
+        }
+        for user_id in users
+    }
+    for user_id, total in realized_rows:
+        if user_id in fields_by_user:
+            fields_by_user[user_id]["realized_loss"] = str(abs(Decimal(total)))
+
+    for user_id, position_id, symbol, unrealized_pnl in open_rows:
+        fields = fields_by_user.get(user_id)
+        if fields is None:
+            continue
+        fields[f"pos:{position_id}"] = symbol
+        fields[f"open:{symbol}"] = str(int(fields.get(f"open:{symbol}", 0)) + 1)
+        fields["open_total"] = str(int(fields["open_total"]) + 1)
+        loss = -Decimal(unrealized_pnl or 0)
+        if loss > 0:
+            fields[f"upnl:{position_id}"] = str(loss)
+            fields["unrealized_loss"] = str(Decimal(fields["unrealized_loss"]) + loss)
+
+    skipped = await ledger.replace(
+        {user_id: (fields, sequences[user_id]) for user_id, fields in fields_by_user.items()}
+    )
+
+    logger.info(
+        "Exposure ledgers reconciled",
+        users=len(fields_by_user) - len(skipped),
+        changed_during_read=len(skipped),
+    )
+    return fields_by_user
+
+
+def snapshot_from_fields(fields: dict[str, str], symbol: str) -> RiskSnapshot:
+    """Build a RiskSnapshot from reconciled ledger fields."""
+    return _parse_snapshot(fields, symbol, _today())
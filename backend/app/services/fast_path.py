@@ -0,0 +1,163 @@
+"""In-process fast path for signal execution.
+
+With ``EXECUTION_FAST_PATH`` enabled, the API process executes new signals
+itself instead of handing them to Celery: a small pool of asyncio workers
+takes signal ids off a bounded queue right after the webhook transaction
+commits. Compared with ``process_signal.delay`` this saves the broker
+round-trip, the worker's fresh event loop and Redis client, and a second
+instrument lookup (the already-validated contract spec rides along).
+
+The signal row is the durable outbox (see ``app.services.signal_executor``):
+if the queue is full, the executor is stopped, or the process dies mid-flight,
+the signal stays ENRICHED and is executed by Celery instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from contextlib import suppress
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.db.models.contract_specification import ContractSpecification
+from app.services.contract_registry import ContractSpec
+from app.services.signal_executor import SignalExecutor, claim_signal
+
+logger = get_logger("trendedge.fast_path")
+
+_QUEUE_SIZE = 256
+_DRAIN_TIMEOUT = 10.0  # seconds to finish queued signals on shutdown
+
+
+@dataclass(frozen=True, slots=True)
+class _Job:
+    signal_id: uuid.UUID
+    contract_spec: ContractSpecification | ContractSpec | None
+    enqueued_at: float
+
+
+class FastPathExecutor:
+    """Bounded asyncio worker pool that executes accepted signals."""
+
+    def __init__(
+        self,
+        session_factory,
+        redis: Redis,
+        workers: int = 4,
+        queue_size: int = _QUEUE_SIZE,
+    ) -> None:
+        self._session_factory = session_factory
+        self._redis = redis
+        self._workers = workers
+        self._queue: asyncio.Queue[_Job] = asyncio.Queue(maxsize=queue_size)
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._work(), name=f"fast-path-{i}")
+                for i in range(self._workers)
+            ]
+
+    async def stop(self, drain_timeout: float = _DRAIN_TIMEOUT) -> None:
+        """Finish queued signals (up to ``drain_timeout``), then stop workers.
+
+        Anything left over is still ENRICHED and goes to the outbox sweeper.
+        """
+        if not self._tasks:
+            return
+        with suppress(TimeoutError):
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    def submit(
+        self,
+        signal_id: uuid.UUID,
+        contract_spec: ContractSpecification | ContractSpec | None = None,
+    ) -> bool:
+        """Queue a committed signal. False means the caller should fall back."""
+        if not self._tasks:
+            return False
+        try:
+            self._queue.put_nowait(_Job(signal_id, contract_spec, time.perf_counter()))
+        except asyncio.QueueFull:
+            logger.warning("Fast path queue full", signal_id=str(signal_id))
+            return False
+        return True
+
+    async def execute(
+        self,
+        signal_id: uuid.UUID,
+        contract_spec: ContractSpecification | ContractSpec | None = None,
+    ) -> str | None:
+        """Claim and execute one signal. None if another executor has it."""
+        async with self._session_factory() as db:
+            signal = await claim_signal(db, signal_id)
+            if signal is None:
+                return None
+            return await SignalExecutor(db, self._redis).execute(signal, contract_spec)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                status = await self.execute(job.signal_id, job.contract_spec)
+                logger.info(
+                    "Fast path signal executed",
+                    signal_id=str(job.signal_id),
+                    status=status,
+                    latency_ms=round((time.perf_counter() - job.enqueued_at) * 1000, 2),
+                )
+            except Exception:
+                # The transaction rolled back, so the signal is still pending;
+                # the outbox sweeper retries it through Celery.
+                logger.warning(
+                    "Fast path signal failed", signal_id=str(job.signal_id), exc_info=True
+                )
+            finally:
+                self._queue.task_done()
+
+
+_executor: FastPathExecutor | None = None
+
+
+def get_fast_path() -> FastPathExecutor | None:
+    """The running executor for this process, if the fast path is enabled."""
+    return _executor if _executor is not None and _executor.running else None
+
+
+def start_fast_path(redis: Redis) -> None:
+    """Start the executor. Called from the API lifespan when enabled."""
+    global _executor
+    if not settings.EXECUTION_FAST_PATH or get_fast_path() is not None:
+        return
+    from app.db.session import AsyncSessionLocal
+
+    _executor = FastPathExecutor(
+        AsyncSessionLocal, redis, workers=settings.EXECUTION_FAST_PATH_WORKERS
+    )
+    _executor.start()
+    logger.info(
+        "Execution fast path started", workers=settings.EXECUTION_FAST_PATH_WORKERS
+    )
+
+
+async def stop_fast_path() -> None:
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        await executor.stop()
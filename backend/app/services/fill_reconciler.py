@@ -0,0 +1,274 @@
+"""Batched, concurrent reconciliation of SUBMITTED orders against brokers.
+
+One pass:
+
+1. Load every SUBMITTED order, the affected users' risk settings, and their
+   live broker connections — one query each.
+2. Build each user's adapter, then fan out status requests concurrently.
+   Requests go through ``get_order_statuses`` in chunks of the adapter's
+   ``max_status_batch`` and are paced by a per-broker token bucket, so one
+   broker's limits never slow another broker's users.
+3. Apply changes in one transaction per user, entry fills before exits, so a
+   failure for one user never rolls back another's fills.
+
+The fill stream (``app.services.fill_stream``) normally applies fills first;
+this pass is the safety net.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+
+from app.adapters.base import BrokerAdapter
+from app.adapters.pool import adapter_pool
+from app.adapters.registry import get_adapter
+from app.adapters.types import OrderStatusInfo
+from app.core.logging import get_logger
+from app.db.models.order import Order
+from app.db.models.user_risk_settings import UserRiskSettings
+
+logger = get_logger("trendedge.fill_reconciler")
+
+# (requests per second, burst) per broker_type. Paper hits our own Redis.
+_BROKER_RATE_LIMITS: dict[str, tuple[float, int]] = {
+    "paper": (500.0, 100),
+    "tradovate": (10.0, 10),
+    "ibkr": (40.0, 20),
+}
+_DEFAULT_RATE_LIMIT = (5.0, 5)
+_USER_CONCURRENCY = 64  # users whose status requests may be in flight at once
+
+
+class RateLimiter:
+    """Async token bucket: ``rate`` requests per second, bursting to ``burst``."""
+
+    def __init__(
+        self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._clock = clock
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:  # FIFO: waiters are served in arrival order
+            while True:
+                now = self._clock()
+                self._tokens = min(
+                    self._burst, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+@dataclass(slots=True)
+class ReconcileSummary:
+    orders_checked: int = 0
+    users: int = 0
+    reconciled: int = 0
+    filled: int = 0
+    failed_users: int = 0
+
+
+class FillReconciler:
+    """One reconciliation pass over all SUBMITTED orders."""
+
+    def __init__(
+        self,
+        session_factory,
+        redis: Redis,
+        rate_limits: dict[str, tuple[float, int]] | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._redis = redis
+        self._rate_limits = rate_limits or _BROKER_RATE_LIMITS
+        self._limiters: dict[str, RateLimiter] = {}
+
+    async def run(self) -> ReconcileSummary:
+        summary = ReconcileSummary()
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Order.user_id, Order.broker_order_id).where(
+                    Order.status == "SUBMITTED",
+                    Order.broker_order_id.isnot(None),
+                )
+            )
+            by_user: dict[uuid.UUID, list[str]] = {}
+            for user_id, broker_order_id in result.all():
+                by_user.setdefault(user_id, []).append(broker_order_id)
+            summary.orders_checked = sum(len(ids) for ids in by_user.values())
+            summary.users = len(by_user)
+            if not by_user:
+                return summary
+
+            adapters = await self._build_adapters(db, list(by_user))
+
+        semaphore = asyncio.Semaphore(_USER_CONCURRENCY)
+
+        async def fetch(user_id: uuid.UUID) -> dict[str, OrderStatusInfo] | None:
+            async with semaphore:
+                try:
+                    return await self._fetch_statuses(adapters[user_id], by_user[user_id])
+                except Exception:
+                    logger.warning(
+                        "Failed to fetch order statuses",
+                        user_id=str(user_id),
+                        exc_info=True,
+                    )
+                    return None
+
+        users = [user_id for user_id in by_user if user_id in adapters]
+        fetched = await asyncio.gather(*(fetch(user_id) for user_id in users))
+        summary.failed_users = len(by_user) - len(users)
+
+        for user_id, statuses in zip(users, fetched, strict=True):
+            if statuses is None:
+                summary.failed_users += 1
+                continue
+            try:
+                reconciled, filled = await self._apply_user(user_id, statuses)
+            except Exception:
+                summary.failed_users += 1
+                logger.warning(
+                    "Failed to apply reconciled statuses",
+                    user_id=str(user_id),
+                    exc_info=True,
+                )
+                continue
+            summary.reconciled += reconciled
+            summary.filled += filled
+
+        logger.info(
+            "Fill reconciliation complete",
+            orders_checked=summary.orders_checked,
+            users=summary.users,
+            reconciled=summary.reconciled,
+            filled=summary.filled,
+            failed_users=summary.failed_users,
+        )
+        return summary
+
+    # ------------------------------------------------------------------
+    # Fetch
+    # ------------------------------------------------------------------
+
+    async def _build_adapters(
+        self, db, user_ids: list[uuid.UUID]
+    ) -> dict[uuid.UUID, BrokerAdapter]:
+        """Adapters for every user, with settings and connections batch-loaded."""
+        result = await db.execute(
+            select(UserRiskSettings).where(UserRiskSettings.user_id.in_(user_ids))
+        )
+        settings_by_user = {s.user_id: s for s in result.scalars().all()}
+        live = [uid for uid in user_ids if not self._is_paper(settings_by_user.get(uid))]
+        await adapter_pool.prime_connections(db, live)
+
+        adapters = {}
+        for user_id in user_ids:  # serial: these share one session
+            risk_settings = settings_by_user.get(user_id)
+            try:
+                adapters[user_id] = await get_adapter(
+                    user_id,
+                    db,
+                    self._redis,
+                    is_paper=self._is_paper(risk_settings),
+                    slippage_ticks=(
+                        risk_settings.paper_slippage_ticks if risk_settings else 1
+                    ),
+                )
+            except Exception:
+                logger.warning(
+                    "Failed to get adapter for user during reconciliation",
+                    user_id=str(user_id),
+                    exc_info=True,
+                )
+        return adapters
+
+    @staticmethod
+    def _is_paper(risk_settings: UserRiskSettings | None) -> bool:
+        return risk_settings.is_paper_mode if risk_settings else True
+
+    def _limiter(self, broker_type: str) -> RateLimiter:
+        limiter = self._limiters.get(broker_type)
+        if limiter is None:
+            rate, burst = self._rate_limits.get(broker_type, _DEFAULT_RATE_LIMIT)
+            limiter = self._limiters[broker_type] = RateLimiter(rate, burst)
+        return limiter
+
+    async def _fetch_statuses(
+        self, adapter: BrokerAdapter, broker_order_ids: list[str]
+    ) -> dict[str, OrderStatusInfo]:
+        limiter = self._limiter(adapter.broker_type)
+        batch = max(1, adapter.max_status_batch)
+        statuses: dict[str, OrderStatusInfo] = {}
+        for start in range(0, len(broker_order_ids), batch):
+            await limiter.acquire()
+            statuses.update(
+                await adapter.get_order_statuses(broker_order_ids[start:start + batch])
+            )
+        return statuses
+
+    # ------------------------------------------------------------------
+    # Apply
+    # ------------------------------------------------------------------
+
+    async def _apply_user(
+        self, user_id: uuid.UUID, statuses: dict[str, OrderStatusInfo]
+    ) -> tuple[int, int]:
+        """Apply one user's changed statuses in a single transaction."""
+        from app.services.execution_service import ExecutionService
+
+        changed = {
+            oid: status for oid, status in statuses.items() if status.status != "SUBMITTED"
+        }
+        if not changed:
+            return 0, 0
+
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Order)
+                .where(
+                    Order.user_id == user_id,
+                    Order.broker_order_id.in_(list(changed)),
+                    Order.status == "SUBMITTED",  # the fill stream may have won
+                )
+                .with_for_update()
+            )
+            # Entries first: exit fills close the position an entry fill opens.
+            orders = sorted(result.scalars().all(), key=lambda o: o.bracket_role != "ENTRY")
+            service = ExecutionService(db, self._redis)
+            filled = 0
+            for order in orders:
+                broker_status = changed[order.broker_order_id]
+                old_status = order.status
+                if broker_status.status == "FILLED":
+                    await service.apply_fill(
+                        order,
+                        {
+                            "fill_price": float(broker_status.fill_price or 0),
+                            "fill_quantity": broker_status.filled_quantity or order.quantity,
+                        },
+                    )
+                    filled += 1
+                else:
+                    order.status = broker_status.status
+                logger.info(
+                    "Order status reconciled",
+                    order_id=str(order.id),
+                    old_status=old_status,
+                    new_status=broker_status.status,
+                )
+            await db.commit()
+        return len(orders), filled
@@ -0,0 +1,286 @@
+"""Streaming fill consumer: broker order updates into ``process_fill``.
+
+One producer task per subscribed user reads ``subscribe_order_updates`` from
+that user's adapter and puts fills on a bounded queue. Consumers apply them
+through ``ExecutionService.process_fill``.
+
+- **Backpressure** — queues are bounded. When consumers fall behind,
+  producers block on ``put`` and stop reading from the broker, so the backlog
+  stays in the broker's stream rather than in this process's memory.
+- **Ordering** — a user's fills always go to the same queue and consumer, so
+  an entry fill is applied before the exits that depend on it.
+- **Resume** — producers remember the last sequence they saw and resubscribe
+  from it after a disconnect. Consumers persist the last *applied* sequence
+  to ``fills:cursor:{user_id}``, so a restarted process resumes there.
+- **Idempotence** — the order row is locked and fills for orders that are
+  already FILLED are skipped, so the stream and the ``reconcile_fills``
+  safety-net poll can both see the same fill.
+
+Users are subscribed while they have SUBMITTED orders at the broker, not
+counting exits left behind by a bracket whose position is already CLOSED.
+For paper users the stream is fed by the paper monitor's trigger passes.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import exists, select
+from sqlalchemy.orm import aliased
+
+from app.adapters.base import BrokerAdapter
+from app.adapters.types import OrderResult
+from app.core.logging import get_logger
+from app.db.models.order import Order
+from app.db.models.position import Position
+
+logger = get_logger("trendedge.fill_stream")
+
+CURSOR_KEY_PREFIX = "fills:cursor:"
+_CURSOR_TTL = 7 * 24 * 3600  # seconds; older cursors predate the broker's replay window
+_QUEUE_SIZE = 1000  # per consumer
+_CONSUMERS = 4
+_SYNC_INTERVAL = 30  # seconds between subscription refreshes
+_RECONNECT_DELAYS = (1, 2, 5, 10, 30)  # seconds; the last one repeats
+
+AdapterFactory = Callable[[uuid.UUID], Awaitable[BrokerAdapter]]
+
+
+@dataclass(frozen=True, slots=True)
+class FillUpdate:
+    user_id: uuid.UUID
+    result: OrderResult
+
+
+class FillStreamService:
+    """Holds broker order-update subscriptions and applies their fills."""
+
+    def __init__(
+        self,
+        session_factory,
+        redis: Redis,
+        adapter_factory: AdapterFactory | None = None,
+        queue_size: int = _QUEUE_SIZE,
+        consumers: int = _CONSUMERS,
+    ) -> None:
+        self._session_factory = session_factory
+        self._redis = redis
+        self._adapter_factory = adapter_factory or self._adapter_for
+        self._queues: list[asyncio.Queue[FillUpdate]] = [
+            asyncio.Queue(maxsize=queue_size) for _ in range(consumers)
+        ]
+        self._producers: dict[uuid.UUID, asyncio.Task] = {}
+        self._consumers: list[asyncio.Task] = []
+
+    @property
+    def subscribed(self) -> set[uuid.UUID]:
+        return set(self._producers)
+
+    @property
+    def backlog(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def run(self) -> None:
+        """Consume fills until cancelled, refreshing subscriptions periodically."""
+        self.start()
+        logger.info("Fill stream started", consumers=len(self._consumers))
+        try:
+            while True:
+                try:
+                    await self.sync_subscriptions()
+                except Exception:
+                    logger.warning("Fill stream subscription sync failed", exc_info=True)
+                await asyncio.sleep(_SYNC_INTERVAL)
+        finally:
+            await self.close()
+
+    def start(self) -> None:
+        if not self._consumers:
+            self._consumers = [
+                asyncio.create_task(self._consume(queue)) for queue in self._queues
+            ]
+
+    async def close(self) -> None:
+        tasks = [*self._producers.values(), *self._consumers]
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._producers.clear()
+        self._consumers = []
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    async def sync_subscriptions(self) -> None:
+        """Subscribe users with working orders; drop the rest.
+
+        SUBMITTED exits of a bracket whose position is CLOSED cannot fill
+        into anything, so they do not keep a user subscribed.
+        """
+        entry = aliased(Order)
+        position_closed = exists().where(
+            entry.bracket_group_id == Order.bracket_group_id,
+            entry.bracket_role == "ENTRY",
+            Position.entry_order_id == entry.id,
+            Position.status == "CLOSED",
+        )
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Order.user_id)
+                .where(
+                    Order.status == "SUBMITTED",
+                    Order.broker_order_id.isnot(None),
+                    ~position_closed,
+                )
+                .distinct()
+            )
+            wanted = set(result.scalars().all())
+
+        for user_id in wanted - self._producers.keys():
+            self.subscribe(user_id)
+        for user_id in self._producers.keys() - wanted:
+            self.unsubscribe(user_id)
+
+    def subscribe(self, user_id: uuid.UUID) -> None:
+        task = self._producers.get(user_id)
+        if task is None or task.done():
+            self._producers[user_id] = asyncio.create_task(self._produce(user_id))
+
+    def unsubscribe(self, user_id: uuid.UUID) -> None:
+        task = self._producers.pop(user_id, None)
+        if task is not None:
+            task.cancel()
+
+    # ------------------------------------------------------------------
+    # Producer / consumer
+    # ------------------------------------------------------------------
+
+    async def _adapter_for(self, user_id: uuid.UUID) -> BrokerAdapter:
+        """Build the user's adapter the same way the execution tasks do."""
+        from app.adapters.registry import get_adapter
+        from app.db.models.user_risk_settings import UserRiskSettings
+
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(UserRiskSettings).where(UserRiskSettings.user_id == user_id)
+            )
+            risk_settings = result.scalar_one_or_none()
+            return await get_adapter(
+                user_id,
+                db,
+                self._redis,
+                is_paper=risk_settings.is_paper_mode if risk_settings else True,
+                slippage_ticks=risk_settings.paper_slippage_ticks if risk_settings else 1,
+            )
+
+    def _queue_for(self, user_id: uuid.UUID) -> asyncio.Queue[FillUpdate]:
+        return self._queues[user_id.int % len(self._queues)]
+
+    async def _produce(self, user_id: uuid.UUID) -> None:
+        queue = self._queue_for(user_id)
+        cursor = await self._load_cursor(user_id)
+        failures = 0
+        while True:
+            try:
+                adapter = await self._adapter_factory(user_id)
+                async for update in adapter.subscribe_order_updates(since=cursor):
+                    failures = 0
+                    if update.sequence is not None:
+                        cursor = update.sequence
+                    if update.status == "FILLED":
+                        await queue.put(FillUpdate(user_id, update))  # blocks when full
+                logger.info("Order update stream ended", user_id=str(user_id))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning(
+                    "Order update stream failed",
+                    user_id=str(user_id),
+                    cursor=cursor,
+                    exc_info=True,
+                )
+            delay = _RECONNECT_DELAYS[min(failures, len(_RECONNECT_DELAYS) - 1)]
+            failures += 1
+            await asyncio.sleep(delay)
+
+    async def _consume(self, queue: asyncio.Queue[FillUpdate]) -> None:
+        while True:
+            update = await queue.get()
+            try:
+                await self.apply(update)
+            except Exception:
+                logger.warning(
+                    "Failed to apply streamed fill",
+                    user_id=str(update.user_id),
+                    broker_order_id=update.result.broker_order_id,
+                    exc_info=True,
+                )
+            finally:
+                queue.task_done()
+
+    async def apply(self, update: FillUpdate) -> bool:
+        """Apply one streamed fill. Returns False if it was already applied."""
+        from app.services.execution_service import ExecutionService
+
+        result = update.result
+        async with self._session_factory() as db:
+            row = await db.execute(
+                select(Order.id, Order.status)
+                .where(
+                    Order.user_id == update.user_id,
+                    Order.broker_order_id == result.broker_order_id,
+                )
+                .with_for_update()
+            )
+            order = row.one_or_none()
+            applied = order is not None and order.status != "FILLED"
+            if applied:
+                await ExecutionService(db, self._redis).process_fill(
+                    order.id,
+                    {
+                        "fill_price": float(result.fill_price or 0),
+                        "fill_quantity": result.fill_quantity,
+                        "commission": result.commission,
+                    },
+                )
+                logger.info(
+                    "Streamed fill applied",
+                    order_id=str(order.id),
+                    broker_order_id=result.broker_order_id,
+                )
+            else:
+                await db.rollback()
+
+        if result.sequence is not None:
+            await self._save_cursor(update.user_id, result.sequence)
+        return applied
+
+    # ------------------------------------------------------------------
+    # Cursors
+    # ------------------------------------------------------------------
+
+    async def _load_cursor(self, user_id: uuid.UUID) -> str | None:
+        try:
+            return await self._redis.get(f"{CURSOR_KEY_PREFIX}{user_id}")
+        except RedisError:
+            logger.warning("Fill cursor read failed", user_id=str(user_id), exc_info=True)
+            return None
+
+    async def _save_cursor(self, user_id: uuid.UUID, sequence: str) -> None:
+        try:
+            await self._redis.set(f"{CURSOR_KEY_PREFIX}{user_id}", sequence, ex=_CURSOR_TTL)
+        except RedisError:
+            logger.warning("Fill cursor write failed", user_id=str(user_id), exc_info=True)
@@ -0,0 +1,737 @@
+"""Event-driven paper position monitor.
+
+Replaces polling every open position on a timer. The monitor is one
+long-running asyncio process (``python -m app.scripts.paper_monitor``) that:
+
+- keeps open positions in memory, indexed by instrument symbol;
+- pattern-subscribes to ``market:price:*`` channels, so each price update only
+  touches the positions on that symbol;
+- closes positions as soon as a stop-loss or take-profit is crossed, using a
+  price-sorted ``TriggerBook`` so only crossed levels are visited, and
+  cancels their resting bracket orders;
+- runs the paper matching engine's trigger pass for the symbol, so resting
+  paper SL/TP orders of every user fill (and reach the fill stream);
+- marks every position on a symbol with a few NumPy operations
+  (``SymbolMarks``);
+- batches P&L / MAE / MFE writes into one executemany UPDATE, persisting only
+  positions whose unrealized P&L moved by at least ``_PNL_WRITE_THRESHOLD`` or
+  that set a new MAE/MFE extreme.
+
+Prices come from an external market data feed; nothing in this repository
+writes ``market:price:{symbol}``. Feeds should use ``publish_price``, which
+sets the key and publishes on the channel in one round trip, so triggers
+fire on the tick. Feeds that only SET the key still work: the monitor polls
+the tracked symbols' keys with one MGET every ``_PRICE_POLL_INTERVAL``
+seconds and applies prices that changed. ExecutionService announces opened
+and closed positions on ``paper:positions`` via ``publish_position_event`` so
+the index stays current without re-querying. A periodic full resync covers
+missed messages; ``sweep()`` runs the same resync once for the on-demand
+Celery task.
+
+Errors in one step (a tick, a flush, a resync) are logged and the loop
+carries on; if the pub/sub connection itself fails, the monitor resubscribes
+and resyncs after ``_RESTART_DELAY``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from decimal import Decimal
+from functools import partial
+
+import numpy as np
+from redis.asyncio import Redis
+from sqlalchemy import bindparam, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.adapters.paper_engine import PaperMatchingEngine, RedisPaperEngine
+from app.adapters.trigger_book import FIRES_AT_OR_ABOVE, FIRES_AT_OR_BELOW, TriggerBook
+from app.core.logging import get_logger
+from app.db.models.order import Order
+from app.db.models.position import Position
+from app.services.contract_registry import contract_registry
+from app.services.exposure_ledger import ExposureLedger
+
+logger = get_logger("trendedge.paper_monitor")
+
+PRICE_KEY_PREFIX = "market:price:"
+_PRICE_CHANNEL_PATTERN = f"{PRICE_KEY_PREFIX}*"
+POSITION_EVENTS_CHANNEL = "paper:positions"
+_PENDING_STATUSES = ("CONSTRUCTED", "SUBMITTED")
+_RESYNC_INTERVAL = 60.0  # seconds; safety net for missed position events
+_FLUSH_INTERVAL = 1.0  # seconds between batched P&L writes
+_PRICE_POLL_INTERVAL = 1.0  # seconds between MGETs for feeds that only SET prices
+_RESTART_DELAY = 5.0  # seconds before resubscribing after a pub/sub failure
+_PNL_WRITE_THRESHOLD = 1.0  # dollars of unrealized P&L movement worth persisting
+# Used when a symbol has no contract specification (matches the old task).
+_DEFAULT_TICK_SIZE = 0.25
+_DEFAULT_TICK_VALUE = 12.50
+
+
+# ---------------------------------------------------------------------------
+# Publishing helpers
+# ---------------------------------------------------------------------------
+
+
+async def publish_price(redis: Redis, symbol: str, price: float | Decimal) -> None:
+    """Store the latest price and notify subscribers in one round trip."""
+    key = f"{PRICE_KEY_PREFIX}{symbol}"
+    pipe = redis.pipeline(transaction=False)
+    pipe.set(key, str(price))
+    pipe.publish(key, str(price))
+    await pipe.execute()
+
+
+async def publish_position_event(redis: Redis, event: str, position: Position) -> None:
+    """Announce an opened or closed position to running monitors."""
+    payload: dict = {"event": event, "id": str(position.id)}
+    if event == "opened":
+        payload.update(
+            user_id=str(position.user_id),
+            symbol=position.instrument_symbol,
+            direction=position.direction,
+            entry_price=str(position.entry_price),
+            quantity=position.quantity,
+            stop_loss_price=_str_or_none(position.stop_loss_price),
+            take_profit_price=_str_or_none(position.take_profit_price),
+        )
+    await redis.publish(POSITION_EVENTS_CHANNEL, json.dumps(payload))
+
+
+def _str_or_none(value: Decimal | None) -> str | None:
+    return str(value) if value is not None else None
+
+
+def _float_or_none(value: object) -> float | None:
+    return float(value) if value is not None else None
+
+
+# ---------------------------------------------------------------------------
+# P&L helpers
+# ---------------------------------------------------------------------------
+
+
+def close_paper_position(
+    position: Position,
+    exit_price: float,
+    exit_reason: str,
+    tick_size: float,
+    tick_value: float,
+) -> None:
+    """Close a paper position with final P&L calculation."""
+    entry = float(position.entry_price)
+    qty = position.quantity
+
+    if position.direction == "LONG":
+        raw_pnl = (exit_price - entry) / tick_size * tick_value * qty
+    else:
+        raw_pnl = (entry - exit_price) / tick_size * tick_value * qty
+
+    position.realized_pnl = Decimal(str(round(raw_pnl, 2)))
+    position.net_pnl = position.realized_pnl
+    position.unrealized_pnl = Decimal("0")
+    position.current_price = Decimal(str(exit_price))
+    position.status = "CLOSED"
+    position.exit_reason = exit_reason
+    position.closed_at = datetime.now(UTC)
+
+    # R-multiple
+    if position.stop_loss_price is not None:
+        stop = float(position.stop_loss_price)
+        risk_per_contract = abs(entry - stop) / tick_size * tick_value
+        planned_risk = risk_per_contract * qty
+        if planned_risk > 0:
+            position.r_multiple = Decimal(
+                str(round(float(position.net_pnl) / planned_risk, 4))
+            )
+
+
+def _tick_spec(symbol: str) -> tuple[float, float]:
+    spec = contract_registry.get_spec(symbol) if contract_registry.loaded else None
+    if spec is None:
+        return _DEFAULT_TICK_SIZE, _DEFAULT_TICK_VALUE
+    return float(spec.tick_size), float(spec.tick_value)
+
+
+@dataclass(slots=True)
+class TrackedPosition:
+    """Static view of an open position: enough to mark and trigger it.
+
+    The mark fields seed ``SymbolMarks`` when the position is tracked; live
+    values are kept in the arrays, and ``unrealized_pnl`` is refreshed on
+    every flush.
+    """
+
+    id: uuid.UUID
+    user_id: uuid.UUID
+    symbol: str
+    direction: str
+    entry: float
+    quantity: int
+    stop: float | None
+    target: float | None
+    current_price: float | None = None
+    unrealized_pnl: float = 0.0
+    mae: float | None = None
+    mfe: float | None = None
+
+    @classmethod
+    def from_model(cls, position: Position) -> TrackedPosition:
+        return cls(
+            id=position.id,
+            user_id=position.user_id,
+            symbol=position.instrument_symbol,
+            direction=position.direction,
+            entry=float(position.entry_price),
+            quantity=position.quantity,
+            stop=_float_or_none(position.stop_loss_price),
+            target=_float_or_none(position.take_profit_price),
+            current_price=_float_or_none(position.current_price),
+            unrealized_pnl=float(position.unrealized_pnl or 0),
+            mae=_float_or_none(position.mae),
+            mfe=_float_or_none(position.mfe),
+        )
+
+    @classmethod
+    def from_event(cls, payload: dict) -> TrackedPosition:
+        return cls(
+            id=uuid.UUID(payload["id"]),
+            user_id=uuid.UUID(payload["user_id"]),
+            symbol=payload["symbol"],
+            direction=payload["direction"],
+            entry=float(payload["entry_price"]),
+            quantity=int(payload["quantity"]),
+            stop=_float_or_none(payload.get("stop_loss_price")),
+            target=_float_or_none(payload.get("take_profit_price")),
+        )
+
+    def triggers(self) -> list[tuple[str, float, str]]:
+        """(exit_reason, level, direction) for each bracket exit."""
+        long = self.direction == "LONG"
+        triggers = []
+        if self.stop is not None:
+            direction = FIRES_AT_OR_BELOW if long else FIRES_AT_OR_ABOVE
+            triggers.append(("STOP_LOSS", self.stop, direction))
+        if self.target is not None:
+            direction = FIRES_AT_OR_ABOVE if long else FIRES_AT_OR_BELOW
+            triggers.append(("TAKE_PROFIT", self.target, direction))
+        return triggers
+
+
+# Rows of the SymbolMarks matrix
+_ENTRY, _QTY, _SIGN, _RISK, _PRICE, _PNL, _PERSISTED, _MAE, _MFE = range(9)
+_INITIAL_CAPACITY = 16
+
+
+class SymbolMarks:
+    """Mark state for the open positions on one symbol, as NumPy columns.
+
+    Each position is a column of a float matrix (entry, quantity, direction
+    sign, stop distance, last price, P&L, last persisted P&L, MAE, MFE), so a
+    tick marks every position with a handful of array operations. NaN stands
+    for "unknown" (no stop, no price yet, no MAE/MFE yet). Removal swaps the
+    last column into the freed slot.
+    """
+
+    def __init__(self) -> None:
+        self.positions: list[TrackedPosition] = []
+        self._index: dict[uuid.UUID, int] = {}
+        self._data = np.full((9, _INITIAL_CAPACITY), np.nan)
+        self._dirty = np.zeros(_INITIAL_CAPACITY, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(self, tracked: TrackedPosition) -> None:
+        n = len(self.positions)
+        if n == self._data.shape[1]:
+            self._data = np.concatenate([self._data, np.full_like(self._data, np.nan)], axis=1)
+            self._dirty = np.concatenate([self._dirty, np.zeros_like(self._dirty)])
+
+        risk = abs(tracked.entry - tracked.stop) if tracked.stop is not None else np.nan
+        col = self._data[:, n]
+        col[_ENTRY] = tracked.entry
+        col[_QTY] = tracked.quantity
+        col[_SIGN] = 1.0 if tracked.direction == "LONG" else -1.0
+        col[_RISK] = risk if risk else np.nan
+        col[_PRICE] = _nan_if_none(tracked.current_price)
+        col[_PNL] = col[_PERSISTED] = tracked.unrealized_pnl
+        col[_MAE] = _nan_if_none(tracked.mae)
+        col[_MFE] = _nan_if_none(tracked.mfe)
+        self._dirty[n] = False
+        self._index[tracked.id] = n
+        self.positions.append(tracked)
+
+    def remove(self, position_id: uuid.UUID) -> TrackedPosition | None:
+        i = self._index.pop(position_id, None)
+        if i is None:
+            return None
+        tracked = self.positions[i]
+        last = len(self.positions) - 1
+        if i != last:
+            self._data[:, i] = self._data[:, last]
+            self._dirty[i] = self._dirty[last]
+            self.positions[i] = self.positions[last]
+            self._index[self.positions[i].id] = i
+        self.positions.pop()
+        self._data[:, last] = np.nan
+        self._dirty[last] = False
+        return tracked
+
+    def mark(self, price: float, tick_size: float, tick_value: float) -> None:
+        """Apply a price to every position: P&L, MAE/MFE and dirty flags."""
+        n = len(self.positions)
+        if not n:
+            return
+        data = self._data[:, :n]
+        favorable = data[_SIGN] * (price - data[_ENTRY])
+        data[_PRICE] = price
+        data[_PNL] = favorable / tick_size * tick_value * data[_QTY]
+
+        # fmax ignores NaN, so the first mark sets MAE/MFE outright.
+        mae = np.fmax(data[_MAE], np.round(-favorable, 4))
+        mfe = np.fmax(data[_MFE], np.round(favorable, 4))
+        extreme = (mae != data[_MAE]) | (mfe != data[_MFE])
+        data[_MAE] = mae
+        data[_MFE] = mfe
+        self._dirty[:n] |= extreme | (
+            np.abs(data[_PNL] - data[_PERSISTED]) >= _PNL_WRITE_THRESHOLD
+        )
+
+    def row(self, position_id: uuid.UUID) -> dict[str, float | None]:
+        """Current marks of one position (for closing it)."""
+        return self._rows(np.array([self._index[position_id]]))[0]
+
+    def take_dirty(self) -> list[tuple[TrackedPosition, dict[str, float | None]]]:
+        """Marks of positions worth persisting; clears their dirty flags."""
+        n = len(self.positions)
+        idx = np.flatnonzero(self._dirty[:n])
+        if not idx.size:
+            return []
+        rows = self._rows(idx)
+        self._data[_PERSISTED, idx] = self._data[_PNL, idx]
+        self._dirty[idx] = False
+
+        dirty = []
+        for i, row in zip(idx.tolist(), rows, strict=True):
+            tracked = self.positions[i]
+            tracked.unrealized_pnl = row["unrealized_pnl"] or 0.0
+            dirty.append((tracked, row))
+        return dirty
+
+    def _rows(self, idx: np.ndarray) -> list[dict[str, float | None]]:
+        data = self._data[:, idx]
+        # R = excursion / stop distance (tick size, value and quantity cancel)
+        with np.errstate(invalid="ignore"):
+            mae_r = np.round(-np.abs(data[_MAE]) / data[_RISK], 4)
+            mfe_r = np.round(np.abs(data[_MFE]) / data[_RISK], 4)
+        columns = {
+            "current_price": data[_PRICE],
+            "unrealized_pnl": np.round(data[_PNL], 2),
+            "mae": data[_MAE],
+            "mfe": data[_MFE],
+            "mae_r": mae_r,
+            "mfe_r": mfe_r,
+        }
+        as_lists = {name: values.tolist() for name, values in columns.items()}
+        return [
+            {name: _none_if_nan(values[k]) for name, values in as_lists.items()}
+            for k in range(len(idx))
+        ]
+
+
+def _nan_if_none(value: float | None) -> float:
+    return np.nan if value is None else value
+
+
+def _none_if_nan(value: float) -> float | None:
+    return None if value != value else value
+
+
+# ---------------------------------------------------------------------------
+# Monitor
+# ---------------------------------------------------------------------------
+
+
+class PaperPositionMonitor:
+    """Long-running, price-driven SL/TP and P&L monitor for open paper positions."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        redis: Redis,
+        engine: PaperMatchingEngine | None = None,
+    ) -> None:
+        self._session_factory = session_factory
+        self._redis = redis
+        self._engine = engine if engine is not None else RedisPaperEngine(redis)
+        self._by_symbol: dict[str, SymbolMarks] = {}
+        self._symbols: dict[uuid.UUID, str] = {}
+        self._last_prices: dict[str, float] = {}
+        # SL/TP levels of tracked positions; payload is (position, exit_reason)
+        self._triggers = TriggerBook()
+
+    @property
+    def tracked_count(self) -> int:
+        return len(self._symbols)
+
+    def track(self, tracked: TrackedPosition) -> None:
+        if tracked.id in self._symbols:
+            self.untrack(tracked.id)
+        marks = self._by_symbol.get(tracked.symbol)
+        if marks is None:
+            marks = self._by_symbol[tracked.symbol] = SymbolMarks()
+        marks.add(tracked)
+        self._symbols[tracked.id] = tracked.symbol
+
+        self._arm(tracked)
+
+    def _arm(self, tracked: TrackedPosition) -> None:
+        """(Re)place a position's SL/TP levels in the trigger book."""
+        order_ids = []
+        for reason, level, direction in tracked.triggers():
+            order_id = f"{tracked.id}:{reason}"
+            self._triggers.add(
+                order_id, tracked.symbol, level, direction, payload=(tracked, reason)
+            )
+            order_ids.append(order_id)
+        if len(order_ids) == 2:
+            self._triggers.link_oco(*order_ids)
+
+    def untrack(self, position_id: uuid.UUID) -> TrackedPosition | None:
+        symbol = self._symbols.pop(position_id, None)
+        if symbol is None:
+            return None
+        self._triggers.remove(f"{position_id}:STOP_LOSS")
+        self._triggers.remove(f"{position_id}:TAKE_PROFIT")
+        marks = self._by_symbol[symbol]
+        tracked = marks.remove(position_id)
+        if not marks:
+            del self._by_symbol[symbol]
+        return tracked
+
+    # ------------------------------------------------------------------
+    # Main loop
+    # ------------------------------------------------------------------
+
+    async def run(self) -> None:
+        """Process messages until cancelled, resubscribing after failures."""
+        while True:
+            try:
+                await self._run_subscribed()
+            except Exception:
+                logger.error("Paper monitor subscription failed; restarting", exc_info=True)
+                await asyncio.sleep(_RESTART_DELAY)
+
+    async def _run_subscribed(self) -> None:
+        """Subscribe, load positions, and process messages until an error."""
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.psubscribe(_PRICE_CHANNEL_PATTERN)
+            await pubsub.subscribe(POSITION_EVENTS_CHANNEL)
+            # Subscribe first so nothing published during the load is missed.
+            synced = await self._guarded(self.sync_positions, "resync")
+            now = time.monotonic()
+            next_flush = now + _FLUSH_INTERVAL
+            next_poll = now + _PRICE_POLL_INTERVAL
+            next_sync = now + (_RESYNC_INTERVAL if synced else _RESTART_DELAY)
+
+            while True:
+                message = await pubsub.get_message(timeout=_FLUSH_INTERVAL)
+                if message is not None:
+                    await self._guarded(partial(self.dispatch, message), "message")
+
+                now = time.monotonic()
+                if now >= next_flush:
+                    await self._guarded(self.flush, "flush")
+                    next_flush = now + _FLUSH_INTERVAL
+                if now >= next_poll:
+                    await self._guarded(partial(self.refresh_prices, changed_only=True), "poll")
+                    next_poll = now + _PRICE_POLL_INTERVAL
+                if now >= next_sync:
+                    synced = await self._guarded(self.sync_positions, "resync")
+                    next_sync = now + (_RESYNC_INTERVAL if synced else _RESTART_DELAY)
+        finally:
+            await self._guarded(self.flush, "flush")
+            with suppress(Exception):
+                await pubsub.aclose()
+
+    @staticmethod
+    async def _guarded(step: Callable[[], Awaitable[object]], name: str) -> bool:
+        """Run one loop step; log and swallow its errors. Returns success."""
+        try:
+            await step()
+        except Exception:
+            logger.error("Paper monitor step failed", step=name, exc_info=True)
+            return False
+        return True
+
+    async def sweep(self) -> int:
+        """One-shot pass: load positions, apply current prices, persist marks."""
+        await self.sync_positions()
+        return await self.flush()
+
+    async def dispatch(self, message: dict) -> None:
+        """Route one pub/sub message to the price or position-event handler."""
+        channel = message.get("channel", "")
+        data = message.get("data")
+        try:
+            if channel == POSITION_EVENTS_CHANNEL:
+                await self.handle_position_event(json.loads(data))
+            elif channel.startswith(PRICE_KEY_PREFIX):
+                await self.handle_price(channel.removeprefix(PRICE_KEY_PREFIX), float(data))
+        except (ValueError, TypeError, KeyError):
+            logger.warning("Malformed monitor message", channel=channel, data=data)
+
+    # ------------------------------------------------------------------
+    # Handlers
+    # ------------------------------------------------------------------
+
+    async def handle_price(self, symbol: str, price: float) -> None:
+        """Mark every position on ``symbol``; close the ones whose SL/TP crossed.
+
+        Then fills any paper SL/TP still resting on ``symbol``, for every user
+        at once. Bracket exits only exist for open positions, so symbols with
+        none tracked are skipped.
+        """
+        self._last_prices[symbol] = price
+        marks = self._by_symbol.get(symbol)
+        if not marks:
+            return
+        tick_size, tick_value = _tick_spec(symbol)
+        marks.mark(price, tick_size, tick_value)
+
+        # OCO partners come back in ``cancelled``; the close covers both legs.
+        for entry in self._triggers.on_price(symbol, price).fired:
+            tracked, reason = entry.payload
+            await self._close(tracked, reason, entry.price, tick_size, tick_value)
+
+        try:
+            await self._engine.trigger({symbol: Decimal(str(price))})
+        except Exception:
+            logger.warning("Paper trigger pass failed", symbol=symbol, exc_info=True)
+
+    async def handle_position_event(self, payload: dict) -> None:
+        if payload["event"] == "opened":
+            self.track(TrackedPosition.from_event(payload))
+        elif payload["event"] == "closed":
+            self.untrack(uuid.UUID(payload["id"]))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    async def sync_positions(self) -> None:
+        """Rebuild the index from Postgres, then apply the latest prices."""
+        await self.flush()
+        async with self._session_factory() as db:
+            await contract_registry.ensure_current(db, self._redis)
+            result = await db.execute(select(Position).where(Position.status == "OPEN"))
+            positions = list(result.scalars().all())
+
+        self._by_symbol = {}
+        self._symbols = {}
+        self._triggers.clear()
+        for position in positions:
+            self.track(TrackedPosition.from_model(position))
+        logger.info("Paper monitor synced", open_positions=len(positions))
+
+        await self.refresh_prices()
+
+    async def refresh_prices(self, changed_only: bool = False) -> None:
+        """Fetch every tracked symbol's price with one MGET and apply it.
+
+        With ``changed_only``, prices already applied (from a published tick
+        or an earlier poll) are skipped.
+        """
+        symbols = list(self._by_symbol)
+        if not symbols:
+            return
+        prices = await self._redis.mget([f"{PRICE_KEY_PREFIX}{s}" for s in symbols])
+        for symbol, raw_price in zip(symbols, prices, strict=True):
+            if raw_price is None:
+                continue
+            price = float(raw_price)
+            if changed_only and self._last_prices.get(symbol) == price:
+                continue
+            await self.handle_price(symbol, price)
+
+    async def flush(self) -> int:
+        """Persist dirty marks with one executemany UPDATE. Returns rows written."""
+        dirty = [item for marks in self._by_symbol.values() for item in marks.take_dirty()]
+        if not dirty:
+            return 0
+
+        stmt = (
+            update(Position.__table__)
+            .where(Position.id == bindparam("b_id"), Position.status == "OPEN")
+            .values(
+                current_price=bindparam("b_current_price"),
+                unrealized_pnl=bindparam("b_unrealized_pnl"),
+                mae=bindparam("b_mae"),
+                mfe=bindparam("b_mfe"),
+                mae_r=bindparam("b_mae_r"),
+                mfe_r=bindparam("b_mfe_r"),
+            )
+        )
+        async with self._session_factory() as db:
+            await db.execute(stmt, [_mark_row(tracked.id, row) for tracked, row in dirty])
+            await db.commit()
+
+        try:
+            await ExposureLedger(self._redis).mark_positions(tracked for tracked, _ in dirty)
+        except Exception:
+            logger.warning("Exposure ledger update failed", exc_info=True)
+        return len(dirty)
+
+    async def _close(
+        self,
+        tracked: TrackedPosition,
+        reason: str,
+        exit_price: float,
+        tick_size: float,
+        tick_value: float,
+    ) -> None:
+        """Close a triggered position in its own transaction.
+
+        Paper exits fill at the bracket level, as the resting order would.
+        """
+        marks = self._by_symbol[tracked.symbol].row(tracked.id)
+        try:
+            position = await self._close_row(
+                tracked, reason, exit_price, marks, tick_size, tick_value
+            )
+        except Exception:
+            logger.error(
+                "Paper exit failed",
+                position_id=str(tracked.id),
+                exit_reason=reason,
+                exc_info=True,
+            )
+            position = None
+        if position is None:
+            # Row locked by another close in flight, closed elsewhere (its
+            # "closed" event or the resync drops it), or the close failed:
+            # re-arm so the next tick retries.
+            self._arm(tracked)
+            return
+        self.untrack(tracked.id)
+
+        try:
+            await ExposureLedger(self._redis).position_closed(position)
+        except Exception:
+            logger.warning("Exposure ledger update failed", exc_info=True)
+
+        logger.info(
+            "Paper exit triggered",
+            position_id=str(tracked.id),
+            exit_reason=reason,
+            price=marks["current_price"],
+            exit_price=exit_price,
+        )
+
+    async def _close_row(
+        self,
+        tracked: TrackedPosition,
+        reason: str,
+        exit_price: float,
+        marks: dict[str, float | None],
+        tick_size: float,
+        tick_value: float,
+    ) -> Position | None:
+        """Close the position row and commit. None if it is not OPEN or is locked."""
+        from app.services.risk_service import RiskService
+
+        async with self._session_factory() as db:
+            result = await db.execute(
+                select(Position)
+                .where(Position.id == tracked.id, Position.status == "OPEN")
+                .with_for_update(skip_locked=True)
+            )
+            position = result.scalar_one_or_none()
+            if position is None:
+                return None
+
+            position.mae = _decimal(marks["mae"])
+            position.mfe = _decimal(marks["mfe"])
+            position.mae_r = _decimal(marks["mae_r"])
+            position.mfe_r = _decimal(marks["mfe_r"])
+            close_paper_position(position, exit_price, reason, tick_size, tick_value)
+            await self._cancel_bracket(db, position)
+
+            risk_svc = RiskService(db, self._redis)
+            net_pnl = float(position.net_pnl) if position.net_pnl else 0.0
+            if net_pnl < 0:
+                tripped = await risk_svc.record_loss(position.user_id)
+                if tripped:
+                    logger.warning(
+                        "Circuit breaker tripped after paper exit",
+                        user_id=str(position.user_id),
+                        position_id=str(position.id),
+                        exit_reason=reason,
+                    )
+            else:
+                await risk_svc.record_win(position.user_id)
+            await db.commit()
+        return position
+
+
+    async def _cancel_bracket(self, db: AsyncSession, position: Position) -> None:
+        """Cancel a closed position's resting SL/TP in the engine and the DB.
+
+        Orders the engine no longer holds (a trigger pass filled them) keep
+        their DB status, so the fill stream can still record the fill.
+        """
+        if position.entry_order_id is None:
+            return
+        bracket_group = (
+            select(Order.bracket_group_id)
+            .where(Order.id == position.entry_order_id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(Order).where(
+                Order.bracket_group_id == bracket_group,
+                Order.bracket_role != "ENTRY",
+                Order.status.in_(_PENDING_STATUSES),
+            )
+        )
+        pending = list(result.scalars().all())
+        at_engine = [o.broker_order_id for o in pending if o.broker_order_id]
+        cancelled: dict[str, bool] = {}
+        if at_engine:
+            try:
+                cancelled = await self._engine.cancel_orders(at_engine)
+            except Exception:
+                logger.warning(
+                    "Failed to cancel paper bracket orders",
+                    position_id=str(position.id),
+                    exc_info=True,
+                )
+                return
+        for order in pending:
+            if order.broker_order_id is None or cancelled.get(order.broker_order_id):
+                order.status = "CANCELLED"
+
+
+def _decimal(value: float | None, places: int = 4) -> Decimal | None:
+    return Decimal(str(round(value, places))) if value is not None else None
+
+
+def _mark_row(position_id: uuid.UUID, marks: dict[str, float | None]) -> dict:
+    return {
+        "b_id": position_id,
+        "b_current_price": _decimal(marks["current_price"]),
+        "b_unrealized_pnl": _decimal(marks["unrealized_pnl"], 2),
+        "b_mae": _decimal(marks["mae"]),
+        "b_mfe": _decimal(marks["mfe"]),
+        "b_mae_r": _decimal(marks["mae_r"]),
+        "b_mfe_r": _decimal(marks["mfe_r"]),
+    }
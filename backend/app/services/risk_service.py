@@ -6,13 +6,16 @@ import math
 import uuid
 from datetime import UTC, datetime, time, timedelta
 from decimal import Decimal
+from time import perf_counter
 
 from redis.asyncio import Redis
-from sqlalchemy import func, select
+from redis.exceptions import RedisError
+from sqlalchemy import and_, func, insert, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.exceptions import NotFoundError
 from app.core.logging import get_logger
+from app.core.metrics import Counter, Histogram
 from app.db.models.contract_specification import ContractSpecification
 from app.db.models.instrument_correlation import InstrumentCorrelation
 from app.db.models.position import Position
@@ -20,9 +23,25 @@ from app.db.models.risk_check_audit import RiskCheckAudit
 from app.db.models.risk_settings_changelog import RiskSettingsChangelog
 from app.db.models.signal import Signal
 from app.db.models.user_risk_settings import UserRiskSettings
+from app.services.audit_buffer import stage_audit
+from app.services.contract_registry import ContractSpec, contract_registry
+from app.services.exposure_ledger import (
+    ExposureLedger,
+    RiskSnapshot,
+    reconcile_exposure,
+    snapshot_from_fields,
+)
 
 logger = get_logger("trendedge.risk_service")
 
+_RISK_CHECK_SECONDS = Histogram(
+    "trendedge_risk_check_seconds",
+    "Latency of each pre-trade risk check",
+    ("check",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+_RISK_CHECKS = Counter("trendedge_risk_checks", "Risk check outcomes", ("check", "result"))
+
 # Risk settings defaults (must match UserRiskSettings server_defaults)
 _DEFAULTS = {
     "max_position_size_micro": 2,
@@ -67,6 +86,7 @@ class RiskService:
         Returns list of check results. Fail-fast on first FAIL.
         """
         contract_spec = await self._get_contract_spec(signal.instrument_symbol)
+        snapshot = await self.get_risk_snapshot(signal.user_id, signal.instrument_symbol)
 
         checks = [
             ("max_position_size", self.check_max_position_size),
@@ -80,37 +100,41 @@ class RiskService:
         ]
 
         results: list[dict] = []
+        audit_rows: list[dict] = []
         overall = "PASS"
 
         for check_name, check_fn in checks:
-            result = await check_fn(signal, settings, contract_spec)
+            started = perf_counter()
+            result = await check_fn(signal, settings, contract_spec, snapshot=snapshot)
+            _RISK_CHECK_SECONDS.labels(check_name).observe(perf_counter() - started)
+            _RISK_CHECKS.labels(check_name, result["result"]).inc()
             result["check_name"] = check_name
 
-            # Persist audit record
-            audit = RiskCheckAudit(
-                signal_id=signal.id,
-                check_name=check_name,
-                result=result["result"],
-                actual_value=(
+            audit_rows.append({
+                "signal_id": signal.id,
+                "check_name": check_name,
+                "result": result["result"],
+                "actual_value": (
                     Decimal(str(result["actual_value"]))
                     if result.get("actual_value") is not None
                     else None
                 ),
-                threshold_value=(
+                "threshold_value": (
                     Decimal(str(result["threshold_value"]))
                     if result.get("threshold_value") is not None
                     else None
                 ),
-                details=result.get("details", {}),
-            )
-            self._db.add(audit)
+                "details": result.get("details", {}),
+            })
             results.append(result)
 
             if result["result"] == "FAIL":
                 overall = "FAIL"
                 break  # Fail-fast
 
-        await self._db.flush()
+        # Persist audit records in one multi-row INSERT (or write them behind)
+        if not stage_audit(self._db, RiskCheckAudit, audit_rows):
+            await self._db.execute(insert(RiskCheckAudit), audit_rows)
 
         logger.info(
             "Risk checks complete",
@@ -120,12 +144,74 @@ class RiskService:
         )
         return results
 
+    async def get_risk_snapshot(self, user_id: uuid.UUID, symbol: str) -> RiskSnapshot:
+        """Gather every per-user exposure figure the checks need in one round trip.
+
+        Reads the Redis exposure ledger; if the user's ledger has not been
+        reconciled yet it is rebuilt from Postgres first. Without Redis, falls
+        back to a single aggregate query.
+        """
+        if self._redis is not None:
+            try:
+                snapshot = await ExposureLedger(self._redis).snapshot(user_id, symbol)
+                if snapshot is not None:
+                    return snapshot
+                fields = await reconcile_exposure(self._db, self._redis, [user_id])
+                return snapshot_from_fields(fields[user_id], symbol)
+            except RedisError:
+                logger.warning(
+                    "Exposure ledger unavailable, using SQL snapshot",
+                    user_id=str(user_id),
+                    exc_info=True,
+                )
+        return await self._query_risk_snapshot(user_id, symbol)
+
+    async def _query_risk_snapshot(self, user_id: uuid.UUID, symbol: str) -> RiskSnapshot:
+        """Aggregate the snapshot from positions in one query.
+
+        Scans only the user's open positions and those closed today.
+        """
+        today_start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+        is_open = Position.status == "OPEN"
+        stmt = select(
+            func.count().filter(is_open, Position.instrument_symbol == symbol),
+            func.count().filter(is_open),
+            func.coalesce(
+                func.sum(Position.realized_pnl).filter(
+                    Position.status == "CLOSED",
+                    Position.closed_at >= today_start,
+                    Position.realized_pnl < 0,
+                ),
+                0,
+            ),
+            func.coalesce(
+                func.sum(Position.unrealized_pnl).filter(is_open, Position.unrealized_pnl < 0),
+                0,
+            ),
+            func.array_agg(Position.instrument_symbol.distinct()).filter(is_open),
+        ).where(
+            Position.user_id == user_id,
+            or_(is_open, and_(Position.status == "CLOSED", Position.closed_at >= today_start)),
+        )
+        row = (await self._db.execute(stmt)).one()
+        return RiskSnapshot(
+            open_for_symbol=row[0] or 0,
+            open_total=row[1] or 0,
+            realized_losses_today=abs(float(row[2] or 0)),
+            unrealized_losses=abs(float(row[3] or 0)),
+            open_symbols=list(row[4] or []),
+        )
+
     # ------------------------------------------------------------------
     # Individual checks
     # ------------------------------------------------------------------
 
     async def check_max_position_size(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Check if adding this position exceeds max position size for the instrument."""
         max_size = (
@@ -135,13 +221,16 @@ class RiskService:
         )
 
         # Count open positions for this instrument
-        stmt = select(func.count()).select_from(Position).where(
-            Position.user_id == signal.user_id,
-            Position.instrument_symbol == signal.instrument_symbol,
-            Position.status == "OPEN",
-        )
-        result = await self._db.execute(stmt)
-        current_count = result.scalar() or 0
+        if snapshot is not None:
+            current_count = snapshot.open_for_symbol
+        else:
+            stmt = select(func.count()).select_from(Position).where(
+                Position.user_id == signal.user_id,
+                Position.instrument_symbol == signal.instrument_symbol,
+                Position.status == "OPEN",
+            )
+            result = await self._db.execute(stmt)
+            current_count = result.scalar() or 0
 
         quantity = signal.quantity or 1
         new_total = current_count + quantity
@@ -164,31 +253,39 @@ class RiskService:
         }
 
     async def check_daily_loss_limit(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Sum today's realized losses + unrealized losses + worst-case new loss."""
-        today_start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
-
-        # Today's realized losses from closed positions
-        realized_stmt = select(func.coalesce(func.sum(Position.realized_pnl), 0)).where(
-            Position.user_id == signal.user_id,
-            Position.status == "CLOSED",
-            Position.closed_at >= today_start,
-            Position.realized_pnl < 0,
-        )
-        realized_result = await self._db.execute(realized_stmt)
-        realized_losses = abs(float(realized_result.scalar() or 0))
+        if snapshot is not None:
+            realized_losses = snapshot.realized_losses_today
+            unrealized_losses = snapshot.unrealized_losses
+        else:
+            today_start = datetime.now(UTC).replace(hour=0, minute=0, second=0, microsecond=0)
+
+            # Today's realized losses from closed positions
+            realized_stmt = select(func.coalesce(func.sum(Position.realized_pnl), 0)).where(
+                Position.user_id == signal.user_id,
+                Position.status == "CLOSED",
+                Position.closed_at >= today_start,
+                Position.realized_pnl < 0,
+            )
+            realized_result = await self._db.execute(realized_stmt)
+            realized_losses = abs(float(realized_result.scalar() or 0))
 
-        # Unrealized losses from open positions
-        unrealized_stmt = select(
-            func.coalesce(func.sum(Position.unrealized_pnl), 0)
-        ).where(
-            Position.user_id == signal.user_id,
-            Position.status == "OPEN",
-            Position.unrealized_pnl < 0,
-        )
-        unrealized_result = await self._db.execute(unrealized_stmt)
-        unrealized_losses = abs(float(unrealized_result.scalar() or 0))
+            # Unrealized losses from open positions
+            unrealized_stmt = select(
+                func.coalesce(func.sum(Position.unrealized_pnl), 0)
+            ).where(
+                Position.user_id == signal.user_id,
+                Position.status == "OPEN",
+                Position.unrealized_pnl < 0,
+            )
+            unrealized_result = await self._db.execute(unrealized_stmt)
+            unrealized_losses = abs(float(unrealized_result.scalar() or 0))
 
         # Worst-case loss for the new signal (all stops hit)
         worst_case = 0.0
@@ -219,15 +316,22 @@ class RiskService:
         }
 
     async def check_max_concurrent_positions(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Count all open positions across all instruments."""
-        stmt = select(func.count()).select_from(Position).where(
-            Position.user_id == signal.user_id,
-            Position.status == "OPEN",
-        )
-        result = await self._db.execute(stmt)
-        current_count = result.scalar() or 0
+        if snapshot is not None:
+            current_count = snapshot.open_total
+        else:
+            stmt = select(func.count()).select_from(Position).where(
+                Position.user_id == signal.user_id,
+                Position.status == "OPEN",
+            )
+            result = await self._db.execute(stmt)
+            current_count = result.scalar() or 0
         max_concurrent = settings["max_concurrent_positions"]
 
         if current_count >= max_concurrent:
@@ -243,7 +347,11 @@ class RiskService:
         }
 
     async def check_min_risk_reward(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Compare signal's risk/reward ratio to minimum threshold."""
         min_rr = settings["min_risk_reward"]
@@ -274,6 +382,9 @@ class RiskService:
 
     async def _normalize_symbol(self, symbol: str) -> str:
         """Resolve a micro symbol to its full-size symbol for correlation lookups."""
+        if contract_registry.loaded:
+            await contract_registry.ensure_current(self._db, self._redis)
+            return contract_registry.normalize_symbol(symbol)
         stmt = select(ContractSpecification).where(
             ContractSpecification.symbol == symbol
         )
@@ -283,24 +394,44 @@ class RiskService:
             return spec.full_size_symbol
         return symbol
 
+    async def _get_correlation(self, symbol_a: str, symbol_b: str) -> float | None:
+        """Correlation between two full-size symbols, or None if not recorded."""
+        if contract_registry.loaded:
+            return contract_registry.correlation(symbol_a, symbol_b)
+        pair_a, pair_b = sorted([symbol_a, symbol_b])
+        corr_stmt = select(InstrumentCorrelation).where(
+            InstrumentCorrelation.instrument_a == pair_a,
+            InstrumentCorrelation.instrument_b == pair_b,
+        )
+        corr_result = await self._db.execute(corr_stmt)
+        correlation = corr_result.scalar_one_or_none()
+        return float(correlation.correlation) if correlation else None
+
     async def check_correlation(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Check for correlated open positions."""
         corr_limit = settings["correlation_limit"]
         symbol = await self._normalize_symbol(signal.instrument_symbol)
 
         # Get open position symbols for this user
-        open_stmt = (
-            select(Position.instrument_symbol)
-            .where(
-                Position.user_id == signal.user_id,
-                Position.status == "OPEN",
+        if snapshot is not None:
+            open_symbols = snapshot.open_symbols
+        else:
+            open_stmt = (
+                select(Position.instrument_symbol)
+                .where(
+                    Position.user_id == signal.user_id,
+                    Position.status == "OPEN",
+                )
+                .distinct()
             )
-            .distinct()
-        )
-        result = await self._db.execute(open_stmt)
-        open_symbols = [row[0] for row in result.all()]
+            result = await self._db.execute(open_stmt)
+            open_symbols = [row[0] for row in result.all()]
 
         if not open_symbols:
             return {"result": "PASS", "actual_value": 0, "threshold_value": corr_limit}
@@ -311,19 +442,13 @@ class RiskService:
 
         for open_sym in open_symbols:
             open_sym = await self._normalize_symbol(open_sym)
-            pair_a, pair_b = sorted([symbol, open_sym])
-            corr_stmt = select(InstrumentCorrelation).where(
-                InstrumentCorrelation.instrument_a == pair_a,
-                InstrumentCorrelation.instrument_b == pair_b,
-            )
-            corr_result = await self._db.execute(corr_stmt)
-            correlation = corr_result.scalar_one_or_none()
+            correlation = await self._get_correlation(symbol, open_sym)
 
-            if correlation and abs(float(correlation.correlation)) >= corr_limit:
+            if correlation is not None and abs(correlation) >= corr_limit:
                 correlated_count += 1
                 correlated_instruments.append({
                     "symbol": open_sym,
-                    "correlation": float(correlation.correlation),
+                    "correlation": correlation,
                 })
 
         if correlated_count >= 2:
@@ -343,7 +468,11 @@ class RiskService:
         return {"result": "PASS", "actual_value": 0, "threshold_value": corr_limit}
 
     async def check_max_single_trade_risk(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Risk = |entry - stop| / tick_size * tick_value * quantity."""
         max_risk = settings["max_single_trade_risk"]
@@ -378,7 +507,11 @@ class RiskService:
         }
 
     async def check_trading_hours(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Check if current time falls within allowed trading hours."""
         mode = settings["trading_hours_mode"]
@@ -425,7 +558,11 @@ class RiskService:
         return {"result": "PASS", "actual_value": None, "threshold_value": None}
 
     async def check_signal_staleness(
-        self, signal: Signal, settings: dict, contract_spec: ContractSpecification
+        self,
+        signal: Signal,
+        settings: dict,
+        contract_spec: ContractSpecification,
+        snapshot: RiskSnapshot | None = None,
     ) -> dict:
         """Check if signal is too old (created_at exceeds staleness_minutes)."""
         max_age = settings["staleness_minutes"]
@@ -648,8 +785,14 @@ class RiskService:
     # Helpers
     # ------------------------------------------------------------------
 
-    async def _get_contract_spec(self, symbol: str) -> ContractSpecification:
-        """Look up contract specification by symbol."""
+    async def _get_contract_spec(self, symbol: str) -> ContractSpecification | ContractSpec:
+        """Look up contract specification by symbol (registry first, then DB)."""
+        if contract_registry.loaded:
+            await contract_registry.ensure_current(self._db, self._redis)
+            registry_spec = contract_registry.get_spec(symbol)
+            if registry_spec is None:
+                raise NotFoundError("ContractSpecification", symbol)
+            return registry_spec
         stmt = select(ContractSpecification).where(
             ContractSpecification.symbol == symbol
         )
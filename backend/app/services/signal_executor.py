@@ -0,0 +1,202 @@
+"""Signal execution: risk checks, sizing, bracket construction and submission.
+
+Shared by the ``process_signal`` Celery task and the in-process fast path
+(``app.services.fast_path``).
+
+The committed signal row is the outbox: a signal in ENRICHED status has been
+accepted but not yet executed. Executors claim it with ``claim_signal`` (a
+``FOR UPDATE SKIP LOCKED`` read), so a signal is executed by exactly one of
+the fast path, the Celery task or the outbox sweeper. If an executor dies
+before reaching the broker its transaction rolls back, the row stays ENRICHED,
+and ``sweep_signal_outbox`` hands it to Celery. EXECUTING is committed before
+the broker call, so a failure after submission can never re-arm the signal.
+
+The sweeper stamps each re-dispatch in ``dispatched_at``/``dispatch_attempts``;
+a signal is re-dispatched at most once per cooldown and rejected after
+``MAX_DISPATCH_ATTEMPTS``.
+"""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime, timedelta
+
+from redis.asyncio import Redis
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.logging import get_logger
+from app.db.models.contract_specification import ContractSpecification
+from app.db.models.signal import Signal
+from app.services.contract_registry import ContractSpec, contract_registry
+
+logger = get_logger("trendedge.signal_executor")
+
+PENDING_STATUS = "ENRICHED"
+_OUTBOX_GRACE = timedelta(seconds=15)  # leave fresh signals to the path that accepted them
+_OUTBOX_BATCH = 200
+_OUTBOX_COOLDOWN = timedelta(minutes=5)  # outlasts process_signal's own retries (3 x 60s)
+MAX_DISPATCH_ATTEMPTS = 3
+
+
+async def claim_signal(db: AsyncSession, signal_id: uuid.UUID) -> Signal | None:
+    """Lock a pending signal for execution; None if it is taken or done."""
+    result = await db.execute(
+        select(Signal)
+        .where(Signal.id == signal_id, Signal.status == PENDING_STATUS)
+        .with_for_update(skip_locked=True)
+    )
+    return result.scalar_one_or_none()
+
+
+async def stale_pending_signals(db: AsyncSession) -> list[uuid.UUID]:
+    """Ids of pending signals nobody has executed within the grace period.
+
+    Signals re-dispatched within the cooldown are skipped. Returned rows are
+    stamped as dispatched, and signals out of attempts are rejected instead;
+    the caller commits before dispatching.
+    """
+    now = datetime.now(UTC)
+    result = await db.execute(
+        select(Signal)
+        .where(
+            Signal.status == PENDING_STATUS,
+            Signal.updated_at < now - _OUTBOX_GRACE,
+            or_(
+                Signal.dispatched_at.is_(None),
+                Signal.dispatched_at < now - _OUTBOX_COOLDOWN,
+            ),
+        )
+        .order_by(Signal.updated_at)
+        .limit(_OUTBOX_BATCH)
+        .with_for_update(skip_locked=True)
+    )
+    signal_ids: list[uuid.UUID] = []
+    for signal in result.scalars().all():
+        if signal.dispatch_attempts >= MAX_DISPATCH_ATTEMPTS:
+            signal.status = "REJECTED"
+            signal.rejection_reason = (
+                f"Not executed after {MAX_DISPATCH_ATTEMPTS} dispatch attempts"
+            )
+            logger.error(
+                "Signal rejected: dispatch attempts exhausted",
+                signal_id=str(signal.id),
+                user_id=str(signal.user_id),
+            )
+            continue
+        signal.dispatched_at = now
+        signal.dispatch_attempts += 1
+        signal_ids.append(signal.id)
+    return signal_ids
+
+
+class SignalExecutor:
+    """Runs a claimed signal through risk checks and broker submission."""
+
+    def __init__(self, db: AsyncSession, redis: Redis) -> None:
+        self._db = db
+        self._redis = redis
+
+    async def execute(
+        self,
+        signal: Signal,
+        contract_spec: ContractSpecification | ContractSpec | None = None,
+    ) -> str:
+        """Execute ``signal`` and commit. Returns its final status.
+
+        ``contract_spec`` may be passed by callers that already validated the
+        instrument (the webhook fast path) to skip a second lookup.
+        """
+        from app.adapters.registry import get_adapter
+        from app.services.execution_service import ExecutionService
+        from app.services.risk_service import RiskService
+        from app.services.signal_service import SignalService
+
+        db, redis = self._db, self._redis
+        signal_id = str(signal.id)
+        await contract_registry.ensure_current(db, redis)
+
+        # Check circuit breaker
+        risk_svc = RiskService(db, redis)
+        user_id = signal.user_id
+        cb_state = await risk_svc.get_circuit_breaker_state(user_id)
+        if cb_state["state"] == "TRIPPED":
+            signal.status = "REJECTED"
+            signal.rejection_reason = "Circuit breaker is tripped"
+            await db.commit()
+            logger.warning(
+                "Signal rejected: circuit breaker tripped",
+                signal_id=signal_id,
+                user_id=str(user_id),
+            )
+            return signal.status
+
+        # Get risk settings
+        risk_settings = await risk_svc.get_risk_settings(user_id)
+
+        # Run risk checks
+        signal.status = "VALIDATED"
+        check_results = await risk_svc.run_all_checks(signal, risk_settings)
+
+        # Check overall result
+        failed = any(c["result"] == "FAIL" for c in check_results)
+        if failed:
+            signal.status = "REJECTED"
+            failed_checks = [
+                c["check_name"] for c in check_results if c["result"] == "FAIL"
+            ]
+            signal.rejection_reason = f"Risk check failed: {', '.join(failed_checks)}"
+            await db.commit()
+            logger.info(
+                "Signal rejected by risk checks",
+                signal_id=signal_id,
+                failed_checks=failed_checks,
+            )
+            return signal.status
+
+        signal.status = "RISK_PASSED"
+
+        # Calculate quantity
+        if contract_spec is None:
+            contract_spec = await SignalService(db, redis).validate_instrument(
+                signal.instrument_symbol
+            )
+        quantity = await risk_svc.calculate_quantity(signal, risk_settings, contract_spec)
+
+        # Override with user-specified quantity if set
+        if signal.quantity:
+            quantity = signal.quantity
+
+        # Construct bracket order
+        exec_svc = ExecutionService(db, redis)
+        bracket_group_id = await exec_svc.construct_bracket_order(signal, quantity)
+
+        # Submit to broker. Commit EXECUTING first: once the broker may have the
+        # order, no rollback or retry may leave the signal claimable again.
+        signal.status = "EXECUTING"
+        await db.commit()
+
+        adapter = await get_adapter(
+            user_id,
+            db,
+            redis,
+            is_paper=risk_settings["is_paper_mode"],
+            slippage_ticks=risk_settings["paper_slippage_ticks"],
+        )
+        result = await exec_svc.submit_bracket_order(user_id, bracket_group_id, adapter)
+
+        if result["entry_status"] == "FILLED":
+            signal.status = "FILLED"
+        else:
+            signal.status = "EXECUTING"
+
+        await db.commit()
+
+        logger.info(
+            "Signal processed successfully",
+            signal_id=signal_id,
+            status=signal.status,
+            bracket_group_id=bracket_group_id,
+            quantity=quantity,
+        )
+        return signal.status
@@ -17,6 +17,7 @@ from app.db.models.risk_check_audit import RiskCheckAudit
 from app.db.models.signal import Signal
 from app.db.models.trendline import Trendline
 from app.db.models.webhook_url import WebhookUrl
+from app.services.contract_registry import ContractSpec, contract_registry
 
 logger = get_logger("trendedge.signal_service")
 
@@ -109,16 +110,7 @@ class SignalService:
         await self._db.refresh(signal)
 
         # Dispatch processing task
-        try:
-            from app.tasks.execution_tasks import process_signal
-
-            process_signal.delay(str(signal.id))
-        except Exception:
-            logger.warning(
-                "Failed to dispatch process_signal task",
-                signal_id=str(signal.id),
-                exc_info=True,
-            )
+        self._dispatch_processing(signal, contract_spec)
 
         logger.info(
             "Manual signal created",
@@ -193,25 +185,42 @@ class SignalService:
         await self._db.refresh(signal)
 
         # Dispatch processing
+        self._dispatch_processing(signal, contract_spec)
+
+        logger.info(
+            "Webhook signal created",
+            signal_id=str(signal.id),
+            webhook_id=webhook_id,
+            instrument=normalized["instrument_symbol"],
+        )
+        return signal
+
+    @staticmethod
+    def _dispatch_processing(
+        signal: Signal, contract_spec: ContractSpecification | ContractSpec
+    ) -> None:
+        """Hand a committed signal to the fast path, or to Celery.
+
+        If both fail the signal stays ENRICHED and the outbox sweeper
+        dispatches it.
+        """
+        from app.services.fast_path import get_fast_path
+
+        fast_path = get_fast_path()
+        if fast_path is not None and fast_path.submit(signal.id, contract_spec):
+            return
         try:
             from app.tasks.execution_tasks import process_signal
 
             process_signal.delay(str(signal.id))
         except Exception:
             logger.warning(
-                "Failed to dispatch process_signal task for webhook",
+                "Failed to dispatch process_signal task",
                 signal_id=str(signal.id),
+                source=signal.source,
                 exc_info=True,
             )
 
-        logger.info(
-            "Webhook signal created",
-            signal_id=str(signal.id),
-            webhook_id=webhook_id,
-            instrument=normalized["instrument_symbol"],
-        )
-        return signal
-
     # ------------------------------------------------------------------
     # Normalization
     # ------------------------------------------------------------------
@@ -234,8 +243,14 @@ class SignalService:
     # Validation
     # ------------------------------------------------------------------
 
-    async def validate_instrument(self, symbol: str) -> ContractSpecification:
+    async def validate_instrument(self, symbol: str) -> ContractSpecification | ContractSpec:
         """Look up the contract specification for an instrument symbol."""
+        if contract_registry.loaded:
+            await contract_registry.ensure_current(self._db, self._redis)
+            registry_spec = contract_registry.get_spec(symbol)
+            if registry_spec is None:
+                raise NotFoundError("Instrument", symbol)
+            return registry_spec
         stmt = select(ContractSpecification).where(
             ContractSpecification.symbol == symbol
         )
@@ -275,7 +290,9 @@ class SignalService:
     # ------------------------------------------------------------------
 
     @staticmethod
-    def enrich_signal(signal: Signal, contract_spec: ContractSpecification) -> dict:
+    def enrich_signal(
+        signal: Signal, contract_spec: ContractSpecification | ContractSpec
+    ) -> dict:
         """Compute risk/reward metrics and store in enrichment_data."""
         entry = float(signal.entry_price)
         tick_size = float(contract_spec.tick_size)
@@ -2,7 +2,10 @@
 
 from __future__ import annotations
 
+import hashlib
+import time
 import uuid
+from collections.abc import Awaitable, Callable
 from datetime import UTC, datetime, timedelta
 from decimal import Decimal
 
@@ -11,8 +14,10 @@ from redis.asyncio import Redis
 from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import delete_cached, get_or_load
 from app.core.exceptions import ConflictError, ForbiddenError, NotFoundError
 from app.core.logging import get_logger
+from app.core.metrics import Counter, Histogram
 from app.db.models.alert import Alert
 from app.db.models.candle import Candle
 from app.db.models.instrument import Instrument
@@ -21,6 +26,7 @@ from app.db.models.trendline import Trendline
 from app.db.models.trendline_event import TrendlineEvent
 from app.db.models.user_detection_config import UserDetectionConfig
 from app.db.models.user_watchlist import UserWatchlist
+from app.services.audit_buffer import stage_audit
 from app.services.detection import (
     assign_grade,
     compute_composite_score,
@@ -58,6 +64,13 @@ _WATCHLIST_LIMITS: dict[str, int | None] = {
     "team": None,
 }
 
+# Cached GET /trendlines/{instrument_id} payloads, one entry per (user,
+# instrument) in the ``trendlines`` cache namespace. Entries are deleted
+# whenever detection, dismissal, promotion/demotion, expiry or an alert break
+# changes the listed lines; the TTL only bounds staleness of the latest candle.
+_TRENDLINE_LIST_NAMESPACE = "trendlines"
+_TRENDLINE_LIST_CACHE_TTL = 300  # 5 minutes
+
 # Valid state transitions for trendlines
 _VALID_TRANSITIONS: dict[str, set[str]] = {
     "detected": {"qualifying", "invalidated"},
@@ -66,6 +79,29 @@ _VALID_TRANSITIONS: dict[str, set[str]] = {
     "traded": {"invalidated"},
 }
 
+_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+_DETECTION_STAGE_SECONDS = Histogram(
+    "trendedge_detection_stage_seconds", "Detection pipeline time per stage", ("stage",)
+)
+_DETECTION_CANDIDATES = Histogram(
+    "trendedge_detection_candidates",
+    "Candidate lines per detection run (generated, then surviving grading)",
+    ("direction", "outcome"),
+    buckets=_COUNT_BUCKETS,
+)
+_ALERT_EVALUATION_SECONDS = Histogram(
+    "trendedge_alert_evaluation_seconds", "Time to evaluate alerts for one user and candle"
+)
+_ALERTS = Counter("trendedge_alerts", "Alerts generated", ("alert_type",))
+
+
+def _stage_done(stage: str, started: float) -> float:
+    """Record a detection stage that began at ``started``; returns now."""
+    now = time.perf_counter()
+    _DETECTION_STAGE_SECONDS.labels(stage).observe(now - started)
+    return now
+
 
 class TrendlineService:
     """Orchestrates trendline detection pipeline and lifecycle management."""
@@ -94,6 +130,7 @@ class TrendlineService:
         8. Store qualifying trendlines with state transitions
         9. Rank and surface top-N
         """
+        stage_started = time.perf_counter()
         config = await self.get_config(user_id)
         n_bar = config["pivot_n_bar_lookback"]
         min_touch = config["min_touch_count"]
@@ -111,6 +148,7 @@ class TrendlineService:
         )
         result = await self._db.execute(stmt)
         candles = list(result.scalars().all())
+        stage_started = _stage_done("load", stage_started)
 
         if len(candles) < 2 * n_bar + 1:
             logger.info(
@@ -142,6 +180,7 @@ class TrendlineService:
         # Detect pivots
         pivot_high_indices = detect_pivot_highs(highs, n_bar)
         pivot_low_indices = detect_pivot_lows(lows, n_bar)
+        stage_started = _stage_done("pivots", stage_started)
 
         # Store pivots
         await self._store_pivots(
@@ -150,6 +189,7 @@ class TrendlineService:
         await self._store_pivots(
             instrument_id, candles, pivot_low_indices, "LOW", n_bar
         )
+        stage_started = _stage_done("store_pivots", stage_started)
 
         # Generate and score candidates for both directions
         all_trendlines: list[dict] = []
@@ -185,6 +225,8 @@ class TrendlineService:
                 candle_count=len(candles),
                 max_slope_degrees=max_slope,
             )
+            _DETECTION_CANDIDATES.labels(direction, "generated").observe(len(candidates))
+            graded_before = len(all_trendlines)
 
             for cand in candidates:
                 anchor_price = float(pivot_prices_arr[
@@ -285,6 +327,10 @@ class TrendlineService:
                     "anchor_candle_2": candles[cand.anchor_idx_2],
                 })
 
+            _DETECTION_CANDIDATES.labels(direction, "graded").observe(
+                len(all_trendlines) - graded_before
+            )
+
         # Rank by composite score and take top-N per direction
         support_lines = sorted(
             [t for t in all_trendlines if t["direction"] == "SUPPORT"],
@@ -298,6 +344,7 @@ class TrendlineService:
         )[:max_lines]
 
         selected = support_lines + resistance_lines
+        stage_started = _stage_done("candidates", stage_started)
 
         # Store trendlines
         stored_count = 0
@@ -352,6 +399,8 @@ class TrendlineService:
             stored_count += 1
 
         await self._db.commit()
+        await self.invalidate_trendline_cache((user_id, instrument_id))
+        _stage_done("store", stage_started)
 
         logger.info(
             "Detection pipeline complete",
@@ -503,6 +552,7 @@ class TrendlineService:
             reason=reason or "User dismissed",
         )
         await self._db.commit()
+        await self.invalidate_trendline_cache((user_id, trendline.instrument_id))
 
         return self._trendline_to_dict(trendline)
 
@@ -610,6 +660,7 @@ class TrendlineService:
 
         if promoted or demoted:
             await self._db.commit()
+            await self.invalidate_trendline_cache((user_id, instrument_id))
 
         logger.info(
             "Promote/demote complete",
@@ -638,7 +689,9 @@ class TrendlineService:
         trendlines = list(result.scalars().all())
 
         expired_count = 0
+        affected: set[tuple[uuid.UUID, uuid.UUID]] = set()
         for tl in trendlines:
+            affected.add((tl.user_id, tl.instrument_id))
             old_status = tl.status
             tl.status = "expired"
             await self._log_event(
@@ -652,6 +705,7 @@ class TrendlineService:
 
         if expired_count:
             await self._db.commit()
+            await self.invalidate_trendline_cache(*affected)
 
         logger.info(
             "Stale trendline expiration complete",
@@ -714,6 +768,7 @@ class TrendlineService:
 
         await self._db.commit()
         await self._db.refresh(config)
+        await self._invalidate_watchlist_trendline_cache(user_id)
 
         # Dispatch recalculation task (import here to avoid circular imports)
         try:
@@ -741,6 +796,7 @@ class TrendlineService:
                 if hasattr(config, key):
                     setattr(config, key, value)
             await self._db.commit()
+            await self._invalidate_watchlist_trendline_cache(user_id)
 
         try:
             from app.tasks.trendline_tasks import recalculate_all_trendlines
@@ -890,6 +946,15 @@ class TrendlineService:
 
         Returns list of generated alerts.
         """
+        with _ALERT_EVALUATION_SECONDS.time():
+            alerts = await self._evaluate_alerts(user_id, instrument_id, candle_id)
+        for alert in alerts:
+            _ALERTS.labels(alert["alert_type"]).inc()
+        return alerts
+
+    async def _evaluate_alerts(
+        self, user_id: uuid.UUID, instrument_id: uuid.UUID, candle_id: uuid.UUID
+    ) -> list[dict]:
         # Load the trigger candle
         candle_stmt = select(Candle).where(Candle.id == candle_id)
         candle_result = await self._db.execute(candle_stmt)
@@ -1014,6 +1079,8 @@ class TrendlineService:
 
         if alerts:
             await self._db.commit()
+            if any(a["alert_type"] == "break" for a in alerts):
+                await self.invalidate_trendline_cache((user_id, instrument_id))
 
         logger.info(
             "Alert evaluation complete",
@@ -1023,6 +1090,65 @@ class TrendlineService:
         )
         return alerts
 
+    # ------------------------------------------------------------------
+    # Trendline list response cache
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def trendline_list_cache_key(user_id: uuid.UUID, instrument_id: uuid.UUID) -> str:
+        """Cache key for a user's trendline list on one instrument."""
+        return f"{user_id}:{instrument_id}"
+
+    async def get_trendline_list(
+        self,
+        user_id: uuid.UUID,
+        instrument_id: uuid.UUID,
+        load_body: Callable[[], Awaitable[str]],
+    ) -> tuple[str, str]:
+        """Return (etag, serialized body) for a trendline list.
+
+        Served from the cache; on a miss ``load_body`` builds the serialized
+        response, once for all concurrent requests.
+        """
+
+        async def load() -> dict[str, str]:
+            body = await load_body()
+            etag = '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+            return {"etag": etag, "body": body}
+
+        entry = await get_or_load(
+            self.trendline_list_cache_key(user_id, instrument_id),
+            load,
+            ttl=_TRENDLINE_LIST_CACHE_TTL,
+            namespace=_TRENDLINE_LIST_NAMESPACE,
+            client=self._redis,
+        )
+        return entry["etag"], entry["body"]
+
+    async def invalidate_trendline_cache(
+        self, *pairs: tuple[uuid.UUID, uuid.UUID]
+    ) -> None:
+        """Drop cached trendline lists for the given (user_id, instrument_id) pairs.
+
+        Deletes exact keys in one round trip instead of pattern-scanning the
+        keyspace. Call after the change is committed.
+        """
+        if not pairs:
+            return
+        keys = [self.trendline_list_cache_key(uid, iid) for uid, iid in pairs]
+        await delete_cached(*keys, namespace=_TRENDLINE_LIST_NAMESPACE, client=self._redis)
+
+    async def _invalidate_watchlist_trendline_cache(self, user_id: uuid.UUID) -> None:
+        """Drop cached lists for every watched instrument (config changes alter list meta)."""
+        stmt = select(UserWatchlist.instrument_id).where(
+            UserWatchlist.user_id == user_id,
+            UserWatchlist.is_active == True,  # noqa: E712
+        )
+        result = await self._db.execute(stmt)
+        await self.invalidate_trendline_cache(
+            *((user_id, row[0]) for row in result.all())
+        )
+
     # ------------------------------------------------------------------
     # Event logging
     # ------------------------------------------------------------------
@@ -1037,15 +1163,16 @@ class TrendlineService:
         trigger_candle_id: uuid.UUID | None = None,
     ) -> None:
         """Insert a trendline_events record."""
-        event = TrendlineEvent(
-            trendline_id=trendline_id,
-            event_type=event_type,
-            old_value=old_value,
-            new_value=new_value,
-            reason=reason,
-            trigger_candle_id=trigger_candle_id,
-        )
-        self._db.add(event)
+        row = {
+            "trendline_id": trendline_id,
+            "event_type": event_type,
+            "old_value": old_value,
+            "new_value": new_value,
+            "reason": reason,
+            "trigger_candle_id": trigger_candle_id,
+        }
+        if not stage_audit(self._db, TrendlineEvent, row):
+            self._db.add(TrendlineEvent(**row))
 
     # ------------------------------------------------------------------
     # Private helpers
@@ -63,8 +63,11 @@ celery_app.conf.update(
         "app.tasks.trendline_tasks.evaluate_*": {"queue": "alerts"},
         "app.tasks.trendline_tasks.gap_*": {"queue": "low"},
         "app.tasks.execution_tasks.process_signal": {"queue": "high"},
+        "app.tasks.execution_tasks.sweep_signal_outbox": {"queue": "high"},
         "app.tasks.execution_tasks.monitor_paper_positions": {"queue": "detection"},
         "app.tasks.execution_tasks.reconcile_fills": {"queue": "default"},
+        "app.tasks.execution_tasks.reconcile_exposure_ledgers": {"queue": "low"},
+        "app.tasks.execution_tasks.flush_api_key_usage": {"queue": "low"},
     },
     # Task autodiscovery
     include=["app.tasks.trendline_tasks", "app.tasks.execution_tasks"],
@@ -78,13 +81,21 @@ celery_app.conf.update(
             "task": "app.tasks.trendline_tasks.gap_detection_and_fill",
             "schedule": crontab(minute=0, hour=6),
         },
-        "monitor_paper_positions": {
-            "task": "app.tasks.execution_tasks.monitor_paper_positions",
-            "schedule": 5.0,  # every 5 seconds
+        "sweep_signal_outbox": {
+            "task": "app.tasks.execution_tasks.sweep_signal_outbox",
+            "schedule": 30.0,  # seconds
         },
         "reconcile_fills": {
             "task": "app.tasks.execution_tasks.reconcile_fills",
             "schedule": crontab(minute="*/5"),  # every 5 minutes
         },
+        "reconcile_exposure_ledgers": {
+            "task": "app.tasks.execution_tasks.reconcile_exposure_ledgers",
+            "schedule": crontab(minute="*/10"),  # every 10 minutes
+        },
+        "flush_api_key_usage": {
+            "task": "app.tasks.execution_tasks.flush_api_key_usage",
+            "schedule": 60.0,  # seconds
+        },
     },
 )
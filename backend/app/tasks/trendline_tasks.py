@@ -2,22 +2,20 @@
 
 from __future__ import annotations
 
-import asyncio
 import uuid
 
 from app.core.logging import get_logger
+from app.core.metrics import Histogram
 from app.tasks.celery_app import celery_app
+from app.tasks.worker import run_async, worker_redis
 
 logger = get_logger("trendedge.trendline_tasks")
 
-
-def _run_async(coro):
-    """Run an async coroutine from a sync Celery task."""
-    loop = asyncio.new_event_loop()
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
+_ALERT_FANOUT = Histogram(
+    "trendedge_alert_fanout",
+    "Alert evaluations dispatched per new candle (one per watching user)",
+    buckets=(0, 1, 5, 10, 50, 100, 500, 1000, 5000),
+)
 
 
 @celery_app.task(
@@ -73,7 +71,7 @@ def ingest_candles(self):
             )
 
     try:
-        _run_async(_run())
+        run_async(_run())
     except Exception as exc:
         logger.error("ingest_candles task failed", exc_info=True)
         raise self.retry(exc=exc) from exc
@@ -90,10 +88,8 @@ def detect_trendlines_incremental(self, instrument_id: str):
     """Triggered by new candle. Runs detection for all users watching this instrument."""
 
     async def _run():
-        from redis.asyncio import Redis
         from sqlalchemy import select
 
-        from app.core.config import settings
         from app.db.models.user_watchlist import UserWatchlist
         from app.db.session import AsyncSessionLocal
         from app.services.trendline_service import TrendlineService
@@ -101,57 +97,57 @@ def detect_trendlines_incremental(self, instrument_id: str):
         instrument_uuid = uuid.UUID(instrument_id)
 
         async with AsyncSessionLocal() as db:
-            redis = Redis.from_url(settings.UPSTASH_REDIS_URL, decode_responses=True)
-            try:
-                # Find all users watching this instrument
-                stmt = select(UserWatchlist.user_id).where(
-                    UserWatchlist.instrument_id == instrument_uuid,
-                    UserWatchlist.is_active == True,  # noqa: E712
-                )
-                result = await db.execute(stmt)
-                user_ids = [row[0] for row in result.all()]
-
-                for uid in user_ids:
-                    try:
-                        svc = TrendlineService(db, redis)
-                        count = await svc.detect_trendlines(uid, instrument_uuid)
-                        logger.info(
-                            "Incremental detection complete",
-                            user_id=str(uid),
-                            instrument_id=instrument_id,
-                            trendlines=count,
-                        )
+            redis = worker_redis()
+            # Find all users watching this instrument
+            stmt = select(UserWatchlist.user_id).where(
+                UserWatchlist.instrument_id == instrument_uuid,
+                UserWatchlist.is_active == True,  # noqa: E712
+            )
+            result = await db.execute(stmt)
+            user_ids = [row[0] for row in result.all()]
 
-                        # Trigger alert evaluation for the latest candle
-                        from app.db.models.candle import Candle
-
-                        latest_stmt = (
-                            select(Candle.id)
-                            .where(
-                                Candle.instrument_id == instrument_uuid,
-                                Candle.timeframe == "1D",
-                            )
-                            .order_by(Candle.timestamp.desc())
-                            .limit(1)
+            fanout = 0
+            for uid in user_ids:
+                try:
+                    svc = TrendlineService(db, redis)
+                    count = await svc.detect_trendlines(uid, instrument_uuid)
+                    logger.info(
+                        "Incremental detection complete",
+                        user_id=str(uid),
+                        instrument_id=instrument_id,
+                        trendlines=count,
+                    )
+
+                    # Trigger alert evaluation for the latest candle
+                    from app.db.models.candle import Candle
+
+                    latest_stmt = (
+                        select(Candle.id)
+                        .where(
+                            Candle.instrument_id == instrument_uuid,
+                            Candle.timeframe == "1D",
                         )
-                        latest_result = await db.execute(latest_stmt)
-                        latest_candle_id = latest_result.scalar_one_or_none()
-                        if latest_candle_id:
-                            evaluate_alerts_task.delay(
-                                str(uid), instrument_id, str(latest_candle_id)
-                            )
-                    except Exception:
-                        logger.error(
-                            "Detection failed for user",
-                            user_id=str(uid),
-                            instrument_id=instrument_id,
-                            exc_info=True,
+                        .order_by(Candle.timestamp.desc())
+                        .limit(1)
+                    )
+                    latest_result = await db.execute(latest_stmt)
+                    latest_candle_id = latest_result.scalar_one_or_none()
+                    if latest_candle_id:
+                        evaluate_alerts_task.delay(
+                            str(uid), instrument_id, str(latest_candle_id)
                         )
-            finally:
-                await redis.aclose()
+                        fanout += 1
+                except Exception:
+                    logger.error(
+                        "Detection failed for user",
+                        user_id=str(uid),
+                        instrument_id=instrument_id,
+                        exc_info=True,
+                    )
+            _ALERT_FANOUT.observe(fanout)
 
     try:
-        _run_async(_run())
+        run_async(_run())
     except Exception as exc:
         logger.error(
             "detect_trendlines_incremental task failed",
@@ -172,34 +168,28 @@ def evaluate_alerts_task(self, user_id: str, instrument_id: str, candle_id: str)
     """Check for breaks/touches, create alert records."""
 
     async def _run():
-        from redis.asyncio import Redis
-
-        from app.core.config import settings
         from app.db.session import AsyncSessionLocal
         from app.services.trendline_service import TrendlineService
 
         async with AsyncSessionLocal() as db:
-            redis = Redis.from_url(settings.UPSTASH_REDIS_URL, decode_responses=True)
-            try:
-                svc = TrendlineService(db, redis)
-                alerts = await svc.evaluate_alerts(
-                    uuid.UUID(user_id),
-                    uuid.UUID(instrument_id),
-                    uuid.UUID(candle_id),
+            redis = worker_redis()
+            svc = TrendlineService(db, redis)
+            alerts = await svc.evaluate_alerts(
+                uuid.UUID(user_id),
+                uuid.UUID(instrument_id),
+                uuid.UUID(candle_id),
+            )
+            if alerts:
+                logger.info(
+                    "Alerts generated",
+                    user_id=user_id,
+                    instrument_id=instrument_id,
+                    alert_count=len(alerts),
+                    alert_types=[a["alert_type"] for a in alerts],
                 )
-                if alerts:
-                    logger.info(
-                        "Alerts generated",
-                        user_id=user_id,
-                        instrument_id=instrument_id,
-                        alert_count=len(alerts),
-                        alert_types=[a["alert_type"] for a in alerts],
-                    )
-            finally:
-                await redis.aclose()
 
     try:
-        _run_async(_run())
+        run_async(_run())
     except Exception as exc:
         logger.error(
             "evaluate_alerts_task failed",
@@ -222,10 +212,8 @@ def recalculate_all_trendlines(self, user_id: str):
     """Triggered by config change. Full recalculation for user's watchlist."""
 
     async def _run():
-        from redis.asyncio import Redis
         from sqlalchemy import select
 
-        from app.core.config import settings
         from app.db.models.user_watchlist import UserWatchlist
         from app.db.session import AsyncSessionLocal
         from app.services.trendline_service import TrendlineService
@@ -233,47 +221,44 @@ def recalculate_all_trendlines(self, user_id: str):
         user_uuid = uuid.UUID(user_id)
 
         async with AsyncSessionLocal() as db:
-            redis = Redis.from_url(settings.UPSTASH_REDIS_URL, decode_responses=True)
-            try:
-                # Get user's active watchlist
-                stmt = select(UserWatchlist.instrument_id).where(
-                    UserWatchlist.user_id == user_uuid,
-                    UserWatchlist.is_active == True,  # noqa: E712
-                )
-                result = await db.execute(stmt)
-                instrument_ids = [row[0] for row in result.all()]
-
-                total = 0
-                for inst_id in instrument_ids:
-                    try:
-                        svc = TrendlineService(db, redis)
-                        count = await svc.detect_trendlines(user_uuid, inst_id)
-                        total += count
-                        logger.info(
-                            "Recalculated trendlines",
-                            user_id=user_id,
-                            instrument_id=str(inst_id),
-                            trendlines=count,
-                        )
-                    except Exception:
-                        logger.error(
-                            "Recalculation failed for instrument",
-                            user_id=user_id,
-                            instrument_id=str(inst_id),
-                            exc_info=True,
-                        )
+            redis = worker_redis()
+            # Get user's active watchlist
+            stmt = select(UserWatchlist.instrument_id).where(
+                UserWatchlist.user_id == user_uuid,
+                UserWatchlist.is_active == True,  # noqa: E712
+            )
+            result = await db.execute(stmt)
+            instrument_ids = [row[0] for row in result.all()]
 
-                logger.info(
-                    "Full recalculation complete",
-                    user_id=user_id,
-                    instruments=len(instrument_ids),
-                    total_trendlines=total,
-                )
-            finally:
-                await redis.aclose()
+            total = 0
+            for inst_id in instrument_ids:
+                try:
+                    svc = TrendlineService(db, redis)
+                    count = await svc.detect_trendlines(user_uuid, inst_id)
+                    total += count
+                    logger.info(
+                        "Recalculated trendlines",
+                        user_id=user_id,
+                        instrument_id=str(inst_id),
+                        trendlines=count,
+                    )
+                except Exception:
+                    logger.error(
+                        "Recalculation failed for instrument",
+                        user_id=user_id,
+                        instrument_id=str(inst_id),
+                        exc_info=True,
+                    )
+
+            logger.info(
+                "Full recalculation complete",
+                user_id=user_id,
+                instruments=len(instrument_ids),
+                total_trendlines=total,
+            )
 
     try:
-        _run_async(_run())
+        run_async(_run())
     except Exception as exc:
         logger.error(
             "recalculate_all_trendlines task failed",
@@ -294,9 +279,6 @@ def bootstrap_instrument_task(self, user_id: str, instrument_id: str):
     """On watchlist add: fetch historical data + run initial detection."""
 
     async def _run():
-        from redis.asyncio import Redis
-
-        from app.core.config import settings
         from app.db.session import AsyncSessionLocal
         from app.services.market_data_service import MarketDataService
         from app.services.trendline_service import TrendlineService
@@ -323,21 +305,18 @@ def bootstrap_instrument_task(self, user_id: str, instrument_id: str):
                 return
 
             # Step 2: Run initial detection
-            redis = Redis.from_url(settings.UPSTASH_REDIS_URL, decode_responses=True)
-            try:
-                tl_svc = TrendlineService(db, redis)
-                tl_count = await tl_svc.detect_trendlines(user_uuid, instrument_uuid)
-                logger.info(
-                    "Bootstrap detection complete",
-                    user_id=user_id,
-                    instrument_id=instrument_id,
-                    trendlines=tl_count,
-                )
-            finally:
-                await redis.aclose()
+            redis = worker_redis()
+            tl_svc = TrendlineService(db, redis)
+            tl_count = await tl_svc.detect_trendlines(user_uuid, instrument_uuid)
+            logger.info(
+                "Bootstrap detection complete",
+                user_id=user_id,
+                instrument_id=instrument_id,
+                trendlines=tl_count,
+            )
 
     try:
-        _run_async(_run())
+        run_async(_run())
     except Exception as exc:
         logger.error(
             "bootstrap_instrument_task failed",
@@ -400,7 +379,7 @@ def gap_detection_and_fill(self):
             )
 
     try:
-        _run_async(_run())
+        run_async(_run())
     except Exception as exc:
         logger.error("gap_detection_and_fill task failed", exc_info=True)
         raise self.retry(exc=exc) from exc
@@ -0,0 +1,208 @@
+"""Per-process async runtime for Celery workers.
+
+Every prefork child gets one event loop for its whole life, created on
+``worker_process_init``. Tasks run their coroutines on it through
+``run_async``, so the SQLAlchemy engine pool, the shared Redis pool
+(``worker_redis``) and the broker adapters' keep-alive HTTP clients
+(``app.adapters.pool.adapter_pool``) keep their connections from one task to
+the next instead of being rebuilt for a fresh loop each time.
+``worker_process_shutdown`` closes them before the child exits (including the
+recycle after ``worker_max_tasks_per_child``). Audit rows staged for
+write-behind (``app.services.audit_buffer``) are flushed, post-commit
+exposure ledger updates finished, and the pool's cached broker connection
+rows forgotten, after every task.
+
+Each task run is also an instrumentation scope (``app.core.instrumentation``):
+its SQL statements and Redis round trips are logged when it finishes and
+added to the per-task metrics, next to its duration, retries and queue wait
+(publishers stamp ``published_at`` into the message headers).
+
+Pools without those signals (``--pool solo``, eager mode in tests) get the
+same runtime lazily on the first ``run_async`` call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Coroutine
+from contextvars import Token
+from datetime import datetime
+from typing import Any, TypeVar
+
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    task_retry,
+    worker_process_init,
+    worker_process_shutdown,
+)
+from redis.asyncio import Redis
+
+from app.core import instrumentation
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core.metrics import Counter, Histogram, write_snapshot
+
+logger = get_logger("trendedge.worker")
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_redis: Redis | None = None
+_task_scopes: dict[str, tuple[instrumentation.QueryStats, Token, float]] = {}
+
+_TASK_RUNS = Counter("trendedge_task_runs", "Celery task runs by final state", ("task", "state"))
+_TASK_RETRIES = Counter("trendedge_task_retries", "Celery task retries", ("task",))
+_TASK_SECONDS = Histogram("trendedge_task_duration_seconds", "Celery task run time", ("task",))
+_TASK_QUEUE_WAIT = Histogram(
+    "trendedge_task_queue_wait_seconds",
+    "Time from publish (or ETA) to a worker starting the task",
+    ("task",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+
+@worker_process_init.connect
+def init_worker(**_: Any) -> None:
+    """Create this process's event loop and shared clients."""
+    global _loop, _redis
+    from app.db.session import engine
+
+    # Connections inherited through fork belong to the parent; drop them
+    # without closing the parent's sockets.
+    engine.sync_engine.dispose(close=False)
+
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+    instrumentation.instrument_redis()
+    _redis = Redis.from_url(
+        settings.UPSTASH_REDIS_URL,
+        decode_responses=True,
+        socket_timeout=5,
+        socket_connect_timeout=5,
+        retry_on_timeout=True,
+        max_connections=20,
+    )
+    from app.services.audit_buffer import start_audit_buffer
+
+    start_audit_buffer(_redis, background=False)  # flushed after every task
+    logger.info("Worker runtime initialized")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker(**_: Any) -> None:
+    """Close the shared clients and the event loop."""
+    global _loop, _redis
+    if _loop is None:
+        return
+    try:
+        _loop.run_until_complete(_close_clients())
+    except Exception:
+        logger.warning("Worker runtime shutdown failed", exc_info=True)
+    finally:
+        write_snapshot(force=True)
+        _loop.close()
+        asyncio.set_event_loop(None)
+        _loop = None
+        _redis = None
+        logger.info("Worker runtime closed")
+
+
+async def _close_clients() -> None:
+    from app.adapters.pool import adapter_pool
+    from app.db.session import engine
+    from app.services.audit_buffer import stop_audit_buffer
+
+    await stop_audit_buffer()
+    await adapter_pool.close()
+    if _redis is not None:
+        await _redis.aclose()
+    await engine.dispose()
+
+
+@before_task_publish.connect
+def _stamp_published_at(headers: dict | None = None, **_: Any) -> None:
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+@task_prerun.connect
+def _open_task_scope(task_id: str | None = None, task: Any = None, **_: Any) -> None:
+    stats, token = instrumentation.open_scope()
+    _task_scopes[task_id] = (stats, token, time.perf_counter())
+    if task is not None:
+        wait = _queue_wait(task.request)
+        if wait is not None:
+            _TASK_QUEUE_WAIT.labels(task.name).observe(wait)
+
+
+def _queue_wait(request: Any) -> float | None:
+    published_at = getattr(request, "published_at", None)
+    if published_at is None:
+        return None
+    ready_at = float(published_at)
+    eta = getattr(request, "eta", None)
+    if eta:  # a countdown is not queueing
+        try:
+            ready_at = max(ready_at, datetime.fromisoformat(str(eta)).timestamp())
+        except ValueError:
+            pass
+    return max(0.0, time.time() - ready_at)
+
+
+@task_retry.connect
+def _count_retry(sender: Any = None, **_: Any) -> None:
+    _TASK_RETRIES.labels(getattr(sender, "name", "unknown")).inc()
+
+
+@task_postrun.connect
+def _close_task_scope(
+    task_id: str | None = None, task: Any = None, state: str | None = None, **_: Any
+) -> None:
+    scope = _task_scopes.pop(task_id, None)
+    if scope is None:
+        return
+    stats, token, started = scope
+    duration = time.perf_counter() - started
+    instrumentation.close_scope(token)
+    name = getattr(task, "name", "unknown")
+    _TASK_RUNS.labels(name, state or "UNKNOWN").inc()
+    _TASK_SECONDS.labels(name).observe(duration)
+    instrumentation.report(stats, "task", name)
+    write_snapshot()
+    logger.info(
+        "Task completed",
+        task=name,
+        task_id=task_id,
+        state=state,
+        duration_ms=round(duration * 1000, 2),
+        **stats.log_fields(),
+    )
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """Run an async coroutine from a sync Celery task on the process loop."""
+    from app.adapters.pool import adapter_pool
+    from app.services.audit_buffer import flush_audit_buffer
+    from app.services.execution_service import drain_ledger_updates
+
+    if _loop is None or _loop.is_closed():
+        init_worker()
+    try:
+        return _loop.run_until_complete(coro)
+    finally:
+        # Between tasks nothing runs on the loop, so publish audit rows and
+        # finish post-commit exposure ledger updates now. Workers miss the
+        # pool's invalidation broadcasts, so its connection rows last one task.
+        _loop.run_until_complete(drain_ledger_updates())
+        _loop.run_until_complete(flush_audit_buffer())
+        adapter_pool.forget_connections()
+
+
+def worker_redis() -> Redis:
+    """The Redis client shared by every task in this process. Do not close it."""
+    if _redis is None:
+        init_worker()
+    return _redis
@@ -0,0 +1,118 @@
+"""Benchmark: order throughput with inline vs. write-behind audit rows.
+
+Usage:
+    python -m tests.benchmarks.bench_audit_write_behind [--orders 2000] [--accounts 4] [--rtt 1.0]
+
+Runs concurrent order transactions against a few hot accounts. Each
+transaction holds its account's row lock (modelled as an ``asyncio.Lock``)
+from the first write until commit, like the position and risk-state updates
+do in Postgres. Inline, the transaction also pays one round trip per audit
+INSERT (order events, risk check rows) under that lock. Write-behind, the rows
+are staged with the real ``stage_audit`` and published after commit by the
+real ``AuditBuffer`` over a simulated Redis pipeline. Every database or Redis
+round trip costs ``--rtt`` milliseconds.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+from unittest.mock import patch
+
+import structlog
+from sqlalchemy.orm import Session
+
+from app.db.models.order_event import OrderEvent
+from app.services import audit_buffer
+from app.services.audit_buffer import stage_audit
+
+_BUSINESS_ROUND_TRIPS = 4  # order insert, position update, risk state, commit
+_AUDIT_ROWS = 9  # 7 risk check rows + 2 order events per order
+_CONCURRENCY = 32
+
+
+class _FakePipeline:
+    def __init__(self, rtt: float) -> None:
+        self._rtt = rtt
+
+    async def __aenter__(self) -> _FakePipeline:
+        return self
+
+    async def __aexit__(self, *exc) -> bool:
+        return False
+
+    def xadd(self, *args, **kwargs) -> None:
+        pass
+
+    async def execute(self) -> None:
+        await asyncio.sleep(self._rtt)
+
+
+class _FakeRedis:
+    def __init__(self, rtt: float) -> None:
+        self._rtt = rtt
+
+    def pipeline(self, transaction: bool = True) -> _FakePipeline:
+        return _FakePipeline(self._rtt)
+
+
+def _audit_rows(order_id: uuid.UUID) -> list[dict]:
+    return [
+        {"order_id": order_id, "previous_state": None, "new_state": "SUBMITTED"}
+        for _ in range(_AUDIT_ROWS)
+    ]
+
+
+async def run(orders: int, accounts: int, rtt: float, write_behind: bool) -> tuple[float, float]:
+    locks = [asyncio.Lock() for _ in range(accounts)]
+    holds: list[float] = []
+    gate = asyncio.Semaphore(_CONCURRENCY)
+    session = Session()  # only its .info and commit events are used
+
+    async def order(n: int) -> None:
+        async with gate, locks[n % accounts]:
+            acquired = time.perf_counter()
+            order_id = uuid.uuid4()
+            await asyncio.sleep(_BUSINESS_ROUND_TRIPS * rtt)
+            if write_behind:
+                stage_audit(session, OrderEvent, _audit_rows(order_id))
+                session.commit()
+            else:
+                await asyncio.sleep(_AUDIT_ROWS * rtt)
+            holds.append(time.perf_counter() - acquired)
+
+    started = time.perf_counter()
+    if write_behind:
+        with patch("app.services.audit_buffer.settings.AUDIT_WRITE_BEHIND", True):
+            audit_buffer.start_audit_buffer(_FakeRedis(rtt), session_factory=None)
+        await asyncio.gather(*(order(n) for n in range(orders)))
+        await audit_buffer.stop_audit_buffer()
+    else:
+        await asyncio.gather(*(order(n) for n in range(orders)))
+    elapsed = time.perf_counter() - started
+    return orders / elapsed, statistics.median(holds) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--accounts", type=int, default=4, help="hot rows contended for")
+    parser.add_argument("--rtt", type=float, default=1.0, help="ms per DB/Redis round trip")
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    rtt = args.rtt / 1000
+    print(f"{args.orders} orders over {args.accounts} accounts, {args.rtt} ms per round trip")
+    for name, write_behind in (("inline", False), ("write-behind", True)):
+        rate, hold = asyncio.run(run(args.orders, args.accounts, rtt, write_behind))
+        print(f"  {name:<13} {rate:9.0f} orders/s   lock held p50 {hold:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
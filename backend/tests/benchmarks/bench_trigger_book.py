@@ -0,0 +1,105 @@
+"""Benchmark: trigger book vs. scanning every pending order.
+
+Usage:
+    python -m tests.benchmarks.bench_trigger_book [--orders 100000]
+
+Rests N bracket legs (OCO pairs) spread over a few symbols, then replays a
+random walk of price ticks through both the trigger book and the linear scan
+the paper adapter used before. Both must fire the same orders.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+from app.adapters.trigger_book import FIRES_AT_OR_ABOVE, FIRES_AT_OR_BELOW, TriggerBook
+
+_SYMBOLS = ["MNQ", "MES", "MYM", "M2K"]
+_TICKS = 2_000
+
+
+def _make_orders(count: int, rng: random.Random) -> list[tuple[str, str, float, str, str]]:
+    orders = []
+    for i in range(count // 2):
+        symbol = rng.choice(_SYMBOLS)
+        entry = 100.0 + rng.uniform(-5, 5)
+        width = rng.uniform(0.5, 20.0)
+        orders.append((f"{i}:sl", symbol, entry - width, FIRES_AT_OR_BELOW, f"{i}:tp"))
+        orders.append((f"{i}:tp", symbol, entry + width, FIRES_AT_OR_ABOVE, f"{i}:sl"))
+    return orders
+
+
+def _ticks(rng: random.Random) -> list[tuple[str, float]]:
+    prices = dict.fromkeys(_SYMBOLS, 100.0)
+    ticks = []
+    for _ in range(_TICKS):
+        symbol = rng.choice(_SYMBOLS)
+        prices[symbol] += rng.gauss(0, 0.25)
+        ticks.append((symbol, prices[symbol]))
+    return ticks
+
+
+def run_book(orders, ticks) -> tuple[float, set[str]]:
+    book = TriggerBook()
+    for order_id, symbol, price, direction, _ in orders:
+        book.add(order_id, symbol, price, direction)
+    for order_id, _, _, _, partner in orders[::2]:
+        book.link_oco(order_id, partner)
+
+    fired: set[str] = set()
+    start = time.perf_counter()
+    for symbol, price in ticks:
+        fired.update(e.order_id for e in book.on_price(symbol, price).fired)
+    return time.perf_counter() - start, fired
+
+
+def run_scan(orders, ticks) -> tuple[float, set[str]]:
+    pending = {
+        order_id: (symbol, price, direction, partner)
+        for order_id, symbol, price, direction, partner in orders
+    }
+
+    fired: set[str] = set()
+    start = time.perf_counter()
+    for tick_symbol, tick_price in ticks:
+        hits, cancels = [], []
+        for order_id, (symbol, price, direction, partner) in pending.items():
+            if symbol != tick_symbol or order_id in cancels:
+                continue
+            if direction == FIRES_AT_OR_BELOW:
+                crossed = tick_price <= price
+            else:
+                crossed = tick_price >= price
+            if crossed:
+                hits.append(order_id)
+                cancels.append(partner)
+        for order_id in hits + cancels:
+            pending.pop(order_id, None)
+        fired.update(hits)
+    return time.perf_counter() - start, fired
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    orders = _make_orders(args.orders, rng)
+    ticks = _ticks(rng)
+
+    book_time, book_fired = run_book(orders, ticks)
+    scan_time, scan_fired = run_scan(orders, ticks)
+    assert book_fired == scan_fired, "trigger book and scan disagree"
+
+    print(f"{len(orders)} resting orders, {len(ticks)} ticks, {len(book_fired)} fills")
+    print(f"  linear scan:  {scan_time * 1e6 / len(ticks):10.1f} us/tick")
+    print(f"  trigger book: {book_time * 1e6 / len(ticks):10.1f} us/tick")
+    print(f"  speedup:      {scan_time / book_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Benchmark: webhook-to-submitted latency, fast path vs. Celery dispatch.
+
+Usage:
+    python -m tests.benchmarks.bench_webhook_latency [--signals 500] [--rate 200] [--rtt 1.0]
+
+Replays a steady stream of accepted signals through the real
+``FastPathExecutor`` and through a model of the Celery route (broker hop,
+then the task on its worker's loop, including instrument re-validation).
+Database and Redis round trips are simulated with ``--rtt`` milliseconds of
+latency each, so the numbers compare dispatch overhead, not Postgres.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import structlog
+
+from app.services.fast_path import FastPathExecutor
+
+_TARGET_P99_MS = 50.0
+_EXECUTE_ROUND_TRIPS = 12  # risk settings, checks, bracket insert, adapter, commit
+
+
+class _FakeResult:
+    def scalar_one_or_none(self) -> SimpleNamespace:
+        return SimpleNamespace(id=uuid.uuid4())
+
+
+class _FakeSession:
+    def __init__(self, rtt: float) -> None:
+        self._rtt = rtt
+
+    async def execute(self, *args, **kwargs) -> _FakeResult:
+        await asyncio.sleep(self._rtt)
+        return _FakeResult()
+
+
+def _percentiles(latencies: list[float]) -> tuple[float, float]:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered) * 1000, p99 * 1000
+
+
+async def run_fast_path(signals: int, rate: float, rtt: float, workers: int) -> list[float]:
+    @asynccontextmanager
+    async def session_factory():
+        yield _FakeSession(rtt)
+
+    started: dict[uuid.UUID, float] = {}
+    latencies: list[float] = []
+
+    async def execute(self, signal, contract_spec=None):
+        await asyncio.sleep(_EXECUTE_ROUND_TRIPS * rtt)
+        return "EXECUTING"
+
+    executor = FastPathExecutor(session_factory, None, workers=workers)
+    original = executor.execute
+
+    async def timed(signal_id, contract_spec=None):
+        status = await original(signal_id, contract_spec)
+        latencies.append(time.perf_counter() - started[signal_id])
+        return status
+
+    with patch("app.services.fast_path.SignalExecutor.execute", execute):
+        executor.execute = timed
+        executor.start()
+        for _ in range(signals):
+            signal_id = uuid.uuid4()
+            started[signal_id] = time.perf_counter()
+            if not executor.submit(signal_id):
+                raise RuntimeError("fast path queue overflowed; lower --rate")
+            await asyncio.sleep(1 / rate)
+        await executor.stop()
+    return latencies
+
+
+def run_celery(
+    signals: int, rate: float, rtt: float, concurrency: int, broker_hop: float
+) -> list[float]:
+    loops = threading.local()
+
+    async def task() -> None:
+        await asyncio.sleep(rtt)  # claim_signal
+        await asyncio.sleep(rtt)  # validate_instrument
+        await asyncio.sleep(_EXECUTE_ROUND_TRIPS * rtt)
+
+    def worker(enqueued: float) -> float:
+        time.sleep(broker_hop)  # publish + worker fetch
+        if not hasattr(loops, "loop"):  # app.tasks.worker: one loop per process
+            loops.loop = asyncio.new_event_loop()
+        loops.loop.run_until_complete(task())
+        return time.perf_counter() - enqueued
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(signals):
+            futures.append(pool.submit(worker, time.perf_counter()))
+            time.sleep(1 / rate)
+    return [f.result() for f in futures]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signals", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=200.0, help="signals per second")
+    parser.add_argument("--rtt", type=float, default=1.0, help="ms per DB/Redis round trip")
+    parser.add_argument("--broker-hop", type=float, default=5.0, help="ms Celery broker hop")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    structlog.configure(
+        wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING)
+    )
+
+    rtt = args.rtt / 1000
+    fast = asyncio.run(run_fast_path(args.signals, args.rate, rtt, args.workers))
+    celery = run_celery(args.signals, args.rate, rtt, args.workers, args.broker_hop / 1000)
+
+    print(f"{args.signals} signals at {args.rate:.0f}/s, {args.rtt} ms per round trip")
+    for name, latencies in (("celery", celery), ("fast path", fast)):
+        p50, p99 = _percentiles(latencies)
+        print(f"  {name:<10} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms")
+    _, fast_p99 = _percentiles(fast)
+    verdict = "PASS" if fast_p99 <= _TARGET_P99_MS else "FAIL"
+    print(f"  target p99 <= {_TARGET_P99_MS:.0f} ms: {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -106,6 +106,7 @@ class MockDBSession:
         self._added: list = []
         self._execute_results: list = []
         self._execute_idx = 0
+        self.info: dict = {}
 
     def add(self, obj):
         self._added.append(obj)
@@ -126,7 +127,7 @@ class MockDBSession:
     def push_result(self, result):
         self._execute_results.append(result)
 
-    async def execute(self, stmt):
+    async def execute(self, stmt, params=None):
         if self._execute_idx < len(self._execute_results):
             result = self._execute_results[self._execute_idx]
             self._execute_idx += 1
@@ -178,46 +179,25 @@ class TestExecutionPipeline:
         # ------ Risk checks ------
         risk_svc = RiskService(mock_db, mock_redis)
 
-        # We need mock results for each risk check DB query:
+        # Exposure comes from the reconciled Redis ledger: no positions.
+        mock_redis.hgetall.return_value = {
+            "ready": "1",
+            "day": datetime.now(UTC).date().isoformat(),
+            "open_total": "0",
+        }
+
+        # run_all_checks DB reads (registry not loaded):
         # 1. _get_contract_spec
         spec_result = MagicMock()
         spec_result.scalar_one_or_none.return_value = spec
 
-        # 2. check_max_position_size (count open positions)
-        count_result1 = MagicMock()
-        count_result1.scalar.return_value = 0
-
-        # 3. check_daily_loss_limit (realized losses)
-        loss_result1 = MagicMock()
-        loss_result1.scalar.return_value = Decimal("0")
-
-        # 4. check_daily_loss_limit (unrealized losses)
-        loss_result2 = MagicMock()
-        loss_result2.scalar.return_value = Decimal("0")
-
-        # 5. check_max_concurrent_positions
-        count_result2 = MagicMock()
-        count_result2.scalar.return_value = 0
-
-        # 6. check_correlation -> _normalize_symbol
+        # 2. check_correlation -> _normalize_symbol
         norm_result = MagicMock()
         norm_result.scalar_one_or_none.return_value = spec
 
-        # 7. check_correlation -> open positions
-        open_result = MagicMock()
-        open_result.all.return_value = []
-
-        mock_db.push_result(spec_result)     # _get_contract_spec
-        mock_db.push_result(count_result1)   # max_position_size
-        mock_db.push_result(loss_result1)    # daily_loss realized
-        mock_db.push_result(loss_result2)    # daily_loss unrealized
-        mock_db.push_result(count_result2)   # max_concurrent
-        # min_risk_reward: no DB calls
-        mock_db.push_result(norm_result)     # correlation -> normalize
-        mock_db.push_result(open_result)     # correlation -> open positions
-        # max_single_trade_risk: no DB calls
-        # trading_hours: no DB calls
-        # staleness: no DB calls
+        mock_db.push_result(spec_result)      # _get_contract_spec
+        mock_db.push_result(norm_result)      # correlation -> normalize
+        # All other checks evaluate against the snapshot; audits are one INSERT.
 
         check_results = await risk_svc.run_all_checks(signal, settings)
 
@@ -245,26 +225,17 @@ class TestExecutionPipeline:
         spec_result = MagicMock()
         spec_result.scalar_one_or_none.return_value = spec
 
-        # max_position_size: 0 current
-        count_result1 = MagicMock()
-        count_result1.scalar.return_value = 0
-
-        # daily_loss: 0 realized
-        loss_result1 = MagicMock()
-        loss_result1.scalar.return_value = Decimal("0")
-        # daily_loss: 0 unrealized
-        loss_result2 = MagicMock()
-        loss_result2.scalar.return_value = Decimal("0")
-
-        # max_concurrent: already at 3
-        count_result2 = MagicMock()
-        count_result2.scalar.return_value = 3
+        # Ledger: no positions for this symbol, already at 3 open overall
+        mock_redis.hgetall.return_value = {
+            "ready": "1",
+            "day": datetime.now(UTC).date().isoformat(),
+            "open_total": "3",
+            "open:ES": "1",
+            "open:YM": "1",
+            "open:GC": "1",
+        }
 
         mock_db.push_result(spec_result)
-        mock_db.push_result(count_result1)
-        mock_db.push_result(loss_result1)
-        mock_db.push_result(loss_result2)
-        mock_db.push_result(count_result2)
 
         check_results = await risk_svc.run_all_checks(signal, settings)
 
@@ -299,7 +270,7 @@ class TestExecutionPipeline:
 
         # For _finalize_position: contract spec lookup
         spec_result = MagicMock()
-        spec_result.scalar_one_or_none.return_value = spec
+        spec_result.scalars.return_value.all.return_value = [spec]
         mock_db.push_result(spec_result)
 
         await exec_svc._finalize_position(position, 18520.0, "MANUAL")
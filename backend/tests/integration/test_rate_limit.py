@@ -0,0 +1,45 @@
+"""Integration tests for the GCRA Lua script against a real Redis."""
+
+from __future__ import annotations
+
+import uuid
+
+from redis.asyncio import Redis
+
+from app.core.rate_limit import acquire
+from tests.conftest import requires_redis
+
+
+@requires_redis
+async def test_gcra_burst_then_reject(test_redis_url: str) -> None:
+    """A fresh key allows exactly the limit, then rejects without consuming."""
+    redis = Redis.from_url(test_redis_url, decode_responses=True)
+    key = f"ratelimit:test:{uuid.uuid4().hex}"
+    try:
+        results = [await acquire(redis, key, 5, 60) for _ in range(7)]
+        assert [r.allowed for r in results] == [True] * 5 + [False] * 2
+        assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+        assert 1 <= results[5].retry_after <= 12
+        assert results[5].retry_after == results[6].retry_after
+        assert await redis.type(f"{key}:gcra") == "string"
+        assert 0 < await redis.pttl(f"{key}:gcra") <= 60_000
+    finally:
+        await redis.delete(f"{key}:gcra")
+        await redis.aclose()
+
+
+@requires_redis
+async def test_gcra_debt_is_charged_even_when_rejecting(test_redis_url: str) -> None:
+    """Locally admitted requests count against the limit on the next check."""
+    redis = Redis.from_url(test_redis_url, decode_responses=True)
+    key = f"ratelimit:test:{uuid.uuid4().hex}"
+    try:
+        first = await acquire(redis, key, 5, 60, debt=3)
+        assert first.allowed and first.remaining == 1
+        second = await acquire(redis, key, 5, 60, debt=2)
+        assert not second.allowed
+        third = await acquire(redis, key, 5, 60)
+        assert not third.allowed
+    finally:
+        await redis.delete(f"{key}:gcra")
+        await redis.aclose()
@@ -961,3 +961,112 @@ class TestTrendlineLifecycle:
             # Re-add
             result = await svc.add_to_watchlist(user_id, instrument_id, "free")
             assert result["is_active"] is True
+
+
+# ===================================================================
+# Test: Trendline list response cache
+# ===================================================================
+
+
+class TestTrendlineListCache:
+    @pytest.fixture
+    def cache_calls(self):
+        """Patch the core cache helpers the service uses with a dict."""
+        entries: dict = {}
+
+        async def get_or_load(key, loader, ttl=60, namespace=None, tags=(), client=None):
+            if (namespace, key) not in entries:
+                entries[(namespace, key)] = await loader()
+            return entries[(namespace, key)]
+
+        delete = AsyncMock(return_value=1)
+        with (
+            patch("app.services.trendline_service.get_or_load", get_or_load),
+            patch("app.services.trendline_service.delete_cached", delete),
+        ):
+            yield entries, delete
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_skips_loader(
+        self, db_session: AsyncSession, redis_mock, seed_data, cache_calls
+    ):
+        """A cached entry is returned as (etag, body) without loading."""
+        entries, _ = cache_calls
+        key = f"{seed_data['user_id']}:{seed_data['instrument_id']}"
+        entries[("trendlines", key)] = {"etag": '"abc"', "body": '{"support_lines": []}'}
+        load_body = AsyncMock()
+        svc = TrendlineService(db_session, redis_mock)
+
+        cached = await svc.get_trendline_list(
+            seed_data["user_id"], seed_data["instrument_id"], load_body
+        )
+
+        assert cached == ('"abc"', '{"support_lines": []}')
+        load_body.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_etag_is_stable_for_same_body(
+        self, db_session: AsyncSession, redis_mock, seed_data, cache_calls
+    ):
+        """Identical bodies produce identical ETags."""
+        entries, _ = cache_calls
+        svc = TrendlineService(db_session, redis_mock)
+        user_id, instrument_id = seed_data["user_id"], seed_data["instrument_id"]
+
+        etags = []
+        for body in ('{"a": 1}', '{"a": 1}', '{"a": 2}'):
+            entries.clear()
+            etag, _ = await svc.get_trendline_list(
+                user_id, instrument_id, AsyncMock(return_value=body)
+            )
+            etags.append(etag)
+
+        assert etags[0] == etags[1]
+        assert etags[0] != etags[2]
+
+    @pytest.mark.asyncio
+    async def test_dismiss_invalidates_exact_key(
+        self, db_session: AsyncSession, redis_mock, seed_data, cache_calls
+    ):
+        """Dismissal deletes the (user, instrument) entry without scanning."""
+        _, delete = cache_calls
+        user_id = seed_data["user_id"]
+        instrument_id = seed_data["instrument_id"]
+        pivot_1_id, pivot_2_id = await _create_pivots(
+            db_session, instrument_id, seed_data["candles"]
+        )
+        trendline = _create_trendline(user_id, instrument_id, pivot_1_id, pivot_2_id)
+        db_session.add(trendline)
+        await db_session.commit()
+
+        svc = TrendlineService(db_session, redis_mock)
+        await svc.dismiss_trendline(user_id, trendline.id)
+
+        delete.assert_awaited_once_with(
+            f"{user_id}:{instrument_id}", namespace="trendlines", client=redis_mock
+        )
+        redis_mock.scan_iter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_config_update_invalidates_watchlist_keys(
+        self, db_session: AsyncSession, redis_mock, seed_data, cache_calls
+    ):
+        """Config changes drop the cached list for each watched instrument."""
+        _, delete = cache_calls
+        user_id = seed_data["user_id"]
+        instrument_id = seed_data["instrument_id"]
+        db_session.add(
+            UserWatchlist(user_id=user_id, instrument_id=instrument_id, is_active=True)
+        )
+        await db_session.commit()
+
+        svc = TrendlineService(db_session, redis_mock)
+        with patch(
+            "app.tasks.trendline_tasks.recalculate_all_trendlines"
+        ) as mock_task:
+            mock_task.delay = MagicMock()
+            await svc.update_config(user_id, {"max_lines_per_instrument": 3})
+
+        delete.assert_awaited_once_with(
+            f"{user_id}:{instrument_id}", namespace="trendlines", client=redis_mock
+        )
@@ -0,0 +1,424 @@
+"""Unit tests for the live broker adapter pool, against a local fake broker."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from collections import Counter
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.adapters.base import BrokerAdapter
+from app.adapters.exceptions import BrokerConnectionError
+from app.adapters.pool import AdapterPool, ConnectionInfo, invalidate_broker_user
+from app.adapters.registry import get_adapter
+from app.adapters.types import ConnectionStatus, OrderStatusInfo
+from app.core import cache
+from app.services import encryption_service
+from app.services.encryption_service import encrypt_credentials
+
+# ---------------------------------------------------------------------------
+# Fake broker: a keep-alive HTTP/1.1 server on localhost
+# ---------------------------------------------------------------------------
+
+
+class FakeBrokerServer:
+    """Counts TCP connections and requests so tests can see session reuse."""
+
+    def __init__(self) -> None:
+        self.connections = 0
+        self.requests: Counter[str] = Counter()
+        self.healthy = True
+        self._server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer) -> None:
+        self.connections += 1
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode().split("\r\n")
+                method, path, _ = request_line.split(" ", 2)
+                headers = dict(
+                    line.split(": ", 1) for line in header_lines if ": " in line
+                )
+                length = int(headers.get("content-length", headers.get("Content-Length", 0)))
+                if length:
+                    await reader.readexactly(length)
+                self.requests[f"{method} {path}"] += 1
+                status, body = self._route(method, path)
+                payload = json.dumps(body).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method: str, path: str) -> tuple[str, dict]:
+        if path == "/auth":
+            return "200 OK", {"token": uuid.uuid4().hex}
+        if path == "/health":
+            return ("200 OK", {}) if self.healthy else ("503 Unavailable", {})
+        if path.startswith("/orders/"):
+            return "200 OK", {"status": "FILLED"}
+        return "404 Not Found", {}
+
+
+class FakeBrokerAdapter(BrokerAdapter):
+    """Minimal REST adapter that authenticates against the fake broker."""
+
+    base_url = ""
+
+    def __init__(self, credentials, http_client=None, account_id=None) -> None:
+        self._credentials = credentials
+        self._http = http_client
+        self._token: str | None = None
+        self.disconnected = False
+
+    async def connect(self) -> ConnectionStatus:
+        response = await self._http.post(f"{self.base_url}/auth", json=self._credentials)
+        self._token = response.json()["token"]
+        return ConnectionStatus.CONNECTED
+
+    async def disconnect(self) -> None:
+        self.disconnected = True
+
+    async def health_check(self) -> bool:
+        response = await self._http.get(f"{self.base_url}/health")
+        return response.status_code == 200
+
+    async def get_order_status(self, broker_order_id: str) -> OrderStatusInfo:
+        response = await self._http.get(f"{self.base_url}/orders/{broker_order_id}")
+        return OrderStatusInfo(
+            broker_order_id=broker_order_id, status=response.json()["status"]
+        )
+
+    async def place_order(self, order):
+        raise NotImplementedError
+
+    async def place_bracket_order(self, entry, stop_loss, take_profit):
+        raise NotImplementedError
+
+    async def cancel_order(self, broker_order_id):
+        raise NotImplementedError
+
+    async def modify_order(self, broker_order_id, new_price=None, new_quantity=None):
+        raise NotImplementedError
+
+    async def get_positions(self):
+        return []
+
+    async def get_account_info(self):
+        raise NotImplementedError
+
+    async def subscribe_order_updates(self):
+        raise NotImplementedError
+
+    async def subscribe_position_updates(self):
+        raise NotImplementedError
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture(autouse=True)
+def master_key(monkeypatch):
+    monkeypatch.setattr(
+        encryption_service.settings, "BROKER_ENCRYPTION_MASTER_KEY", os.urandom(32).hex()
+    )
+
+
+@pytest_asyncio.fixture
+async def broker():
+    server = FakeBrokerServer()
+    await server.start()
+    FakeBrokerAdapter.base_url = server.url
+    yield server
+    await server.stop()
+
+
+@pytest_asyncio.fixture
+async def pool():
+    pool = AdapterPool(
+        max_sessions=2, idle_timeout=300, health_check_interval=30, clock=FakeClock()
+    )
+    yield pool
+    await pool.close()
+
+
+def make_connection(user_id: uuid.UUID | None = None, **credentials) -> ConnectionInfo:
+    connection_id = uuid.uuid4()
+    ciphertext, iv, key_id = encrypt_credentials(
+        connection_id, credentials or {"username": "trader", "password": "hunter2"}
+    )
+    return ConnectionInfo(
+        id=connection_id,
+        user_id=user_id or uuid.uuid4(),
+        broker_type="fake",
+        account_id="ACC-1",
+        credentials_encrypted=ciphertext,
+        credentials_iv=iv,
+        credentials_key_id=key_id,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Reuse
+# ---------------------------------------------------------------------------
+
+
+class TestReuse:
+    @pytest.mark.asyncio
+    async def test_same_connection_reuses_session(self, pool, broker):
+        """Repeated lookups cost one auth handshake."""
+        connection = make_connection()
+
+        first = await pool.get(connection, FakeBrokerAdapter)
+        second = await pool.get(connection, FakeBrokerAdapter)
+        await second.get_order_status("42")
+
+        assert first is second
+        assert broker.requests["POST /auth"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_handshake(self, pool, broker):
+        connection = make_connection()
+
+        adapters = await asyncio.gather(
+            *(pool.get(connection, FakeBrokerAdapter) for _ in range(5))
+        )
+
+        assert len({id(a) for a in adapters}) == 1
+        assert broker.requests["POST /auth"] == 1
+
+    @pytest.mark.asyncio
+    async def test_adapters_share_http_connections(self, pool, broker):
+        """Different users' sessions ride the same keep-alive socket."""
+        a = await pool.get(make_connection(), FakeBrokerAdapter)
+        b = await pool.get(make_connection(), FakeBrokerAdapter)
+        await a.get_order_status("1")
+        await b.get_order_status("2")
+
+        assert a is not b
+        assert broker.requests["POST /auth"] == 2
+        assert broker.connections == 1
+
+    @pytest.mark.asyncio
+    async def test_credentials_decrypted_once(self, pool, broker):
+        connection = make_connection()
+        decrypt = MagicMock(wraps=encryption_service.decrypt_credentials)
+
+        with patch("app.adapters.pool.decrypt_credentials", decrypt):
+            adapter = await pool.get(connection, FakeBrokerAdapter)
+            await pool.invalidate_user(uuid.uuid4())  # someone else's change
+            assert pool.credentials(connection) == {"username": "trader", "password": "hunter2"}
+
+        decrypt.assert_called_once()
+        assert adapter._credentials["username"] == "trader"
+
+    @pytest.mark.asyncio
+    async def test_rotated_credentials_reconnect(self, pool, broker):
+        """New ciphertext for the same connection forces a fresh session."""
+        old = make_connection()
+        ciphertext, iv, key_id = encrypt_credentials(old.id, {"username": "new"})
+        rotated = ConnectionInfo(
+            old.id, old.user_id, "fake", None, ciphertext, iv, key_id
+        )
+
+        first = await pool.get(old, FakeBrokerAdapter)
+        second = await pool.get(rotated, FakeBrokerAdapter)
+
+        assert first.disconnected
+        assert second._credentials == {"username": "new"}
+
+
+# ---------------------------------------------------------------------------
+# Health, eviction, limits
+# ---------------------------------------------------------------------------
+
+
+class TestLifecycle:
+    @pytest.mark.asyncio
+    async def test_unhealthy_session_is_replaced(self, pool, broker):
+        connection = make_connection()
+        first = await pool.get(connection, FakeBrokerAdapter)
+
+        pool._clock.now += 10  # inside the check interval: no probe
+        assert await pool.get(connection, FakeBrokerAdapter) is first
+        assert broker.requests["GET /health"] == 0
+
+        broker.healthy = False
+        pool._clock.now += 60
+        second = await pool.get(connection, FakeBrokerAdapter)
+
+        assert second is not first
+        assert first.disconnected
+        assert broker.requests["GET /health"] == 1
+        assert broker.requests["POST /auth"] == 2
+
+    @pytest.mark.asyncio
+    async def test_idle_sessions_are_evicted(self, pool, broker):
+        idle = await pool.get(make_connection(), FakeBrokerAdapter)
+        pool._clock.now += 200
+        busy_connection = make_connection()
+        await pool.get(busy_connection, FakeBrokerAdapter)
+        pool._clock.now += 200
+
+        assert await pool.evict_idle() == 1
+        assert idle.disconnected
+        assert busy_connection.key in pool
+
+    @pytest.mark.asyncio
+    async def test_max_sessions_evicts_least_recently_used(self, pool, broker):
+        first, second, third = make_connection(), make_connection(), make_connection()
+        lru = await pool.get(first, FakeBrokerAdapter)
+        await pool.get(second, FakeBrokerAdapter)
+        pool._clock.now += 1
+        await pool.get(second, FakeBrokerAdapter)
+
+        await pool.get(third, FakeBrokerAdapter)
+
+        assert len(pool) == 2
+        assert lru.disconnected
+        assert first.key not in pool
+
+    @pytest.mark.asyncio
+    async def test_invalidate_user_disconnects_sessions(self, pool, broker):
+        connection = make_connection()
+        adapter = await pool.get(connection, FakeBrokerAdapter)
+
+        await pool.invalidate_user(connection.user_id)
+
+        assert adapter.disconnected
+        assert len(pool) == 0
+
+
+# ---------------------------------------------------------------------------
+# Registry integration
+# ---------------------------------------------------------------------------
+
+
+class TestRegistry:
+    @pytest.mark.asyncio
+    async def test_connection_lookup_is_cached(self, pool):
+        """The BrokerConnection query runs once per TTL, not once per call."""
+        user_id = uuid.uuid4()
+        model = MagicMock(**{"user_id": user_id, "broker_type": "tradovate"})
+        info = make_connection(user_id)
+        for field in ("id", "account_id", "credentials_encrypted", "credentials_iv",
+                      "credentials_key_id"):
+            setattr(model, field, getattr(info, field))
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = model
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        with patch("app.adapters.registry.adapter_pool", pool):
+            for _ in range(2):
+                with pytest.raises(BrokerConnectionError, match="not yet available"):
+                    await get_adapter(user_id, db, AsyncMock(), is_paper=False)
+
+        db.execute.assert_awaited_once()
+        assert len(pool) == 0
+
+    @pytest.mark.asyncio
+    async def test_pool_drops_sessions_from_another_loop(self, broker):
+        """Sessions are never reused across event loops."""
+        pool = AdapterPool()
+        connection = make_connection()
+        await pool.get(connection, FakeBrokerAdapter)
+        pool._loop = object()  # as if first used under a different loop
+
+        await pool.get(connection, FakeBrokerAdapter)
+
+        assert broker.requests["POST /auth"] == 2
+        assert isinstance(pool.http_client("fake"), httpx.AsyncClient)
+        await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_primed_connections_need_no_lookup(self, pool):
+        """Batch jobs load every user's connection in one query up front."""
+        with_connection, without = uuid.uuid4(), uuid.uuid4()
+        info = make_connection(with_connection)
+        model = MagicMock(user_id=with_connection, broker_type="fake")
+        for field in ("id", "account_id", "credentials_encrypted", "credentials_iv",
+                      "credentials_key_id"):
+            setattr(model, field, getattr(info, field))
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [model]
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        await pool.prime_connections(db, [with_connection, without])
+
+        assert (await pool.get_connection(db, with_connection)).id == info.id
+        assert await pool.get_connection(db, without) is None
+        db.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_peer_invalidation_drops_cached_connection(self, pool):
+        """A broadcast from the process that changed the row forces a fresh lookup."""
+        user_id = uuid.uuid4()
+        info = make_connection(user_id)
+        model = MagicMock(user_id=user_id, broker_type="fake")
+        for field in ("id", "account_id", "credentials_encrypted", "credentials_iv",
+                      "credentials_key_id"):
+            setattr(model, field, getattr(info, field))
+        primed = MagicMock()
+        primed.scalars.return_value.all.return_value = [model]
+        gone = MagicMock()
+        gone.scalar_one_or_none.return_value = None
+        db = AsyncMock()
+        db.execute.side_effect = [primed, gone]
+
+        with patch("app.adapters.pool.adapter_pool", pool):
+            await pool.prime_connections(db, [user_id])
+            cache._apply_invalidation({"broker_user": str(user_id)})  # as from the listener
+
+            assert await pool.get_connection(db, user_id) is None
+
+        assert db.execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidate_broker_user_broadcasts(self, pool, broker):
+        connection = make_connection()
+        adapter = await pool.get(connection, FakeBrokerAdapter)
+
+        with (
+            patch("app.adapters.pool.adapter_pool", pool),
+            patch("app.adapters.pool.publish_invalidation", AsyncMock()) as publish,
+        ):
+            await invalidate_broker_user(connection.user_id)
+
+        assert adapter.disconnected
+        publish.assert_awaited_once_with({"broker_user": str(connection.user_id)})
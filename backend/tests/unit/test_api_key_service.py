@@ -0,0 +1,296 @@
+"""Unit tests for API key validation caching and batched usage tracking."""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.core.exceptions import AuthenticationError
+from app.services import api_key_service
+from app.services.api_key_service import (
+    _hash_key,
+    flush_usage,
+    record_usage,
+    revoke_key,
+    validate_key,
+)
+from tests.unit.test_cache import _ScriptedRedis
+
+_KEY_ID = uuid.UUID(int=1)
+_USER_ID = uuid.UUID(int=2)
+
+
+def _entry(**overrides) -> dict:
+    entry = {
+        "id": str(_KEY_ID),
+        "user_id": str(_USER_ID),
+        "permissions": ["webhook:write"],
+        "is_active": True,
+        "expires_at": None,
+    }
+    entry.update(overrides)
+    return entry
+
+
+def _row(**overrides) -> SimpleNamespace:
+    row = dict(
+        id=_KEY_ID,
+        user_id=_USER_ID,
+        permissions=["webhook:write"],
+        is_active=True,
+        expires_at=None,
+    )
+    row.update(overrides)
+    return SimpleNamespace(**row)
+
+
+def _db(row: SimpleNamespace | None = None) -> AsyncMock:
+    db = AsyncMock()
+    result = MagicMock()
+    result.one_or_none.return_value = row
+    db.execute = AsyncMock(return_value=result)
+    return db
+
+
+class _Cache:
+    """Stand-in for the cache helpers the service uses: a dict with a loader."""
+
+    def __init__(self, entries: dict | None = None) -> None:
+        self.entries = dict(entries or {})
+        self.ttls: dict[str, int] = {}
+
+    async def get_or_load(self, key, loader, ttl=60, namespace=None, tags=()):
+        if key in self.entries:
+            return self.entries[key]
+        value = await loader()
+        if value is not None:
+            self.entries[key] = value
+            self.ttls[key] = ttl
+        return value
+
+    async def set_cached(self, key, value, ttl=300, namespace=None, tags=()):
+        self.entries[key] = value
+        self.ttls[key] = ttl
+
+    async def delete_cached(self, *keys, namespace=None):
+        for key in keys:
+            self.entries.pop(key, None)
+        return len(keys)
+
+
+@pytest.fixture
+def cache():
+    fake = _Cache()
+    with (
+        patch.object(api_key_service, "get_or_load", fake.get_or_load),
+        patch.object(api_key_service, "set_cached", fake.set_cached),
+        patch.object(api_key_service, "delete_cached", fake.delete_cached),
+    ):
+        yield fake
+
+
+class TestValidateKey:
+    async def test_cache_hit_skips_database(self, cache):
+        cache.entries[_hash_key("te_live_x")] = _entry()
+        db = _db()
+
+        key = await validate_key("te_live_x", db)
+
+        assert key.id == _KEY_ID
+        assert key.user_id == _USER_ID
+        assert key.permissions == ["webhook:write"]
+        db.execute.assert_not_awaited()
+
+    async def test_miss_loads_once_then_serves_from_cache(self, cache):
+        db = _db(_row())
+
+        await validate_key("te_live_x", db)
+        await validate_key("te_live_x", db)
+
+        assert db.execute.await_count == 1
+        assert cache.ttls[_hash_key("te_live_x")] == api_key_service._KEY_CACHE_TTL
+
+    async def test_unknown_key_is_cached_negatively(self, cache):
+        db = _db(None)
+
+        for _ in range(3):
+            with pytest.raises(AuthenticationError, match="Invalid API key"):
+                await validate_key("te_live_bogus", db)
+
+        assert db.execute.await_count == 1
+        key_hash = _hash_key("te_live_bogus")
+        assert cache.ttls[key_hash] == api_key_service._NEGATIVE_CACHE_TTL
+
+    async def test_revoked_key_rejected(self, cache):
+        cache.entries[_hash_key("te_live_x")] = _entry(is_active=False)
+        with pytest.raises(AuthenticationError, match="revoked"):
+            await validate_key("te_live_x", _db())
+
+    async def test_expired_key_rejected(self, cache):
+        expired = (datetime.now(UTC) - timedelta(minutes=1)).isoformat()
+        cache.entries[_hash_key("te_live_x")] = _entry(expires_at=expired)
+        with pytest.raises(AuthenticationError, match="expired"):
+            await validate_key("te_live_x", _db())
+
+    async def test_revoke_invalidates_cached_entry(self, cache):
+        key_hash = _hash_key("te_live_x")
+        cache.entries[key_hash] = _entry()
+        api_key = SimpleNamespace(is_active=True, key_hash=key_hash, key_prefix="abcd1234")
+        db = AsyncMock()
+
+        with patch.object(api_key_service, "_get_user_key", AsyncMock(return_value=api_key)):
+            await revoke_key(str(_USER_ID), str(_KEY_ID), db)
+
+        assert not api_key.is_active
+        assert key_hash not in cache.entries
+
+
+class TestRevokeDuringValidation:
+    async def test_load_that_read_active_row_cannot_recache_revoked_key(self):
+        """A validation miss that read is_active=True before the revoke commits
+        must not put the key back in the cache as active."""
+        redis = _ScriptedRedis()
+        key_hash = _hash_key("te_live_x")
+        read_row, revoked = asyncio.Event(), asyncio.Event()
+
+        async def execute(*args):
+            result = MagicMock()
+            result.one_or_none.return_value = _row()  # read before the revoke commits
+            read_row.set()
+            await revoked.wait()
+            return result
+
+        db = AsyncMock()
+        db.execute = execute
+        api_key = SimpleNamespace(is_active=True, key_hash=key_hash, key_prefix="abcd1234")
+
+        with patch("app.core.redis.redis_client", redis):
+            validation = asyncio.create_task(validate_key("te_live_x", db))
+            await read_row.wait()
+            with patch.object(
+                api_key_service, "_get_user_key", AsyncMock(return_value=api_key)
+            ):
+                await revoke_key(str(_USER_ID), str(_KEY_ID), AsyncMock())
+            revoked.set()
+            await validation  # this request raced the revoke and got through
+
+            db.execute = AsyncMock(return_value=MagicMock(
+                one_or_none=MagicMock(return_value=_row(is_active=False))
+            ))
+            with pytest.raises(AuthenticationError, match="revoked"):
+                await validate_key("te_live_x", db)
+
+
+class _UsageRedis:
+    def __init__(self, counts: dict, last_used: dict) -> None:
+        self.hashes = {
+            api_key_service._USAGE_COUNT_KEY: counts,
+            api_key_service._USAGE_LAST_USED_KEY: last_used,
+        }
+
+    def pipeline(self, transaction: bool = True) -> _UsagePipeline:
+        return _UsagePipeline(self)
+
+    async def evalsha(self, sha: str, numkeys: int, *args) -> int:
+        """Run the usage settle script against the dicts."""
+        assert sha == api_key_service._SETTLE_USAGE_SCRIPT.sha
+        count_key, last_used_key = args[:numkeys]
+        counts, last_used = self.hashes[count_key], self.hashes[last_used_key]
+        pairs = args[numkeys:]
+        for key_id, flushed in zip(pairs[0::2], pairs[1::2], strict=True):
+            left = int(counts.get(key_id, 0)) - int(flushed)
+            counts[key_id] = str(left)
+            if left <= 0:
+                counts.pop(key_id)
+                last_used.pop(key_id, None)
+        return 1
+
+
+class _UsagePipeline:
+    def __init__(self, redis: _UsageRedis) -> None:
+        self._redis = redis
+        self._queued: list = []
+
+    def hgetall(self, name: str) -> None:
+        self._queued.append(lambda: dict(self._redis.hashes[name]))
+
+    def hincrby(self, name: str, field: str, amount: int) -> None:
+        def run() -> int:
+            values = self._redis.hashes[name]
+            values[field] = str(int(values.get(field, 0)) + amount)
+            return int(values[field])
+
+        self._queued.append(run)
+
+    def hset(self, name: str, field: str, value: int) -> None:
+        self._queued.append(lambda: self._redis.hashes[name].__setitem__(field, str(value)))
+
+    async def execute(self) -> list:
+        return [run() for run in self._queued]
+
+
+class TestUsage:
+    async def test_record_usage_counts_and_stamps(self):
+        redis = _UsageRedis({}, {})
+        pipe = redis.pipeline()
+        record_usage(pipe, _KEY_ID)
+        record_usage(pipe, _KEY_ID)
+        await pipe.execute()
+
+        assert redis.hashes[api_key_service._USAGE_COUNT_KEY] == {str(_KEY_ID): "2"}
+        assert str(_KEY_ID) in redis.hashes[api_key_service._USAGE_LAST_USED_KEY]
+
+    async def test_flush_writes_one_batch_and_subtracts_flushed_counts(self):
+        other = uuid.UUID(int=3)
+        redis = _UsageRedis(
+            {str(_KEY_ID): "5", str(other): "0"},
+            {str(_KEY_ID): "1700000000"},
+        )
+        db = AsyncMock()
+
+        assert await flush_usage(db, redis) == 1
+
+        _, params = db.execute.await_args.args
+        assert params == [
+            {
+                "b_id": _KEY_ID,
+                "b_count": 5,
+                "b_last_used": datetime.fromtimestamp(1700000000, UTC),
+            }
+        ]
+        db.commit.assert_awaited_once()
+        assert redis.hashes[api_key_service._USAGE_COUNT_KEY] == {}
+        assert redis.hashes[api_key_service._USAGE_LAST_USED_KEY] == {}
+
+    async def test_flush_keeps_usage_counted_after_the_read(self):
+        redis = _UsageRedis({str(_KEY_ID): "5"}, {str(_KEY_ID): "1700000000"})
+        db = AsyncMock()
+
+        async def request_during_flush(*args):
+            redis.hashes[api_key_service._USAGE_COUNT_KEY][str(_KEY_ID)] = "7"
+
+        db.commit.side_effect = request_during_flush
+
+        assert await flush_usage(db, redis) == 1
+        assert redis.hashes[api_key_service._USAGE_COUNT_KEY] == {str(_KEY_ID): "2"}
+        assert str(_KEY_ID) in redis.hashes[api_key_service._USAGE_LAST_USED_KEY]
+
+    async def test_flush_trims_stamps_of_keys_without_counts(self):
+        deleted = uuid.UUID(int=4)
+        redis = _UsageRedis({}, {str(deleted): "1700000000"})
+        db = AsyncMock()
+
+        assert await flush_usage(db, redis) == 0
+
+        db.execute.assert_not_awaited()
+        assert redis.hashes[api_key_service._USAGE_LAST_USED_KEY] == {}
+
+    async def test_flush_with_nothing_counted_skips_database(self):
+        db = AsyncMock()
+        assert await flush_usage(db, _UsageRedis({}, {})) == 0
+        db.execute.assert_not_awaited()
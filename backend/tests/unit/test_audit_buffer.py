@@ -0,0 +1,255 @@
+"""Unit tests for the audit write-behind pipeline."""
+
+from __future__ import annotations
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from asyncpg.exceptions import ForeignKeyViolationError, InvalidTextRepresentationError
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.exc import DataError
+from sqlalchemy.orm import Session
+
+from app.db.models.order_event import OrderEvent
+from app.db.models.risk_check_audit import RiskCheckAudit
+from app.services import audit_buffer
+from app.services.audit_buffer import (
+    DEAD_LETTER_KEY,
+    STREAM_KEY,
+    AuditWriter,
+    decode_rows,
+    encode_rows,
+    stage_audit,
+)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self._redis = redis
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self._redis.calls.append((name, args, kwargs))
+
+    async def execute(self):
+        if self._redis.down:
+            raise RedisConnectionError("down")
+
+
+class FakeRedis:
+    def __init__(self):
+        self.calls = []
+        self.down = False
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+def session_factory(db):
+    @asynccontextmanager
+    async def factory():
+        yield db
+
+    return factory
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def db():
+    return AsyncMock()
+
+
+@pytest.fixture
+def buffer(redis, db):
+    with patch("app.services.audit_buffer.settings.AUDIT_WRITE_BEHIND", True):
+        audit_buffer.start_audit_buffer(redis, session_factory(db), background=False)
+    yield audit_buffer._buffer
+    audit_buffer._buffer = None
+
+
+def event_row(order_id, state):
+    return {"order_id": order_id, "previous_state": "SUBMITTED", "new_state": state}
+
+
+class TestStaging:
+    def test_disabled_means_write_inline(self):
+        assert not stage_audit(Session(), OrderEvent, event_row(uuid.uuid4(), "FILLED"))
+
+    def test_published_on_commit_only(self, buffer):
+        order_id = uuid.uuid4()
+        committed, rolled_back = Session(), Session()
+
+        stage_audit(committed, OrderEvent, event_row(order_id, "FILLED"))
+        committed.commit()
+        rolled_back.begin()
+        stage_audit(rolled_back, OrderEvent, event_row(order_id, "CANCELLED"))
+        rolled_back.rollback()
+
+        assert buffer.pending == 1
+        [(table, row)] = buffer._pending[0]
+        assert table == "order_events"
+        assert row["new_state"] == "FILLED"
+        assert isinstance(row["id"], uuid.UUID)
+        assert "audit_rows" not in rolled_back.info
+
+
+class TestBuffer:
+    @pytest.mark.asyncio
+    async def test_one_stream_entry_per_transaction_in_commit_order(self, buffer, redis):
+        first, second = uuid.uuid4(), uuid.uuid4()
+        buffer.append([("order_events", event_row(first, "SUBMITTED"))])
+        buffer.append([("order_events", event_row(second, "FILLED"))])
+
+        await buffer.flush()
+
+        xadds = [args for name, args, _ in redis.calls if name == "xadd"]
+        assert [key for key, _ in xadds] == [STREAM_KEY, STREAM_KEY]
+        assert [decode_rows(f["rows"])[0][1]["order_id"] for _, f in xadds] == [first, second]
+        assert buffer.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_redis_down_falls_back_to_postgres(self, buffer, redis, db):
+        redis.down = True
+        buffer.append([("order_events", event_row(uuid.uuid4(), "FILLED"))])
+        buffer.append([("risk_check_audit", {"signal_id": uuid.uuid4(), "check_name": "x",
+                                             "result": "PASS", "details": {}})])
+
+        await buffer.flush()
+
+        tables = [c.args[0].table.name for c in db.execute.await_args_list]
+        assert tables == ["order_events", "risk_check_audit"]
+        db.commit.assert_awaited_once()
+        assert buffer.pending == 0
+
+    @pytest.mark.asyncio
+    async def test_rows_stay_queued_when_everything_is_down(self, buffer, redis, db):
+        redis.down = True
+        db.execute.side_effect = OSError("postgres down")
+        buffer.append([("order_events", event_row(uuid.uuid4(), "FILLED"))])
+
+        await audit_buffer.flush_audit_buffer()
+
+        assert buffer.pending == 1
+
+
+class TestEncoding:
+    def test_round_trip_restores_column_types(self):
+        row = {
+            "id": uuid.uuid4(),
+            "created_at": datetime.now(UTC),
+            "signal_id": uuid.uuid4(),
+            "check_name": "daily_loss_limit",
+            "result": "PASS",
+            "actual_value": Decimal("125.5000"),
+            "threshold_value": None,
+            "details": {"limit": 500},
+        }
+
+        [(table, decoded)] = decode_rows(encode_rows([("risk_check_audit", dict(row))]))
+
+        assert table == RiskCheckAudit.__tablename__
+        assert decoded == row
+
+
+class TestWriter:
+    def make_writer(self, db=None):
+        redis = FakeRedis()
+        redis.xautoclaim = AsyncMock(return_value=["0-0", [], []])
+        rows = encode_rows([("order_events", event_row(uuid.uuid4(), "FILLED"))])
+        redis.xreadgroup = AsyncMock(
+            return_value=[[STREAM_KEY, [("1-0", {"rows": rows}), ("2-0", {"rows": rows})]]]
+        )
+        writer = AuditWriter(redis, MagicMock(), session_factory(db or AsyncMock()),
+                             consumer="test")
+        return writer, redis
+
+    @pytest.mark.asyncio
+    async def test_acks_and_deletes_after_copy(self):
+        writer, redis = self.make_writer()
+
+        with patch.object(writer, "_copy", AsyncMock()) as copy:
+            assert await writer.write_batch() == 2
+
+        assert len(copy.await_args.args[0]) == 2
+        assert ("xack", (STREAM_KEY, "audit-writers", "1-0", "2-0"), {}) in redis.calls
+        assert ("xdel", (STREAM_KEY, "1-0", "2-0"), {}) in redis.calls
+
+    @pytest.mark.asyncio
+    async def test_failed_copy_is_not_acknowledged(self):
+        writer, redis = self.make_writer()
+
+        with patch.object(writer, "_copy", AsyncMock(side_effect=OSError("db down"))):
+            with pytest.raises(OSError):
+                await writer.write_batch()
+
+        assert redis.calls == []
+
+    @pytest.mark.asyncio
+    async def test_integrity_error_falls_back_to_row_by_row(self):
+        db = AsyncMock()
+        writer, redis = self.make_writer(db)
+
+        with patch.object(writer, "_copy", AsyncMock(side_effect=ForeignKeyViolationError())):
+            assert await writer.write_batch() == 2
+
+        assert db.commit.await_count == 2
+        assert redis.calls[0][0] == "xack"
+
+    @pytest.mark.asyncio
+    async def test_data_error_falls_back_and_dead_letters_rejected_rows(self):
+        db = AsyncMock()
+        db.commit.side_effect = [DataError("INSERT", {}, Exception("bad value")), None]
+        writer, redis = self.make_writer(db)
+
+        with patch.object(
+            writer, "_copy", AsyncMock(side_effect=InvalidTextRepresentationError())
+        ):
+            assert await writer.write_batch() == 1
+
+        dead = [args for name, args, _ in redis.calls if name == "xadd"]
+        assert [key for key, _ in dead] == [DEAD_LETTER_KEY]
+        assert len(decode_rows(dead[0][1]["rows"])) == 1
+        assert ("xack", (STREAM_KEY, "audit-writers", "1-0", "2-0"), {}) in redis.calls
+
+    @pytest.mark.asyncio
+    async def test_undecodable_entry_is_dead_lettered_and_acked(self):
+        writer, redis = self.make_writer()
+        rows = encode_rows([("order_events", event_row(uuid.uuid4(), "FILLED"))])
+        redis.xreadgroup.return_value = [
+            [STREAM_KEY, [("1-0", {"rows": "{not json"}), ("2-0", {"rows": rows})]]
+        ]
+
+        with patch.object(writer, "_copy", AsyncMock()) as copy:
+            assert await writer.write_batch() == 1
+
+        assert len(copy.await_args.args[0]) == 1
+        assert redis.calls[0][0] == "xadd"
+        key, fields = redis.calls[0][1]
+        assert key == DEAD_LETTER_KEY
+        assert fields["rows"] == "{not json"
+        assert fields["entry_id"] == "1-0"
+        assert ("xack", (STREAM_KEY, "audit-writers", "1-0", "2-0"), {}) in redis.calls
+
+    @pytest.mark.asyncio
+    async def test_reclaimed_entries_come_first(self):
+        writer, redis = self.make_writer()
+        rows = encode_rows([("order_events", event_row(uuid.uuid4(), "FILLED"))])
+        redis.xautoclaim.return_value = ["0-0", [("0-1", {"rows": rows})], []]
+
+        with patch.object(writer, "_copy", AsyncMock()):
+            assert await writer.write_batch() == 1
+
+        redis.xreadgroup.assert_not_awaited()
@@ -0,0 +1,443 @@
+"""Unit tests for core.cache: namespaced keys, tags, batched helpers, and L1."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+from redis.exceptions import NoScriptError
+
+from app.core import cache
+
+
+@pytest_asyncio.fixture
+async def mock_redis():
+    redis = AsyncMock()
+    redis.get = AsyncMock(return_value=None)
+    redis.mget = AsyncMock(return_value=[])
+    redis.incr = AsyncMock(return_value=1)
+    redis.unlink = AsyncMock(return_value=0)
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[])
+    redis.pipeline = MagicMock(return_value=pipe)
+    cache._local.clear()
+    cache._local_versions.clear()
+    cache.reset_cache_stats()
+    with patch("app.core.redis.redis_client", redis):
+        yield redis
+    cache._local.clear()
+    cache._local_versions.clear()
+
+
+@pytest.fixture
+def l1_enabled():
+    with patch.object(cache, "_listener_ready", True):
+        yield
+
+
+class TestNamespaces:
+    @pytest.mark.asyncio
+    async def test_key_embeds_generation(self, mock_redis):
+        """Namespaced reads resolve the generation and the value in one script call."""
+        mock_redis.evalsha.return_value = [3, json.dumps({"role": "user"}), 300_000]
+
+        value = await cache.get_cached("u1", namespace="perms")
+
+        assert value == {"role": "user"}
+        mock_redis.evalsha.assert_awaited_once_with(
+            cache._NAMESPACED_GET_SCRIPT.sha, 1, "cache:ns:perms", "cache:perms:v", "u1"
+        )
+        mock_redis.get.assert_not_awaited()
+        mock_redis.mget.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_unversioned_namespace_defaults_to_zero(self, mock_redis):
+        """A namespace that was never bumped uses generation 0."""
+        mock_redis.evalsha.return_value = [0, None, -2]
+
+        assert await cache.get_cached("u1", namespace="perms") is None
+        assert cache.get_cache_stats()["perms"]["misses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_namespaced_read_loads_script_when_missing(self, mock_redis):
+        """A flushed script cache falls back to EVAL."""
+        mock_redis.evalsha.side_effect = NoScriptError("NOSCRIPT")
+        mock_redis.eval.return_value = [1, json.dumps(5), 300_000]
+
+        assert await cache.get_cached("u1", namespace="perms") == 5
+        mock_redis.eval.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_namespace_is_single_incr(self, mock_redis):
+        """Namespace invalidation is one INCR and never scans."""
+        mock_redis.incr.return_value = 4
+
+        version = await cache.invalidate_namespace("perms")
+
+        assert version == 4
+        mock_redis.incr.assert_awaited_once_with("cache:ns:perms")
+        mock_redis.scan_iter.assert_not_called()
+
+
+class TestBatchedHelpers:
+    @pytest.mark.asyncio
+    async def test_get_many_uses_one_mget(self, mock_redis):
+        """get_many issues one MGET and drops misses."""
+        mock_redis.mget.return_value = [json.dumps(1), None, json.dumps({"x": 2})]
+
+        result = await cache.get_many(["a", "b", "c"])
+
+        assert result == {"a": 1, "c": {"x": 2}}
+        mock_redis.mget.assert_awaited_once_with(["a", "b", "c"])
+
+    @pytest.mark.asyncio
+    async def test_set_many_pipelines_and_tags(self, mock_redis):
+        """set_many writes every key and records tags in a single pipeline."""
+        pipe = mock_redis.pipeline.return_value
+
+        await cache.set_many({"a": 1, "b": 2}, ttl=30, tags=["user:1"])
+
+        assert pipe.set.call_count == 2
+        pipe.set.assert_any_call("a", "1", ex=30)
+        pipe.sadd.assert_called_once_with("cache:tag:user:1", "a", "b")
+        pipe.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidate_tags_unlinks_members(self, mock_redis):
+        """Tag invalidation tombstones the tagged members and UNLINKs the tag set."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.side_effect = [[{"a", "b"}], [2, 1, 1]]
+
+        deleted = await cache.invalidate_tags("user:1")
+
+        assert deleted == 2
+        sha, numkeys, *args = pipe.evalsha.call_args.args
+        assert sha == cache._DELETE_SCRIPT.sha
+        assert sorted(args[:numkeys]) == ["a", "b"]
+        pipe.unlink.assert_called_once_with("cache:tag:user:1")
+        mock_redis.scan_iter.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_redis_unavailable_degrades(self):
+        """Helpers return empty results when Redis is not initialized."""
+        with patch("app.core.redis.redis_client", None):
+            assert await cache.get_cached("a") is None
+            assert await cache.get_many(["a"]) == {}
+            assert await cache.delete_cached("a") == 0
+            assert await cache.invalidate_tags("t") == 0
+
+
+class TestPermissionCache:
+    @pytest.mark.asyncio
+    async def test_permissions_served_from_namespace(self, mock_redis):
+        """get_user_permissions reads the 'perms' namespace before the DB."""
+        from app.core.permissions import get_user_permissions
+
+        perms = {"role": "user", "subscription_tier": "pro"}
+        mock_redis.evalsha.return_value = [0, json.dumps(perms), 300_000]
+        db = AsyncMock()
+
+        assert await get_user_permissions("u1", db) == perms
+        db.execute.assert_not_awaited()
+
+
+class TestLocalTier:
+    @pytest.mark.asyncio
+    async def test_l1_disabled_without_listener(self, mock_redis):
+        """Without the invalidation listener every read goes to Redis."""
+        mock_redis.mget.return_value = [json.dumps(1)]
+
+        await cache.get_cached("k")
+        await cache.get_cached("k")
+
+        assert mock_redis.mget.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_l2_hit_populates_l1(self, mock_redis, l1_enabled):
+        """A Redis hit is served from L1 on the next read."""
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [json.dumps({"v": 1}), 300_000]
+
+        assert await cache.get_cached("k") == {"v": 1}
+        assert await cache.get_cached("k") == {"v": 1}
+
+        assert pipe.execute.await_count == 1
+        stats = cache.get_cache_stats()["_default"]
+        assert stats["l1_hits"] == 1
+        assert stats["l2_hits"] == 1
+        assert stats["hit_ratio"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_l1_entry_never_outlives_redis_entry(self, mock_redis, l1_enabled):
+        """L1 copies from get_many expire with the key's remaining Redis TTL."""
+        mock_redis.pipeline.return_value.execute.return_value = [json.dumps(1), 500]
+
+        with patch.object(cache.settings, "CACHE_L1_TTL", 30):
+            await cache.get_many(["k"])
+
+        entry = cache._local.get("k", time.monotonic())
+        assert entry is not None
+        assert entry.expires_at - time.monotonic() <= 0.5
+
+    @pytest.mark.asyncio
+    async def test_l1_returns_fresh_copies(self, mock_redis, l1_enabled):
+        """Mutating a returned value does not corrupt the L1 entry."""
+        mock_redis.pipeline.return_value.execute.return_value = [json.dumps({"v": 1}), 300_000]
+
+        first = await cache.get_cached("k")
+        first["v"] = 99
+
+        assert await cache.get_cached("k") == {"v": 1}
+
+    @pytest.mark.asyncio
+    async def test_write_publishes_invalidation(self, mock_redis, l1_enabled):
+        """Writes broadcast the physical keys so peers drop their L1 copies."""
+        pipe = mock_redis.pipeline.return_value
+
+        await cache.set_cached("k", 1)
+
+        channel, payload = pipe.publish.call_args.args
+        assert channel == "cache:invalidate"
+        assert json.loads(payload) == {"keys": ["k"]}
+
+    @pytest.mark.asyncio
+    async def test_peer_invalidation_drops_entries(self, mock_redis, l1_enabled):
+        """Messages from peers evict keys, namespaces, and patterns."""
+        cache._local.set("a", "1", 30, 0.0, None)
+        cache._local.set("cache:perms:v0:u1", "2", 30, 0.0, "perms")
+        cache._local.set("cache:other:x", "3", 30, 0.0, None)
+
+        cache._apply_invalidation({"keys": ["a"]})
+        cache._apply_invalidation({"namespace": "perms", "version": 1})
+        cache._apply_invalidation({"pattern": "cache:other:*"})
+
+        assert len(cache._local) == 0
+        assert cache._local_versions["perms"] == 1
+
+    @pytest.mark.asyncio
+    async def test_namespace_version_cached_locally(self, mock_redis, l1_enabled):
+        """With L1 active the namespace generation is read from Redis once."""
+        mock_redis.get.return_value = "2"
+
+        await cache.get_namespace_version("perms")
+        await cache.get_namespace_version("perms")
+
+        mock_redis.get.assert_awaited_once_with("cache:ns:perms")
+
+    def test_lru_evicts_oldest(self):
+        """The L1 store is bounded and evicts least recently used entries."""
+        local = cache._LocalCache(max_entries=2)
+        local.set("a", "1", 30, 0.0, None)
+        local.set("b", "2", 30, 0.0, None)
+        assert local.get("a", 0.0) is not None
+        local.set("c", "3", 30, 0.0, None)
+
+        assert local.get("b", 0.0) is None
+        assert local.get("a", 0.0) is not None
+
+
+class TestGetOrLoad:
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_single_flight(self, mock_redis):
+        """Concurrent misses for one key run the loader once."""
+        mock_redis.pipeline.return_value.execute.return_value = [None, -2]
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"v": 1}
+
+        results = await asyncio.gather(*(cache.get_or_load("k", loader) for _ in range(10)))
+
+        assert calls == 1
+        assert results == [{"v": 1}] * 10
+        assert cache.get_cache_stats()["_default"]["coalesced"] == 9
+
+    @pytest.mark.asyncio
+    async def test_loader_error_propagates_and_is_not_cached(self, mock_redis):
+        """A failing loader raises to every waiter and leaves nothing in flight."""
+        mock_redis.pipeline.return_value.execute.return_value = [None, -2]
+
+        async def loader():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(
+            cache.get_or_load("k", loader), cache.get_or_load("k", loader), return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert cache._inflight == {}
+
+    @pytest.mark.asyncio
+    async def test_early_expiration_triggers_reload(self, mock_redis):
+        """An entry about to expire is recomputed when the XFetch draw fires."""
+        mock_redis.pipeline.return_value.execute.return_value = [json.dumps("old"), 1]
+        cache._stats_for(None).load_latency = 1.0
+        loader = AsyncMock(return_value="new")
+
+        with patch.object(cache.random, "random", return_value=0.99):
+            assert await cache.get_or_load("k", loader) == "new"
+
+        loader.assert_awaited_once()
+        assert cache.get_cache_stats()["_default"]["early_refreshes"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fresh_entry_is_not_reloaded(self, mock_redis):
+        """Entries far from expiry are served without calling the loader."""
+        mock_redis.pipeline.return_value.execute.return_value = [json.dumps("cached"), 300_000]
+        cache._stats_for(None).load_latency = 0.01
+        loader = AsyncMock(return_value="new")
+
+        assert await cache.get_or_load("k", loader) == "cached"
+        loader.assert_not_awaited()
+
+
+class _ScriptedRedis:
+    """Dict-backed Redis that runs the cache's scripts, for interleaving tests."""
+
+    def __init__(self) -> None:
+        self.data: dict[str, str] = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def publish(self, channel, message):
+        return 0
+
+    async def evalsha(self, sha, numkeys, *args):
+        keys, argv = list(args[:numkeys]), [str(a) for a in args[numkeys:]]
+        if sha == cache._NAMESPACED_GET_SCRIPT.sha:
+            version = int(self.data.get(keys[0], 0))
+            reply = [version]
+            for key in argv[1:]:
+                reply += [self.data.get(f"{argv[0]}{version}:{key}"), 60_000]
+            return reply
+        if sha == cache._WRITE_BACK_SCRIPT.sha:
+            if self.data.get(keys[0], "") != argv[0]:
+                return 0
+            self.data[keys[0]] = argv[1]
+            return 1
+        if sha == cache._DELETE_SCRIPT.sha:
+            deleted = 0
+            for key in keys:
+                old = self.data.get(key)
+                deleted += old is not None and not old.startswith(argv[2])
+                self.data[key] = argv[0]
+            return deleted
+        raise AssertionError(f"unexpected script {sha}")
+
+    def pipeline(self, transaction: bool = True):
+        return _ScriptedPipeline(self)
+
+
+class _ScriptedPipeline:
+    def __init__(self, redis: _ScriptedRedis) -> None:
+        self._redis = redis
+        self._queued: list = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._queued.append((name, args))
+        return queue
+
+    async def execute(self):
+        results = []
+        for name, args in self._queued:
+            if name == "pttl":
+                results.append(60_000 if args[0] in self._redis.data else -2)
+            elif name == "set":
+                results.append(await self._redis.set(*args))
+            elif name in ("get", "evalsha", "incr", "publish"):
+                results.append(await getattr(self._redis, name)(*args))
+            else:
+                results.append(1)
+        return results
+
+
+class TestLateLoaders:
+    """A loader that started before an invalidation must not restore its value."""
+
+    @pytest_asyncio.fixture
+    async def redis(self):
+        redis = _ScriptedRedis()
+        with patch("app.core.redis.redis_client", redis):
+            yield redis
+
+    @staticmethod
+    def _gated_loader(value):
+        gate = asyncio.Event()
+
+        async def loader():
+            await gate.wait()
+            return value
+
+        return gate, loader
+
+    @pytest.mark.asyncio
+    async def test_delete_during_load_is_not_undone(self, redis):
+        await cache.set_cached("k", "old")
+        assert redis.data["k"] == json.dumps("old")
+        gate, loader = self._gated_loader("stale")
+        with patch.object(cache, "_should_refresh_early", return_value=True):
+            load = asyncio.create_task(cache.get_or_load("k", loader))
+            await asyncio.sleep(0)
+
+        await cache.delete_cached("k")
+        gate.set()
+        assert await load == "stale"
+
+        assert await cache.get_cached("k") is None
+
+    @pytest.mark.asyncio
+    async def test_miss_during_delete_is_not_written(self, redis):
+        gate, loader = self._gated_loader("stale")
+        load = asyncio.create_task(cache.get_or_load("k", loader))
+        await asyncio.sleep(0)
+
+        await cache.delete_cached("k")
+        gate.set()
+        await load
+
+        assert await cache.get_cached("k") is None
+        assert await cache.get_or_load("k", AsyncMock(return_value="fresh")) == "fresh"
+        assert await cache.get_cached("k") == "fresh"
+
+    @pytest.mark.asyncio
+    async def test_namespace_bump_during_load_orphans_the_value(self, redis):
+        gate, loader = self._gated_loader("stale")
+        load = asyncio.create_task(cache.get_or_load("u1", loader, namespace="perms"))
+        await asyncio.sleep(0)
+
+        await cache.invalidate_namespace("perms")
+        gate.set()
+        await load
+
+        assert "cache:perms:v0:u1" in redis.data
+        assert await cache.get_cached("u1", namespace="perms") is None
+
+    @pytest.mark.asyncio
+    async def test_explicit_client_without_shared_client(self):
+        """Workers without the shared client pass their own."""
+        redis = _ScriptedRedis()
+        with patch("app.core.redis.redis_client", None):
+            assert await cache.get_or_load("k", AsyncMock(return_value=1), client=redis) == 1
+            assert await cache.delete_cached("k", client=redis) == 1
+            loader = AsyncMock(return_value=2)
+            assert await cache.get_or_load("k", loader, client=redis) == 2
@@ -0,0 +1,192 @@
+"""Unit tests for the in-memory contract specification / correlation registry."""
+
+from __future__ import annotations
+
+import uuid
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+
+from app.core.exceptions import NotFoundError
+from app.db.models.contract_specification import ContractSpecification
+from app.db.models.instrument_correlation import InstrumentCorrelation
+from app.db.models.signal import Signal
+from app.services import contract_registry as registry_module
+from app.services.contract_registry import ContractSpec, contract_registry
+from app.services.risk_service import RiskService
+
+
+# ---------------------------------------------------------------------------
+# Factory helpers
+# ---------------------------------------------------------------------------
+
+
+def make_spec_row(symbol, full_size_symbol=None, is_micro=False, tick_value="12.50"):
+    row = MagicMock(spec=ContractSpecification)
+    row.symbol = symbol
+    row.name = symbol
+    row.exchange = "CME"
+    row.asset_class = "futures"
+    row.tick_size = Decimal("0.25")
+    row.tick_value = Decimal(tick_value)
+    row.point_value = Decimal("50.00")
+    row.margin_day = None
+    row.margin_overnight = None
+    row.trading_hours = None
+    row.is_micro = is_micro
+    row.full_size_symbol = full_size_symbol
+    return row
+
+
+def make_corr_row(a, b, value):
+    row = MagicMock(spec=InstrumentCorrelation)
+    row.instrument_a = a
+    row.instrument_b = b
+    row.correlation = Decimal(value)
+    return row
+
+
+def scalars_result(rows):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = rows
+    return result
+
+
+def reference_db():
+    db = AsyncMock()
+    db.execute.side_effect = [
+        scalars_result([
+            make_spec_row("NQ"),
+            make_spec_row("ES"),
+            make_spec_row("YM"),
+            make_spec_row("MNQ", full_size_symbol="NQ", is_micro=True, tick_value="0.50"),
+        ]),
+        scalars_result([
+            make_corr_row("ES", "NQ", "0.9200"),
+            make_corr_row("NQ", "YM", "0.8700"),
+            make_corr_row("ES", "YM", "0.9500"),
+        ]),
+    ]
+    return db
+
+
+@pytest_asyncio.fixture
+async def loaded_registry():
+    with patch.object(registry_module, "get_namespace_version", AsyncMock(return_value=0)):
+        await contract_registry.ensure_current(reference_db())
+        yield contract_registry
+    contract_registry.reset()
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+
+class TestRegistryLookups:
+    @pytest.mark.asyncio
+    async def test_specs_are_snapshots(self, loaded_registry):
+        """Specs are copied into immutable ContractSpec objects."""
+        spec = loaded_registry.get_spec("MNQ")
+        assert isinstance(spec, ContractSpec)
+        assert spec.tick_value == Decimal("0.50")
+        assert spec.is_micro is True
+        assert loaded_registry.get_spec("XX") is None
+
+    @pytest.mark.asyncio
+    async def test_normalize_symbol(self, loaded_registry):
+        """Micro symbols map to their full-size symbol; others pass through."""
+        assert loaded_registry.normalize_symbol("MNQ") == "NQ"
+        assert loaded_registry.normalize_symbol("ES") == "ES"
+        assert loaded_registry.normalize_symbol("XX") == "XX"
+
+    @pytest.mark.asyncio
+    async def test_correlation_matrix_is_symmetric(self, loaded_registry):
+        """Pairs resolve in either order; unknown pairs and the diagonal are None."""
+        assert loaded_registry.correlation("ES", "NQ") == pytest.approx(0.92)
+        assert loaded_registry.correlation("NQ", "ES") == pytest.approx(0.92)
+        assert loaded_registry.correlation("NQ", "NQ") is None
+        assert loaded_registry.correlation("NQ", "XX") is None
+
+
+class TestRegistryVersioning:
+    @pytest.mark.asyncio
+    async def test_version_checks_are_throttled(self, loaded_registry):
+        """Within the check interval ensure_current does no I/O."""
+        version = AsyncMock(return_value=0)
+        db = AsyncMock()
+        with patch.object(registry_module, "get_namespace_version", version):
+            await loaded_registry.ensure_current(db)
+
+        version.assert_not_awaited()
+        db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_reloads_when_generation_moves(self, loaded_registry):
+        """A bumped generation triggers a reload from the database."""
+        loaded_registry.mark_stale()
+        with patch.object(registry_module, "get_namespace_version", AsyncMock(return_value=1)):
+            await loaded_registry.ensure_current(reference_db())
+
+        assert loaded_registry.version == 1
+
+    @pytest.mark.asyncio
+    async def test_unchanged_generation_skips_reload(self, loaded_registry):
+        """A stale check with the same generation keeps the snapshot."""
+        loaded_registry.mark_stale()
+        db = AsyncMock()
+        with patch.object(registry_module, "get_namespace_version", AsyncMock(return_value=0)):
+            await loaded_registry.ensure_current(db)
+
+        db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_notify_bumps_namespace(self, loaded_registry):
+        """notify_reference_data_changed bumps the refdata generation."""
+        invalidate = AsyncMock(return_value=1)
+        with patch.object(registry_module, "invalidate_namespace", invalidate):
+            await registry_module.notify_reference_data_changed()
+
+        invalidate.assert_awaited_once_with("refdata")
+
+
+# ---------------------------------------------------------------------------
+# Call sites
+# ---------------------------------------------------------------------------
+
+
+class TestRiskServiceUsesRegistry:
+    @pytest.mark.asyncio
+    async def test_correlation_check_queries_only_positions(self, loaded_registry):
+        """With the registry loaded, check_correlation issues one query."""
+        signal = MagicMock(spec=Signal)
+        signal.user_id = uuid.uuid4()
+        signal.instrument_symbol = "MNQ"
+
+        open_result = MagicMock()
+        open_result.all.return_value = [("ES",), ("YM",)]
+        db = AsyncMock()
+        db.execute.return_value = open_result
+        svc = RiskService(db, None)
+
+        result = await svc.check_correlation(
+            signal, {"correlation_limit": 0.70}, loaded_registry.get_spec("MNQ")
+        )
+
+        assert result["result"] == "FAIL"
+        assert result["actual_value"] == 2
+        assert db.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_contract_spec_from_registry(self, loaded_registry):
+        """_get_contract_spec serves from memory and raises for unknown symbols."""
+        db = AsyncMock()
+        svc = RiskService(db, None)
+
+        spec = await svc._get_contract_spec("ES")
+        assert spec.symbol == "ES"
+        with pytest.raises(NotFoundError):
+            await svc._get_contract_spec("XX")
+        db.execute.assert_not_awaited()
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+import asyncio
+import time
 import uuid
 from datetime import UTC, datetime
 from decimal import Decimal
@@ -9,6 +11,7 @@ from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import pytest
 import pytest_asyncio
+from sqlalchemy.orm import Session
 
 from app.adapters.types import (
     BracketOrderResult,
@@ -26,7 +29,11 @@ from app.db.models.order import Order
 from app.db.models.order_event import OrderEvent
 from app.db.models.position import Position
 from app.db.models.signal import Signal
-from app.services.execution_service import ExecutionService
+from app.services.execution_service import (
+    _LEDGER_STAGED_KEY,
+    ExecutionService,
+    drain_ledger_updates,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -150,6 +157,7 @@ async def mock_db():
     db.flush = AsyncMock()
     db.commit = AsyncMock()
     db.refresh = AsyncMock()
+    db.info = {}
     return db
 
 
@@ -280,10 +288,8 @@ class TestFillProcessing:
         mock_db.execute.return_value = mock_scalar_result
 
         signal = make_signal()
-        # Second call for signal lookup in _create_position_from_fill
-        mock_scalar_result2 = MagicMock()
-        mock_scalar_result2.scalar_one_or_none.return_value = signal
-        mock_db.execute.side_effect = [mock_scalar_result, mock_scalar_result2]
+        # Signal for SL/TP prices in _create_position_from_fill
+        mock_db.get.return_value = signal
 
         await svc.process_fill(
             order.id, {"fill_price": 18500.25, "fill_quantity": 1}
@@ -291,6 +297,7 @@ class TestFillProcessing:
 
         assert order.status == "FILLED"
         assert order.fill_price == Decimal("18500.25")
+        mock_db.get.assert_awaited_once_with(Signal, order.signal_id)
         # A position was added
         position_adds = [
             c.args[0]
@@ -318,7 +325,7 @@ class TestFillProcessing:
         # Third call: find contract spec
         spec = make_contract_spec()
         mock_result3 = MagicMock()
-        mock_result3.scalar_one_or_none.return_value = spec
+        mock_result3.scalars.return_value.all.return_value = [spec]
 
         # Fourth call: OCO - find pending orders
         partner = make_order(bracket_role="TAKE_PROFIT", status="SUBMITTED")
@@ -354,7 +361,7 @@ class TestFillProcessing:
 
         spec = make_contract_spec()
         mock_result3 = MagicMock()
-        mock_result3.scalar_one_or_none.return_value = spec
+        mock_result3.scalars.return_value.all.return_value = [spec]
 
         partner = make_order(bracket_role="STOP_LOSS", status="SUBMITTED")
         mock_result4 = MagicMock()
@@ -431,6 +438,135 @@ class TestPositionManagement:
         with pytest.raises(NotFoundError):
             await svc.close_position(uuid.uuid4(), uuid.uuid4(), adapter)
 
+    @staticmethod
+    def _flatten_results(positions, pending, groups, specs):
+        """Results of flatten_all's queries, in order."""
+
+        def rows(values):
+            result = MagicMock()
+            result.scalars.return_value.all.return_value = values
+            result.all.return_value = values
+            return result
+
+        return [
+            rows(positions),
+            rows(pending),
+            rows(groups),  # entry order -> bracket group
+            rows(specs),
+            MagicMock(),  # bulk OrderEvent insert
+        ]
+
+    @staticmethod
+    def _filled(request=None):
+        return OrderResult(
+            broker_order_id="PAPER-X", status="FILLED",
+            fill_price=Decimal("18520.00"), fill_quantity=1,
+            timestamp=datetime.now(UTC),
+        )
+
+    @pytest.mark.asyncio
+    async def test_flatten_all_is_set_based_and_concurrent(self, svc, mock_db):
+        """Query count is fixed and broker exits overlap, however many positions."""
+        positions = [make_position(instrument_symbol=sym) for sym in ("MNQ", "MES", "MNQ")]
+        groups = [(p.entry_order_id, uuid.uuid4()) for p in positions]
+        brackets = [
+            make_order(status="SUBMITTED", bracket_role=role, bracket_group_id=group,
+                       broker_order_id=f"PAPER-{i}-{role}")
+            for i, (_, group) in enumerate(groups) for role in ("STOP_LOSS", "TAKE_PROFIT")
+        ]
+        resting_entry = make_order(status="CONSTRUCTED")
+        mock_db.execute.side_effect = self._flatten_results(
+            positions, [*brackets, resting_entry], groups,
+            [make_contract_spec(), make_contract_spec(symbol="MES")],
+        )
+
+        async def place_order(request):
+            await asyncio.sleep(0.05)
+            return self._filled()
+
+        adapter = AsyncMock()
+        adapter.place_order.side_effect = place_order
+        adapter.cancel_order.side_effect = lambda oid: CancelResult(broker_order_id=oid, success=True)
+
+        start = time.perf_counter()
+        result = await svc.flatten_all(uuid.uuid4(), adapter)
+        elapsed = time.perf_counter() - start
+
+        assert result["closed_count"] == 3
+        assert result["cancelled_orders"] == 7
+        assert elapsed < 0.1  # three 50 ms exits in parallel
+        assert mock_db.execute.await_count == 5
+        assert adapter.cancel_order.await_count == 6
+        events = mock_db.execute.await_args_list[4].args[1]
+        assert len(events) == 10
+        assert len({frozenset(event) for event in events}) == 1  # one executemany shape
+        assert all(p.status == "CLOSED" for p in positions)
+        assert all(o.status == "CANCELLED" for o in [*brackets, resting_entry])
+        mock_db.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_flatten_all_leaves_failed_exit_open_and_protected(self, svc, mock_db):
+        """A hung exit is cut off; its position stays OPEN with its SL/TP resting."""
+        stuck, ok = make_position(), make_position()
+        stuck_group, ok_group = uuid.uuid4(), uuid.uuid4()
+        stuck_stop = make_order(
+            status="SUBMITTED", bracket_role="STOP_LOSS",
+            bracket_group_id=stuck_group, broker_order_id="PAPER-STUCK-SL",
+        )
+        ok_stop = make_order(
+            status="SUBMITTED", bracket_role="STOP_LOSS",
+            bracket_group_id=ok_group, broker_order_id="PAPER-OK-SL",
+        )
+        mock_db.execute.side_effect = self._flatten_results(
+            [stuck, ok], [stuck_stop, ok_stop],
+            [(stuck.entry_order_id, stuck_group), (ok.entry_order_id, ok_group)],
+            [make_contract_spec()],
+        )
+
+        async def place_order(request):
+            if request.client_order_id == f"close-{stuck.id}":
+                await asyncio.sleep(10)
+            return self._filled()
+
+        adapter = AsyncMock()
+        adapter.place_order.side_effect = place_order
+        adapter.cancel_order.side_effect = lambda oid: CancelResult(broker_order_id=oid, success=True)
+
+        with patch("app.services.execution_service._BROKER_CALL_TIMEOUT", 0.05):
+            result = await svc.flatten_all(uuid.uuid4(), adapter)
+
+        assert result["closed_count"] == 1
+        assert result["positions"][0]["id"] == str(ok.id)
+        assert stuck.status == "OPEN"
+        assert ok.status == "CLOSED"
+        adapter.cancel_order.assert_awaited_once_with("PAPER-OK-SL")
+        assert stuck_stop.status == "SUBMITTED"
+        assert ok_stop.status == "CANCELLED"
+
+    @pytest.mark.asyncio
+    async def test_flatten_all_marks_only_confirmed_cancels(self, svc, mock_db):
+        """Refused or timed-out cancels leave the order pending in the DB."""
+        refused = make_order(status="SUBMITTED", broker_order_id="PAPER-REFUSED")
+        hung = make_order(status="SUBMITTED", broker_order_id="PAPER-HUNG")
+        done = make_order(status="SUBMITTED", broker_order_id="PAPER-DONE")
+        mock_db.execute.side_effect = self._flatten_results([], [refused, hung, done], [], [])
+
+        async def cancel_order(oid):
+            if oid == "PAPER-HUNG":
+                await asyncio.sleep(10)
+            return CancelResult(broker_order_id=oid, success=oid == "PAPER-DONE")
+
+        adapter = AsyncMock()
+        adapter.cancel_order.side_effect = cancel_order
+
+        with patch("app.services.execution_service._BROKER_CALL_TIMEOUT", 0.05):
+            result = await svc.flatten_all(uuid.uuid4(), adapter)
+
+        assert result["cancelled_orders"] == 1
+        assert refused.status == "SUBMITTED"
+        assert hung.status == "SUBMITTED"
+        assert done.status == "CANCELLED"
+
     @pytest.mark.asyncio
     async def test_cancel_order(self, svc, mock_db):
         """Cancels a SUBMITTED order."""
@@ -514,7 +650,7 @@ class TestFinalization:
         )
         spec = make_contract_spec(tick_size=Decimal("0.25"), tick_value=Decimal("0.50"))
         mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = spec
+        mock_result.scalars.return_value.all.return_value = [spec]
         mock_db.execute.return_value = mock_result
 
         await svc._finalize_position(position, 18520.0, "MANUAL")
@@ -536,7 +672,7 @@ class TestFinalization:
         )
         spec = make_contract_spec(tick_size=Decimal("0.25"), tick_value=Decimal("0.50"))
         mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = spec
+        mock_result.scalars.return_value.all.return_value = [spec]
         mock_db.execute.return_value = mock_result
 
         await svc._finalize_position(position, 18480.0, "STOP_LOSS")
@@ -556,7 +692,7 @@ class TestFinalization:
         )
         spec = make_contract_spec(tick_size=Decimal("0.25"), tick_value=Decimal("0.50"))
         mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = spec
+        mock_result.scalars.return_value.all.return_value = [spec]
         mock_db.execute.return_value = mock_result
 
         await svc._finalize_position(position, 18480.0, "TAKE_PROFIT")
@@ -575,7 +711,7 @@ class TestFinalization:
         )
         spec = make_contract_spec(tick_size=Decimal("0.25"), tick_value=Decimal("0.50"))
         mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = spec
+        mock_result.scalars.return_value.all.return_value = [spec]
         mock_db.execute.return_value = mock_result
 
         await svc._finalize_position(position, 18540.0, "TAKE_PROFIT")
@@ -603,7 +739,7 @@ class TestFinalization:
             is_micro=False,
         )
         mock_result = MagicMock()
-        mock_result.scalar_one_or_none.return_value = spec
+        mock_result.scalars.return_value.all.return_value = [spec]
         mock_db.execute.return_value = mock_result
 
         await svc._finalize_position(position, 5020.0, "MANUAL")
@@ -688,9 +824,7 @@ class TestOrderEventRecording:
 
         # Also mock the signal lookup for position creation
         signal = make_signal(user_id=user_id)
-        mock_result2 = MagicMock()
-        mock_result2.scalar_one_or_none.return_value = signal
-        mock_db.execute.side_effect = [mock_result, mock_result2]
+        mock_db.get.return_value = signal
 
         result = await svc.submit_bracket_order(
             user_id, str(bg_id), adapter
@@ -706,3 +840,51 @@ class TestOrderEventRecording:
         # SL: CONSTRUCTED->SUBMITTED
         # TP: CONSTRUCTED->SUBMITTED
         assert len(event_adds) >= 3
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Exposure Ledger Updates
+# ═══════════════════════════════════════════════════════════════════
+
+
+class TestLedgerUpdatesAfterCommit:
+    """Ledger deltas and monitor events wait for the transaction to commit."""
+
+    @pytest.mark.asyncio
+    async def test_close_is_staged_until_commit(self, svc, mock_db, mock_redis):
+        position = make_position(stop_loss_price=None)
+        mock_result = MagicMock()
+        mock_result.scalars.return_value.all.return_value = [make_contract_spec()]
+        mock_db.execute.return_value = mock_result
+
+        await svc._finalize_position(position, 18510.0, "MANUAL")
+
+        assert mock_db.info[_LEDGER_STAGED_KEY] == [(mock_redis, "position_closed", position)]
+        mock_redis.evalsha.assert_not_awaited()
+        mock_redis.publish.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_commit_applies_staged_updates(self, mock_redis):
+        session = Session()
+        position = make_position()
+        session.info[_LEDGER_STAGED_KEY] = [(mock_redis, "position_opened", position)]
+
+        session.commit()
+        await drain_ledger_updates()
+
+        mock_redis.evalsha.assert_awaited_once()
+        assert '"event": "opened"' in mock_redis.publish.await_args.args[1]
+        assert _LEDGER_STAGED_KEY not in session.info
+
+    @pytest.mark.asyncio
+    async def test_rollback_discards_staged_updates(self, mock_redis):
+        session = Session()
+        session.begin()
+        session.info[_LEDGER_STAGED_KEY] = [(mock_redis, "position_opened", make_position())]
+
+        session.rollback()
+        session.commit()
+        await drain_ledger_updates()
+
+        mock_redis.evalsha.assert_not_awaited()
+        mock_redis.publish.assert_not_awaited()
@@ -0,0 +1,246 @@
+"""Unit tests for the Redis exposure ledger and its Postgres reconciliation."""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import pytest_asyncio
+from redis.exceptions import NoScriptError
+
+from app.db.models.position import Position
+from app.services.exposure_ledger import (
+    _CLOSE_SCRIPT,
+    _MARK_SCRIPT,
+    _OPEN_SCRIPT,
+    _REPLACE_SCRIPT,
+    ExposureLedger,
+    RiskSnapshot,
+    reconcile_exposure,
+)
+from app.services.risk_service import RiskService
+
+_USER_ID = uuid.uuid4()
+_TODAY = datetime.now(UTC).date().isoformat()
+
+
+def make_position(**overrides):
+    defaults = {
+        "id": uuid.uuid4(),
+        "user_id": _USER_ID,
+        "instrument_symbol": "MNQ",
+        "realized_pnl": None,
+        "unrealized_pnl": Decimal("0"),
+        "status": "OPEN",
+    }
+    defaults.update(overrides)
+    position = MagicMock(spec=Position)
+    for k, v in defaults.items():
+        setattr(position, k, v)
+    return position
+
+
+def rows_result(rows):
+    result = MagicMock()
+    result.all.return_value = rows
+    return result
+
+
+@pytest_asyncio.fixture
+async def mock_redis():
+    redis = AsyncMock()
+    redis.hgetall = AsyncMock(return_value={})
+    redis.smembers = AsyncMock(return_value=set())
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[])
+    redis.pipeline = MagicMock(return_value=pipe)
+    return redis
+
+
+class TestSnapshotRead:
+    @pytest.mark.asyncio
+    async def test_unreconciled_ledger_returns_none(self, mock_redis):
+        """Hashes without the ready marker are ignored."""
+        mock_redis.hgetall.return_value = {"open_total": "1"}
+
+        assert await ExposureLedger(mock_redis).snapshot(_USER_ID, "MNQ") is None
+
+    @pytest.mark.asyncio
+    async def test_snapshot_from_hash(self, mock_redis):
+        """One HGETALL yields every exposure figure."""
+        mock_redis.hgetall.return_value = {
+            "ready": "1",
+            "day": _TODAY,
+            "realized_loss": "120.5",
+            "unrealized_loss": "30",
+            "open_total": "3",
+            "open:MNQ": "2",
+            "open:ES": "1",
+            "pos:abc": "MNQ",
+        }
+
+        snapshot = await ExposureLedger(mock_redis).snapshot(_USER_ID, "MNQ")
+
+        assert snapshot.open_for_symbol == 2
+        assert snapshot.open_total == 3
+        assert snapshot.realized_losses_today == 120.5
+        assert snapshot.unrealized_losses == 30.0
+        assert sorted(snapshot.open_symbols) == ["ES", "MNQ"]
+
+    @pytest.mark.asyncio
+    async def test_realized_loss_rolls_over_at_day_boundary(self, mock_redis):
+        """Losses recorded on a previous UTC day do not count today."""
+        yesterday = (datetime.now(UTC) - timedelta(days=1)).date().isoformat()
+        mock_redis.hgetall.return_value = {
+            "ready": "1",
+            "day": yesterday,
+            "realized_loss": "400",
+        }
+
+        snapshot = await ExposureLedger(mock_redis).snapshot(_USER_ID, "MNQ")
+
+        assert snapshot.realized_losses_today == 0.0
+
+
+class TestLedgerUpdates:
+    @pytest.mark.asyncio
+    async def test_open_and_close_run_scripts(self, mock_redis):
+        """Open/close are single EVALSHA calls against the user's hash."""
+        ledger = ExposureLedger(mock_redis)
+        position = make_position(realized_pnl=Decimal("-45.00"))
+
+        await ledger.position_opened(position)
+        await ledger.position_closed(position)
+
+        open_call, close_call = mock_redis.evalsha.await_args_list
+        assert open_call.args[:4] == (_OPEN_SCRIPT.sha, 2, f"exposure:{_USER_ID}", "exposure:users")
+        assert open_call.args[-1] == "MNQ"
+        assert close_call.args[0] == _CLOSE_SCRIPT.sha
+        assert close_call.args[-2:] == (-45.0, _TODAY)
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_eval_when_script_not_cached(self, mock_redis):
+        """NOSCRIPT is retried with the script source."""
+        mock_redis.evalsha.side_effect = NoScriptError("NOSCRIPT")
+
+        await ExposureLedger(mock_redis).position_opened(make_position())
+
+        assert mock_redis.eval.await_args.args[0] == _OPEN_SCRIPT.source
+
+    @pytest.mark.asyncio
+    async def test_marks_are_pipelined(self, mock_redis):
+        """Mark-to-market updates for many positions share one pipeline."""
+        pipe = mock_redis.pipeline.return_value
+        positions = [make_position(unrealized_pnl=Decimal("-10")) for _ in range(3)]
+
+        await ExposureLedger(mock_redis).mark_positions(positions)
+
+        assert pipe.evalsha.call_count == 3
+        assert pipe.evalsha.call_args.args[0] == _MARK_SCRIPT.sha
+        pipe.execute.assert_awaited_once()
+
+
+class TestReconciliation:
+    @pytest.mark.asyncio
+    async def test_rebuilds_hash_from_positions(self, mock_redis):
+        """Open positions and today's losses become ledger fields."""
+        pos_a, pos_b = uuid.uuid4(), uuid.uuid4()
+        db = AsyncMock()
+        db.execute.side_effect = [
+            rows_result([
+                (_USER_ID, pos_a, "MNQ", Decimal("-25.00")),
+                (_USER_ID, pos_b, "MNQ", Decimal("10.00")),
+            ]),
+            rows_result([(_USER_ID, Decimal("-80.00"))]),
+        ]
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.side_effect = [["7"], [1]]  # seq read, replace
+
+        fields = (await reconcile_exposure(db, mock_redis, [_USER_ID]))[_USER_ID]
+
+        assert fields["ready"] == "1"
+        assert fields["open:MNQ"] == "2"
+        assert fields["open_total"] == "2"
+        assert fields[f"pos:{pos_a}"] == "MNQ"
+        assert Decimal(fields["unrealized_loss"]) == Decimal("25.00")
+        assert Decimal(fields["realized_loss"]) == Decimal("80.00")
+        pipe.hget.assert_called_once_with(f"exposure:{_USER_ID}", "seq")
+        args = pipe.evalsha.call_args.args
+        assert args[:7] == (
+            _REPLACE_SCRIPT.sha, 2, f"exposure:{_USER_ID}", "exposure:users",
+            str(_USER_ID), "7", "2",
+        )
+        written = dict(zip(args[7::2], args[8::2], strict=True))
+        assert written == fields
+
+    @pytest.mark.asyncio
+    async def test_user_without_positions_gets_empty_ledger(self, mock_redis):
+        """Users with no exposure still get a ready ledger so checks stay O(1)."""
+        db = AsyncMock()
+        db.execute.side_effect = [rows_result([]), rows_result([])]
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.side_effect = [[None], [1]]
+
+        fields = (await reconcile_exposure(db, mock_redis, [_USER_ID]))[_USER_ID]
+
+        assert fields["open_total"] == "0"
+        assert fields["realized_loss"] == "0"
+        args = pipe.evalsha.call_args.args
+        assert args[5:7] == ("0", "0")  # seq unset, no open positions
+
+    @pytest.mark.asyncio
+    async def test_update_during_read_is_not_overwritten(self, mock_redis):
+        """A ledger whose seq moved since the read keeps its live values."""
+        other = uuid.uuid4()
+        db = AsyncMock()
+        db.execute.side_effect = [rows_result([]), rows_result([])]
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.side_effect = [["3", "1"], [0, 1]]
+
+        ledger = ExposureLedger(mock_redis)
+        sequences = await ledger.sequences([_USER_ID, other])
+        skipped = await ledger.replace(
+            {_USER_ID: ({"open_total": "0"}, sequences[_USER_ID]),
+             other: ({"open_total": "0"}, sequences[other])}
+        )
+
+        assert sequences == {_USER_ID: "3", other: "1"}
+        assert skipped == {_USER_ID}
+
+    def test_replace_script_is_guarded_by_seq(self):
+        """Open and close bump seq; replace compares it before writing."""
+        assert "'seq', 1" in _OPEN_SCRIPT.source
+        assert "'seq', 1" in _CLOSE_SCRIPT.source
+        assert "HGET', KEYS[1], 'seq'" in _REPLACE_SCRIPT.source
+
+
+class TestRiskServiceSnapshot:
+    @pytest.mark.asyncio
+    async def test_ready_ledger_needs_no_db_reads(self, mock_redis):
+        """With a reconciled ledger the snapshot costs zero queries."""
+        mock_redis.hgetall.return_value = {"ready": "1", "day": _TODAY, "open_total": "1"}
+        db = AsyncMock()
+
+        snapshot = await RiskService(db, mock_redis).get_risk_snapshot(_USER_ID, "MNQ")
+
+        assert snapshot == RiskSnapshot(open_total=1)
+        db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_missing_ledger_is_reconciled(self, mock_redis):
+        """A missing ledger is rebuilt from Postgres and used immediately."""
+        db = AsyncMock()
+        db.execute.side_effect = [
+            rows_result([(_USER_ID, uuid.uuid4(), "ES", Decimal("0"))]),
+            rows_result([]),
+        ]
+        mock_redis.pipeline.return_value.execute.side_effect = [[None], [1]]
+
+        snapshot = await RiskService(db, mock_redis).get_risk_snapshot(_USER_ID, "ES")
+
+        assert snapshot.open_for_symbol == 1
+        assert snapshot.open_symbols == ["ES"]
+        assert mock_redis.pipeline.return_value.execute.await_count == 2
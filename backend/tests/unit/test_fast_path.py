@@ -0,0 +1,218 @@
+"""Unit tests for the in-process signal execution fast path."""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.services import fast_path as fast_path_module
+from app.services.fast_path import FastPathExecutor
+from app.services.signal_executor import (
+    MAX_DISPATCH_ATTEMPTS,
+    SignalExecutor,
+    stale_pending_signals,
+)
+from app.services.signal_service import SignalService
+
+
+def session_factory(db):
+    @asynccontextmanager
+    async def factory():
+        yield db
+
+    return factory
+
+
+def claimed(signal):
+    result = MagicMock()
+    result.scalar_one_or_none.return_value = signal
+    return result
+
+
+class TestFastPathExecutor:
+    @pytest.mark.asyncio
+    async def test_executes_claimed_signal_with_passed_spec(self):
+        signal, spec = MagicMock(id=uuid.uuid4()), MagicMock()
+        db = AsyncMock()
+        db.execute.return_value = claimed(signal)
+        executor = FastPathExecutor(session_factory(db), AsyncMock(), workers=1)
+
+        with patch(
+            "app.services.fast_path.SignalExecutor.execute",
+            AsyncMock(return_value="FILLED"),
+        ) as execute:
+            executor.start()
+            assert executor.submit(signal.id, spec)
+            await executor.stop()
+
+        execute.assert_awaited_once_with(signal, spec)
+        assert not executor.running
+
+    @pytest.mark.asyncio
+    async def test_signal_claimed_elsewhere_is_skipped(self):
+        db = AsyncMock()
+        db.execute.return_value = claimed(None)
+        executor = FastPathExecutor(session_factory(db), AsyncMock())
+
+        with patch("app.services.fast_path.SignalExecutor.execute", AsyncMock()) as execute:
+            assert await executor.execute(uuid.uuid4()) is None
+
+        execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_submit_refuses_when_stopped_or_full(self):
+        executor = FastPathExecutor(session_factory(AsyncMock()), AsyncMock(), queue_size=1)
+        assert not executor.submit(uuid.uuid4())
+
+        gate = asyncio.Event()
+
+        async def execute(signal_id, spec):
+            await gate.wait()
+
+        with patch.object(executor, "execute", execute):
+            executor.start()
+            await asyncio.sleep(0)
+            assert executor.submit(uuid.uuid4())  # taken by a worker
+            await asyncio.sleep(0)
+            assert executor.submit(uuid.uuid4())  # fills the queue
+            assert not executor.submit(uuid.uuid4())
+            gate.set()
+            await executor.stop()
+
+    @pytest.mark.asyncio
+    async def test_worker_survives_failed_signal(self):
+        executor = FastPathExecutor(session_factory(AsyncMock()), AsyncMock(), workers=1)
+        done = []
+
+        async def execute(signal_id, spec):
+            if not done:
+                done.append(signal_id)
+                raise RuntimeError("broker down")
+            done.append(signal_id)
+
+        with patch.object(executor, "execute", execute):
+            executor.start()
+            executor.submit(uuid.uuid4())
+            executor.submit(uuid.uuid4())
+            await executor.stop()
+
+        assert len(done) == 2
+
+
+class TestDispatch:
+    def test_uses_fast_path_when_running(self):
+        signal, spec = MagicMock(id=uuid.uuid4()), MagicMock()
+        running = MagicMock()
+        running.submit.return_value = True
+
+        with (
+            patch.object(fast_path_module, "get_fast_path", return_value=running),
+            patch("app.tasks.execution_tasks.process_signal") as task,
+        ):
+            SignalService._dispatch_processing(signal, spec)
+
+        running.submit.assert_called_once_with(signal.id, spec)
+        task.delay.assert_not_called()
+
+    def test_falls_back_to_celery_when_queue_full(self):
+        signal = MagicMock(id=uuid.uuid4())
+        full = MagicMock()
+        full.submit.return_value = False
+
+        with (
+            patch.object(fast_path_module, "get_fast_path", return_value=full),
+            patch("app.tasks.execution_tasks.process_signal") as task,
+        ):
+            SignalService._dispatch_processing(signal, MagicMock())
+
+        task.delay.assert_called_once_with(str(signal.id))
+
+    def test_disabled_by_default(self):
+        fast_path_module.start_fast_path(AsyncMock())
+        assert fast_path_module.get_fast_path() is None
+
+
+def stale(*signals):
+    result = MagicMock()
+    result.scalars.return_value.all.return_value = list(signals)
+    return result
+
+
+class TestSignalOutbox:
+    @pytest.mark.asyncio
+    async def test_stamps_dispatched_signals(self):
+        signal = MagicMock(id=uuid.uuid4(), status="ENRICHED", dispatch_attempts=1)
+        db = AsyncMock()
+        db.execute.return_value = stale(signal)
+
+        assert await stale_pending_signals(db) == [signal.id]
+
+        assert signal.dispatch_attempts == 2
+        assert signal.dispatched_at is not None
+        assert signal.status == "ENRICHED"
+
+    @pytest.mark.asyncio
+    async def test_skips_recently_dispatched_signals(self):
+        db = AsyncMock()
+        db.execute.return_value = stale()
+
+        await stale_pending_signals(db)
+
+        query = str(db.execute.call_args.args[0])
+        assert "signals.dispatched_at IS NULL" in query
+        assert "signals.dispatched_at <" in query
+
+    @pytest.mark.asyncio
+    async def test_rejects_signals_out_of_attempts(self):
+        signal = MagicMock(
+            id=uuid.uuid4(), status="ENRICHED", dispatch_attempts=MAX_DISPATCH_ATTEMPTS
+        )
+        db = AsyncMock()
+        db.execute.return_value = stale(signal)
+
+        assert await stale_pending_signals(db) == []
+
+        assert signal.status == "REJECTED"
+        assert signal.dispatch_attempts == MAX_DISPATCH_ATTEMPTS
+
+    @pytest.mark.asyncio
+    async def test_executing_is_committed_before_broker_submission(self):
+        signal = MagicMock(id=uuid.uuid4(), status="ENRICHED", quantity=1)
+        db = AsyncMock()
+        events = []
+        db.commit.side_effect = lambda: events.append(("commit", signal.status))
+
+        risk = MagicMock()
+        risk.get_circuit_breaker_state = AsyncMock(return_value={"state": "OK"})
+        risk.get_risk_settings = AsyncMock(
+            return_value={"is_paper_mode": True, "paper_slippage_ticks": 0}
+        )
+        risk.run_all_checks = AsyncMock(return_value=[])
+        risk.calculate_quantity = AsyncMock(return_value=1)
+        execution = MagicMock()
+        execution.construct_bracket_order = AsyncMock(return_value="bg-1")
+
+        async def submit(*args):
+            events.append(("submit", signal.status))
+            return {"entry_status": "FILLED"}
+
+        execution.submit_bracket_order = submit
+
+        with (
+            patch("app.services.signal_executor.contract_registry.ensure_current", AsyncMock()),
+            patch("app.services.risk_service.RiskService", return_value=risk),
+            patch("app.services.execution_service.ExecutionService", return_value=execution),
+            patch("app.adapters.registry.get_adapter", AsyncMock()),
+        ):
+            status = await SignalExecutor(db, AsyncMock()).execute(signal, MagicMock())
+
+        assert status == "FILLED"
+        assert events == [
+            ("commit", "EXECUTING"),
+            ("submit", "EXECUTING"),
+            ("commit", "FILLED"),
+        ]
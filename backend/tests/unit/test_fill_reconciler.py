@@ -0,0 +1,202 @@
+"""Unit tests for batched fill reconciliation."""
+
+from __future__ import annotations
+
+import uuid
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.adapters.exceptions import OrderNotFoundError
+from app.adapters.paper import PaperBrokerAdapter
+from app.adapters.paper_engine import LocalPaperEngine
+from app.adapters.types import OrderStatusInfo
+from app.db.models.order import Order
+from app.services.execution_service import ExecutionService
+from app.services.fill_reconciler import FillReconciler, RateLimiter
+
+
+def session_factory(*sessions):
+    queue = list(sessions)
+
+    @asynccontextmanager
+    async def factory():
+        yield queue.pop(0)
+
+    return factory
+
+
+def rows(values):
+    result = MagicMock()
+    result.all.return_value = values
+    result.scalars.return_value.all.return_value = values
+    return result
+
+
+def make_order(user_id, broker_order_id, bracket_role="ENTRY"):
+    order = MagicMock(spec=Order)
+    order.id = uuid.uuid4()
+    order.user_id = user_id
+    order.broker_order_id = broker_order_id
+    order.bracket_role = bracket_role
+    order.status = "SUBMITTED"
+    order.quantity = 1
+    return order
+
+
+def fake_adapter(broker_type="paper", batch=2, statuses=None):
+    adapter = MagicMock()
+    adapter.broker_type = broker_type
+    adapter.max_status_batch = batch
+    adapter.get_order_statuses = AsyncMock(side_effect=lambda ids: {
+        oid: statuses[oid] for oid in ids if oid in (statuses or {})
+    })
+    return adapter
+
+
+def filled(oid, price="101.25"):
+    return OrderStatusInfo(
+        broker_order_id=oid, status="FILLED", fill_price=Decimal(price), filled_quantity=1
+    )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter:
+    @pytest.mark.asyncio
+    async def test_bursts_then_paces(self):
+        clock = FakeClock()
+        limiter = RateLimiter(rate=10, burst=2, clock=clock)
+
+        with patch("app.services.fill_reconciler.asyncio.sleep", clock.sleep):
+            for _ in range(5):
+                await limiter.acquire()
+
+        assert clock.slept == pytest.approx([0.1, 0.1, 0.1])
+
+
+class TestBulkStatuses:
+    @pytest.mark.asyncio
+    async def test_paper_statuses_are_one_engine_read(self):
+        engine = LocalPaperEngine()
+        engine.get_orders = AsyncMock(return_value={"A": None, "B": None})
+        adapter = PaperBrokerAdapter(uuid.uuid4(), AsyncMock(), AsyncMock(), engine=engine)
+
+        assert await adapter.get_order_statuses(["A", "B"]) == {}
+        engine.get_orders.assert_awaited_once_with(["A", "B"])
+
+    @pytest.mark.asyncio
+    async def test_default_bulk_skips_unknown_orders(self):
+        """Adapters without a bulk endpoint fall back to per-order lookups."""
+        adapter = PaperBrokerAdapter(uuid.uuid4(), AsyncMock(), AsyncMock(), engine=LocalPaperEngine())
+        adapter.get_order_status = AsyncMock(
+            side_effect=[filled("A"), OrderNotFoundError("B")]
+        )
+
+        statuses = await super(PaperBrokerAdapter, adapter).get_order_statuses(["A", "B"])
+
+        assert list(statuses) == ["A"]
+
+
+class TestReconcile:
+    @pytest.mark.asyncio
+    async def test_batched_fetch_and_one_transaction_per_user(self):
+        paper_user, live_user = uuid.uuid4(), uuid.uuid4()
+        live_settings = MagicMock(user_id=live_user, is_paper_mode=False, paper_slippage_ticks=1)
+        read_db = AsyncMock()
+        read_db.execute.side_effect = [
+            rows([(paper_user, "P-1"), (paper_user, "P-2"), (paper_user, "P-3"),
+                  (live_user, "L-1")]),
+            rows([live_settings]),
+        ]
+        entry = make_order(paper_user, "P-1")
+        stop = make_order(paper_user, "P-3", bracket_role="STOP_LOSS")
+        paper_db, live_db = AsyncMock(), AsyncMock()
+        paper_db.execute.return_value = rows([stop, entry])
+        live_db.execute.return_value = rows([make_order(live_user, "L-1")])
+
+        paper = fake_adapter(statuses={"P-1": filled("P-1"), "P-3": filled("P-3", "99")})
+        live = fake_adapter(
+            broker_type="tradovate",
+            batch=1,
+            statuses={"L-1": OrderStatusInfo(broker_order_id="L-1", status="CANCELLED")},
+        )
+        adapters = {paper_user: paper, live_user: live}
+        applied = []
+
+        async def apply_fill(self, order, data):
+            applied.append((order.broker_order_id, data["fill_price"]))
+
+        with (
+            patch("app.services.fill_reconciler.get_adapter",
+                  AsyncMock(side_effect=lambda uid, *a, **kw: adapters[uid])) as get_adapter,
+            patch("app.services.fill_reconciler.adapter_pool.prime_connections",
+                  AsyncMock()) as prime,
+            patch.object(ExecutionService, "apply_fill", apply_fill),
+        ):
+            summary = await FillReconciler(
+                session_factory(read_db, paper_db, live_db), AsyncMock()
+            ).run()
+
+        assert read_db.execute.await_count == 2  # orders + all users' settings
+        prime.assert_awaited_once_with(read_db, [live_user])
+        assert get_adapter.await_args_list[1].kwargs["is_paper"] is False
+        assert [c.args[0] for c in paper.get_order_statuses.await_args_list] == [
+            ["P-1", "P-2"], ["P-3"]
+        ]
+        assert applied == [("P-1", 101.25), ("P-3", 99.0)]  # entry before exit
+        paper_db.commit.assert_awaited_once()
+        live_db.commit.assert_awaited_once()
+        assert summary.orders_checked == 4
+        assert summary.reconciled == 3
+        assert summary.filled == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_user_does_not_block_others(self):
+        ok_user, bad_user = uuid.uuid4(), uuid.uuid4()
+        read_db = AsyncMock()
+        read_db.execute.side_effect = [
+            rows([(bad_user, "B-1"), (ok_user, "O-1")]),
+            rows([]),
+        ]
+        ok_db = AsyncMock()
+        ok_db.execute.return_value = rows([make_order(ok_user, "O-1")])
+        broken = fake_adapter()
+        broken.get_order_statuses = AsyncMock(side_effect=TimeoutError)
+        adapters = {bad_user: broken, ok_user: fake_adapter(statuses={"O-1": filled("O-1")})}
+
+        with (
+            patch("app.services.fill_reconciler.get_adapter",
+                  AsyncMock(side_effect=lambda uid, *a, **kw: adapters[uid])),
+            patch.object(ExecutionService, "apply_fill", AsyncMock()),
+        ):
+            summary = await FillReconciler(
+                session_factory(read_db, ok_db), AsyncMock()
+            ).run()
+
+        assert summary.failed_users == 1
+        assert summary.filled == 1
+        ok_db.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_no_submitted_orders_is_one_query(self):
+        read_db = AsyncMock()
+        read_db.execute.return_value = rows([])
+
+        summary = await FillReconciler(session_factory(read_db), AsyncMock()).run()
+
+        assert summary.orders_checked == 0
+        read_db.execute.assert_awaited_once()
@@ -0,0 +1,375 @@
+"""Unit tests for the streaming fill consumer."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+
+from app.adapters.base import BrokerAdapter
+from app.adapters.paper import PaperBrokerAdapter
+from app.adapters.paper_engine import LocalPaperEngine
+from app.adapters.types import BracketRole, OrderRequest, OrderResult, OrderSide, OrderType
+from app.services import fill_stream
+from app.services.execution_service import ExecutionService
+from app.services.fill_stream import FillStreamService, FillUpdate
+
+_USER_ID = uuid.uuid4()
+
+
+# ---------------------------------------------------------------------------
+# Local stand-in for a broker's order-update socket
+# ---------------------------------------------------------------------------
+
+
+class FakeUpdateServer:
+    """Pushes sequenced fills as JSON lines, replaying after the client's cursor.
+
+    The first line from the client is ``{"since": <cursor or null>}``, like a
+    resubscribe message on a broker WebSocket.
+    """
+
+    def __init__(self, fills: int, drop_after: int | None = None) -> None:
+        self.messages = [
+            {"seq": str(i), "order_id": f"B-{i}", "status": "FILLED", "price": "100.25"}
+            for i in range(1, fills + 1)
+        ]
+        self.drop_after = drop_after
+        self.subscriptions: list[str | None] = []
+        self._server: asyncio.Server | None = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer) -> None:
+        since = json.loads(await reader.readline())["since"]
+        self.subscriptions.append(since)
+        start = int(since or 0)
+        drop_at = self.drop_after if len(self.subscriptions) == 1 else None
+        for sent, message in enumerate(self.messages[start:]):
+            if drop_at is not None and sent == drop_at:
+                break  # connection lost mid-stream
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain()
+        if drop_at is None:
+            await asyncio.sleep(3600)  # stay subscribed
+        writer.close()
+
+
+class StreamingAdapter(BrokerAdapter):
+    """Adapter whose order-update stream reads the stand-in socket."""
+
+    def __init__(self, port: int) -> None:
+        self._port = port
+        self.yielded = 0
+
+    async def subscribe_order_updates(self, since=None):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self._port)
+        writer.write((json.dumps({"since": since}) + "\n").encode())
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                self.yielded += 1
+                yield OrderResult(
+                    broker_order_id=message["order_id"],
+                    status=message["status"],
+                    fill_price=Decimal(message["price"]),
+                    fill_quantity=1,
+                    sequence=message["seq"],
+                )
+        finally:
+            writer.close()
+        raise ConnectionError("stream closed")
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def place_order(self, order):
+        raise NotImplementedError
+
+    async def place_bracket_order(self, entry, stop_loss, take_profit):
+        raise NotImplementedError
+
+    async def cancel_order(self, broker_order_id):
+        raise NotImplementedError
+
+    async def modify_order(self, broker_order_id, new_price=None, new_quantity=None):
+        raise NotImplementedError
+
+    async def get_positions(self):
+        return []
+
+    async def get_order_status(self, broker_order_id):
+        raise NotImplementedError
+
+    async def get_account_info(self):
+        raise NotImplementedError
+
+    async def subscribe_position_updates(self):
+        raise NotImplementedError
+
+
+async def wait_until(predicate, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+def session_factory(db):
+    @asynccontextmanager
+    async def factory():
+        yield db
+
+    return factory
+
+
+@pytest_asyncio.fixture
+async def mock_redis():
+    redis = AsyncMock()
+    redis.get.return_value = None
+    return redis
+
+
+@pytest.fixture(autouse=True)
+def fast_reconnect():
+    with patch.object(fill_stream, "_RECONNECT_DELAYS", (0,)):
+        yield
+
+
+async def run_stream(service):
+    """Subscribe the user and record what the consumers apply."""
+    applied: list[FillUpdate] = []
+
+    async def record(update):
+        applied.append(update)
+        return True
+
+    service.apply = record
+    service.start()
+    service.subscribe(_USER_ID)
+    return applied
+
+
+# ---------------------------------------------------------------------------
+# Paper adapter stream
+# ---------------------------------------------------------------------------
+
+
+class TestPaperStream:
+    @pytest.mark.asyncio
+    async def test_trigger_fills_are_streamed_with_cursor(self, mock_redis):
+        """Engine fills reach subscribers, and resubscribing resumes after the cursor."""
+        engine = LocalPaperEngine()
+        adapter = PaperBrokerAdapter(_USER_ID, AsyncMock(), mock_redis, engine=engine)
+        await adapter.connect()
+        for price in ("90", "95"):
+            await adapter.place_order(
+                OrderRequest(
+                    instrument_symbol="MNQ",
+                    side=OrderSide.SELL,
+                    order_type=OrderType.STOP,
+                    quantity=1,
+                    price=Decimal(price),
+                    bracket_role=BracketRole.STOP_LOSS,
+                )
+            )
+
+        stream = adapter.subscribe_order_updates()
+        first = asyncio.create_task(anext(stream))
+        await asyncio.sleep(0)
+        await engine.trigger({"MNQ": Decimal("94")})
+        update = await first
+
+        assert update.status == "FILLED"
+        assert update.fill_price == Decimal("94.75")  # 95 stop, one tick slippage
+        assert update.sequence == "1"
+
+        await engine.trigger({"MNQ": Decimal("89")})
+        resumed = adapter.subscribe_order_updates(since=update.sequence)
+        replayed = await anext(resumed)
+        assert replayed.sequence == "2"
+        assert replayed.fill_price == Decimal("89.75")
+        await stream.aclose()
+        await resumed.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+
+class TestStreaming:
+    @pytest.mark.asyncio
+    async def test_resumes_from_last_sequence_after_disconnect(self, mock_redis):
+        server = FakeUpdateServer(fills=5, drop_after=2)
+        adapter = StreamingAdapter(await server.start())
+        service = FillStreamService(
+            session_factory(AsyncMock()), mock_redis, adapter_factory=AsyncMock(return_value=adapter)
+        )
+
+        applied = await run_stream(service)
+        await wait_until(lambda: len(applied) == 5)
+
+        assert server.subscriptions == [None, "2"]
+        assert [u.result.broker_order_id for u in applied] == [f"B-{i}" for i in range(1, 6)]
+        await service.close()
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_starts_from_persisted_cursor(self, mock_redis):
+        mock_redis.get.return_value = "3"
+        server = FakeUpdateServer(fills=5)
+        adapter = StreamingAdapter(await server.start())
+        service = FillStreamService(
+            session_factory(AsyncMock()), mock_redis, adapter_factory=AsyncMock(return_value=adapter)
+        )
+
+        applied = await run_stream(service)
+        await wait_until(lambda: len(applied) == 2)
+
+        assert server.subscriptions == ["3"]
+        mock_redis.get.assert_awaited_once_with(f"fills:cursor:{_USER_ID}")
+        await service.close()
+        await server.stop()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_stops_reading_the_stream(self, mock_redis):
+        """A slow consumer applies backpressure instead of buffering everything."""
+        server = FakeUpdateServer(fills=20)
+        adapter = StreamingAdapter(await server.start())
+        service = FillStreamService(
+            session_factory(AsyncMock()),
+            mock_redis,
+            adapter_factory=AsyncMock(return_value=adapter),
+            queue_size=2,
+            consumers=1,
+        )
+        release = asyncio.Event()
+        applied = []
+
+        async def slow_apply(update):
+            await release.wait()
+            applied.append(update)
+
+        service.apply = slow_apply
+        service.start()
+        service.subscribe(_USER_ID)
+        await wait_until(lambda: adapter.yielded >= 4)
+        await asyncio.sleep(0.05)
+
+        # One held by the consumer, two queued, one blocked in put().
+        assert adapter.yielded == 4
+        assert service.backlog == 2
+
+        release.set()
+        await wait_until(lambda: len(applied) == 20)
+        await service.close()
+        await server.stop()
+
+
+class TestApply:
+    def _service(self, db, redis):
+        return FillStreamService(session_factory(db), redis, adapter_factory=AsyncMock())
+
+    def _update(self, sequence="7"):
+        return FillUpdate(
+            _USER_ID,
+            OrderResult(
+                broker_order_id="B-7",
+                status="FILLED",
+                fill_price=Decimal("101.5"),
+                fill_quantity=2,
+                commission=Decimal("1.24"),
+                sequence=sequence,
+            ),
+        )
+
+    @pytest.mark.asyncio
+    async def test_fill_goes_through_process_fill(self, mock_redis):
+        order_id = uuid.uuid4()
+        db = AsyncMock()
+        row = MagicMock()
+        row.one_or_none.return_value = MagicMock(id=order_id, status="SUBMITTED")
+        db.execute.return_value = row
+
+        with patch.object(ExecutionService, "process_fill", AsyncMock()) as process_fill:
+            applied = await self._service(db, mock_redis).apply(self._update())
+
+        assert applied
+        process_fill.assert_awaited_once_with(
+            order_id,
+            {"fill_price": 101.5, "fill_quantity": 2, "commission": Decimal("1.24")},
+        )
+        mock_redis.set.assert_awaited_once_with(
+            f"fills:cursor:{_USER_ID}", "7", ex=7 * 24 * 3600
+        )
+
+    @pytest.mark.asyncio
+    async def test_already_filled_order_is_skipped(self, mock_redis):
+        """A fill the reconcile poll already applied is not applied twice."""
+        db = AsyncMock()
+        row = MagicMock()
+        row.one_or_none.return_value = MagicMock(id=uuid.uuid4(), status="FILLED")
+        db.execute.return_value = row
+
+        with patch.object(ExecutionService, "process_fill", AsyncMock()) as process_fill:
+            applied = await self._service(db, mock_redis).apply(self._update())
+
+        assert not applied
+        process_fill.assert_not_awaited()
+        mock_redis.set.assert_awaited_once()  # cursor still advances
+
+
+class TestSubscriptions:
+    @pytest.mark.asyncio
+    async def test_sync_tracks_users_with_working_orders(self, mock_redis):
+        stale, kept, new = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+        db = AsyncMock()
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = [kept, new]
+        db.execute.return_value = result
+        never_ready = asyncio.Event()
+
+        async def factory(user_id):
+            await never_ready.wait()
+
+        service = FillStreamService(session_factory(db), mock_redis, adapter_factory=factory)
+        service.subscribe(stale)
+        service.subscribe(kept)
+
+        await service.sync_subscriptions()
+
+        assert service.subscribed == {kept, new}
+        await service.close()
+
+    @pytest.mark.asyncio
+    async def test_exits_of_closed_positions_do_not_subscribe(self, mock_redis):
+        db = AsyncMock()
+        result = MagicMock()
+        result.scalars.return_value.all.return_value = []
+        db.execute.return_value = result
+
+        await FillStreamService(session_factory(db), mock_redis).sync_subscriptions()
+
+        sql = str(db.execute.await_args.args[0])
+        assert "NOT (EXISTS" in sql
+        assert "positions.status" in sql
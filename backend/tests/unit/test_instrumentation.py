@@ -0,0 +1,133 @@
+"""Unit tests for per-request query instrumentation and /metrics."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core import instrumentation
+from app.core.instrumentation import QueryStats, current_stats, report, track
+from app.core.metrics import Counter, Registry
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite://")
+    instrumentation.instrument_engine(engine)
+    yield engine
+    await engine.dispose()
+
+
+class TestScopes:
+    async def test_counts_statements_and_rows_inside_scope(self, engine):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))  # outside any scope
+            with track() as stats:
+                await conn.execute(text("CREATE TABLE t (x INTEGER)"))
+                await conn.execute(text("INSERT INTO t VALUES (1), (2), (3)"))
+                await conn.execute(text("UPDATE t SET x = x + 1"))
+
+        assert stats.db_statements == 3
+        assert stats.db_rows == 6  # 3 inserted + 3 updated
+        assert stats.db_seconds > 0
+        assert current_stats() is None
+
+    async def test_child_tasks_report_to_the_same_scope(self, engine):
+        async def query():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        with track() as stats:
+            await asyncio.gather(query(), query())
+
+        assert stats.db_statements == 2
+
+    async def test_redis_wrapper_counts_round_trips(self):
+        calls = []
+
+        async def execute_command(*args):
+            calls.append(args)
+            return "OK"
+
+        timed = instrumentation._timed(execute_command)
+        await timed("GET", "k")  # outside any scope
+        with track() as stats:
+            await timed("SET", "k", "v")
+            await timed("GET", "k")
+
+        assert len(calls) == 3
+        assert stats.redis_calls == 2
+
+    def test_redis_clients_are_wrapped_once(self):
+        from redis.asyncio.client import Pipeline, Redis
+
+        instrumentation.instrument_redis()
+        wrapped = Redis.execute_command
+        instrumentation.instrument_redis()
+
+        assert Redis.execute_command is wrapped
+        assert Redis.execute_command.__instrumented__
+        assert Pipeline.execute.__instrumented__
+
+
+class TestReport:
+    def test_repeated_statement_is_flagged(self):
+        stats = QueryStats(statements={"SELECT * FROM orders WHERE id = $1": 12, "SELECT 1": 1})
+        before = instrumentation.REPEATED_QUERIES.labels("http", "GET /x").value
+
+        report(stats, "http", "GET /x")
+
+        assert stats.repeated() == [("SELECT * FROM orders WHERE id = $1", 12)]
+        assert instrumentation.REPEATED_QUERIES.labels("http", "GET /x").value == before + 1
+
+    def test_server_timing_header(self):
+        stats = QueryStats(db_statements=3, db_seconds=0.0042, redis_calls=2, redis_seconds=0.001)
+
+        assert stats.server_timing(0.0123) == (
+            'app;dur=12.3, db;dur=4.2;desc="3 queries", redis;dur=1.0;desc="2 calls"'
+        )
+
+
+class TestMetricsFormat:
+    def test_render_prometheus_text(self, monkeypatch):
+        registry = Registry()
+        monkeypatch.setattr("app.core.metrics.REGISTRY", registry)
+        counter = Counter("demo_requests", "Requests", ("route",))
+        counter.labels('/a"b').inc()
+        counter.labels('/a"b').inc(2)
+
+        assert registry.render() == (
+            "# HELP demo_requests Requests\n"
+            "# TYPE demo_requests counter\n"
+            'demo_requests_total{route="/a\\"b"} 3\n'
+        )
+
+    def test_wrong_label_count_rejected(self, monkeypatch):
+        monkeypatch.setattr("app.core.metrics.REGISTRY", Registry())
+        with pytest.raises(ValueError):
+            Counter("demo", "Demo", ("a", "b")).labels("only-one")
+
+
+class TestEndpoint:
+    async def test_metrics_requires_operator_key(self, async_client: AsyncClient):
+        resp = await async_client.get("/metrics")
+        assert resp.status_code == 401
+
+    async def test_metrics_served_with_bearer_key(self, async_client: AsyncClient, monkeypatch):
+        monkeypatch.setattr("app.core.config.settings.OPERATOR_API_KEY", "op-key")
+        await async_client.get("/health")
+
+        resp = await async_client.get("/metrics", headers={"Authorization": "Bearer op-key"})
+
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+        sample = 'trendedge_http_requests_total{method="GET",route="/health",status="200"}'
+        assert sample in resp.text
+
+    async def test_server_timing_header_on_responses(self, async_client: AsyncClient):
+        resp = await async_client.get("/health")
+        assert resp.headers["Server-Timing"].startswith("app;dur=")
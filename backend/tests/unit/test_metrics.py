@@ -0,0 +1,135 @@
+"""Unit tests for the in-process metrics registry and multiprocess mode."""
+
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import metrics
+from app.core.metrics import Counter, Histogram, Registry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = Registry()
+    monkeypatch.setattr("app.core.metrics.REGISTRY", registry)
+    return registry
+
+
+class TestHistogram:
+    def test_buckets_render_cumulatively(self, registry):
+        latency = Histogram("demo_seconds", "Demo", ("route",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.labels("/x").observe(value)
+
+        assert registry.render().splitlines()[2:] == [
+            'demo_seconds_bucket{route="/x",le="0.1"} 2',
+            'demo_seconds_bucket{route="/x",le="1.0"} 3',
+            'demo_seconds_bucket{route="/x",le="+Inf"} 4',
+            'demo_seconds_count{route="/x"} 4',
+            'demo_seconds_sum{route="/x"} 3.65',
+        ]
+
+    def test_time_observes_elapsed(self, registry):
+        latency = Histogram("demo_seconds", "Demo")
+
+        with latency.time():
+            time.sleep(0.01)
+
+        child = latency.labels()
+        assert sum(child.counts) == 1
+        assert child.sum >= 0.01
+
+
+class TestMultiprocess:
+    def test_render_sums_other_processes_snapshots(self, registry, tmp_path, monkeypatch):
+        runs = Counter("demo_runs", "Demo", ("task",))
+        latency = Histogram("demo_seconds", "Demo", buckets=(1.0,))
+
+        # Another process: write its snapshot under a different pid.
+        runs.labels("a").inc(3)
+        latency.observe(0.5)
+        monkeypatch.setattr("os.getpid", lambda: 1001)
+        registry.write_snapshot(tmp_path)
+        (tmp_path / "metrics-other-1002.json").write_text("{not json")
+
+        # This process starts from zero and renders.
+        monkeypatch.setattr("os.getpid", lambda: 2002)
+        runs.labels("a").value = 1
+        runs.labels("b").inc()
+        latency.labels().counts = [0.0, 1.0]
+        latency.labels().sum = 2.0
+
+        text = registry.render(tmp_path)
+
+        assert 'demo_runs_total{task="a"} 4' in text
+        assert 'demo_runs_total{task="b"} 1' in text
+        assert 'demo_seconds_bucket{le="1.0"} 1' in text
+        assert 'demo_seconds_bucket{le="+Inf"} 2' in text
+        assert "demo_seconds_sum 2.5" in text
+
+    def test_snapshots_from_another_layout_are_skipped(self, registry, tmp_path):
+        """A process from an older deploy cannot break rendering."""
+        Counter("demo_runs", "Demo", ("task",)).labels("a").inc()
+        latency = Histogram("demo_seconds", "Demo", buckets=(1.0,))
+        latency.observe(0.5)
+        (tmp_path / "metrics-old-1.json").write_text(
+            '{"demo_runs": [[[], [5.0]], [["a", "extra"], [5.0]]],'
+            ' "demo_seconds": [[[], [1.0, 0.0, 0.0, 0.2]]]}'
+        )
+
+        text = registry.render(tmp_path)
+
+        assert 'demo_runs_total{task="a"} 1' in text
+        assert 'demo_seconds_bucket{le="+Inf"} 1' in text
+
+    def test_own_snapshot_is_not_double_counted(self, registry, tmp_path):
+        runs = Counter("demo_runs", "Demo")
+        runs.inc(2)
+        registry.write_snapshot(tmp_path)
+
+        assert "demo_runs_total 2" in registry.render(tmp_path)
+
+    def test_snapshot_writes_are_throttled(self, registry, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.metrics.settings.METRICS_MULTIPROC_DIR", str(tmp_path))
+        monkeypatch.setattr("app.core.metrics._last_snapshot", 0.0)
+        Counter("demo_runs", "Demo").inc()
+
+        metrics.write_snapshot()
+        written = list(tmp_path.glob("metrics-*.json"))
+        written[0].unlink()
+        metrics.write_snapshot()
+        assert not list(tmp_path.glob("metrics-*.json"))
+        metrics.write_snapshot(force=True)
+
+        assert len(written) == 1
+        assert len(list(tmp_path.glob("metrics-*.json"))) == 1
+
+    def test_single_process_mode_writes_nothing(self, registry, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.core.metrics.settings.METRICS_MULTIPROC_DIR", "")
+        metrics.write_snapshot(force=True)
+        assert not list(tmp_path.iterdir())
+
+
+class TestTaskQueueWait:
+    def test_measured_from_publish(self):
+        from app.tasks.worker import _queue_wait
+
+        request = SimpleNamespace(published_at=time.time() - 2.0, eta=None)
+        assert 2.0 <= _queue_wait(request) < 3.0
+
+    def test_countdown_is_not_queue_wait(self):
+        from datetime import UTC, datetime, timedelta
+
+        from app.tasks.worker import _queue_wait
+
+        eta = (datetime.now(UTC) - timedelta(seconds=1)).isoformat()
+        request = SimpleNamespace(published_at=time.time() - 60.0, eta=eta)
+        assert 1.0 <= _queue_wait(request) < 2.0
+
+    def test_unstamped_messages_are_skipped(self):
+        from app.tasks.worker import _queue_wait
+
+        assert _queue_wait(SimpleNamespace()) is None
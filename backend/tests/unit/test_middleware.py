@@ -1,11 +1,17 @@
-"""Tests for middleware stack: request IDs, timing, and API versioning."""
+"""Tests for middleware stack: request IDs, timing, rate limiting and API versioning."""
 
 from __future__ import annotations
 
 import uuid
+from collections.abc import Iterator
+from unittest.mock import patch
 
+import pytest
 from httpx import AsyncClient
 
+from app.core.config import settings
+from app.core.rate_limit import LocalRateLimiter
+
 
 async def test_request_id_generated(async_client: AsyncClient) -> None:
     """Request without X-Request-ID gets a UUID assigned in the response."""
@@ -36,3 +42,144 @@ async def test_api_version_header(async_client: AsyncClient) -> None:
     """Every response includes the X-API-Version: v1 header."""
     resp = await async_client.get("/health")
     assert resp.headers.get("X-API-Version") == "v1"
+
+
+# ---------------------------------------------------------------------------
+# Rate limiting
+# ---------------------------------------------------------------------------
+
+
+class _FakeRedis:
+    """Answers the GCRA script with a plain counter against the default limit."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.down = False
+
+    async def evalsha(self, sha: str, numkeys: int, key: str, now, interval, window, *_) -> list:
+        if self.down:
+            raise ConnectionError("redis down")
+        if self.count >= settings.RATE_LIMIT_DEFAULT:
+            return [0, 0, 1_500_000, window]  # retry in 1.5 s
+        self.count += 1
+        return [1, settings.RATE_LIMIT_DEFAULT - self.count, 0, self.count * interval]
+
+
+@pytest.fixture
+def fake_redis(async_client: AsyncClient) -> Iterator[_FakeRedis]:
+    from app.main import app
+
+    original = (getattr(app.state, "redis", None), getattr(app.state, "redis_available", False))
+    redis = _FakeRedis()
+    app.state.redis, app.state.redis_available = redis, True
+    try:
+        yield redis
+    finally:
+        app.state.redis, app.state.redis_available = original
+
+
+_LIMITED_PATH = "/api/v1/nonexistent-route-abc123"  # limited before routing
+
+
+async def test_rate_limit_headers(async_client: AsyncClient, fake_redis: _FakeRedis) -> None:
+    """Responses under the limit carry the X-RateLimit-* headers."""
+    resp = await async_client.get(_LIMITED_PATH)
+    assert resp.headers["X-RateLimit-Limit"] == str(settings.RATE_LIMIT_DEFAULT)
+    assert resp.headers["X-RateLimit-Remaining"] == str(settings.RATE_LIMIT_DEFAULT - 1)
+    assert "X-RateLimit-Reset" in resp.headers
+
+
+async def test_rate_limit_exceeded(async_client: AsyncClient, fake_redis: _FakeRedis) -> None:
+    """Over the limit returns 429 with the request headers still applied."""
+    fake_redis.count = settings.RATE_LIMIT_DEFAULT
+    request_id = str(uuid.uuid4())
+    resp = await async_client.get(_LIMITED_PATH, headers={"X-Request-ID": request_id})
+    assert resp.status_code == 429
+    assert resp.json()["error"]["code"] == "RATE_LIMITED"
+    assert resp.json()["error"]["request_id"] == request_id
+    assert resp.headers["Retry-After"] == "2"
+    assert resp.headers["X-RateLimit-Remaining"] == "0"
+    assert resp.headers["X-Request-ID"] == request_id
+    assert resp.headers["X-API-Version"] == "v1"
+    assert resp.headers["Server-Timing"].startswith("app;dur=")
+
+
+async def test_rate_limit_exempt_path(async_client: AsyncClient, fake_redis: _FakeRedis) -> None:
+    """Health checks are never rate limited."""
+    fake_redis.count = settings.RATE_LIMIT_DEFAULT
+    resp = await async_client.get("/health")
+    assert resp.status_code == 200
+    assert "X-RateLimit-Limit" not in resp.headers
+    assert fake_redis.count == settings.RATE_LIMIT_DEFAULT
+
+
+async def test_rate_limit_redis_down_allows(
+    async_client: AsyncClient, fake_redis: _FakeRedis
+) -> None:
+    """A Redis failure lets the request through without rate-limit headers."""
+    fake_redis.down = True
+    resp = await async_client.get(_LIMITED_PATH)
+    assert resp.status_code == 404
+    assert "X-RateLimit-Limit" not in resp.headers
+    assert resp.headers.get("X-API-Version") == "v1"
+
+
+async def test_rate_limit_unavailable_redis_still_refuses_abusers(
+    async_client: AsyncClient, fake_redis: _FakeRedis
+) -> None:
+    """With fail-closed, an identifier Redis rejected stays refused once Redis is marked down."""
+    from app.main import app
+
+    limiter = LocalRateLimiter(
+        settings.RATE_LIMIT_DEFAULT, 60, fraction=0.0, near_limit=1.0,
+        sync_interval=60.0, fail_closed=True,
+    )
+    fake_redis.count = settings.RATE_LIMIT_DEFAULT
+    with patch("app.core.middleware.local_rate_limiter", return_value=limiter):
+        assert (await async_client.get(_LIMITED_PATH)).status_code == 429
+        for entry in limiter._entries.values():
+            entry.blocked_until = 0.0  # retry time has passed
+        app.state.redis_available = False
+
+        resp = await async_client.get(_LIMITED_PATH)
+
+    assert resp.status_code == 429
+    assert resp.headers["X-RateLimit-Remaining"] == "0"
+
+
+async def test_cors_preflight_has_api_version(async_client: AsyncClient) -> None:
+    """CORS preflight responses, answered before the app, still carry X-API-Version."""
+    resp = await async_client.options(
+        "/api/v1/trendlines",
+        headers={
+            "Origin": settings.cors_origins_list[0],
+            "Access-Control-Request-Method": "GET",
+        },
+    )
+    assert resp.status_code == 200
+    assert resp.headers.get("X-API-Version") == "v1"
+
+
+async def test_unhandled_error_is_counted_as_500() -> None:
+    """An exception escaping the app is recorded as a 500 before it propagates."""
+    from fastapi import FastAPI
+    from httpx import ASGITransport
+
+    from app.core.middleware import _HTTP_REQUESTS, RequestContextMiddleware
+
+    app = FastAPI()
+
+    @app.get("/boom")
+    async def boom() -> None:
+        raise RuntimeError("boom")
+
+    app.add_middleware(RequestContextMiddleware)
+    counter = _HTTP_REQUESTS.labels("GET", "/boom", "500")
+    before = counter.value
+
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        resp = await client.get("/boom")
+
+    assert resp.status_code == 500
+    assert counter.value == before + 1
@@ -11,6 +11,7 @@ import pytest_asyncio
 
 from app.adapters.exceptions import OrderNotFoundError
 from app.adapters.paper import PaperBrokerAdapter
+from app.adapters.paper_engine import LocalPaperEngine
 from app.adapters.types import (
     BracketRole,
     OrderRequest,
@@ -30,7 +31,7 @@ async def adapter():
     db = AsyncMock()
     redis = AsyncMock()
     adpt = PaperBrokerAdapter(
-        user_id=user_id, db=db, redis=redis, slippage_ticks=1
+        user_id=user_id, db=db, redis=redis, slippage_ticks=1, engine=LocalPaperEngine()
     )
     await adpt.connect()
     return adpt
@@ -107,7 +108,8 @@ class TestPaperOrders:
 
         assert result.status == "SUBMITTED"
         assert result.fill_price is None
-        assert result.broker_order_id in adapter._pending_orders
+        status = await adapter.get_order_status(result.broker_order_id)
+        assert status.status == "SUBMITTED"
 
     @pytest.mark.asyncio
     async def test_stop_order_pending(self, adapter):
@@ -119,7 +121,8 @@ class TestPaperOrders:
         result = await adapter.place_order(req)
 
         assert result.status == "SUBMITTED"
-        assert result.broker_order_id in adapter._pending_orders
+        status = await adapter.get_order_status(result.broker_order_id)
+        assert status.status == "SUBMITTED"
 
     @pytest.mark.asyncio
     async def test_cancel_pending_order(self, adapter):
@@ -133,7 +136,8 @@ class TestPaperOrders:
 
         cancel = await adapter.cancel_order(broker_id)
         assert cancel.success is True
-        assert broker_id not in adapter._pending_orders
+        status = await adapter.get_order_status(broker_id)
+        assert status.status == "CANCELLED"
 
     @pytest.mark.asyncio
     async def test_cancel_nonexistent(self, adapter):
@@ -207,8 +211,9 @@ class TestPaperBracket:
         tp_id = result.take_profit.broker_order_id
 
         # Verify OCO linking
-        assert adapter._pending_orders[sl_id]["oco_partner"] == tp_id
-        assert adapter._pending_orders[tp_id]["oco_partner"] == sl_id
+        orders = await adapter._engine.get_orders([sl_id, tp_id])
+        assert orders[sl_id].oco_partner == tp_id
+        assert orders[tp_id].oco_partner == sl_id
 
     @pytest.mark.asyncio
     async def test_modify_pending_order(self, adapter):
@@ -222,10 +227,103 @@ class TestPaperBracket:
 
         mod = await adapter.modify_order(broker_id, new_price=18495.00)
         assert mod.success is True
-        assert adapter._pending_orders[broker_id]["order"].price == Decimal("18495.0")
+        order = (await adapter._engine.get_orders([broker_id]))[broker_id]
+        assert order.request.price == Decimal("18495.0")
 
     @pytest.mark.asyncio
     async def test_modify_nonexistent_raises(self, adapter):
         """Modifying a nonexistent order raises OrderNotFoundError."""
         with pytest.raises(OrderNotFoundError):
             await adapter.modify_order("PAPER-DOESNOTEXIST", new_price=18495.00)
+
+
+class TestPaperTriggers:
+    """Test SL/TP trigger evaluation through the trigger book."""
+
+    async def _place_long_bracket(self, adapter, symbol="MNQ"):
+        entry = make_order_request(instrument_symbol=symbol)
+        sl = make_order_request(
+            instrument_symbol=symbol,
+            side=OrderSide.SELL,
+            order_type=OrderType.STOP,
+            price=Decimal("18480.00"),
+            bracket_role=BracketRole.STOP_LOSS,
+        )
+        tp = make_order_request(
+            instrument_symbol=symbol,
+            side=OrderSide.SELL,
+            order_type=OrderType.LIMIT,
+            price=Decimal("18540.00"),
+            bracket_role=BracketRole.TAKE_PROFIT,
+        )
+        return await adapter.place_bracket_order(entry, sl, tp)
+
+    @pytest.mark.asyncio
+    async def test_price_between_levels_fills_nothing(self, adapter):
+        await self._place_long_bracket(adapter)
+
+        fills = await adapter.check_pending_triggers("MNQ", Decimal("18500.00"))
+
+        assert fills == []
+
+    @pytest.mark.asyncio
+    async def test_stop_fill_cancels_oco_partner(self, adapter):
+        """A stop fill removes both legs of the bracket."""
+        result = await self._place_long_bracket(adapter)
+
+        fills = await adapter.check_pending_triggers("MNQ", Decimal("18479.00"))
+
+        assert [f.broker_order_id for f in fills] == [result.stop_loss.broker_order_id]
+        assert fills[0].fill_price == Decimal("18479.75")  # stop minus one tick
+        tp_status = await adapter.get_order_status(result.take_profit.broker_order_id)
+        assert tp_status.status == "CANCELLED"
+        sl_status = await adapter.get_order_status(result.stop_loss.broker_order_id)
+        assert sl_status.status == "FILLED"
+        assert sl_status.fill_price == Decimal("18479.75")
+
+    @pytest.mark.asyncio
+    async def test_other_symbols_untouched(self, adapter):
+        await self._place_long_bracket(adapter, symbol="MES")
+
+        fills = await adapter.check_pending_triggers("MNQ", Decimal("18600.00"))
+
+        assert fills == []
+
+    @pytest.mark.asyncio
+    async def test_cancelled_and_modified_orders(self, adapter):
+        """Cancels drop the trigger; modifies move it."""
+        result = await self._place_long_bracket(adapter)
+        await adapter.cancel_order(result.take_profit.broker_order_id)
+        await adapter.modify_order(result.stop_loss.broker_order_id, new_price=18450.00)
+
+        assert await adapter.check_pending_triggers("MNQ", Decimal("18470.00")) == []
+        assert await adapter.check_pending_triggers("MNQ", Decimal("18600.00")) == []
+        fills = await adapter.check_pending_triggers("MNQ", Decimal("18450.00"))
+        assert [f.broker_order_id for f in fills] == [result.stop_loss.broker_order_id]
+
+    @pytest.mark.asyncio
+    async def test_orders_shared_across_adapters(self, adapter):
+        """A new adapter on the same engine sees (and triggers) earlier orders."""
+        result = await self._place_long_bracket(adapter)
+        other = PaperBrokerAdapter(
+            user_id=adapter._user_id,
+            db=AsyncMock(),
+            redis=AsyncMock(),
+            engine=adapter._engine,
+        )
+
+        status = await other.get_order_status(result.take_profit.broker_order_id)
+        fills = await other.check_pending_triggers("MNQ", Decimal("18540.00"))
+
+        assert status.status == "SUBMITTED"
+        assert [f.fill_price for f in fills] == [Decimal("18540.00")]
+
+    @pytest.mark.asyncio
+    async def test_other_users_orders_not_triggered(self, adapter):
+        await self._place_long_bracket(adapter)
+        other_user = PaperBrokerAdapter(
+            user_id=uuid.uuid4(), db=AsyncMock(), redis=AsyncMock(), engine=adapter._engine
+        )
+
+        assert await other_user.check_pending_triggers("MNQ", Decimal("18400.00")) == []
+        assert len(await adapter.check_pending_triggers("MNQ", Decimal("18400.00"))) == 1
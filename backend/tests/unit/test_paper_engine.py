@@ -0,0 +1,147 @@
+"""Unit tests for the shared paper matching engine."""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, datetime
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis.exceptions import NoScriptError
+
+from app.adapters.paper_engine import (
+    _CANCEL_SCRIPT,
+    _TRIGGER_SCRIPT,
+    PaperOrder,
+    RedisPaperEngine,
+)
+from app.adapters.types import BracketRole, OrderRequest, OrderSide, OrderType
+
+_USER_ID = str(uuid.uuid4())
+
+
+def make_paper_order(broker_order_id="PAPER-SL", **overrides):
+    request = OrderRequest(
+        instrument_symbol="MNQ",
+        side=OrderSide.SELL,
+        order_type=OrderType.STOP,
+        quantity=2,
+        price=Decimal("18480.00"),
+        bracket_role=BracketRole.STOP_LOSS,
+        bracket_group_id="grp",
+    )
+    defaults = {
+        "broker_order_id": broker_order_id,
+        "user_id": _USER_ID,
+        "request": request,
+        "created_at": datetime(2026, 1, 5, tzinfo=UTC),
+        "fill_offset": Decimal("-0.25"),
+        "oco_partner": "PAPER-TP",
+    }
+    defaults.update(overrides)
+    return PaperOrder(**defaults)
+
+
+def mock_redis(*pipeline_results):
+    redis = MagicMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(side_effect=list(pipeline_results))
+    redis.pipeline = MagicMock(return_value=pipe)
+    redis.script_load = AsyncMock()
+    return redis, pipe
+
+
+class TestPaperOrder:
+    def test_fields_round_trip(self):
+        order = make_paper_order()
+
+        restored = PaperOrder.from_fields(order.broker_order_id, order.to_fields())
+
+        assert restored == order
+
+    def test_fill_price_includes_offset_once_filled(self):
+        order = make_paper_order()
+        assert order.fill_price is None
+
+        order.status = "FILLED"
+        assert order.fill_price == Decimal("18479.75")
+
+
+class TestRedisPaperEngine:
+    @pytest.mark.asyncio
+    async def test_place_rests_bracket_exits_in_sorted_set(self):
+        """Orders are written in one transaction; exits are scored by price."""
+        redis, pipe = mock_redis([1, 1])
+
+        await RedisPaperEngine(redis).place_orders([make_paper_order()])
+
+        redis.pipeline.assert_called_once_with(transaction=True)
+        assert pipe.hset.call_args.args == ("paper:order:PAPER-SL",)
+        pipe.zadd.assert_called_once_with("paper:book:MNQ:below", {"PAPER-SL": 18480.0})
+
+    @pytest.mark.asyncio
+    async def test_trigger_evaluates_symbols_in_one_pipeline(self):
+        """One script call per symbol, then one HGETALL pass for the fills."""
+        filled = make_paper_order(status="FILLED")
+        redis, pipe = mock_redis([["PAPER-SL"], []], [filled.to_fields()])
+
+        orders = await RedisPaperEngine(redis).trigger(
+            {"MNQ": Decimal("18479"), "MES": Decimal("5000")}
+        )
+
+        first, second = pipe.evalsha.call_args_list
+        assert first.args[:4] == (
+            _TRIGGER_SCRIPT.sha, 2, "paper:book:MNQ:below", "paper:book:MNQ:above"
+        )
+        assert first.args[4] == "18479"
+        assert first.args[7] == ""  # all users
+        assert second.args[2] == "paper:book:MES:below"
+        assert [o.fill_price for o in orders] == [Decimal("18479.75")]
+
+    @pytest.mark.asyncio
+    async def test_nothing_fired_skips_lookup(self):
+        redis, pipe = mock_redis([[]])
+
+        assert await RedisPaperEngine(redis).trigger({"MNQ": Decimal("18500")}) == []
+        assert pipe.execute.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_cancel_batches_and_reports_per_order(self):
+        redis, pipe = mock_redis([1, 0])
+
+        result = await RedisPaperEngine(redis).cancel_orders(["A", "B"])
+
+        assert result == {"A": True, "B": False}
+        assert pipe.evalsha.call_args_list[0].args[:3] == (_CANCEL_SCRIPT.sha, 1, "paper:order:A")
+
+    @pytest.mark.asyncio
+    async def test_loads_script_on_noscript(self):
+        redis, pipe = mock_redis(NoScriptError("NOSCRIPT"), [1])
+
+        assert await RedisPaperEngine(redis).cancel_orders(["A"]) == {"A": True}
+        redis.script_load.assert_awaited_once_with(_CANCEL_SCRIPT.source)
+
+    @pytest.mark.asyncio
+    async def test_unknown_orders_are_none(self):
+        redis, _ = mock_redis([{}])
+
+        assert await RedisPaperEngine(redis).get_orders(["GONE"]) == {"GONE": None}
+
+    @pytest.mark.asyncio
+    async def test_read_fills_resumes_from_stream_id(self):
+        """The fill log is read with XREAD from the caller's cursor."""
+        filled = make_paper_order(status="FILLED")
+        redis, _ = mock_redis([filled.to_fields()])
+        redis.xread = AsyncMock(return_value=[
+            [f"paper:fills:{_USER_ID}", [("1700000000000-0", {"order_id": "PAPER-SL"})]],
+        ])
+
+        fills = await RedisPaperEngine(redis).read_fills(_USER_ID, "1699999999999-0", timeout=2)
+
+        redis.xread.assert_awaited_once_with(
+            {f"paper:fills:{_USER_ID}": "1699999999999-0"}, count=1000, block=2000
+        )
+        assert [(cursor, order.broker_order_id) for cursor, order in fills] == [
+            ("1700000000000-0", "PAPER-SL")
+        ]
@@ -0,0 +1,413 @@
+"""Unit tests for the event-driven paper position monitor."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+import pytest_asyncio
+
+from app.db.models.order import Order
+from app.db.models.position import Position
+from app.services.paper_monitor import (
+    POSITION_EVENTS_CHANNEL,
+    PaperPositionMonitor,
+    SymbolMarks,
+    TrackedPosition,
+    publish_position_event,
+    publish_price,
+)
+from app.services.risk_service import RiskService
+
+_USER_ID = uuid.uuid4()
+
+
+# ---------------------------------------------------------------------------
+# Factory helpers
+# ---------------------------------------------------------------------------
+
+
+def make_position(**overrides):
+    defaults = {
+        "id": uuid.uuid4(),
+        "user_id": _USER_ID,
+        "instrument_symbol": "MNQ",
+        "direction": "LONG",
+        "entry_price": Decimal("100.00"),
+        "quantity": 1,
+        "stop_loss_price": Decimal("90.00"),
+        "take_profit_price": Decimal("120.00"),
+        "current_price": None,
+        "unrealized_pnl": Decimal("0"),
+        "realized_pnl": None,
+        "net_pnl": None,
+        "mae": None,
+        "mfe": None,
+        "mae_r": None,
+        "mfe_r": None,
+        "status": "OPEN",
+    }
+    defaults.update(overrides)
+    position = MagicMock(spec=Position)
+    for k, v in defaults.items():
+        setattr(position, k, v)
+    return position
+
+
+def session_factory(db):
+    @asynccontextmanager
+    async def factory():
+        yield db
+
+    return factory
+
+
+@pytest_asyncio.fixture
+async def mock_db():
+    db = AsyncMock()
+    db.add = MagicMock()
+    return db
+
+
+@pytest_asyncio.fixture
+async def mock_redis():
+    redis = AsyncMock()
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(return_value=[])
+    redis.pipeline = MagicMock(return_value=pipe)
+    return redis
+
+
+@pytest_asyncio.fixture
+async def mock_engine():
+    engine = AsyncMock()
+    engine.trigger.return_value = []
+    engine.cancel_orders.side_effect = lambda ids: {oid: True for oid in ids}
+    return engine
+
+
+@pytest_asyncio.fixture
+async def monitor(mock_db, mock_redis, mock_engine):
+    return PaperPositionMonitor(session_factory(mock_db), mock_redis, engine=mock_engine)
+
+
+# ---------------------------------------------------------------------------
+# Price handling
+# ---------------------------------------------------------------------------
+
+
+class TestPriceHandling:
+    @pytest.mark.asyncio
+    async def test_price_only_touches_its_symbol(self, monitor, mock_db):
+        """A tick on one symbol leaves positions on other symbols alone."""
+        mnq = TrackedPosition.from_model(make_position())
+        es = TrackedPosition.from_model(make_position(instrument_symbol="ES"))
+        monitor.track(mnq)
+        monitor.track(es)
+
+        await monitor.handle_price("MNQ", 105.0)
+
+        row = monitor._by_symbol["MNQ"].row(mnq.id)
+        assert row["current_price"] == 105.0
+        assert row["unrealized_pnl"] == pytest.approx(250.0)  # 5 pts / 0.25 * 12.50
+        assert monitor._by_symbol["ES"].row(es.id)["current_price"] is None
+        mock_db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_small_moves_are_not_persisted(self, monitor):
+        """Moves under the write threshold that set no new extreme stay clean."""
+        tracked = TrackedPosition.from_model(make_position(entry_price=Decimal("100.00")))
+        monitor.track(tracked)
+        marks = monitor._by_symbol["MNQ"]
+        await monitor.handle_price("MNQ", 101.0)
+        await monitor.handle_price("MNQ", 99.0)
+        assert len(marks.take_dirty()) == 1
+
+        # 0.01 points is $0.50: below the threshold and inside the MAE/MFE range.
+        await monitor.handle_price("MNQ", 99.01)
+
+        assert marks.take_dirty() == []
+
+    @pytest.mark.asyncio
+    async def test_take_profit_closes_at_target(self, monitor, mock_db, mock_redis):
+        """Crossing the target closes the row at the target price."""
+        position = make_position()
+        monitor.track(TrackedPosition.from_model(position))
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = position
+        mock_db.execute.return_value = result
+
+        await monitor.handle_price("MNQ", 121.0)
+
+        assert position.status == "CLOSED"
+        assert position.exit_reason == "TAKE_PROFIT"
+        assert position.current_price == Decimal("120.0")
+        assert position.realized_pnl == Decimal("1000.0")
+        assert position.mfe == Decimal("21.0")
+        mock_db.commit.assert_awaited_once()
+        mock_redis.evalsha.assert_awaited_once()  # ledger close
+        assert monitor.tracked_count == 0
+
+    @pytest.mark.asyncio
+    async def test_stop_loss_records_loss(self, monitor, mock_db):
+        """A stop-out closes at the stop and feeds the circuit breaker."""
+        position = make_position(
+            direction="SHORT",
+            stop_loss_price=Decimal("110.00"),
+            take_profit_price=Decimal("80.00"),
+        )
+        monitor.track(TrackedPosition.from_model(position))
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = position
+        mock_db.execute.return_value = result
+
+        record_loss = AsyncMock(return_value=False)
+        with patch.object(RiskService, "record_loss", record_loss):
+            await monitor.handle_price("MNQ", 111.0)
+
+        assert position.exit_reason == "STOP_LOSS"
+        assert position.realized_pnl == Decimal("-500.0")
+        assert position.r_multiple == Decimal("-1.0")
+        record_loss.assert_awaited_once_with(_USER_ID)
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_resting_bracket(self, monitor, mock_db, mock_engine):
+        """The monitor's close cancels the SL/TP left at the engine and in the DB."""
+        position = make_position()
+        monitor.track(TrackedPosition.from_model(position))
+        stop, target = MagicMock(spec=Order), MagicMock(spec=Order)
+        stop.broker_order_id, stop.status = "PAPER-SL", "SUBMITTED"
+        target.broker_order_id, target.status = "PAPER-TP", "SUBMITTED"
+        locked = MagicMock()
+        locked.scalar_one_or_none.return_value = position
+        bracket = MagicMock()
+        bracket.scalars.return_value.all.return_value = [stop, target]
+        mock_db.execute.side_effect = [locked, bracket]
+        mock_engine.cancel_orders.side_effect = None
+        mock_engine.cancel_orders.return_value = {"PAPER-SL": True, "PAPER-TP": False}
+
+        await monitor.handle_price("MNQ", 121.0)
+
+        mock_engine.cancel_orders.assert_awaited_once_with(["PAPER-SL", "PAPER-TP"])
+        assert stop.status == "CANCELLED"
+        assert target.status == "SUBMITTED"  # already filled; left for the fill stream
+        mock_db.commit.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_price_runs_engine_trigger_for_all_users(self, monitor, mock_engine):
+        """Resting paper SL/TP on the symbol are triggered once, across users."""
+        monitor.track(TrackedPosition.from_model(make_position()))
+
+        await monitor.handle_price("MNQ", 105.0)
+        await monitor.handle_price("ES", 5000.0)  # nothing open on ES
+
+        mock_engine.trigger.assert_awaited_once_with({"MNQ": Decimal("105.0")})
+
+    @pytest.mark.asyncio
+    async def test_locked_or_closed_row_is_rearmed(self, monitor, mock_db):
+        """A row that is locked or already closed is not written, and stays armed."""
+        monitor.track(TrackedPosition.from_model(make_position()))
+        result = MagicMock()
+        result.scalar_one_or_none.return_value = None
+        mock_db.execute.return_value = result
+
+        await monitor.handle_price("MNQ", 125.0)
+        await monitor.handle_price("MNQ", 126.0)
+
+        mock_db.commit.assert_not_awaited()
+        assert mock_db.execute.await_count == 2  # retried on the next tick
+        assert monitor.tracked_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_close_keeps_position_tracked(self, monitor, mock_db):
+        """A database error during a close is logged; the next tick retries."""
+        monitor.track(TrackedPosition.from_model(make_position()))
+        mock_db.execute.side_effect = ConnectionError("db down")
+
+        await monitor.handle_price("MNQ", 125.0)
+
+        assert monitor.tracked_count == 1
+        assert len(monitor._triggers) == 2
+
+
+# ---------------------------------------------------------------------------
+# Persistence and events
+# ---------------------------------------------------------------------------
+
+
+class TestFlush:
+    @pytest.mark.asyncio
+    async def test_dirty_marks_written_in_one_statement(self, monitor, mock_db, mock_redis):
+        """All dirty positions share one executemany UPDATE and one ledger pipeline."""
+        positions = [TrackedPosition.from_model(make_position()) for _ in range(3)]
+        for tracked in positions:
+            monitor.track(tracked)
+        await monitor.handle_price("MNQ", 104.0)
+
+        written = await monitor.flush()
+
+        assert written == 3
+        mock_db.execute.assert_awaited_once()
+        rows = mock_db.execute.await_args.args[1]
+        assert [row["b_id"] for row in rows] == [p.id for p in positions]
+        assert rows[0]["b_unrealized_pnl"] == Decimal("200.0")
+        mock_db.commit.assert_awaited_once()
+        mock_redis.pipeline.return_value.execute.assert_awaited_once()
+        assert await monitor.flush() == 0
+
+    @pytest.mark.asyncio
+    async def test_clean_flush_does_no_io(self, monitor, mock_db):
+        monitor.track(TrackedPosition.from_model(make_position()))
+
+        assert await monitor.flush() == 0
+        mock_db.execute.assert_not_awaited()
+
+
+class TestSymbolMarks:
+    def test_marks_are_vectorized_per_direction(self):
+        """Longs and shorts are marked in one pass, with R from the stop distance."""
+        marks = SymbolMarks()
+        long = TrackedPosition.from_model(make_position(quantity=2))
+        short = TrackedPosition.from_model(
+            make_position(direction="SHORT", stop_loss_price=Decimal("105.00"))
+        )
+        no_stop = TrackedPosition.from_model(make_position(stop_loss_price=None))
+        for tracked in (long, short, no_stop):
+            marks.add(tracked)
+
+        marks.mark(96.0, 0.25, 12.50)
+
+        long_row, short_row = marks.row(long.id), marks.row(short.id)
+        assert long_row["unrealized_pnl"] == -400.0
+        assert long_row["mae"] == 4.0 and long_row["mfe"] == -4.0
+        assert long_row["mae_r"] == -0.4  # 4 of a 10 point stop
+        assert short_row["unrealized_pnl"] == 200.0
+        assert short_row["mfe_r"] == 0.8
+        assert marks.row(no_stop.id)["mae_r"] is None
+
+    def test_remove_keeps_other_rows(self):
+        marks = SymbolMarks()
+        positions = [
+            TrackedPosition.from_model(make_position(entry_price=Decimal(p)))
+            for p in ("100", "101", "102")
+        ]
+        for tracked in positions:
+            marks.add(tracked)
+
+        marks.remove(positions[0].id)
+        marks.mark(103.0, 0.25, 12.50)
+
+        assert len(marks) == 2
+        assert marks.row(positions[2].id)["unrealized_pnl"] == 50.0
+        assert marks.row(positions[1].id)["unrealized_pnl"] == 100.0
+
+    def test_grows_past_initial_capacity(self):
+        marks = SymbolMarks()
+        positions = [TrackedPosition.from_model(make_position()) for _ in range(40)]
+        for tracked in positions:
+            marks.add(tracked)
+
+        marks.mark(101.0, 0.25, 12.50)
+
+        assert len(marks.take_dirty()) == 40
+
+
+class TestRunLoop:
+    @pytest.mark.asyncio
+    async def test_step_errors_do_not_stop_the_loop(self, monitor, mock_redis):
+        """A failing resync or flush is logged and the loop keeps reading messages."""
+        pubsub = AsyncMock()
+        reads = 0
+
+        async def get_message(timeout):
+            nonlocal reads
+            reads += 1
+            if reads == 3:
+                raise asyncio.CancelledError
+            return None
+
+        pubsub.get_message.side_effect = get_message
+        mock_redis.pubsub = MagicMock(return_value=pubsub)
+
+        with (
+            patch.object(monitor, "sync_positions", AsyncMock(side_effect=ConnectionError)),
+            patch.object(monitor, "flush", AsyncMock(side_effect=ConnectionError)),
+            patch("app.services.paper_monitor._FLUSH_INTERVAL", 0),
+            pytest.raises(asyncio.CancelledError),
+        ):
+            await monitor.run()
+
+        assert reads == 3
+        pubsub.aclose.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_price_poll_applies_only_changed_prices(self, monitor, mock_redis):
+        """Feeds that only SET the key are picked up by the poll, once per change."""
+        monitor.track(TrackedPosition.from_model(make_position()))
+        mock_redis.mget.return_value = ["105.0"]
+
+        with patch.object(monitor, "handle_price", wraps=monitor.handle_price) as handle:
+            await monitor.refresh_prices(changed_only=True)
+            await monitor.refresh_prices(changed_only=True)
+
+        handle.assert_awaited_once_with("MNQ", 105.0)
+
+
+class TestSweep:
+    @pytest.mark.asyncio
+    async def test_sweep_fetches_prices_with_one_mget(self, monitor, mock_db, mock_redis):
+        """The one-shot sweep loads positions, MGETs prices, and closes crossed ones."""
+        stopped = make_position(instrument_symbol="MES")
+        running = make_position()
+        loaded = MagicMock()
+        loaded.scalars.return_value.all.return_value = [stopped, running]
+        locked = MagicMock()
+        locked.scalar_one_or_none.return_value = stopped
+        mock_db.execute.side_effect = [loaded, locked, MagicMock(), MagicMock()]
+        mock_redis.mget.return_value = ["85.0", "101.0"]
+
+        with (
+            patch("app.services.paper_monitor.contract_registry.ensure_current", AsyncMock()),
+            patch.object(RiskService, "record_loss", AsyncMock(return_value=False)),
+        ):
+            written = await monitor.sweep()
+
+        mock_redis.mget.assert_awaited_once_with(["market:price:MES", "market:price:MNQ"])
+        assert stopped.exit_reason == "STOP_LOSS"
+        assert written == 1
+        assert monitor.tracked_count == 1
+
+
+class TestEvents:
+    @pytest.mark.asyncio
+    async def test_opened_and_closed_events_update_index(self, monitor, mock_redis):
+        """Position events round-trip through the channel payload."""
+        position = make_position()
+        await publish_position_event(mock_redis, "opened", position)
+        channel, payload = mock_redis.publish.await_args.args
+        assert channel == POSITION_EVENTS_CHANNEL
+
+        await monitor.dispatch({"channel": channel, "data": payload})
+        assert monitor.tracked_count == 1
+
+        await monitor.dispatch({
+            "channel": POSITION_EVENTS_CHANNEL,
+            "data": json.dumps({"event": "closed", "id": str(position.id)}),
+        })
+        assert monitor.tracked_count == 0
+
+    @pytest.mark.asyncio
+    async def test_publish_price_sets_and_publishes(self, mock_redis):
+        """Producers update the key and notify subscribers in one pipeline."""
+        pipe = mock_redis.pipeline.return_value
+
+        await publish_price(mock_redis, "MNQ", Decimal("18250.25"))
+
+        pipe.set.assert_called_once_with("market:price:MNQ", "18250.25")
+        pipe.publish.assert_called_once_with("market:price:MNQ", "18250.25")
+        pipe.execute.assert_awaited_once()
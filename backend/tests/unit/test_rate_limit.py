@@ -0,0 +1,249 @@
+"""Tests for the GCRA rate limiter's client side and its callers."""
+
+from __future__ import annotations
+
+import uuid
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import NoScriptError
+
+from app.core.api_key_auth import _check_api_key_rate_limit
+from app.core.exceptions import RateLimitError
+from app.core.rate_limit import _GCRA_SCRIPT, LocalRateLimiter, acquire, check_rate_limit
+from app.services.api_key_service import ValidatedKey
+
+_KEY = ValidatedKey(
+    id=uuid.UUID(int=1), user_id=uuid.UUID(int=2), key_hash="a" * 64, permissions=[]
+)
+
+
+class FakeRedis:
+    def __init__(self, reply: list | None = None, loaded: bool = True) -> None:
+        self.reply = reply or [1, 9, 0, 6_000_000]
+        self.loaded = loaded
+        self.calls: list[tuple] = []
+
+    async def evalsha(self, sha: str, numkeys: int, *args) -> list:
+        self.calls.append(("evalsha", sha, numkeys, *args))
+        if not self.loaded:
+            raise NoScriptError("NOSCRIPT")
+        return self.reply
+
+    async def eval(self, source: str, numkeys: int, *args) -> list:
+        self.calls.append(("eval", source, numkeys, *args))
+        self.loaded = True
+        return self.reply
+
+    def pipeline(self, transaction: bool = True) -> FakePipeline:
+        return FakePipeline(self)
+
+    async def script_load(self, source: str) -> None:
+        self.loaded = True
+
+
+class FakePipeline:
+    def __init__(self, redis: FakeRedis) -> None:
+        self._redis = redis
+        self._queued: list[tuple] = []
+
+    def evalsha(self, sha: str, numkeys: int, *args) -> None:
+        self._queued.append(args)
+
+    def hincrby(self, *args) -> None:
+        self._queued.append(("hincrby", *args))
+
+    def hset(self, *args) -> None:
+        self._queued.append(("hset", *args))
+
+    async def execute(self, raise_on_error: bool = True) -> list:
+        if not self._redis.loaded and raise_on_error:
+            raise NoScriptError("NOSCRIPT")
+        self._redis.calls.extend(("pipeline", *args) for args in self._queued)
+        return [
+            NoScriptError("NOSCRIPT") if not self._redis.loaded else self._redis.reply
+            for _ in self._queued
+        ]
+
+
+class BrokenRedis:
+    async def evalsha(self, *args) -> list:
+        raise ConnectionError("redis down")
+
+
+class TestAcquire:
+    async def test_one_round_trip_with_gcra_arguments(self):
+        redis = FakeRedis()
+        with patch("app.core.rate_limit.time.time", return_value=1000.0):
+            result = await acquire(redis, "ratelimit:ip:1.2.3.4:login", 10, 60)
+
+        # ARGV: now, interval (60 s / 10), window in microseconds; debt 0, cost 1
+        key = "ratelimit:ip:1.2.3.4:login:gcra"
+        assert redis.calls == [
+            ("evalsha", _GCRA_SCRIPT.sha, 1, key, 1_000_000_000, 6_000_000, 60_000_000, 0, 1)
+        ]
+        assert result.allowed
+        assert result.remaining == 9
+        assert result.reset_at == 1006
+        assert result.limit == 10
+        assert result.retry_after == 0
+
+    async def test_rejection_rounds_retry_after_up(self):
+        redis = FakeRedis(reply=[0, 0, 2_300_000, 60_000_000])
+        result = await acquire(redis, "k", 10, 60)
+        assert not result.allowed
+        assert result.remaining == 0
+        assert result.retry_after == 3
+
+    async def test_loads_script_when_missing(self):
+        redis = FakeRedis(loaded=False)
+        result = await acquire(redis, "k", 10, 60)
+        assert result.allowed
+        assert [call[0] for call in redis.calls] == ["evalsha", "eval"]
+        assert redis.calls[1][1] == _GCRA_SCRIPT.source
+
+    async def test_redis_errors_propagate(self):
+        with pytest.raises(ConnectionError):
+            await acquire(BrokenRedis(), "k", 10, 60)
+
+
+class TestCheckRateLimit:
+    async def test_fails_open(self):
+        result = await check_rate_limit(BrokenRedis(), "k", 10, 60)
+        assert result.allowed
+        assert result.remaining == 10
+
+
+class TestApiKeyRateLimit:
+    async def test_rejection_raises_with_retry_after(self):
+        redis = FakeRedis(reply=[0, 0, 1_000_000, 60_000_000])
+        with patch("app.core.redis.redis_client", redis):
+            with pytest.raises(RateLimitError) as exc_info:
+                await _check_api_key_rate_limit(_KEY)
+        assert exc_info.value.retry_after == 1
+        assert redis.calls[0][1] == f"ratelimit:apikey:{'a' * 64}:gcra"
+
+    async def test_limit_and_usage_share_one_round_trip(self):
+        redis = FakeRedis()
+        with patch("app.core.redis.redis_client", redis):
+            await _check_api_key_rate_limit(_KEY)
+        assert [call[1] for call in redis.calls] == [
+            f"ratelimit:apikey:{'a' * 64}:gcra",
+            "hincrby",
+            "hset",
+        ]
+        assert redis.calls[1][2:] == ("apikey:usage:count", str(_KEY.id), 1)
+
+    async def test_script_not_loaded_falls_back_to_eval(self):
+        redis = FakeRedis(reply=[0, 0, 1_000_000, 60_000_000], loaded=False)
+        with patch("app.core.redis.redis_client", redis):
+            with pytest.raises(RateLimitError):
+                await _check_api_key_rate_limit(_KEY)
+        assert redis.calls[-1][0] == "eval"
+
+    async def test_redis_unavailable_skips_check(self):
+        with patch("app.core.redis.redis_client", None):
+            await _check_api_key_rate_limit(_KEY)
+
+
+def _limiter(**overrides) -> LocalRateLimiter:
+    options = dict(fraction=0.5, near_limit=0.5, sync_interval=60.0, fail_closed=False)
+    options.update(overrides)
+    return LocalRateLimiter(100, 60, **options)
+
+
+class TestLocalRateLimiter:
+    async def test_admits_grant_locally_then_charges_it_as_debt(self):
+        redis = FakeRedis(reply=[1, 90, 0, 6_000_000])
+        limiter = _limiter()
+
+        results = [await limiter.check(redis, "k") for _ in range(47)]
+
+        # One Redis answer (90 left) grants 45 local admissions, then Redis again
+        assert all(r.allowed for r in results)
+        assert [r.remaining for r in results[:3]] == [90, 89, 88]
+        assert len(redis.calls) == 2
+        assert redis.calls[1][-2:] == (45, 1)  # debt, cost
+
+    async def test_near_limit_always_asks_redis(self):
+        redis = FakeRedis(reply=[1, 40, 0, 36_000_000])  # under half left
+        limiter = _limiter()
+        for _ in range(3):
+            await limiter.check(redis, "k")
+        assert len(redis.calls) == 3
+
+    async def test_rejected_identifier_blocked_locally(self):
+        redis = FakeRedis(reply=[0, 0, 4_200_000, 60_000_000])
+        limiter = _limiter()
+
+        first = await limiter.check(redis, "k")
+        second = await limiter.check(redis, "k")
+
+        assert not first.allowed and not second.allowed
+        assert second.retry_after == 5
+        assert len(redis.calls) == 1
+
+    async def test_sync_settles_debt_in_one_pipeline(self):
+        redis = FakeRedis(reply=[1, 90, 0, 6_000_000])
+        limiter = _limiter()
+        for key in ("a", "b"):
+            for _ in range(4):
+                await limiter.check(redis, key)
+        redis.loaded = False  # script flushed: sync loads it and retries
+
+        await limiter.sync(redis)
+
+        settled = [call for call in redis.calls if call[0] == "pipeline"]
+        assert [(call[1], call[-2], call[-1]) for call in settled] == [
+            ("a:gcra", 3, 0),
+            ("b:gcra", 3, 0),
+        ]
+        await limiter.sync(redis)
+        assert len([call for call in redis.calls if call[0] == "pipeline"]) == 2
+
+    async def test_redis_down_fails_open_unless_fail_closed(self):
+        for fail_closed in (False, True):
+            limiter = _limiter(fail_closed=fail_closed)
+            await limiter.check(FakeRedis(reply=[0, 0, 1_000, 60_000_000]), "abuser")
+            await limiter.check(FakeRedis(), "client")
+            limiter._entries["abuser"].blocked_until = 0.0  # retry time has passed
+
+            with pytest.raises(ConnectionError):
+                await limiter.check(BrokenRedis(), "client")
+            if fail_closed:
+                result = await limiter.check(BrokenRedis(), "abuser")
+                assert not result.allowed
+                assert result.retry_after > 0
+            else:
+                with pytest.raises(ConnectionError):
+                    await limiter.check(BrokenRedis(), "abuser")
+
+    async def test_offline_check_refuses_only_blocked_or_abusive(self):
+        for fail_closed in (False, True):
+            limiter = _limiter(fail_closed=fail_closed)
+            await limiter.check(FakeRedis(reply=[0, 0, 4_200_000, 60_000_000]), "blocked")
+            await limiter.check(FakeRedis(reply=[0, 0, 1_000, 60_000_000]), "abuser")
+            await limiter.check(FakeRedis(), "client")
+            limiter._entries["abuser"].blocked_until = 0.0
+
+            assert not limiter.check_offline("blocked").allowed
+            assert limiter.check_offline("client") is None
+            assert limiter.check_offline("unknown") is None
+            abuser = limiter.check_offline("abuser")
+            assert (abuser is not None and not abuser.allowed) == fail_closed
+
+    async def test_debt_survives_eviction_during_failed_acquire(self):
+        limiter = _limiter()
+        for _ in range(3):
+            await limiter.check(FakeRedis(reply=[1, 90, 0, 6_000_000]), "k")
+        limiter._entries["k"].tokens = 0  # next check goes to Redis with debt 2
+
+        class EvictingRedis:
+            async def evalsha(self, *args) -> list:
+                del limiter._entries["k"]  # sync dropped the idle entry meanwhile
+                raise ConnectionError("redis down")
+
+        with pytest.raises(ConnectionError):
+            await limiter.check(EvictingRedis(), "k")
+
+        assert limiter._entries["k"].pending == 2
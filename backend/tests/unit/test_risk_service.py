@@ -14,7 +14,7 @@ from app.db.models.contract_specification import ContractSpecification
 from app.db.models.instrument_correlation import InstrumentCorrelation
 from app.db.models.position import Position
 from app.db.models.signal import Signal
-from app.services.risk_service import RiskService
+from app.services.risk_service import RiskService, RiskSnapshot
 
 
 # ---------------------------------------------------------------------------
@@ -583,3 +583,76 @@ class TestQuantityCalculation:
 
         qty = await svc.calculate_quantity(signal, settings, spec)
         assert qty == 1
+
+
+# ═══════════════════════════════════════════════════════════════════
+# Risk Snapshot Tests
+# ═══════════════════════════════════════════════════════════════════
+
+
+class TestRiskSnapshot:
+    """Test the single-query exposure snapshot used by run_all_checks."""
+
+    @pytest.mark.asyncio
+    async def test_snapshot_maps_aggregate_row(self, mock_db):
+        """Without Redis, one aggregate row maps onto the snapshot fields."""
+        svc = RiskService(mock_db, None)
+        row_result = MagicMock()
+        row_result.one.return_value = (1, 2, Decimal("-150.00"), Decimal("-40.00"), ["MNQ", "ES"])
+        mock_db.execute.return_value = row_result
+
+        snapshot = await svc.get_risk_snapshot(_USER_ID, "MNQ")
+
+        assert snapshot == RiskSnapshot(
+            open_for_symbol=1,
+            open_total=2,
+            realized_losses_today=150.0,
+            unrealized_losses=40.0,
+            open_symbols=["MNQ", "ES"],
+        )
+        mock_db.execute.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_checks_use_snapshot_without_queries(self, svc, mock_db):
+        """Exposure checks evaluate in memory when given a snapshot."""
+        signal = make_signal()
+        spec = make_contract_spec()
+        settings = default_settings(daily_loss_limit=200.0)
+        snapshot = RiskSnapshot(
+            open_for_symbol=2, open_total=1, realized_losses_today=150.0, unrealized_losses=20.0
+        )
+
+        size = await svc.check_max_position_size(signal, settings, spec, snapshot=snapshot)
+        loss = await svc.check_daily_loss_limit(signal, settings, spec, snapshot=snapshot)
+        concurrent = await svc.check_max_concurrent_positions(
+            signal, settings, spec, snapshot=snapshot
+        )
+
+        assert size["result"] == "FAIL"
+        assert size["actual_value"] == 3
+        assert loss["result"] == "FAIL"
+        assert loss["actual_value"] == 210.0
+        assert concurrent["result"] == "PASS"
+        mock_db.execute.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_run_all_checks_bulk_inserts_audits(self, svc, mock_db, mock_redis):
+        """run_all_checks reads exposure from the ledger and writes audits in one INSERT."""
+        mock_redis.hgetall.return_value = {
+            "ready": "1",
+            "day": datetime.now(UTC).date().isoformat(),
+            "open_total": "0",
+        }
+        spec_result = MagicMock()
+        spec_result.scalar_one_or_none.return_value = make_contract_spec()
+        mock_db.execute.side_effect = [spec_result, spec_result, MagicMock()]
+
+        signal = make_signal()
+        results = await svc.run_all_checks(signal, default_settings(trading_hours_mode="24H"))
+
+        assert len(results) == 8
+        insert_call = mock_db.execute.await_args_list[-1]
+        rows = insert_call.args[1]
+        assert [r["check_name"] for r in rows] == [r["check_name"] for r in results]
+        assert all(r["signal_id"] == signal.id for r in rows)
+        mock_db.add.assert_not_called()
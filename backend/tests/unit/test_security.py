@@ -0,0 +1,105 @@
+"""Unit tests for core.security: JWT verification cache and the principal dependency."""
+
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from jose import jwt
+
+from app.core import security
+from app.core.config import settings
+from app.core.exceptions import AuthenticationError, ForbiddenError
+from app.core.permissions import get_current_principal, require_verified_email
+
+
+def _token(exp_in: float = 3600, **claims) -> str:
+    payload = {
+        "sub": "00000000-0000-0000-0000-000000000001",
+        "aud": "authenticated",
+        "exp": int(time.time() + exp_in),
+        **claims,
+    }
+    return jwt.encode(payload, settings.SUPABASE_JWT_SECRET, algorithm="HS256")
+
+
+def _request(token: str) -> SimpleNamespace:
+    return SimpleNamespace(headers={"Authorization": f"Bearer {token}"}, state=SimpleNamespace())
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    security.clear_token_cache()
+    yield
+    security.clear_token_cache()
+
+
+class TestTokenCache:
+    async def test_repeated_token_skips_verification(self):
+        token = _token()
+        with patch.object(security.jwt, "decode", wraps=jwt.decode) as decode:
+            first = await security.validate_jwt(token)
+            second = await security.validate_jwt(token)
+        assert first == second
+        assert decode.call_count == 1
+
+    async def test_cached_token_reverified_after_exp(self):
+        token = _token(exp_in=60)
+        await security.validate_jwt(token)
+        later = time.time() + 120
+        with (
+            patch.object(security.time, "time", return_value=later),
+            patch.object(security.jwt, "decode", side_effect=jwt.ExpiredSignatureError),
+        ):
+            with pytest.raises(AuthenticationError, match="expired"):
+                await security.validate_jwt(token)
+        assert len(security._verified) == 0
+
+    async def test_invalid_token_not_cached(self):
+        token = _token()[:-4] + "AAAA"
+        for _ in range(2):
+            with pytest.raises(AuthenticationError):
+                await security.validate_jwt(token)
+        assert len(security._verified) == 0
+
+    def test_lru_bound(self):
+        cache = security._VerifiedTokens(max_entries=2)
+        exp = time.time() + 60
+        for digest in (b"a", b"b"):
+            cache.put(digest, {"sub": digest.decode(), "exp": exp})
+        cache.get(b"a", time.time())  # b is now least recently used
+        cache.put(b"c", {"sub": "c", "exp": exp})
+        assert cache.get(b"b", time.time()) is None
+        assert cache.get(b"a", time.time()) is not None
+
+    def test_token_without_exp_not_cached(self):
+        cache = security._VerifiedTokens(max_entries=2)
+        cache.put(b"a", {"sub": "a"})
+        assert len(cache) == 0
+
+
+class TestPrincipal:
+    async def test_one_lookup_yields_user_role_and_tier(self):
+        request = _request(_token(email_verified=True))
+        user_id = await security.get_current_user(request)
+        perms = {"role": "admin", "subscription_tier": "pro"}
+        with patch(
+            "app.core.permissions.get_user_permissions", AsyncMock(return_value=perms)
+        ):
+            principal = await get_current_principal(request, user_id, db=None)
+
+        assert principal.user_id == user_id
+        assert (principal.role, principal.subscription_tier) == ("admin", "pro")
+        assert principal.claims["email_verified"] is True
+        assert request.state.subscription_tier == "pro"
+
+    async def test_verified_email_uses_cached_claims(self):
+        check = require_verified_email()
+        request = _request(_token(email_verified=False))
+        user_id = await security.get_current_user(request)
+        with patch.object(security.jwt, "decode") as decode:
+            with pytest.raises(ForbiddenError):
+                await check(request, user_id)
+        decode.assert_not_called()
@@ -0,0 +1,82 @@
+"""Unit tests for the price-sorted SL/TP trigger book."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.adapters.trigger_book import (
+    FIRES_AT_OR_ABOVE,
+    FIRES_AT_OR_BELOW,
+    TriggerBook,
+    trigger_direction,
+)
+from app.adapters.types import BracketRole, OrderSide
+
+
+@pytest.fixture
+def book():
+    return TriggerBook()
+
+
+class TestTriggerDirection:
+    def test_bracket_directions(self):
+        assert trigger_direction(OrderSide.SELL, BracketRole.STOP_LOSS) == FIRES_AT_OR_BELOW
+        assert trigger_direction(OrderSide.BUY, BracketRole.STOP_LOSS) == FIRES_AT_OR_ABOVE
+        assert trigger_direction(OrderSide.SELL, BracketRole.TAKE_PROFIT) == FIRES_AT_OR_ABOVE
+        assert trigger_direction(OrderSide.BUY, BracketRole.TAKE_PROFIT) == FIRES_AT_OR_BELOW
+
+    def test_entry_has_no_direction(self):
+        with pytest.raises(ValueError):
+            trigger_direction(OrderSide.BUY, BracketRole.ENTRY)
+
+
+class TestTriggerBook:
+    def test_pops_only_crossed_levels_in_price_order(self, book):
+        """A drop fires every below-trigger at or above the price, highest first."""
+        for i, level in enumerate([95.0, 99.0, 97.0, 90.0]):
+            book.add(f"s{i}", "MNQ", level, FIRES_AT_OR_BELOW)
+        book.add("t0", "MNQ", 110.0, FIRES_AT_OR_ABOVE)
+
+        result = book.on_price("MNQ", 95.0)
+
+        assert [e.price for e in result.fired] == [99.0, 97.0, 95.0]
+        assert len(book) == 2
+        assert not book.on_price("MNQ", 96.0)
+
+    def test_symbols_are_independent(self, book):
+        book.add("a", "MNQ", 100.0, FIRES_AT_OR_ABOVE)
+        book.add("b", "MES", 100.0, FIRES_AT_OR_ABOVE)
+
+        assert [e.order_id for e in book.on_price("MES", 101.0).fired] == ["b"]
+        assert "a" in book
+
+    def test_oco_partner_is_cancelled(self, book):
+        """Firing one leg cancels the other, even if it crossed on the same tick."""
+        book.add("sl", "MNQ", 95.0, FIRES_AT_OR_BELOW, payload="stop")
+        book.add("tp", "MNQ", 94.0, FIRES_AT_OR_ABOVE, payload="target")
+        book.link_oco("sl", "tp")
+
+        result = book.on_price("MNQ", 94.5)
+
+        assert [e.payload for e in result.fired] == ["stop"]
+        assert [e.order_id for e in result.cancelled] == ["tp"]
+        assert len(book) == 0
+
+    def test_removed_and_modified_entries(self, book):
+        book.add("x", "MNQ", 100.0, FIRES_AT_OR_ABOVE)
+        book.add("y", "MNQ", 100.0, FIRES_AT_OR_ABOVE)
+        book.remove("x")
+        book.modify("y", 105.0)
+
+        assert not book.on_price("MNQ", 101.0)
+        assert [e.order_id for e in book.on_price("MNQ", 105.0).fired] == ["y"]
+
+    def test_stale_heap_items_are_compacted(self, book):
+        """Repeated modifies do not grow the heaps without bound."""
+        book.add("keep", "MNQ", 1.0, FIRES_AT_OR_BELOW)
+        for i in range(1000):
+            book.modify("keep", float(i % 50))
+
+        symbol_book = book._books["MNQ"]
+        assert len(symbol_book.below) <= 2 * len(symbol_book.order_ids) + 33
+        assert [e.price for e in book.on_price("MNQ", 49.0).fired] == [49.0]
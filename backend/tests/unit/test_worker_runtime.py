@@ -0,0 +1,105 @@
+"""Unit tests for the per-process Celery worker runtime."""
+
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.tasks import worker
+
+
+@pytest.fixture
+def runtime():
+    engine = MagicMock()
+    engine.dispose = AsyncMock()
+    with (
+        patch("app.db.session.engine", engine),
+        patch("app.adapters.pool.adapter_pool.close", AsyncMock()) as pool_close,
+    ):
+        worker.init_worker()
+        yield engine, pool_close
+        worker.shutdown_worker()
+
+
+class TestWorkerRuntime:
+    def test_tasks_share_one_loop_and_client(self, runtime):
+        async def current():
+            return asyncio.get_running_loop(), worker.worker_redis()
+
+        first = worker.run_async(current())
+        second = worker.run_async(current())
+
+        assert first[0] is second[0]
+        assert first[1] is second[1]
+
+    def test_loop_bound_state_survives_between_tasks(self, runtime):
+        """A pooled connection created in one task is usable by the next."""
+        state = {}
+
+        async def open_connection():
+            state["future"] = asyncio.get_running_loop().create_future()
+
+        async def use_connection():
+            state["future"].set_result("reused")
+            return await state["future"]
+
+        worker.run_async(open_connection())
+
+        assert worker.run_async(use_connection()) == "reused"
+
+    def test_cached_broker_connections_last_one_task(self, runtime):
+        """Workers miss pool invalidation broadcasts, so lookups are per task."""
+        with patch("app.adapters.pool.adapter_pool.forget_connections") as forget:
+            worker.run_async(asyncio.sleep(0))
+
+        forget.assert_called_once_with()
+
+    def test_inherited_pool_dropped_on_init(self, runtime):
+        engine, _ = runtime
+        engine.sync_engine.dispose.assert_called_once_with(close=False)
+
+    def test_shutdown_closes_clients(self, runtime):
+        engine, pool_close = runtime
+        redis = worker.worker_redis()
+
+        with patch.object(redis, "aclose", AsyncMock()) as redis_close:
+            worker.shutdown_worker()
+
+        redis_close.assert_awaited_once()
+        pool_close.assert_awaited_once()
+        engine.dispose.assert_awaited_once()
+        assert worker._loop is None
+
+    def test_lazy_init_without_worker_signals(self):
+        worker.shutdown_worker()
+        with patch.object(worker, "init_worker", wraps=worker.init_worker) as init:
+            with patch("app.db.session.engine"):
+                assert worker.run_async(asyncio.sleep(0, "ok")) == "ok"
+        init.assert_called_once()
+        with patch("app.adapters.pool.adapter_pool.close", AsyncMock()), patch(
+            "app.db.session.engine", MagicMock(dispose=AsyncMock())
+        ):
+            worker.shutdown_worker()
+
+    def test_task_runs_are_instrumentation_scopes(self, runtime):
+        from app.core.instrumentation import current_stats
+
+        task = MagicMock()
+        task.name = "app.tasks.demo"
+        seen = []
+
+        async def body():
+            stats = current_stats()
+            stats.db_statements += 2
+            seen.append(stats)
+
+        worker._open_task_scope(task_id="t-1")
+        worker.run_async(body())
+        with patch("app.core.instrumentation.report") as report:
+            worker._close_task_scope(task_id="t-1", task=task, state="SUCCESS")
+
+        report.assert_called_once_with(seen[0], "task", "app.tasks.demo")
+        assert seen[0].db_statements == 2
+        assert current_stats() is None